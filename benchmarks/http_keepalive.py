@@ -0,0 +1,80 @@
+"""Repeated local HTTP requests: one ``urlopen`` connection per call vs. pooled keep-alive.
+
+Run from the repository root::
+
+    python benchmarks/http_keepalive.py [requests]
+
+A threaded HTTP/1.1 server on 127.0.0.1 answers every GET with a small JSON
+body, like ComfyUI's ``/queue`` or ``/history`` polling.  Each approach
+issues the same number of sequential GETs; the connection count is taken
+from the server side.  The server disables Nagle's algorithm as production
+HTTP servers (aiohttp, nginx) do; otherwise its separate header and body
+writes stall on delayed ACKs once a connection is reused.  Loopback has no TLS handshake and almost no latency,
+so remote hosts gain considerably more than shown here.
+"""
+from __future__ import annotations
+
+import http.server
+import os
+import sys
+import threading
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests  # noqa: E402  (the bundled shim)
+
+_BODY = b'{"queue_running": [], "queue_pending": []}'
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(_BODY)))
+        self.end_headers()
+        self.wfile.write(_BODY)
+
+
+def _urlopen_get(url):
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return response.read()
+
+
+def _run(label, fetch, url, count):
+    _Handler.connections = 0
+    started = time.perf_counter()
+    for _ in range(count):
+        fetch(url)
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<24} {elapsed / count * 1e6:8.1f} us/request   {_Handler.connections:5d} connection(s)")
+
+
+def main(count: int = 2000) -> None:
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{httpd.server_address[1]}/queue"
+    print(f"{count} sequential GETs against {url}")
+    try:
+        _run("urllib urlopen", _urlopen_get, url, count)
+        with requests.Session() as session:
+            _run("pooled requests.Session", lambda u: session.get(u, timeout=5).content, url, count)
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
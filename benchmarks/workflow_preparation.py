@@ -0,0 +1,85 @@
+"""Per-job workflow preparation: JSON round-trip copy vs. copy-on-write builder.
+
+Run from the repository root::
+
+    python benchmarks/workflow_preparation.py [iterations]
+
+Each iteration prepares a text-to-image payload for every registered model
+the way ``modify_prompt`` does (prompt text, seed, latent size, sampler and
+save-node edits) and produces the plain payload dict.  Serializing that dict
+costs the same either way and is left out.  Time is measured with
+``time.perf_counter``; peak allocation per job with ``tracemalloc`` on a
+separate pass.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_registry import MODEL_REGISTRY, generation_workflow_builder  # noqa: E402
+
+
+def _legacy_copy(spec):
+    return json.loads(json.dumps(spec.generation.text2img_template))
+
+
+def _builder_copy(spec):
+    return generation_workflow_builder(spec.generation, is_img2img=False)
+
+
+def _apply_job_edits(workflow, spec, seed):
+    gen = spec.generation
+    for node_id in (gen.prompt_node, gen.pos_prompt_node, gen.text_encoder_node):
+        if node_id and node_id in workflow:
+            workflow[node_id].setdefault("inputs", {})["text"] = f"benchmark prompt {seed}"
+    if gen.ksampler_node in workflow:
+        inputs = workflow[gen.ksampler_node].setdefault("inputs", {})
+        inputs["seed"] = seed
+        inputs["steps"] = 28
+    if gen.latent_node in workflow:
+        inputs = workflow[gen.latent_node].setdefault("inputs", {})
+        inputs.update({"width": 1024, "height": 1024, "batch_size": 1})
+    if gen.save_node in workflow:
+        workflow[gen.save_node].setdefault("inputs", {})["filename_prefix"] = f"GEN_{seed:08x}"
+
+
+def _prepare_jobs(prepare, finish, specs, iterations):
+    for seed in range(iterations):
+        for spec in specs:
+            workflow = prepare(spec)
+            _apply_job_edits(workflow, spec, seed)
+            finish(workflow)
+
+
+def _run(prepare, finish, specs, iterations):
+    started = time.perf_counter()
+    _prepare_jobs(prepare, finish, specs, iterations)
+    elapsed = time.perf_counter() - started
+
+    # Allocation tracking slows everything down, so measure it on a separate, shorter pass.
+    tracemalloc.start()
+    _prepare_jobs(prepare, finish, specs, 1)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / (iterations * len(specs)) * 1e6, peak
+
+
+def main(iterations: int = 2000) -> None:
+    specs = [spec for spec in MODEL_REGISTRY.values() if getattr(spec.generation, "ksampler_node", None)]
+    approaches = (
+        ("json round-trip", _legacy_copy, lambda workflow: workflow),
+        ("copy-on-write builder", _builder_copy, lambda builder: builder.materialize()),
+    )
+    print(f"{iterations} iterations x {len(specs)} model templates")
+    for label, prepare, finish in approaches:
+        per_job_us, peak = _run(prepare, finish, specs, iterations)
+        print(f"  {label:<22} {per_job_us:8.1f} us/job   peak allocated per job {peak / 1024:6.1f} KiB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
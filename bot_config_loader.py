@@ -1,9 +1,11 @@
 import json
 import os
+import threading
+import time
 import traceback
+from dataclasses import dataclass
 
-def load_main_config():
-    config_path = 'config.json'
+def load_main_config(config_path='config.json', raise_errors=False):
     default_structure = {
         "ADMIN": {"USERNAME": "", "ID": ""}, 
         "OUTPUTS": {}, 
@@ -51,30 +53,161 @@ def load_main_config():
             with open(config_path, 'w') as f: json.dump(config_data, f, indent=2)
         return config_data
     except Exception as e:
+        if raise_errors: raise
         print(f"CRITICAL UNEXPECTED ERROR loading {config_path}: {e}"); traceback.print_exc()
         return default_structure
 
-config = load_main_config()
+
+def _config_file_signature(config_path):
+    try:
+        stat_result = os.stat(config_path)
+    except OSError:
+        return None
+    return stat_result.st_mtime_ns, stat_result.st_size
+
+
+@dataclass(frozen=True)
+class ComfyUIConfig:
+    host: str = '127.0.0.1'
+    port: int = 8188
+
+
+@dataclass(frozen=True)
+class LLMEnhancerConfig:
+    gemini_api_key: str = ''
+    groq_api_key: str = ''
+    openai_api_key: str = ''
+
+    def api_key_for(self, provider):
+        return getattr(self, f"{str(provider or '').lower()}_api_key", '') or ''
+
+
+class ConfigService:
+    """Single owner of ``config.json``.
+
+    The file is parsed once; :meth:`reload_if_changed` re-reads it when its
+    mtime/size changes (checked at most every ``RELOAD_CHECK_INTERVAL``
+    seconds) and updates :attr:`data` in place, so modules holding
+    ``bot_config_loader.config`` see edits from the config editor.  Modules
+    that derive values from the config register with :meth:`subscribe`.
+    """
+
+    RELOAD_CHECK_INTERVAL = 2.0
+
+    def __init__(self, config_path='config.json', loader=load_main_config):
+        self.config_path = config_path
+        self._loader = loader
+        self._lock = threading.RLock()
+        self._subscribers = []
+        self._last_check = time.monotonic()
+        self.data = {}
+        self._apply(loader(config_path))
+
+    def _apply(self, new_data):
+        # Update in place rather than clear()+update() so readers never see an empty dict.
+        self.data.update(new_data)
+        for stale_key in [k for k in self.data if k not in new_data]:
+            del self.data[stale_key]
+        self._signature = _config_file_signature(self.config_path)
+
+        comfy_cfg = self.section('COMFYUI_API')
+        try:
+            comfy_port = int(comfy_cfg.get('PORT', 8188))
+        except (TypeError, ValueError):
+            print(f"Warning: Invalid COMFYUI_API.PORT '{comfy_cfg.get('PORT')}' in config. Using default 8188.")
+            comfy_port = 8188
+        self.comfyui = ComfyUIConfig(host=str(comfy_cfg.get('HOST') or '127.0.0.1'), port=comfy_port)
+
+        llm_cfg = self.section('LLM_ENHANCER')
+        self.llm_enhancer = LLMEnhancerConfig(
+            gemini_api_key=str(llm_cfg.get('GEMINI_API_KEY') or ''),
+            groq_api_key=str(llm_cfg.get('GROQ_API_KEY') or ''),
+            openai_api_key=str(llm_cfg.get('OPENAI_API_KEY') or ''),
+        )
+
+    def section(self, name):
+        value = self.data.get(name, {})
+        return value if isinstance(value, dict) else {}
+
+    def output_dir(self, key, *fallback_keys, default=None):
+        """Absolute path of ``OUTPUTS[key]`` (or the first usable fallback key)."""
+        outputs = self.section('OUTPUTS')
+        for candidate_key in (key, *fallback_keys):
+            candidate = outputs.get(candidate_key)
+            if isinstance(candidate, str) and candidate.strip():
+                return os.path.abspath(candidate.strip())
+        if default is None:
+            default = os.path.join('output', 'TENOSAI-BOT', key)
+        return os.path.abspath(default)
+
+    def output_folders(self, keys):
+        outputs = self.section('OUTPUTS')
+        return [outputs[k] for k in keys if isinstance(outputs.get(k), str) and outputs.get(k)]
+
+    def models_dir(self, key):
+        value = self.section('MODELS').get(key)
+        if isinstance(value, str) and value.strip():
+            return os.path.abspath(value.strip())
+        return None
+
+    def llm_api_key(self, provider):
+        self.reload_if_changed()
+        return self.llm_enhancer.api_key_for(provider)
+
+    def subscribe(self, callback):
+        """Call ``callback(service)`` now and after every reload."""
+        with self._lock:
+            self._subscribers.append(callback)
+        callback(self)
+        return callback
+
+    def reload_if_changed(self, force=False):
+        """Re-read the file if it changed on disk. Returns True when a reload happened."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_check < self.RELOAD_CHECK_INTERVAL:
+                return False
+            self._last_check = now
+            if not force and _config_file_signature(self.config_path) == self._signature:
+                return False
+            try:
+                new_data = self._loader(self.config_path, raise_errors=True)
+            except Exception as e:
+                # Usually a half-written file from the editor; keep the last good config.
+                print(f"Warning: Not reloading {self.config_path}: {e}")
+                self._signature = _config_file_signature(self.config_path)
+                return False
+            self._apply(new_data)
+            subscribers = list(self._subscribers)
+        print(f"Reloaded {self.config_path}.")
+        for callback in subscribers:
+            try:
+                callback(self)
+            except Exception as e_sub:
+                print(f"Error applying reloaded config in {getattr(callback, '__module__', callback)}: {e_sub}")
+                traceback.print_exc()
+        return True
+
+
+config_service = ConfigService()
+config = config_service.data
 BOT_TOKEN = config.get('BOT_API', {}).get('KEY')
 ADMIN_USERNAME = config.get('ADMIN', {}).get('USERNAME', None)
 ADMIN_ID = config.get('ADMIN', {}).get('ID', None)
-ALLOWED_USERS = config.get('ALLOWED_USERS', {})
-COMFYUI_HOST = config.get('COMFYUI_API', {}).get('HOST', '127.0.0.1')
-COMFYUI_PORT = config.get('COMFYUI_API', {}).get('PORT', 8188)
 BOT_INTERNAL_API_HOST = config.get('BOT_INTERNAL_API', {}).get('HOST', '127.0.0.1')
 BOT_INTERNAL_API_PORT = config.get('BOT_INTERNAL_API', {}).get('PORT', 8189)
 BOT_INTERNAL_API_TOKEN = config.get('BOT_INTERNAL_API', {}).get('AUTH_TOKEN', '')
 
-for port_var_name in ["COMFYUI_PORT", "BOT_INTERNAL_API_PORT"]:
+for port_var_name in ["BOT_INTERNAL_API_PORT"]:
     globals()[port_var_name] = int(globals()[port_var_name])
 
 def print_startup_info():
     print(f"Admin User: {ADMIN_USERNAME or 'Not Set'}")
     print(f"Admin User ID: {ADMIN_ID or 'Not Set! WARNING!'}")
-    print(f"ComfyUI API: http://{COMFYUI_HOST}:{COMFYUI_PORT}")
+    print(f"ComfyUI API: http://{config_service.comfyui.host}:{config_service.comfyui.port}")
     print(f"Bot Internal API: http://{BOT_INTERNAL_API_HOST}:{BOT_INTERNAL_API_PORT}")
     print(f"Bot Internal API Token Configured: {'Yes' if BOT_INTERNAL_API_TOKEN else 'No'}")
-    print(f"Allowed Users Loaded: {len(ALLOWED_USERS)}")
+    print(f"Allowed Users Loaded: {len(config_service.section('ALLOWED_USERS'))}")
 
 def normalize_path_for_comfyui(path):
     if not path or not isinstance(path, str): return path
@@ -10,15 +10,21 @@ import re
 import requests
 from io import BytesIO
 import math
+import time
+from collections import OrderedDict
 from typing import Optional
 
-from bot_config_loader import config, COMFYUI_HOST, COMFYUI_PORT, ADMIN_USERNAME
+from bot_config_loader import config, config_service, ADMIN_USERNAME
 from queue_manager import queue_manager
 from file_management import extract_job_id
 from settings_manager import load_settings, load_styles_config
 from model_registry import get_model_spec, get_guidance_field_name
-from comfyui_api import queue_prompt as comfy_queue_prompt, ConnectionRefusedError as ComfyConnectionRefusedError
+from comfyui_api import ConnectionRefusedError as ComfyConnectionRefusedError
+from job_scheduler import job_scheduler
 from websocket_client import WebsocketClient
+from progress_scheduler import progress_scheduler
+from result_delivery import delivery_pipeline, is_contact_sheet_filename
+from source_images import resolve_source_image
 
 from image_generation import modify_prompt as ig_modify_prompt
 from upscaling import modify_upscale_prompt as up_modify_upscale_prompt, get_image_dimensions
@@ -26,10 +32,12 @@ from variation import modify_variation_prompt
 from kontext_editing import modify_kontext_prompt
 from qwen_editing import modify_qwen_edit_prompt
 from utils.seed_utils import generate_seed
+from utils.llm_cache import llm_response_cache
 from utils.show_prompt import reconstruct_full_prompt_string
 from utils.message_utils import send_long_message, safe_interaction_response
 from utils.llm_enhancer import (
     enhance_prompt as util_enhance_prompt,
+    enhance_prompts_batch as util_enhance_prompts_batch,
     FLUX_ENHANCER_SYSTEM_PROMPT,
     SDXL_ENHANCER_SYSTEM_PROMPT,
     KONTEXT_ENHANCER_SYSTEM_PROMPT,
@@ -110,7 +118,7 @@ async def _get_preview_image_from_comfyui(image_data):
         if not filename: return None
 
         params = {"filename": filename, "subfolder": subfolder, "type": img_type}
-        url = f"http://{COMFYUI_HOST}:{COMFYUI_PORT}/view"
+        url = f"http://{config_service.comfyui.host}:{config_service.comfyui.port}/view"
         
         response = await asyncio.to_thread(requests.get, url, params=params, timeout=10)
         response.raise_for_status()
@@ -121,59 +129,66 @@ async def _get_preview_image_from_comfyui(image_data):
         return None
 
 async def update_job_progress(bot, prompt_id, current_step, max_steps, image_data):
-    """Updates the Discord message with the current job progress."""
+    """Queues the latest job progress for the Discord status message."""
     ws_client = WebsocketClient()
     job_info = ws_client.active_prompts.get(prompt_id)
     if not job_info: return
 
-    try:
-        channel = bot.get_channel(job_info['channel_id']) or await bot.fetch_channel(job_info['channel_id'])
-        message = await channel.fetch_message(job_info['message_id'])
-    except discord.NotFound:
-        ws_client.unregister_prompt(prompt_id)
-        return
-    except Exception as e:
-        print(f"Error fetching message for progress update (Prompt ID: {prompt_id}): {e}")
-        return
-        
     job_data = queue_manager.get_job_by_comfy_id(prompt_id)
     if not job_data: return
 
-    edit_kwargs = {}
-
+    status_line = None
     if current_step is not None and max_steps is not None and max_steps > 0:
         percentage = (current_step / max_steps) * 100
         filled_blocks = int(percentage / 10)
         empty_blocks = 10 - filled_blocks
         progress_bar = f"**Status:** Generating: [ {'● ' * filled_blocks}{'◌ ' * empty_blocks}] {int(percentage)}%"
-        
-        original_content = message.content
-        new_content = re.sub(r'> \*\*Status:\*\*.*', f'> {progress_bar}', original_content, flags=re.MULTILINE)
-        
-        if new_content != original_content:
-            edit_kwargs['content'] = new_content
+        status_line = f'> {progress_bar}'
 
+    preview_bytes = None
     if image_data:
         now = asyncio.get_event_loop().time()
         if (now - job_info.get('last_preview_timestamp', 0)) > 2.0:
             job_info['last_preview_timestamp'] = now
             image_bytes = await _get_preview_image_from_comfyui(image_data)
             if image_bytes:
-                edit_kwargs['attachments'] = [discord.File(image_bytes, filename=f"preview_{prompt_id}.jpeg")]
+                preview_bytes = image_bytes.getvalue()
+
+    if status_line is None and preview_bytes is None:
+        return
+
+    progress_scheduler.submit(
+        bot,
+        job_info['channel_id'],
+        job_info['message_id'],
+        status_line=status_line,
+        preview_bytes=preview_bytes,
+        preview_filename=f"preview_{prompt_id}.jpeg",
+        on_missing=lambda: ws_client.unregister_prompt(prompt_id),
+    )
+
+_MAX_DOWNLOAD_LINKS = 5
+
+
+def _build_download_links(bot, file_paths):
+    """Signed download links for outputs that could not be attached to the Discord message."""
+    server = getattr(bot, 'output_server', None)
+    if not server or not file_paths:
+        return []
+    links = []
+    for fp_link in file_paths[:_MAX_DOWNLOAD_LINKS]:
+        url = server.link_for(fp_link)
+        if url: links.append(f"> **Download:** [{os.path.basename(fp_link)}](<{url}>)")
+    if links and len(file_paths) > _MAX_DOWNLOAD_LINKS:
+        links.append(f"> *(+{len(file_paths) - _MAX_DOWNLOAD_LINKS} more files in the output folder)*")
+    return links
 
-    if edit_kwargs:
-        try:
-            await message.edit(**edit_kwargs)
-        except discord.HTTPException as e:
-            if e.status != 429: 
-                print(f"HTTPException updating progress for prompt {prompt_id}: {e}")
-        except Exception as e:
-            print(f"Error updating progress message for prompt {prompt_id}: {e}")
 
 async def process_completed_job(bot, job_id, job_data, file_paths: list):
     ws_client = WebsocketClient()
     if job_data.get("comfy_prompt_id"):
         ws_client.unregister_prompt(job_data["comfy_prompt_id"])
+    await progress_scheduler.finalize(job_data.get('message_id'))
         
     from bot_ui_components import BatchActionsView, GenerationActionsView
 
@@ -216,32 +231,20 @@ async def process_completed_job(bot, job_id, job_data, file_paths: list):
         except discord.Forbidden: print(f"CRITICAL Error: Bot lacks permission for channel {channel_id} (job {job_id})."); return
         except Exception as e_fetch_chan: print(f"CRITICAL Error fetching channel {channel_id} for job {job_id}: {e_fetch_chan}"); return
         if not channel: print(f"CRITICAL Error: Failed get channel object for job {job_id}"); return
-        valid_files_for_discord = []; discord_file_limit = 25 * 1024 * 1024; total_attachment_size = 0; max_total_size = 48 * 1024 * 1024
-        norm_file_paths.sort()
-        for fp_check in norm_file_paths:
-            if os.path.exists(fp_check):
-                try:
-                    f_size = os.path.getsize(fp_check)
-                    if f_size == 0: print(f"Warning: File '{os.path.basename(fp_check)}' is 0 bytes (job {job_id}). Skipping.")
-                    elif f_size > discord_file_limit: print(f"Warning: File '{os.path.basename(fp_check)}' ({f_size} bytes) > Discord limit ({discord_file_limit} bytes). Skipping.")
-                    elif total_attachment_size + f_size > max_total_size: print(f"Warning: Adding file '{os.path.basename(fp_check)}' would exceed total size limit. Skipping for job {job_id}."); break
-                    else: valid_files_for_discord.append(fp_check); total_attachment_size += f_size
-                except OSError as e_size_check: print(f"Error getting size/checking file {fp_check}: {e_size_check}")
-            else: print(f"WARNING: File path not found during completion processing: {fp_check} (job {job_id})")
-        if not valid_files_for_discord:
+        delivery_plan = await delivery_pipeline.prepare(job_id, norm_file_paths)
+        download_links = _build_download_links(bot, delivery_plan.skipped_paths)
+        if not delivery_plan.attachments and not download_links:
             error_content_no_files = f"{user_mention} Error: Output file(s) for job `{job_id}` were missing, empty, or too large to attach."
             try:
                 if message_to_edit: await message_to_edit.edit(content=error_content_no_files, view=None, attachments=[])
                 else: await channel.send(content=error_content_no_files)
             except Exception as e_send_err_nofiles: print(f"Error sending/editing message for missing files: {e_send_err_nofiles}")
             return
-        attachment_warning_str = ""; discord_files_list = []
-        files_to_attach_this_msg = valid_files_for_discord[:10]
-        if len(valid_files_for_discord) > 10: attachment_warning_str = f"\n*(Showing first 10 of {len(valid_files_for_discord)} generated images)*"
-        for fp_attach in files_to_attach_this_msg:
-            try: discord_files_list.append(discord.File(fp_attach))
-            except Exception as e_df_create: print(f"Error creating discord.File for {fp_attach}: {e_df_create}")
-        if not discord_files_list:
+        attachment_warning_str = ""
+        if delivery_plan.contact_sheet: job_data['delivery_mode'] = 'contact_sheet'; attachment_warning_str = f"\n*(Contact sheet of {delivery_plan.total_valid_files} images; the numbered buttons use the full-size originals)*"
+        elif delivery_plan.total_valid_files > len(delivery_plan.attachments): attachment_warning_str = f"\n*(Showing {len(delivery_plan.attachments)} of {delivery_plan.total_valid_files} generated images)*"
+        discord_files_list = delivery_plan.discord_files()
+        if not discord_files_list and not download_links:
             error_content_no_attach = f"{user_mention} Error: Failed to prepare attachments for job `{job_id}`."
             try:
                 if message_to_edit: await message_to_edit.edit(content=error_content_no_attach, view=None, attachments=[])
@@ -312,16 +315,21 @@ async def process_completed_job(bot, job_id, job_data, file_paths: list):
         elif enhancer_had_error: final_content += f"\n> `(Enhancer Error ({llm_provider_used.capitalize() if llm_provider_used else 'LLM'}): {enhancer_had_error})`"
         if job_data.get('style_warning_message'): final_content += f"\n> `(Style Warning: {job_data['style_warning_message']})`"
         final_content += attachment_warning_str
+        for link_line in download_links:
+            if len(final_content) + len(link_line) + 1 > 2000: break
+            final_content += "\n" + link_line
         
         action_msg_id = message_id if message_to_edit else 0
-        view_to_use_final = BatchActionsView(action_msg_id, channel_id, job_id, batch_size, bot) if batch_size >= 2 else GenerationActionsView(action_msg_id, channel_id, job_id, bot)
+        view_to_use_final = BatchActionsView(action_msg_id, channel_id, job_id, batch_size, bot, contact_sheet=delivery_plan.contact_sheet) if batch_size >= 2 else GenerationActionsView(action_msg_id, channel_id, job_id, bot)
         try:
             sent_msg_obj = None
+            upload_started = time.perf_counter()
             if message_to_edit: await message_to_edit.edit(content=final_content, attachments=discord_files_list, view=view_to_use_final); sent_msg_obj = message_to_edit; print(f"Successfully updated message {message_id} for job {job_id}")
             else:
                 new_sent_msg = await channel.send(content=final_content, files=discord_files_list, view=view_to_use_final); sent_msg_obj = new_sent_msg
                 print(f"Sent new message {new_sent_msg.id} for job {job_id} (original status msg missing/failed).")
                 if new_sent_msg: queue_manager.update_job_message_id(job_id, new_sent_msg.id); view_to_use_final.original_message_id = new_sent_msg.id
+            delivery_pipeline.record_upload(delivery_plan.stats, time.perf_counter() - upload_started)
         except discord.HTTPException as http_err_send:
             print(f"Discord HTTP Error sending results for job {job_id}: {http_err_send.status} - {http_err_send.text}")
             fb_content_err = final_content + ("\n\n**Error: Result files too large/many to attach.**" if http_err_send.status == 400 or ("Invalid Form Body" in str(http_err_send.text) and "attachments" in str(http_err_send.text).lower()) or http_err_send.status == 413 or "Request entity too large" in str(http_err_send.text).lower() or "payload too large" in str(http_err_send.text).lower() else "\n\n**Error attaching result images.**")
@@ -351,8 +359,8 @@ async def check_output_folders(bot):
     startup_scan_done_flag = False
     while not bot.is_closed():
         try:
-            if not ws_client.is_connected and not ws_client.is_connecting:
-                bot.loop.create_task(ws_client.ensure_connected())
+            ws_client.start_supervisor()
+            config_service.reload_if_changed()
 
             current_pending_jobs = queue_manager.get_pending_jobs()
             if not current_pending_jobs and startup_scan_done_flag: await asyncio.sleep(15); continue
@@ -440,7 +448,7 @@ async def process_cancel_request(comfy_prompt_id: str) -> tuple[bool, str]:
     final_status_msg = ""
 
     try:
-        api_url_base = f"http://{COMFYUI_HOST}:{COMFYUI_PORT}"
+        api_url_base = f"http://{config_service.comfyui.host}:{config_service.comfyui.port}"
         delete_payload = {"delete": [comfy_prompt_id]}
 
         print(f"Sending DELETE to ComfyUI queue for prompt {comfy_prompt_id}...")
@@ -495,6 +503,78 @@ async def process_cancel_request(comfy_prompt_id: str) -> tuple[bool, str]:
     return False, final_status_msg or "Failed to cancel job."
 
 
+def _generation_enhancer_system_prompt(model_type: str) -> str:
+    return SDXL_ENHANCER_SYSTEM_PROMPT if model_type == "sdxl" else FLUX_ENHANCER_SYSTEM_PROMPT
+
+
+_GENERATION_PARAM_PATTERN = r'\s--(\w+)(?:\s+("([^"]*)"|((?:(?!--|\s--).)+)|([^\s]+)))?'
+_NEGATIVE_PARAM_PATTERN = r'--no\s+(?:"([^"]*)"|((?:(?!\s--).)+))'
+
+
+def _split_generation_prompt(prompt: str):
+    """Split a generation prompt into ``(base, params, negative)``.
+
+    ``params`` maps lower-cased ``--name`` flags to their value (``True`` for
+    bare flags); ``negative`` is the ``--no`` text, ``""`` for a bare
+    ``--no`` and ``None`` without one.  The base is what the enhancer sees.
+    """
+    params = {}
+    first_param = re.search(r'\s--\w+', prompt)
+    if first_param:
+        base = prompt[:first_param.start()].strip()
+        param_matches = re.findall(_GENERATION_PARAM_PATTERN, prompt[first_param.start():])
+        for key, _, quoted_val, unquoted_compound, unquoted_single in param_matches:
+            value = quoted_val if quoted_val else (unquoted_compound if unquoted_compound else unquoted_single)
+            params[key.lower()] = value.strip() if value else True
+    else:
+        base = prompt.strip()
+
+    negative = None
+    no_param_match = re.search(_NEGATIVE_PARAM_PATTERN, prompt, re.I | re.S)
+    if no_param_match:
+        negative = (no_param_match.group(1) or no_param_match.group(2)).strip()
+        base = re.sub(r'\s*' + _NEGATIVE_PARAM_PATTERN + r'\s*', ' ', base, flags=re.I | re.S).strip()
+        params.pop('no', None)
+    elif params.get('no') is True:
+        negative = ""
+        del params['no']
+    return base, params, negative
+
+
+def _is_img2img_request(params: dict) -> bool:
+    return 'img' in params and params['img'] is not True
+
+
+async def prewarm_prompt_enhancements(prompts: list, model_type: str) -> int:
+    """Batch-enhance bulk prompts before they are queued one by one.
+
+    The batch answers land in the LLM cache under the same keys the
+    per-job enhancer call in :func:`execute_generation_logic` looks up, so
+    each queued prompt then skips its own round-trip.  Returns how many
+    prompts got an enhancement.
+    """
+    settings = load_settings()
+    provider = settings.get('llm_provider', 'gemini')
+    if not settings.get('llm_enhancer_enabled', False) or not config_service.llm_api_key(provider):
+        return 0
+    if not llm_response_cache.is_active():
+        return 0
+    base_prompts = []
+    for prompt in prompts:
+        base, params, _ = _split_generation_prompt(prompt)
+        if base and not _is_img2img_request(params):  # img2img prompts skip the enhancer
+            base_prompts.append(base)
+    unique_prompts = list(dict.fromkeys(base_prompts))
+    if not unique_prompts:
+        return 0
+    results = await util_enhance_prompts_batch(
+        unique_prompts,
+        system_prompt_text_override=_generation_enhancer_system_prompt(model_type),
+        target_model_type=model_type,
+    )
+    return sum(1 for enhanced, _ in results if enhanced)
+
+
 async def execute_generation_logic(
     context_user: discord.User,
     context_channel: discord.abc.Messageable,
@@ -507,17 +587,7 @@ async def execute_generation_logic(
     await _ensure_ws_client_id()
     current_styles_config = load_styles_config()
     settings_gen = load_settings()
-    param_pattern_gen = r'\s--(\w+)(?:\s+("([^"]*)"|((?:(?!--|\s--).)+)|([^\s]+)))?'
-    params_dict_gen = {}; prompt_base_gen = prompt; param_string_for_neg_prompt_gen = prompt
-    first_param_match_gen = re.search(r'\s--\w+', prompt)
-    if first_param_match_gen:
-        prompt_base_gen = prompt[:first_param_match_gen.start()].strip()
-        param_string_for_params_dict_gen = prompt[first_param_match_gen.start():]
-        param_matches_gen = re.findall(param_pattern_gen, param_string_for_params_dict_gen)
-        for key_gen, _, quoted_val_gen, unquoted_compound_gen, unquoted_single_gen in param_matches_gen:
-             value_gen = quoted_val_gen if quoted_val_gen else (unquoted_compound_gen if unquoted_compound_gen else unquoted_single_gen)
-             params_dict_gen[key_gen.lower()] = value_gen.strip() if value_gen else True
-    else: prompt_base_gen = prompt.strip()
+    prompt_base_gen, params_dict_gen, user_provided_neg_prompt_gen = _split_generation_prompt(prompt)
     
     selected_model_prefix_gen = settings_gen.get('selected_model')
     current_model_type_for_job = "flux" 
@@ -531,14 +601,6 @@ async def execute_generation_logic(
         if selected_model_prefix_gen.endswith((".gguf",".sft")): current_model_type_for_job = "flux"
         else: current_model_type_for_job = "sdxl"
     
-    user_provided_neg_prompt_gen = None
-    no_param_match_gen = re.search(r'--no\s+(?:"([^"]*)"|((?:(?!\s--).)+))', param_string_for_neg_prompt_gen, re.I | re.S)
-    if no_param_match_gen:
-        user_provided_neg_prompt_gen = (no_param_match_gen.group(1) or no_param_match_gen.group(2)).strip()
-        prompt_base_gen = re.sub(r'\s*--no\s+(?:"([^"]*)"|((?:(?!\s--).)+))\s*', ' ', prompt_base_gen, flags=re.I | re.S).strip()
-        if 'no' in params_dict_gen: del params_dict_gen['no']
-    elif params_dict_gen.get('no') is True: user_provided_neg_prompt_gen = "";  del params_dict_gen['no']
-    
     negative_prompt_text_gen = None
     if current_model_type_for_job == "sdxl":
         if is_derivative_action: 
@@ -550,7 +612,7 @@ async def execute_generation_logic(
             else: 
                 negative_prompt_text_gen = default_sdxl_neg_gen
     
-    is_img2img_gen = 'img' in params_dict_gen and params_dict_gen['img'] is not True
+    is_img2img_gen = _is_img2img_request(params_dict_gen)
     run_times_gen = 1
     if 'r' in params_dict_gen:
         try: run_times_gen = min(max(1, int(params_dict_gen['r'])), 10); del params_dict_gen['r']
@@ -562,18 +624,11 @@ async def execute_generation_logic(
     enhancer_info_gen = {'used': False, 'provider': None, 'enhanced_text': None, 'error': None, 'model_type_for_enhancer': current_model_type_for_job}
     additional_info_msg_gen = ""
     is_admin_text_cmd_gen = (not is_interaction_context) and isinstance(context_user, discord.Member) and context_user.name == ADMIN_USERNAME
-    api_key_present_enh_gen = False
-    try:
-        config_file_path = config.get("CONFIG_FILE_NAME", "config.json")
-        with open(config_file_path, 'r') as cf_enh: temp_cfg_enh = json.load(cf_enh).get('LLM_ENHANCER',{})
-        if llm_provider_gen == 'gemini' and temp_cfg_enh.get('GEMINI_API_KEY',''): api_key_present_enh_gen = True
-        elif llm_provider_gen == 'groq' and temp_cfg_enh.get('GROQ_API_KEY',''): api_key_present_enh_gen = True
-        elif llm_provider_gen == 'openai' and temp_cfg_enh.get('OPENAI_API_KEY',''): api_key_present_enh_gen = True
-    except Exception as e_apikey_read: print(f"Warning: Could not read API keys for LLM enhancer: {e_apikey_read}")
+    api_key_present_enh_gen = bool(config_service.llm_api_key(llm_provider_gen))
 
     if enhancer_enabled_gen and api_key_present_enh_gen and not is_derivative_action and not is_admin_text_cmd_gen and not is_img2img_gen:
         enhancer_info_gen['provider'] = llm_provider_gen
-        system_prompt_llm_gen = SDXL_ENHANCER_SYSTEM_PROMPT if current_model_type_for_job == "sdxl" else FLUX_ENHANCER_SYSTEM_PROMPT
+        system_prompt_llm_gen = _generation_enhancer_system_prompt(current_model_type_for_job)
         enhanced_res_gen, err_msg_llm_gen = await util_enhance_prompt(prompt_base_gen, system_prompt_text_override=system_prompt_llm_gen, target_model_type=current_model_type_for_job)
         if enhanced_res_gen:
             if enhanced_res_gen.strip().lower() != prompt_base_gen.strip().lower():
@@ -590,6 +645,7 @@ async def execute_generation_logic(
     elif is_img2img_gen: print("Skipping LLM Enhancer for img2img command.")
 
     results_list = []
+    prepared_runs = []
     for run_idx_gen in range(run_times_gen):
         job_result = {
             "status": "error", "run_number": run_idx_gen + 1, "total_runs": run_times_gen,
@@ -620,11 +676,20 @@ async def execute_generation_logic(
                 if not can_offer_animation:
                     job_details_current_gen['supports_animation'] = False
                     job_details_current_gen['followup_animation_workflow'] = None
+            prepared_runs.append((job_result, job_id_current_gen, mod_prompt_payload_gen, job_details_current_gen))
+        except Exception as e_gen_loop_outer:
+            job_result["error_message_text"] = f"Unexpected error: {e_gen_loop_outer}"
+            results_list.append(job_result); traceback.print_exc()
 
+    # All runs go to the scheduler together so they share one window instead of waiting out one each.
+    queue_outcomes_gen = await job_scheduler.submit_many([run[2] for run in prepared_runs]) if prepared_runs else []
+    for (job_result, job_id_current_gen, _, job_details_current_gen), queue_outcome_gen in zip(prepared_runs, queue_outcomes_gen):
+        run_idx_gen = job_result["run_number"] - 1
+        try:
             comfy_id_current_gen = None; queue_err_msg_gen = None
-            try: comfy_id_current_gen = comfy_queue_prompt(mod_prompt_payload_gen, COMFYUI_HOST, COMFYUI_PORT)
-            except ComfyConnectionRefusedError as e_conn_gen: queue_err_msg_gen = f"Error: Could not connect to ComfyUI ({e_conn_gen})."
-            except Exception as e_q_inner_gen: queue_err_msg_gen = "Error: Failed to queue job with ComfyUI."; print(f"{queue_err_msg_gen}: {e_q_inner_gen}")
+            if isinstance(queue_outcome_gen, ComfyConnectionRefusedError): queue_err_msg_gen = f"Error: Could not connect to ComfyUI ({queue_outcome_gen})."
+            elif isinstance(queue_outcome_gen, BaseException): queue_err_msg_gen = "Error: Failed to queue job with ComfyUI."; print(f"{queue_err_msg_gen}: {queue_outcome_gen}")
+            else: comfy_id_current_gen = queue_outcome_gen
             if not comfy_id_current_gen:
                 job_result["error_message_text"] = queue_err_msg_gen or "Failed to queue job with ComfyUI (unknown error)."
                 results_list.append(job_result)
@@ -676,24 +741,80 @@ async def execute_generation_logic(
         except Exception as e_gen_loop_outer:
             job_result["error_message_text"] = f"Unexpected error: {e_gen_loop_outer}"
             results_list.append(job_result); traceback.print_exc()
+    results_list.sort(key=lambda result: result["run_number"])
     return results_list
 
+_batch_original_uploads = OrderedDict()
+_BATCH_ORIGINAL_UPLOAD_LIMIT = 128
+
+
+def _get_batch_original_paths(job_id):
+    job_data = queue_manager.get_job_data_by_id(job_id) if job_id else None
+    if not job_data:
+        return []
+    return sorted(os.path.normpath(p) for p in (job_data.get('image_paths') or []) if p)
+
+
+async def prepare_batch_originals(job_id):
+    """Delivery plan for the full-size files behind a contact-sheet result."""
+    paths = [p for p in _get_batch_original_paths(job_id) if os.path.exists(p)]
+    if not paths:
+        return None
+    return await delivery_pipeline.prepare(job_id, paths, allow_contact_sheet=False)
+
+
+async def _resolve_target_attachment(referenced_message_obj, image_idx):
+    """Attachment for image #image_idx, uploading the original when the message shows a contact sheet."""
+    attachments = referenced_message_obj.attachments or []
+    if len(attachments) == 1 and is_contact_sheet_filename(attachments[0].filename):
+        cache_key = (referenced_message_obj.id, image_idx)
+        cached_attachment = _batch_original_uploads.get(cache_key)
+        if cached_attachment is not None:
+            _batch_original_uploads.move_to_end(cache_key)
+            return cached_attachment
+
+        job_id = extract_job_id(attachments[0].filename)
+        paths = _get_batch_original_paths(job_id)
+        if len(paths) < image_idx or not os.path.exists(paths[image_idx-1]):
+            return None
+        plan = await delivery_pipeline.prepare(job_id, [paths[image_idx-1]], allow_contact_sheet=False)
+        files = plan.discord_files()
+        if not files:
+            return None
+        try:
+            original_msg = await referenced_message_obj.reply(content=f"Image #{image_idx} from batch `{job_id}`", files=files, mention_author=False)
+        except Exception as e_upload_original:
+            print(f"Error uploading original image #{image_idx} for contact sheet job {job_id}: {e_upload_original}")
+            return None
+        if not original_msg.attachments:
+            return None
+        _batch_original_uploads[cache_key] = original_msg.attachments[0]
+        while len(_batch_original_uploads) > _BATCH_ORIGINAL_UPLOAD_LIMIT:
+            _batch_original_uploads.popitem(last=False)
+        return original_msg.attachments[0]
+
+    if len(attachments) < image_idx:
+        return None
+    return attachments[image_idx-1]
+
+
 async def process_upscale_request(context_user, context_channel, referenced_message_obj, image_idx, is_interaction, initial_interaction_obj=None):
     await _ensure_ws_client_id()
-    if not referenced_message_obj.attachments or len(referenced_message_obj.attachments) < image_idx:
+    target_attachment_obj = await _resolve_target_attachment(referenced_message_obj, image_idx)
+    if target_attachment_obj is None:
         return [{"status": "error", "error_message_text": f"Error: Cannot find image #{image_idx} in referenced message."}]
-    target_attachment_obj = referenced_message_obj.attachments[image_idx-1]
     if not target_attachment_obj.content_type or not target_attachment_obj.content_type.startswith('image/'):
         return [{"status": "error", "error_message_text": f"Error: Attachment #{image_idx} is not a valid image."}]
 
     original_job_id_str = extract_job_id(target_attachment_obj.filename)
     message_content_str = initial_interaction_obj.message.content if is_interaction and initial_interaction_obj and initial_interaction_obj.message else "" 
 
-    job_id_ups, modified_prompt_ups, response_status_ups, job_details_ups = up_modify_upscale_prompt(message_content_str, referenced_message_obj, target_attachment_obj.url, image_idx)
+    source_ups = resolve_source_image(target_attachment_obj.url, target_attachment_obj.filename, image_idx, output_server=getattr(_bot_instance_core, 'output_server', None))
+    job_id_ups, modified_prompt_ups, response_status_ups, job_details_ups = up_modify_upscale_prompt(message_content_str, referenced_message_obj, source_ups.url_or_path, image_idx)
     if not job_id_ups:
         return [{"status": "error", "error_message_text": response_status_ups or "Failed to prepare upscale request."}]
     comfy_id_ups = None; queue_err_ups = None
-    try: comfy_id_ups = comfy_queue_prompt(modified_prompt_ups, COMFYUI_HOST, COMFYUI_PORT)
+    try: comfy_id_ups = await job_scheduler.submit(modified_prompt_ups)
     except ComfyConnectionRefusedError as e_conn_ref: queue_err_ups = f"Error: Could not connect to ComfyUI ({e_conn_ref})."
     except Exception as e_q_ups: queue_err_ups = "Error: Failed to queue upscale job with ComfyUI."; print(f"{queue_err_ups}: {e_q_ups}")
     if not comfy_id_ups:
@@ -767,7 +888,7 @@ async def process_wan_animation_request(context_user, context_channel, source_jo
     comfy_id_animation = None
     queue_error_animation = None
     try:
-        comfy_id_animation = comfy_queue_prompt(animation_prompt_payload, COMFYUI_HOST, COMFYUI_PORT)
+        comfy_id_animation = await job_scheduler.submit(animation_prompt_payload)
     except ComfyConnectionRefusedError as e_conn_anim:
         queue_error_animation = f"Error: Could not connect to ComfyUI ({e_conn_anim})."
     except Exception as e_queue_anim:
@@ -818,17 +939,18 @@ async def process_wan_animation_request(context_user, context_channel, source_jo
 
 async def process_variation_request(context_user, context_channel, referenced_message_obj, variation_type_str, image_idx, edited_prompt_str=None, edited_neg_prompt_str=None, is_interaction=None, initial_interaction_obj=None):
     await _ensure_ws_client_id()
-    if not referenced_message_obj.attachments or len(referenced_message_obj.attachments) < image_idx:
+    target_attachment_var = await _resolve_target_attachment(referenced_message_obj, image_idx)
+    if target_attachment_var is None:
         return [{"status": "error", "error_message_text": f"Error: Cannot find image #{image_idx}."}]
-    target_attachment_var = referenced_message_obj.attachments[image_idx-1]
     if not target_attachment_var.content_type or not target_attachment_var.content_type.startswith('image/'):
         return [{"status": "error", "error_message_text": f"Error: Attachment #{image_idx} is not an image."}]
 
     original_job_id_var = extract_job_id(target_attachment_var.filename)
     message_content_var = initial_interaction_obj.message.content if is_interaction and initial_interaction_obj and initial_interaction_obj.message else ""
 
+    source_var = resolve_source_image(target_attachment_var.url, target_attachment_var.filename, image_idx, output_server=getattr(_bot_instance_core, 'output_server', None))
     all_jobs_to_queue = modify_variation_prompt(
-        message_content_var, referenced_message_obj, variation_type_str, target_attachment_var.url, image_idx, edited_prompt_str, edited_neg_prompt_str
+        message_content_var, referenced_message_obj, variation_type_str, source_var.url_or_path, image_idx, edited_prompt_str, edited_neg_prompt_str
     )
     if not all_jobs_to_queue: 
         return [{"status": "error", "error_message_text": "Failed to prepare variation request."}]
@@ -838,7 +960,7 @@ async def process_variation_request(context_user, context_channel, referenced_me
 
     comfy_id_var = None; queue_err_var = None
     try: 
-        comfy_id_var = comfy_queue_prompt(mod_prompt_var, COMFYUI_HOST, COMFYUI_PORT)
+        comfy_id_var = await job_scheduler.submit(mod_prompt_var)
     except ComfyConnectionRefusedError as e_conn_ref_var: 
         queue_err_var = f"Error: Could not connect to ComfyUI ({e_conn_ref_var})."
     except Exception as e_q_var: 
@@ -993,8 +1115,12 @@ async def process_kontext_edit_request(
         elif err_msg:
             enhancer_info['error'] = err_msg
 
-    primary_image_url = image_urls[0]
-    dimensions = await asyncio.to_thread(get_image_dimensions, primary_image_url)
+    image_sources = [
+        resolve_source_image(url, output_server=getattr(_bot_instance_core, 'output_server', None))
+        for url in image_urls
+    ]
+    workflow_image_urls = [source.url_or_path for source in image_sources]
+    dimensions = image_sources[0].dimensions or await asyncio.to_thread(get_image_dimensions, workflow_image_urls[0])
     final_aspect_ratio = "1:1"
     if dimensions:
         w, h = dimensions
@@ -1088,7 +1214,7 @@ async def process_kontext_edit_request(
 
     if edit_mode == 'qwen_edit':
         job_id, workflow_payload, status_msg, job_details = modify_qwen_edit_prompt(
-            image_urls=image_urls,
+            image_urls=workflow_image_urls,
             instruction=enhanced_instruction,
             user_settings=settings,
             base_seed=seed,
@@ -1109,7 +1235,7 @@ async def process_kontext_edit_request(
                 job_details['model_used'] = job_details['qwen_model_used']
     else:
         job_id, workflow_payload, status_msg, job_details = modify_kontext_prompt(
-            image_urls=image_urls,
+            image_urls=workflow_image_urls,
             instruction=enhanced_instruction,
             user_settings=settings,
             base_seed=seed,
@@ -1126,7 +1252,7 @@ async def process_kontext_edit_request(
 
     comfy_id = None
     try:
-        comfy_id = comfy_queue_prompt(workflow_payload, COMFYUI_HOST, COMFYUI_PORT)
+        comfy_id = await job_scheduler.submit(workflow_payload)
     except Exception as e:
         await safe_interaction_response(initial_interaction_obj, f"Error queueing job with ComfyUI: {e}", ephemeral=True)
         return
@@ -7,7 +7,7 @@ import textwrap # For message construction
 import os
 import json
 
-from bot_config_loader import print_startup_info, ADMIN_ID, COMFYUI_HOST, COMFYUI_PORT, print_output_dirs
+from bot_config_loader import print_startup_info, ADMIN_ID, print_output_dirs
 from bot_core_logic import check_output_folders, process_cancel_request, execute_generation_logic
 from bot_commands import (
     handle_reply_upscale,
@@ -19,6 +19,8 @@ from queue_manager import queue_manager
 from utils.show_prompt import reconstruct_full_prompt_string
 from utils.message_utils import send_long_message
 from model_scanner import (
+    save_scan_caches,
+    prefetch_model_directories,
     update_models_list,
     scan_clip_files,
     update_checkpoints_list,
@@ -79,7 +81,7 @@ def load_blocklist():
 async def validate_models_against_comfyui(bot):
     try:
         print("Validating selected models against ComfyUI API...")
-        available_models = await asyncio.to_thread(get_available_comfyui_models, COMFYUI_HOST, COMFYUI_PORT)
+        available_models = await asyncio.to_thread(get_available_comfyui_models)
         unet_count = len(available_models.get('unet', [])); checkpoint_count = len(available_models.get('checkpoint', [])); clip_count = len(available_models.get('clip', [])); vae_count = len(available_models.get('vae', [])); upscaler_count = len(available_models.get('upscaler', []))
         print(f"\n=== Available Models (API Summary) ===\nUNET (Flux): {unet_count}, CHECKPOINT (SDXL): {checkpoint_count}, CLIP: {clip_count}, VAE: {vae_count}, UPSCALER: {upscaler_count}\n" + "="*36)
         if unet_count == 0 and checkpoint_count == 0 and clip_count == 0 : print("WARNING: ComfyUI API returned no Flux UNETs, SDXL Checkpoints, or CLIPs. Validation cannot proceed effectively."); return False
@@ -122,6 +124,8 @@ async def validate_models_against_comfyui(bot):
 
 def update_models_on_startup():
     print("Scanning models/CLIPs/checkpoints on startup...")
+    try: prefetch_model_directories('config.json')
+    except Exception as e: print(f"ERROR prefetching model directories: {e}"); traceback.print_exc()
     try: update_models_list('config.json', 'modelslist.json'); print("Flux models list updated.")
     except Exception as e: print(f"ERROR updating Flux models list: {e}"); traceback.print_exc()
     try: update_checkpoints_list('config.json', 'checkpointslist.json'); print("SDXL checkpoints list updated.")
@@ -132,12 +136,13 @@ def update_models_on_startup():
     except Exception as e: print(f"ERROR updating WAN models list: {e}"); traceback.print_exc()
     try: scan_clip_files('config.json', 'cliplist.json'); print("CLIP list updated.")
     except Exception as e: print(f"ERROR updating CLIP list: {e}"); traceback.print_exc()
+    save_scan_caches()
 
 async def on_bot_ready(bot):
     print(f'\n{bot.user.name}#{bot.user.discriminator} connected to Discord!')
     print(f"User ID: {bot.user.id}"); print("-" * 20)
     print_startup_info(); styles_config_on_ready_unused = load_styles_config(); print(f"Styles Loaded: {len(styles_config_on_ready_unused)}")
-    print_output_dirs(); update_models_on_startup(); await validate_models_against_comfyui(bot)
+    print_output_dirs(); await asyncio.to_thread(update_models_on_startup); await validate_models_against_comfyui(bot)
     try:
         print("Registering/syncing slash commands..."); synced = await bot.tree.sync()
         print(f"Successfully synced {len(synced)} slash commands globally.")
@@ -3,7 +3,7 @@ import discord
 from typing import Callable, Optional
 
 from settings_manager import (
-    load_settings, save_settings,
+    load_settings_for_update, save_settings,
     get_steps_choices, get_sdxl_steps_choices, get_qwen_steps_choices, get_qwen_edit_steps_choices, get_wan_steps_choices,
     get_guidance_choices, get_sdxl_guidance_choices, get_qwen_guidance_choices, get_qwen_edit_guidance_choices, get_wan_guidance_choices,
     get_t5_clip_choices, get_clip_l_choices, get_sdxl_clip_choices, get_qwen_clip_choices, get_qwen_edit_clip_choices, get_wan_clip_choices, get_wan_vision_clip_choices,
@@ -884,7 +884,7 @@ class BaseSettingsView(discord.ui.View):
             await interaction.response.edit_message(content="Tenos.ai Bot Settings:", view=view)
         except discord.NotFound:
             print("Original message for settings view not found during back callback.")
-            await interaction.followup.send("Returning to main settings selection.", view=MainSettingsButtonView(load_settings()), ephemeral=True)
+            await interaction.followup.send("Returning to main settings selection.", view=MainSettingsButtonView(load_settings_for_update()), ephemeral=True)
         except Exception as e:
             print(f"Error during settings back callback edit: {e}")
 
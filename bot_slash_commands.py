@@ -9,14 +9,18 @@ from io import StringIO
 import asyncio 
 import requests 
 
-from bot_config_loader import ADMIN_ID, ALLOWED_USERS, COMFYUI_HOST, COMFYUI_PORT
+from bot_config_loader import ADMIN_ID, config_service
 from bot_commands import handle_gen_command
 from bot_settings_ui import MainSettingsButtonView
 from utils.message_utils import send_long_message, safe_interaction_response
-from settings_manager import load_settings, load_styles_config
+from settings_manager import load_settings, load_settings_for_update, load_styles_config
 from comfyui_api import get_available_comfyui_models
-from bot_core_logic import process_kontext_edit_request
+from bot_core_logic import process_kontext_edit_request, prewarm_prompt_enhancements
 from queue_manager import queue_manager
+from job_scheduler import job_scheduler
+
+# Pause between starting /sheet rows so their Discord follow-ups stay paced and in TSV order.
+_SHEET_ROW_INTERVAL_SECONDS = 0.5
 
 _bot_instance_slash = None
 def register_bot_instance_for_slash(bot_instance):
@@ -29,7 +33,7 @@ def setup_slash_commands(tree: app_commands.CommandTree, bot_ref):
     def has_permission(user: discord.User, permission_key: str) -> bool:
         if str(user.id) == ADMIN_ID:
             return True
-        user_config = ALLOWED_USERS.get(str(user.id), {})
+        user_config = config_service.section('ALLOWED_USERS').get(str(user.id), {})
         return user_config.get(permission_key, False)
 
     @tree.command(name="ping", description="Test bot response time.")
@@ -254,7 +258,7 @@ def setup_slash_commands(tree: app_commands.CommandTree, bot_ref):
     async def settings_cmd(interaction: discord.Interaction):
         if not has_permission(interaction.user, "can_manage_bot"):
             await interaction.response.send_message("Permission denied. This command is for administrators only.", ephemeral=True); return
-        current_settings = load_settings(); view = MainSettingsButtonView(current_settings)
+        current_settings = load_settings_for_update(); view = MainSettingsButtonView(current_settings)
         await interaction.response.send_message("Tenos.ai Bot Settings:", view=view, ephemeral=True)
 
     @tree.command(name="sheet", description="Queue prompts from a TSV file (Admin & managers only).")
@@ -298,11 +302,30 @@ def setup_slash_commands(tree: app_commands.CommandTree, bot_ref):
                 
                 settings_sheet = load_settings(); model_type_sheet = "flux"
                 if settings_sheet.get('selected_model') and ":" in settings_sheet.get('selected_model'): model_type_sheet = settings_sheet.get('selected_model').split(":",1)[0].strip().lower() # type: ignore
+                try:
+                    enhanced_count_tsv = await prewarm_prompt_enhancements(prompts_list_tsv, model_type_sheet)
+                    if enhanced_count_tsv: print(f"Sheet: Batch-enhanced {enhanced_count_tsv} prompt(s) ahead of queuing.")
+                except Exception as e_batch_tsv: print(f"Sheet: Batch enhancement failed, prompts will be enhanced individually: {e_batch_tsv}")
+
+                # Up to one scheduler window of rows runs at a time, so rows share a window without
+                # every row of a large sheet building its workflow and messaging Discord at once.
+                sheet_slots = asyncio.Semaphore(job_scheduler.settings['max_window_jobs'])
+
+                async def queue_sheet_prompt(idx_tsv, p_txt_tsv):
+                    try:
+                        print(f"Sheet Queuing {idx_tsv+1}/{num_prompts_tsv} ({model_type_sheet.upper()}): '{textwrap.shorten(p_txt_tsv,50)}'")
+                        await handle_gen_command(interaction, p_txt_tsv, is_modal_submission=False, model_type_override=model_type_sheet, is_derivative_action=False)
+                    finally:
+                        sheet_slots.release()
 
+                sheet_tasks = []
                 for idx_tsv, p_txt_tsv in enumerate(prompts_list_tsv):
-                    print(f"Sheet Queuing {idx_tsv+1}/{num_prompts_tsv} ({model_type_sheet.upper()}): '{textwrap.shorten(p_txt_tsv,50)}'")
-                    await handle_gen_command(interaction, p_txt_tsv, is_modal_submission=False, model_type_override=model_type_sheet, is_derivative_action=False)
-                    await asyncio.sleep(1.5)
+                    await sheet_slots.acquire()  # rows start in TSV order
+                    sheet_tasks.append(asyncio.create_task(queue_sheet_prompt(idx_tsv, p_txt_tsv)))
+                    await asyncio.sleep(_SHEET_ROW_INTERVAL_SECONDS)
+                sheet_results = await asyncio.gather(*sheet_tasks, return_exceptions=True)
+                for idx_tsv, sheet_result in enumerate(sheet_results):
+                    if isinstance(sheet_result, Exception): print(f"Sheet: Prompt {idx_tsv+1}/{num_prompts_tsv} failed: {sheet_result}")
                 await interaction.channel.send(f"{interaction.user.mention}: Finished TSV from {source_desc_log}. Queued {num_prompts_tsv} prompts.") # type: ignore
             except Exception as e_proc_tsv: await interaction.followup.send(f"Error processing TSV: {e_proc_tsv}",ephemeral=True); traceback.print_exc()
         else: await interaction.followup.send("Failed to retrieve TSV data.",ephemeral=True)
@@ -358,7 +381,7 @@ def setup_slash_commands(tree: app_commands.CommandTree, bot_ref):
         await interaction.response.defer(ephemeral=True, thinking=True); cancelled_count = 0; interrupted_count = 0; failed_cancel_ids = []; failed_interrupt_id = None
         try:
             from bot_core_logic import process_cancel_request
-            api_url = f"http://{COMFYUI_HOST}:{COMFYUI_PORT}"; q_resp = await asyncio.to_thread(requests.get, f"{api_url}/queue", timeout=10); q_resp.raise_for_status(); q_data = q_resp.json()
+            api_url = f"http://{config_service.comfyui.host}:{config_service.comfyui.port}"; q_resp = await asyncio.to_thread(requests.get, f"{api_url}/queue", timeout=10); q_resp.raise_for_status(); q_data = q_resp.json()
             pending_jobs = q_data.get('queue_pending', []); pending_ids = [job[1] for job in pending_jobs if isinstance(job, list) and len(job) > 1 and job[1] is not None]
             if pending_ids:
                 cancel_payload = {"delete": [str(pid) for pid in pending_ids]};
@@ -393,7 +416,7 @@ def setup_slash_commands(tree: app_commands.CommandTree, bot_ref):
             await interaction.response.send_message("Permission denied.", ephemeral=True); return
         await interaction.response.defer(ephemeral=True, thinking=True)
         try:
-            available = await asyncio.to_thread(get_available_comfyui_models, COMFYUI_HOST, COMFYUI_PORT)
+            available = await asyncio.to_thread(get_available_comfyui_models)
             model_info = "**Available Models (from ComfyUI API)**\n"
             def format_section(title, models_list):
                 section = f"\n**{title} ({len(models_list)}):**\n"; section += "\n".join([f"- `{m}`" for m in sorted(models_list,key=str.lower)]) if models_list else "- None Found"; return section + "\n"
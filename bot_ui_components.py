@@ -9,7 +9,7 @@ import re
 from queue_manager import queue_manager
 from file_management import extract_job_id, delete_job_files_and_message
 from utils.show_prompt import reconstruct_full_prompt_string
-from bot_config_loader import ADMIN_ID, ALLOWED_USERS
+from bot_config_loader import ADMIN_ID, config_service
 from settings_manager import load_settings
 from model_registry import get_model_spec
 from utils.message_utils import safe_interaction_response
@@ -20,6 +20,7 @@ from bot_core_logic import (
     process_variation_request as core_process_variation,
     process_rerun_request as core_process_rerun,
     process_wan_animation_request as core_process_animation,
+    prepare_batch_originals as core_prepare_batch_originals,
     process_cancel_request,
     process_kontext_edit_request,
     execute_generation_logic
@@ -234,7 +235,7 @@ class QueuedJobView(View):
         if not job_data and interaction.message:
             job_data = queue_manager.get_job_data(interaction.message.id, interaction.message.channel.id)
         if job_data and job_data.get('user_id') == interaction.user.id: return True
-        allowed_user_perms = ALLOWED_USERS.get(str(interaction.user.id), {})
+        allowed_user_perms = config_service.section('ALLOWED_USERS').get(str(interaction.user.id), {})
         if allowed_user_perms.get("can_delete_jobs", False): return True 
         await interaction.response.send_message("You don't have permission to cancel this job.", ephemeral=True); return False
 
@@ -354,7 +355,7 @@ class GenerationActionsView(View):
         is_owner = job_data and job_data.get('user_id') == interaction.user.id
         custom_id = interaction.data.get('custom_id', '')
         permission_key = "can_delete_jobs" if 'delete' in custom_id else "can_use_actions"
-        allowed_user_perms = ALLOWED_USERS.get(str(interaction.user.id), {})
+        allowed_user_perms = config_service.section('ALLOWED_USERS').get(str(interaction.user.id), {})
         has_general_permission = allowed_user_perms.get(permission_key, False)
         if is_owner or has_general_permission: return True
         await interaction.response.send_message("You don't have permission to use this button.", ephemeral=True)
@@ -540,9 +541,10 @@ class GenerationActionsView(View):
         await self._process_and_send_action_results(interaction, results, "Animate")
 
 class BatchActionsView(GenerationActionsView):
-    def __init__(self, original_message_id: int, original_channel_id: int, job_id: str, batch_size: int, bot_ref, timeout=86400*3):
+    def __init__(self, original_message_id: int, original_channel_id: int, job_id: str, batch_size: int, bot_ref, timeout=86400*3, contact_sheet: bool = False):
         super().__init__(original_message_id, original_channel_id, job_id, bot_ref, timeout)
         self.batch_size = batch_size
+        self.contact_sheet = contact_sheet
         
         # Clear all buttons added by the parent __init__
         self.clear_items()
@@ -572,6 +574,28 @@ class BatchActionsView(GenerationActionsView):
         btn_delete.callback = self.delete_callback
         self.add_item(btn_delete)
 
+        if self.contact_sheet:
+            btn_originals = Button(label="Originals 🗂️", style=discord.ButtonStyle.secondary, custom_id=f"originals_{job_id}", row=2)
+            btn_originals.callback = self.originals_callback
+            self.add_item(btn_originals)
+
+    async def originals_callback(self, interaction: discord.Interaction):
+        """Send the full-size files behind a contact sheet, only to the requesting user."""
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        plan = await core_prepare_batch_originals(self.job_id)
+        files = plan.discord_files() if plan else []
+        if not files:
+            await interaction.followup.send("Original images for this batch are no longer available.", ephemeral=True)
+            return
+        note = ""
+        if plan.total_valid_files > len(files):
+            note = f" (showing {len(files)} of {plan.total_valid_files})"
+        try:
+            await interaction.followup.send(content=f"Originals for job `{self.job_id}`{note}:", files=files, ephemeral=True)
+        except discord.HTTPException as e_send_originals:
+            print(f"Error sending originals for job {self.job_id}: {e_send_originals}")
+            await interaction.followup.send("Error: Could not upload the original images.", ephemeral=True)
+
     async def batch_vary_callback(self, interaction: discord.Interaction):
         """Dedicated callback for batch variation buttons (V1, V2, etc.)."""
         try:
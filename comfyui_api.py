@@ -1,10 +1,11 @@
 import json
+import mimetypes
+import uuid
 from urllib import request, error
 import ssl
 import os
 import requests 
 import traceback
-import time
 from socket import error as SocketError
 from urllib.error import URLError
 from websocket_client import WebsocketClient
@@ -13,30 +14,7 @@ class ConnectionRefusedError(Exception):
     """Custom exception for connection refused errors."""
     pass
 
-try:
-    if not os.path.exists('config.json'):
-        raise FileNotFoundError("config.json not found.")
-    with open('config.json', 'r') as config_file:
-        config = json.load(config_file)
-    if not isinstance(config, dict):
-         raise ValueError("config.json is not a valid dictionary.")
-    COMFYUI_HOST = config.get('COMFYUI_HOST', '127.0.0.1')
-    COMFYUI_PORT = config.get('COMFYUI_PORT', 8188)
-    if not isinstance(COMFYUI_PORT, int):
-        try:
-            COMFYUI_PORT = int(COMFYUI_PORT)
-        except (ValueError, TypeError):
-            print(f"Warning: Invalid COMFYUI_PORT '{COMFYUI_PORT}' in config. Using default 8188.")
-            COMFYUI_PORT = 8188
-except (FileNotFoundError, json.JSONDecodeError, ValueError, TypeError) as e:
-    print(f"ERROR loading config.json in comfyui_api: {e}")
-    COMFYUI_HOST = '127.0.0.1'
-    COMFYUI_PORT = 8188
-except Exception as e:
-    print(f"UNEXPECTED ERROR loading config.json in comfyui_api: {e}")
-    traceback.print_exc()
-    COMFYUI_HOST = '127.0.0.1'
-    COMFYUI_PORT = 8188
+from bot_config_loader import config_service
 
 def update_last_prompt(prompt):
     try:
@@ -81,7 +59,9 @@ def validate_prompt_before_sending(prompt_dict):
         return False, f"Prompt validation error: {str(e)}"
 
 
-def queue_prompt(prompt, comfyui_host=COMFYUI_HOST, comfyui_port=COMFYUI_PORT, ignore_ssl_verify=False):
+def queue_prompt(prompt, comfyui_host=None, comfyui_port=None, ignore_ssl_verify=False):
+    comfyui_host = comfyui_host or config_service.comfyui.host
+    comfyui_port = comfyui_port or config_service.comfyui.port
     response_data = ""
     try:
         is_valid, error_msg = validate_prompt_before_sending(prompt)
@@ -220,6 +200,36 @@ def queue_prompt(prompt, comfyui_host=COMFYUI_HOST, comfyui_port=COMFYUI_PORT, i
         raise
 
 
+def upload_image(image_bytes, filename, comfyui_host=None, comfyui_port=None, overwrite=True):
+    """Upload ``image_bytes`` into ComfyUI's input folder and return the name ``LoadImage`` expects.
+
+    Raises ``requests.RequestException`` if the upload fails.
+    """
+    comfyui_host = comfyui_host or config_service.comfyui.host
+    comfyui_port = comfyui_port or config_service.comfyui.port
+    boundary = f"----TenosUpload{uuid.uuid4().hex}"
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    parts = [
+        (f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="{filename}"\r\n'
+         f'Content-Type: {content_type}\r\n\r\n').encode('utf-8'),
+        image_bytes,
+        (f'\r\n--{boundary}\r\nContent-Disposition: form-data; name="type"\r\n\r\ninput'
+         f'\r\n--{boundary}\r\nContent-Disposition: form-data; name="overwrite"\r\n\r\n{"true" if overwrite else "false"}'
+         f'\r\n--{boundary}--\r\n').encode('utf-8'),
+    ]
+    response = requests.post(
+        f"http://{comfyui_host}:{comfyui_port}/upload/image",
+        data=b"".join(parts),
+        headers={'Content-Type': f'multipart/form-data; boundary={boundary}'},
+        timeout=60,
+    )
+    response.raise_for_status()
+    result = response.json()
+    name = result.get('name') or filename
+    subfolder = result.get('subfolder') or ''
+    return f"{subfolder}/{name}" if subfolder else name
+
+
 def _extract_and_flatten_options(data_source):
     options_list = []
     if isinstance(data_source, list):
@@ -241,110 +251,103 @@ def _extract_and_flatten_options(data_source):
     return list(set(options_list))
 
 
-def get_available_comfyui_models(host=COMFYUI_HOST, port=COMFYUI_PORT, suppress_summary_print=False):
+# ComfyUI answers /object_info slowly or not at all while it is still starting up.
+_OBJECT_INFO_RETRY = requests.Retry(total=2, backoff_factor=2.5)
+
+
+def get_available_comfyui_models(host=None, port=None, suppress_summary_print=False):
+    host = host or config_service.comfyui.host
+    port = port or config_service.comfyui.port
     final_unet_list = [] 
     final_checkpoint_list = [] 
     final_clip_list = []
     final_vae_list = []
     final_upscaler_list = [] 
-    max_retries = 3
-    retry_delay = 5
+    api_url = f"http://{host}:{port}/object_info"
+    try:
+        response = requests.get(api_url, timeout=15, retries=_OBJECT_INFO_RETRY)
+        response.raise_for_status()
+        data = response.json()
 
-    for attempt in range(max_retries):
-        try:
-            api_url = f"http://{host}:{port}/object_info"
-            response = requests.get(api_url, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-
-            unet_sources = {
-                "UnetLoaderGGUF": "unet_name",
-                "UNETLoader": "unet_name",
-            }
-            temp_unet_list = []
-            for loader_name, field_name in unet_sources.items():
-                if loader_name in data:
-                    loader_data = data.get(loader_name, {})
-                    input_data = loader_data.get("input", {})
-                    required_data = input_data.get("required", {})
-                    if field_name in required_data:
-                        options_data = required_data.get(field_name, [])
-                        temp_unet_list.extend(_extract_and_flatten_options(options_data))
-            final_unet_list = sorted(list(set(temp_unet_list)), key=str.lower)
-
-            if "CheckpointLoaderSimple" in data:
-                loader_data = data.get("CheckpointLoaderSimple", {})
-                input_data = loader_data.get("input", {})
-                required_data = input_data.get("required", {})
-                if "ckpt_name" in required_data:
-                    options_data = required_data.get("ckpt_name", [])
-                    final_checkpoint_list = sorted(_extract_and_flatten_options(options_data), key=str.lower)
-
-
-            temp_clip_list = []
-            clip_sources = { 
-                "DualCLIPLoader": ["clip_name1", "clip_name2"],
-                "CLIPSetLastLayer": ["clip_name"], 
-                "CheckpointLoaderSimple": ["ckpt_name"] 
-            }
-            for loader_name, field_names in clip_sources.items():
-                 if loader_name in data:
-                     loader_data = data.get(loader_name, {})
-                     input_data = loader_data.get("input", {})
-                     required_data = input_data.get("required", {})
-                     for field_name in field_names:
-                          if field_name in required_data:
-                              options_data = required_data.get(field_name, [])
-                              temp_clip_list.extend(_extract_and_flatten_options(options_data))
-            final_clip_list = sorted(list(set(temp_clip_list)), key=str.lower)
-
-            temp_vae_list = []
-            vae_sources = {
-                "VAELoader": ["vae_name"],
-                "CheckpointLoaderSimple": ["ckpt_name"] 
-            }
-            for loader_name, field_names in vae_sources.items():
-                 if loader_name in data:
-                     loader_data = data.get(loader_name, {})
-                     input_data = loader_data.get("input", {})
-                     required_data = input_data.get("required", {})
-                     for field_name in field_names:
-                          if field_name in required_data:
-                              options_data = required_data.get(field_name, [])
-                              temp_vae_list.extend(_extract_and_flatten_options(options_data))
-            final_vae_list = sorted(list(set(temp_vae_list)), key=str.lower)
-
-            if "UpscaleModelLoader" in data:
-                loader_data = data.get("UpscaleModelLoader", {})
+        unet_sources = {
+            "UnetLoaderGGUF": "unet_name",
+            "UNETLoader": "unet_name",
+        }
+        temp_unet_list = []
+        for loader_name, field_name in unet_sources.items():
+            if loader_name in data:
+                loader_data = data.get(loader_name, {})
                 input_data = loader_data.get("input", {})
                 required_data = input_data.get("required", {})
-                if "model_name" in required_data:
-                    options_data = required_data.get("model_name", [])
-                    final_upscaler_list = sorted(_extract_and_flatten_options(options_data), key=str.lower)
-
-            if not suppress_summary_print:
-                print(f"ComfyAPI: Found {len(final_unet_list)} UNETs (Flux), {len(final_checkpoint_list)} Checkpoints (SDXL), {len(final_clip_list)} CLIPs, {len(final_vae_list)} VAEs, {len(final_upscaler_list)} Upscalers.")
-            break 
-
-        except requests.exceptions.Timeout:
-            print(f"Attempt {attempt+1}/{max_retries}: Timeout connecting to ComfyUI API at {api_url}.")
-            if attempt == max_retries - 1: print("Max retries reached. Could not connect.")
-            else: time.sleep(retry_delay)
-        except requests.exceptions.ConnectionError:
-             print(f"Attempt {attempt+1}/{max_retries}: Connection error connecting to ComfyUI API at {api_url}. Is ComfyUI running?")
-             if attempt == max_retries - 1: print("Max retries reached. Could not connect.")
-             else: time.sleep(retry_delay)
-        except requests.exceptions.RequestException as e_req: 
-            print(f"Attempt {attempt+1}/{max_retries}: Error connecting to ComfyUI API at {api_url}: {e_req}")
-            if attempt == max_retries - 1: print("Max retries reached. Giving up.")
-            else: time.sleep(retry_delay)
-        except json.JSONDecodeError as e_json_decode: 
-            print(f"Error decoding ComfyUI API response from {api_url}: {e_json_decode}. Maybe ComfyUI is starting?")
-            break 
-        except Exception as e_generic: 
-            print(f"Error getting available ComfyUI models: {e_generic}")
-            traceback.print_exc()
-            break 
+                if field_name in required_data:
+                    options_data = required_data.get(field_name, [])
+                    temp_unet_list.extend(_extract_and_flatten_options(options_data))
+        final_unet_list = sorted(list(set(temp_unet_list)), key=str.lower)
+
+        if "CheckpointLoaderSimple" in data:
+            loader_data = data.get("CheckpointLoaderSimple", {})
+            input_data = loader_data.get("input", {})
+            required_data = input_data.get("required", {})
+            if "ckpt_name" in required_data:
+                options_data = required_data.get("ckpt_name", [])
+                final_checkpoint_list = sorted(_extract_and_flatten_options(options_data), key=str.lower)
+
+
+        temp_clip_list = []
+        clip_sources = { 
+            "DualCLIPLoader": ["clip_name1", "clip_name2"],
+            "CLIPSetLastLayer": ["clip_name"], 
+            "CheckpointLoaderSimple": ["ckpt_name"] 
+        }
+        for loader_name, field_names in clip_sources.items():
+             if loader_name in data:
+                 loader_data = data.get(loader_name, {})
+                 input_data = loader_data.get("input", {})
+                 required_data = input_data.get("required", {})
+                 for field_name in field_names:
+                      if field_name in required_data:
+                          options_data = required_data.get(field_name, [])
+                          temp_clip_list.extend(_extract_and_flatten_options(options_data))
+        final_clip_list = sorted(list(set(temp_clip_list)), key=str.lower)
+
+        temp_vae_list = []
+        vae_sources = {
+            "VAELoader": ["vae_name"],
+            "CheckpointLoaderSimple": ["ckpt_name"] 
+        }
+        for loader_name, field_names in vae_sources.items():
+             if loader_name in data:
+                 loader_data = data.get(loader_name, {})
+                 input_data = loader_data.get("input", {})
+                 required_data = input_data.get("required", {})
+                 for field_name in field_names:
+                      if field_name in required_data:
+                          options_data = required_data.get(field_name, [])
+                          temp_vae_list.extend(_extract_and_flatten_options(options_data))
+        final_vae_list = sorted(list(set(temp_vae_list)), key=str.lower)
+
+        if "UpscaleModelLoader" in data:
+            loader_data = data.get("UpscaleModelLoader", {})
+            input_data = loader_data.get("input", {})
+            required_data = input_data.get("required", {})
+            if "model_name" in required_data:
+                options_data = required_data.get("model_name", [])
+                final_upscaler_list = sorted(_extract_and_flatten_options(options_data), key=str.lower)
+
+        if not suppress_summary_print:
+            print(f"ComfyAPI: Found {len(final_unet_list)} UNETs (Flux), {len(final_checkpoint_list)} Checkpoints (SDXL), {len(final_clip_list)} CLIPs, {len(final_vae_list)} VAEs, {len(final_upscaler_list)} Upscalers.")
+
+    except requests.exceptions.Timeout:
+        print(f"Timeout connecting to ComfyUI API at {api_url} after {_OBJECT_INFO_RETRY.total + 1} attempts.")
+    except requests.exceptions.ConnectionError:
+        print(f"Connection error connecting to ComfyUI API at {api_url} after {_OBJECT_INFO_RETRY.total + 1} attempts. Is ComfyUI running?")
+    except requests.exceptions.RequestException as e_req:
+        print(f"Error connecting to ComfyUI API at {api_url}: {e_req}")
+    except json.JSONDecodeError as e_json_decode:
+        print(f"Error decoding ComfyUI API response from {api_url}: {e_json_decode}. Maybe ComfyUI is starting?")
+    except Exception as e_generic:
+        print(f"Error getting available ComfyUI models: {e_generic}")
+        traceback.print_exc()
 
     return {
         "unet": final_unet_list,
@@ -355,7 +358,9 @@ def get_available_comfyui_models(host=COMFYUI_HOST, port=COMFYUI_PORT, suppress_
     }
 
 
-def print_available_models(host=COMFYUI_HOST, port=COMFYUI_PORT): 
+def print_available_models(host=None, port=None):
+    host = host or config_service.comfyui.host
+    port = port or config_service.comfyui.port
     try:
         api_url = f"http://{host}:{port}/object_info"
         response = requests.get(api_url, timeout=10)
@@ -2835,21 +2835,16 @@ class ConfigEditor:
             self.log_queue.put(("worker", f"Latest release found: {tag_name}\n"))
             self.log_queue.put(("worker", f"Downloading from: {zip_url}\n"))
 
-            # Download the zip file
-            zip_response = requests.get(zip_url, stream=True, timeout=60)
-            zip_response.raise_for_status()
-
             # Create a temporary directory to extract the update
             temp_dir = tempfile.mkdtemp()
             self.log_queue.put(("worker", f"Created temporary update directory: {temp_dir}\n"))
 
             temp_zip_path = os.path.join(temp_dir, "release.zip")
 
-            with open(temp_zip_path, 'wb') as f:
-                for chunk in zip_response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            # Download the zip file; a dropped connection resumes where it stopped.
+            downloaded_bytes = requests.download_to_file(zip_url, temp_zip_path, timeout=60)
 
-            self.log_queue.put(("worker", "Download complete. Extracting...\n"))
+            self.log_queue.put(("worker", f"Download complete ({downloaded_bytes / (1024 * 1024):.1f} MB). Extracting...\n"))
 
             with zipfile.ZipFile(temp_zip_path, 'r') as zip_ref:
                 zip_ref.extractall(temp_dir)
@@ -2952,6 +2947,7 @@ class ConfigEditor:
         valid_paths_exist = any(pth_val and isinstance(pth_val,str) and os.path.isdir(pth_val) for pth_val in paths_map.values())
         if not valid_paths_exist: msg = "No valid paths configured for scanning."; self.log_queue.put(("stderr",f"{msg}\n")); return msg
         try:
+            model_scanner.prefetch_model_directories(CONFIG_FILE_NAME)
             if paths_map["Flux Models"] and os.path.isdir(paths_map["Flux Models"]):
                 self.log_queue.put(("worker","Scanning Flux models...\n"))
                 model_scanner.update_models_list(CONFIG_FILE_NAME,MODELS_LIST_FILE_NAME)
@@ -2965,6 +2961,7 @@ class ConfigEditor:
                 model_scanner.update_qwen_models_list(CONFIG_FILE_NAME, QWEN_MODELS_FILE_NAME)
                 self.log_queue.put(("worker","Scanning WAN models...\n"))
                 model_scanner.update_wan_models_list(CONFIG_FILE_NAME, WAN_MODELS_FILE_NAME)
+            model_scanner.save_scan_caches()
         except Exception as e_scan_call: scan_errors_list.append(f"Error during scan call: {e_scan_call}"); self.log_queue.put(("stderr",f"Scan Call Error: {e_scan_call}\n")); traceback.print_exc()
         if scan_errors_list: return "File Scanning Completed with Issues:\n"+"\n".join(scan_errors_list)
         return "File scanning finished. Lists updated. \n(UI dropdowns will refresh after this message)."
@@ -4,34 +4,21 @@ import discord
 import re
 import json
 from queue_manager import queue_manager
+from bot_config_loader import config_service
 import traceback
 
-try:
-    if not os.path.exists('config.json'):
-        print("FATAL ERROR: config.json not found in file_management.py. The bot cannot function without it.")
-        config = {"OUTPUTS": {}} 
-    else:
-        with open('config.json', 'r') as config_file:
-            config = json.load(config_file)
-    
-    # Add KONTEXT_EDITS to the list of folders to scan
-    OUTPUT_FOLDERS = [
-        config.get('OUTPUTS', {}).get('GENERATIONS'),
-        config.get('OUTPUTS', {}).get('UPSCALES'),
-        config.get('OUTPUTS', {}).get('VARIATIONS'),
-        config.get('OUTPUTS', {}).get('KONTEXT_EDITS')
-    ]
-    OUTPUT_FOLDERS = [f for f in OUTPUT_FOLDERS if f and isinstance(f, str)]
+OUTPUT_FOLDER_KEYS = ('GENERATIONS', 'UPSCALES', 'VARIATIONS', 'KONTEXT_EDITS')
+OUTPUT_FOLDERS = []
+
+
+def _apply_config(service):
+    global OUTPUT_FOLDERS
+    OUTPUT_FOLDERS = service.output_folders(OUTPUT_FOLDER_KEYS)
     if not OUTPUT_FOLDERS:
         print("Warning: No valid output folders found in config.json for file_management.")
-except (FileNotFoundError, json.JSONDecodeError) as e:
-    print(f"Error loading config.json in file_management: {e}")
-    config = {"OUTPUTS": {}}
-    OUTPUT_FOLDERS = []
-except Exception as e:
-    print(f"Unexpected error loading config in file_management: {e}")
-    config = {"OUTPUTS": {}}
-    OUTPUT_FOLDERS = []
+
+
+config_service.subscribe(_apply_config)
 
 
 def extract_job_id(filename):
@@ -1,4 +1,5 @@
 # --- START OF FILE image_generation.py ---
+import hashlib
 import json
 import random
 import uuid
@@ -8,42 +9,33 @@ import os
 import requests
 import traceback
 import asyncio
+from dataclasses import dataclass
 from typing import Optional
 
+from bot_config_loader import config_service
 from model_registry import (
-    copy_generation_template,
+    generation_workflow_builder,
     get_model_spec,
     resolve_model_type_from_prefix,
 )
 from utils.seed_utils import parse_seed_from_message, generate_seed
 from settings_manager import load_settings, _get_default_settings, load_styles_config
 from modelnodes import get_model_node
+from model_metadata import lora_compatibility_issue
 from comfyui_api import get_available_comfyui_models as check_available_models_api # suppress_summary_print will be passed as True
 from utils.llm_enhancer import enhance_prompt
+from workflow_builder import WorkflowBuilder, WorkflowPlanCache
 
 
-try:
-    if not os.path.exists('config.json'):
-        raise FileNotFoundError("config.json not found.")
-    with open('config.json', 'r') as config_file:
-        config = json.load(config_file)
-    if not isinstance(config, dict):
-         raise ValueError("config.json is not a valid dictionary.")
-    GENERATIONS_DIR = config.get('OUTPUTS', {}).get('GENERATIONS', os.path.join('output','TENOSAI-BOT','GENERATIONS'))
-    if not isinstance(GENERATIONS_DIR, str) or not GENERATIONS_DIR:
-         print("Warning: Invalid 'GENERATIONS' path in config. Using default.")
-         GENERATIONS_DIR = os.path.join('output','TENOSAI-BOT','GENERATIONS')
-    if not os.path.isabs(GENERATIONS_DIR): 
-        GENERATIONS_DIR = os.path.abspath(GENERATIONS_DIR)
-except (FileNotFoundError, json.JSONDecodeError, ValueError, TypeError) as e:
-    print(f"ERROR loading config.json in image_generation: {e}")
-    config = {"OUTPUTS": {}, "LLM_ENHANCER": {}}
-    GENERATIONS_DIR = os.path.abspath(os.path.join('output','TENOSAI-BOT','GENERATIONS'))
-except Exception as e:
-    print(f"UNEXPECTED ERROR loading config.json in image_generation: {e}")
-    traceback.print_exc()
-    config = {"OUTPUTS": {}, "LLM_ENHANCER": {}}
-    GENERATIONS_DIR = os.path.abspath(os.path.join('output','TENOSAI-BOT','GENERATIONS'))
+GENERATIONS_DIR = None
+
+
+def _apply_config(service):
+    global GENERATIONS_DIR
+    GENERATIONS_DIR = service.output_dir('GENERATIONS')
+
+
+config_service.subscribe(_apply_config)
 
 
 KSAMPLER_SETTING_OVERRIDES = {
@@ -652,6 +644,255 @@ def _apply_wan_generation_inputs(
     else:
         if embed_entry and isinstance(embed_entry.get("inputs"), dict):
             embed_entry["inputs"].pop("extra_latents", None)
+
+
+@dataclass(frozen=True)
+class GenerationPlan:
+    skeleton: dict
+    shift_value: float | None = None
+
+
+# Resolved skeletons for recent (model, mode, loaders, style) combinations; reruns
+# and bulk jobs only re-apply prompt, seed, size and sampler fields on top.
+generation_plan_cache = WorkflowPlanCache(max_entries=32, ttl_seconds=60.0)
+
+
+def _generation_plan_key(
+    spec,
+    model_type: str,
+    *,
+    is_img2img: bool,
+    settings,
+    actual_model_name: str | None,
+    selected_model_name_with_prefix: str | None,
+    style_to_apply: str,
+    styles_config: dict,
+) -> str:
+    setting_keys = (
+        _CHECKPOINT_MODEL_SETTING_KEYS.get(model_type),
+        'selected_t5_clip',
+        'selected_clip_l',
+        f"default_{model_type}_clip",
+        f"default_{model_type}_vae",
+        f"default_{model_type}_shift",
+        getattr(spec.generation, "secondary_model_setting_key", None),
+    )
+    key_material = [
+        model_type,
+        bool(is_img2img),
+        selected_model_name_with_prefix,
+        actual_model_name,
+        [[key, settings.get(key)] for key in setting_keys if key],
+        style_to_apply,
+        styles_config.get(style_to_apply) if style_to_apply != 'off' else None,
+    ]
+    encoded = json.dumps(key_material, sort_keys=True, default=str)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+def _lora_incompatibility(lora_name, model_type: str) -> Optional[str]:
+    """Why the LoRA can't be used with ``model_type`` according to its file header, if known."""
+    lora_root = config_service.section('LORAS').get('LORA_FILES')
+    if not lora_root or not isinstance(lora_name, str) or lora_name in ("", "None"):
+        return None
+    return lora_compatibility_issue(os.path.join(lora_root, lora_name), model_type)
+
+
+def _build_generation_plan(
+    spec,
+    model_type: str,
+    *,
+    is_img2img: bool,
+    settings,
+    default_settings,
+    actual_model_name: str | None,
+    selected_model_name_with_prefix: str | None,
+    style_to_apply: str,
+    styles_config: dict,
+):
+    """Resolve the job-independent part of a generation workflow.
+
+    Applies the model/CLIP/VAE loaders, sampling shift and style LoRAs to a
+    fresh template. Returns ``(GenerationPlan, None)`` or ``(None, error)``.
+    """
+    try:
+        modified_prompt = generation_workflow_builder(spec.generation, is_img2img=is_img2img)
+    except Exception as template_error:
+        print(f"ERROR copying template for model '{model_type}': {template_error}")
+        return None, "Internal Error: Failed to prepare workflow template."
+
+    if spec.generation.family == "checkpoint":
+        preferred_model_name = _extract_model_file_name(actual_model_name)
+        if not preferred_model_name:
+            fallback_key = _CHECKPOINT_MODEL_SETTING_KEYS.get(model_type)
+            fallback_candidate = settings.get(fallback_key) if fallback_key else None
+            preferred_model_name = _extract_model_file_name(fallback_candidate)
+
+        if preferred_model_name:
+            target_loader_node = spec.generation.model_loader_node
+            if target_loader_node and target_loader_node in modified_prompt:
+                _update_model_loader_filename(
+                    modified_prompt,
+                    target_loader_node,
+                    file_name=preferred_model_name,
+                )
+
+    shift_value = None
+    try:
+        comfy_models_data = check_available_models_api(suppress_summary_print=True)
+        category_keys = {"unet", "checkpoint", "clip"}
+        generation_category = spec.generation.comfy_category
+        if generation_category:
+            category_keys.add(generation_category)
+        comfy_category_list = {
+            key: {m.lower() for m in comfy_models_data.get(key, []) if isinstance(m, str)}
+            for key in category_keys
+        }
+
+        model_applied_successfully = False
+        if actual_model_name and selected_model_name_with_prefix:
+            category_key = spec.generation.comfy_category
+            available_models = comfy_category_list.get(category_key, set())
+            if actual_model_name.lower() in available_models:
+                model_loader_node_id_target = spec.generation.model_loader_node
+                if model_loader_node_id_target in modified_prompt:
+                    model_node_update_dict = get_model_node(selected_model_name_with_prefix, model_loader_node_id_target)
+                    if model_loader_node_id_target in model_node_update_dict:
+                        modified_prompt[model_loader_node_id_target] = model_node_update_dict[model_loader_node_id_target]
+                        model_applied_successfully = True
+
+        if spec.generation.family == "flux":
+            sel_t5_clip = settings.get('selected_t5_clip')
+            sel_clip_l = settings.get('selected_clip_l')
+            comfy_clip_list_lower = comfy_category_list.get("clip", set())
+            valid_t5 = sel_t5_clip and sel_t5_clip.lower() in comfy_clip_list_lower
+            valid_cl = sel_clip_l and sel_clip_l.lower() in comfy_clip_list_lower
+            clip_loader_node_id = spec.generation.clip_loader_node
+            if valid_t5 and valid_cl and clip_loader_node_id in modified_prompt and "inputs" in modified_prompt[clip_loader_node_id]:
+                modified_prompt[clip_loader_node_id]["inputs"].update({"clip_name1": sel_t5_clip, "clip_name2": sel_clip_l})
+        else:
+            clip_setting_key = f"default_{model_type}_clip"
+            clip_name_override = settings.get(clip_setting_key)
+            clip_loader_node_id = spec.generation.clip_loader_node
+            if clip_name_override and clip_loader_node_id in modified_prompt:
+                clip_inputs = modified_prompt[clip_loader_node_id].setdefault("inputs", {})
+                if "clip_name" in clip_inputs:
+                    clip_inputs["clip_name"] = clip_name_override
+                elif "model_name" in clip_inputs:
+                    clip_inputs["model_name"] = clip_name_override
+
+        vae_setting_key = f"default_{model_type}_vae"
+        vae_name_override = settings.get(vae_setting_key)
+        vae_loader_node_id = getattr(spec.generation, "vae_loader_node", None)
+        if vae_name_override and vae_loader_node_id and vae_loader_node_id in modified_prompt:
+            vae_inputs = modified_prompt[vae_loader_node_id].setdefault("inputs", {})
+            if "vae_name" in vae_inputs:
+                vae_inputs["vae_name"] = vae_name_override
+            elif "model_name" in vae_inputs:
+                vae_inputs["model_name"] = vae_name_override
+
+        secondary_node_id = getattr(spec.generation, "secondary_model_loader_node", None)
+        secondary_setting_key = getattr(spec.generation, "secondary_model_setting_key", None)
+        if secondary_setting_key:
+            secondary_override = settings.get(secondary_setting_key)
+        else:
+            secondary_override = None
+        if secondary_override:
+            _update_model_loader_filename(
+                modified_prompt,
+                secondary_node_id,
+                file_name=secondary_override,
+            )
+
+        if model_type == "qwen":
+            shift_key = f"default_{model_type}_shift"
+            default_shift = default_settings.get(shift_key, 0.0)
+            shift_candidate = settings.get(shift_key, default_shift)
+            try:
+                shift_value = float(shift_candidate)
+            except (TypeError, ValueError):
+                shift_value = float(default_shift)
+        _apply_sampling_shift_overrides(modified_prompt, shift_value)
+    except Exception as e_model_clip:
+        print(f"ERROR during model/CLIP application: {e_model_clip}"); traceback.print_exc()
+        return None, "Internal Error: Failed during model/CLIP setup."
+    
+    try:
+        gen_spec = spec.generation
+        lora_node_keys: list[str] = []
+        if gen_spec.family == "flux":
+            primary_lora = gen_spec.lora_node_img2img if is_img2img else gen_spec.lora_node
+            if primary_lora:
+                lora_node_keys.append(primary_lora)
+        elif gen_spec.lora_node:
+            lora_node_keys.append(gen_spec.lora_node)
+
+        secondary_lora_node = getattr(gen_spec, "secondary_lora_node", None)
+        if secondary_lora_node:
+            lora_node_keys.append(secondary_lora_node)
+
+        for lora_node_key_final in dict.fromkeys(lora_node_keys):
+            if not lora_node_key_final or lora_node_key_final not in modified_prompt:
+                continue
+
+            lora_node_data = modified_prompt[lora_node_key_final]
+            if "inputs" not in lora_node_data or not isinstance(lora_node_data["inputs"], dict):
+                print(f"  ERROR: LoRA node '{lora_node_key_final}' is missing 'inputs' dictionary or it's not a dict.")
+                continue
+
+            lora_inputs_dict = lora_node_data["inputs"]
+
+            if style_to_apply != 'off':
+                current_style_config = styles_config.get(style_to_apply, {})
+                if not isinstance(current_style_config, dict):
+                    current_style_config = {}
+
+                for i in range(1, 6):
+                    lora_slot_key = f"lora_{i}"
+                    if lora_slot_key not in lora_inputs_dict:
+                        continue
+
+                    slot_data_from_style = current_style_config.get(lora_slot_key, {})
+                    on_val = slot_data_from_style.get("on", False)
+                    lora_name_val = slot_data_from_style.get("lora", "None")
+                    if on_val:
+                        lora_issue = _lora_incompatibility(lora_name_val, model_type)
+                        if lora_issue:
+                            print(f"  WARNING: Skipping LoRA '{lora_name_val}' of style '{style_to_apply}': {lora_issue}.")
+                            on_val = False
+                    lora_strength_val = float(slot_data_from_style.get("strength", 0.0))
+
+                    if not isinstance(lora_inputs_dict.get(lora_slot_key), dict):
+                        lora_inputs_dict[lora_slot_key] = {}
+
+                    lora_inputs_dict[lora_slot_key].update(
+                        {
+                            "on": on_val,
+                            "lora": lora_name_val,
+                            "strength": lora_strength_val,
+                        }
+                    )
+            else:
+                for i in range(1, 6):
+                    lora_slot_key = f"lora_{i}"
+                    if lora_slot_key not in lora_inputs_dict:
+                        continue
+                    if not isinstance(lora_inputs_dict.get(lora_slot_key), dict):
+                        lora_inputs_dict[lora_slot_key] = {}
+                    lora_inputs_dict[lora_slot_key].update(
+                        {
+                            "on": False,
+                            "lora": "None",
+                            "strength": 0.0,
+                        }
+                    )
+    except Exception as e_lora:
+        print(f"ERROR applying style LoRAs: {e_lora}"); traceback.print_exc()
+        return None, "Internal Error: Failed during LoRA application."
+
+    return GenerationPlan(skeleton=modified_prompt.materialize(), shift_value=shift_value), None
+
+
 async def modify_prompt(
     original_prompt_text: str,
     params_dict: dict,
@@ -831,27 +1072,34 @@ async def modify_prompt(
     if not is_img2img: print(f"  AR: {aspect_ratio_str}, MP: {mp_size_str}, Batch: {default_batch_size_from_settings}")
     else: print(f"  Img2Img: Strength {img_strength_percent_for_job}%, Denoise {denoise_for_ksampler:.2f}")
 
-    try:
-        modified_prompt = copy_generation_template(spec.generation, is_img2img=is_img2img)
-    except Exception as template_error:
-        print(f"ERROR copying template for model '{model_type}': {template_error}")
-        return None, None, "Internal Error: Failed to prepare workflow template.", None
-
-    if spec.generation.family == "checkpoint":
-        preferred_model_name = _extract_model_file_name(actual_model_name)
-        if not preferred_model_name:
-            fallback_key = _CHECKPOINT_MODEL_SETTING_KEYS.get(model_type)
-            fallback_candidate = settings.get(fallback_key) if fallback_key else None
-            preferred_model_name = _extract_model_file_name(fallback_candidate)
+    plan_key = _generation_plan_key(
+        spec,
+        model_type,
+        is_img2img=is_img2img,
+        settings=settings,
+        actual_model_name=actual_model_name,
+        selected_model_name_with_prefix=selected_model_name_with_prefix,
+        style_to_apply=style_to_apply,
+        styles_config=styles_config,
+    )
+    plan = generation_plan_cache.get(plan_key)
+    if plan is None:
+        plan, plan_error = _build_generation_plan(
+            spec,
+            model_type,
+            is_img2img=is_img2img,
+            settings=settings,
+            default_settings=default_settings,
+            actual_model_name=actual_model_name,
+            selected_model_name_with_prefix=selected_model_name_with_prefix,
+            style_to_apply=style_to_apply,
+            styles_config=styles_config,
+        )
+        if plan is None:
+            return None, None, plan_error, None
+        generation_plan_cache.put(plan_key, plan)
 
-        if preferred_model_name:
-            target_loader_node = spec.generation.model_loader_node
-            if target_loader_node and target_loader_node in modified_prompt:
-                _update_model_loader_filename(
-                    modified_prompt,
-                    target_loader_node,
-                    file_name=preferred_model_name,
-                )
+    modified_prompt = WorkflowBuilder(plan.skeleton)
 
     try:
         gen_spec = spec.generation
@@ -906,6 +1154,8 @@ async def modify_prompt(
                 settings=settings,
                 model_type=model_type,
             )
+        # The per-job helpers may reconnect inputs on the sampling node; re-apply the plan's shift on top.
+        _apply_sampling_shift_overrides(modified_prompt, plan.shift_value)
     except KeyError as e_key:
         print(f"ERROR (KeyError) during core input application: {e_key}"); traceback.print_exc()
         return None, None, f"Internal Error: Template invalid (KeyError: {e_key}).", None
@@ -932,153 +1182,6 @@ async def modify_prompt(
         print(f"ERROR (General) during filename prefix application: {e_fn}"); traceback.print_exc()
         return None, None, "Error processing output filename.", None
 
-    try:
-        comfy_models_data = check_available_models_api(suppress_summary_print=True)
-        category_keys = {"unet", "checkpoint", "clip"}
-        generation_category = spec.generation.comfy_category
-        if generation_category:
-            category_keys.add(generation_category)
-        comfy_category_list = {
-            key: {m.lower() for m in comfy_models_data.get(key, []) if isinstance(m, str)}
-            for key in category_keys
-        }
-
-        model_applied_successfully = False
-        if actual_model_name and selected_model_name_with_prefix:
-            category_key = spec.generation.comfy_category
-            available_models = comfy_category_list.get(category_key, set())
-            if actual_model_name.lower() in available_models:
-                model_loader_node_id_target = spec.generation.model_loader_node
-                if model_loader_node_id_target in modified_prompt:
-                    model_node_update_dict = get_model_node(selected_model_name_with_prefix, model_loader_node_id_target)
-                    if model_loader_node_id_target in model_node_update_dict:
-                        modified_prompt[model_loader_node_id_target] = model_node_update_dict[model_loader_node_id_target]
-                        model_applied_successfully = True
-
-        if spec.generation.family == "flux":
-            sel_t5_clip = settings.get('selected_t5_clip')
-            sel_clip_l = settings.get('selected_clip_l')
-            comfy_clip_list_lower = comfy_category_list.get("clip", set())
-            valid_t5 = sel_t5_clip and sel_t5_clip.lower() in comfy_clip_list_lower
-            valid_cl = sel_clip_l and sel_clip_l.lower() in comfy_clip_list_lower
-            clip_loader_node_id = spec.generation.clip_loader_node
-            if valid_t5 and valid_cl and clip_loader_node_id in modified_prompt and "inputs" in modified_prompt[clip_loader_node_id]:
-                modified_prompt[clip_loader_node_id]["inputs"].update({"clip_name1": sel_t5_clip, "clip_name2": sel_clip_l})
-        else:
-            clip_setting_key = f"default_{model_type}_clip"
-            clip_name_override = settings.get(clip_setting_key)
-            clip_loader_node_id = spec.generation.clip_loader_node
-            if clip_name_override and clip_loader_node_id in modified_prompt:
-                clip_inputs = modified_prompt[clip_loader_node_id].setdefault("inputs", {})
-                if "clip_name" in clip_inputs:
-                    clip_inputs["clip_name"] = clip_name_override
-                elif "model_name" in clip_inputs:
-                    clip_inputs["model_name"] = clip_name_override
-
-        vae_setting_key = f"default_{model_type}_vae"
-        vae_name_override = settings.get(vae_setting_key)
-        vae_loader_node_id = getattr(spec.generation, "vae_loader_node", None)
-        if vae_name_override and vae_loader_node_id and vae_loader_node_id in modified_prompt:
-            vae_inputs = modified_prompt[vae_loader_node_id].setdefault("inputs", {})
-            if "vae_name" in vae_inputs:
-                vae_inputs["vae_name"] = vae_name_override
-            elif "model_name" in vae_inputs:
-                vae_inputs["model_name"] = vae_name_override
-
-        secondary_node_id = getattr(spec.generation, "secondary_model_loader_node", None)
-        secondary_setting_key = getattr(spec.generation, "secondary_model_setting_key", None)
-        if secondary_setting_key:
-            secondary_override = settings.get(secondary_setting_key)
-        else:
-            secondary_override = None
-        if secondary_override:
-            _update_model_loader_filename(
-                modified_prompt,
-                secondary_node_id,
-                file_name=secondary_override,
-            )
-
-        shift_value = None
-        if model_type == "qwen":
-            shift_key = f"default_{model_type}_shift"
-            default_shift = default_settings.get(shift_key, 0.0)
-            shift_candidate = settings.get(shift_key, default_shift)
-            try:
-                shift_value = float(shift_candidate)
-            except (TypeError, ValueError):
-                shift_value = float(default_shift)
-        _apply_sampling_shift_overrides(modified_prompt, shift_value)
-    except Exception as e_model_clip:
-        print(f"ERROR during model/CLIP application: {e_model_clip}"); traceback.print_exc()
-        return None, None, "Internal Error: Failed during model/CLIP setup.", None
-    
-    try:
-        gen_spec = spec.generation
-        lora_node_keys: list[str] = []
-        if gen_spec.family == "flux":
-            primary_lora = gen_spec.lora_node_img2img if is_img2img else gen_spec.lora_node
-            if primary_lora:
-                lora_node_keys.append(primary_lora)
-        elif gen_spec.lora_node:
-            lora_node_keys.append(gen_spec.lora_node)
-
-        secondary_lora_node = getattr(gen_spec, "secondary_lora_node", None)
-        if secondary_lora_node:
-            lora_node_keys.append(secondary_lora_node)
-
-        for lora_node_key_final in dict.fromkeys(lora_node_keys):
-            if not lora_node_key_final or lora_node_key_final not in modified_prompt:
-                continue
-
-            lora_node_data = modified_prompt[lora_node_key_final]
-            if "inputs" not in lora_node_data or not isinstance(lora_node_data["inputs"], dict):
-                print(f"  ERROR: LoRA node '{lora_node_key_final}' is missing 'inputs' dictionary or it's not a dict.")
-                continue
-
-            lora_inputs_dict = lora_node_data["inputs"]
-
-            if style_to_apply != 'off':
-                current_style_config = styles_config.get(style_to_apply, {})
-                if not isinstance(current_style_config, dict):
-                    current_style_config = {}
-
-                for i in range(1, 6):
-                    lora_slot_key = f"lora_{i}"
-                    if lora_slot_key not in lora_inputs_dict:
-                        continue
-
-                    slot_data_from_style = current_style_config.get(lora_slot_key, {})
-                    on_val = slot_data_from_style.get("on", False)
-                    lora_name_val = slot_data_from_style.get("lora", "None")
-                    lora_strength_val = float(slot_data_from_style.get("strength", 0.0))
-
-                    if not isinstance(lora_inputs_dict.get(lora_slot_key), dict):
-                        lora_inputs_dict[lora_slot_key] = {}
-
-                    lora_inputs_dict[lora_slot_key].update(
-                        {
-                            "on": on_val,
-                            "lora": lora_name_val,
-                            "strength": lora_strength_val,
-                        }
-                    )
-            else:
-                for i in range(1, 6):
-                    lora_slot_key = f"lora_{i}"
-                    if lora_slot_key not in lora_inputs_dict:
-                        continue
-                    if not isinstance(lora_inputs_dict.get(lora_slot_key), dict):
-                        lora_inputs_dict[lora_slot_key] = {}
-                    lora_inputs_dict[lora_slot_key].update(
-                        {
-                            "on": False,
-                            "lora": "None",
-                            "strength": 0.0,
-                        }
-                    )
-    except Exception as e_lora:
-        print(f"ERROR applying style LoRAs: {e_lora}"); traceback.print_exc()
-        return None, None, "Internal Error: Failed during LoRA application.", None
     
     final_batch_size_for_job_details = 1
     if not is_img2img:
@@ -1137,5 +1240,5 @@ async def modify_prompt(
         "wan_animation_motion_profile": settings.get('wan_animation_motion_profile') if runtime_animation_supported else None,
     }
     status_message_for_user = f"Prompt prepared for job {job_id} ({model_type.upper()}{' Img2Img' if is_img2img else ' Text2Img'})."
-    return job_id, modified_prompt, status_message_for_user, job_details_dict
+    return job_id, modified_prompt.materialize(), status_message_for_user, job_details_dict
 # --- END OF FILE image_generation.py ---
@@ -0,0 +1,247 @@
+"""Content-addressed cache of external input images uploaded to ComfyUI.
+
+Edit, img2img and variation workflows load their source images through
+``LoadImageFromUrlOrPath`` nodes, so ComfyUI downloaded the same Discord
+attachment again for every job, and re-running a job failed once the signed
+CDN link expired.  Before a workflow is queued, :class:`InputImageCache`
+downloads its remote inputs concurrently, hashes the bytes and uploads each
+distinct image to ComfyUI's ``/upload/image`` once; the node is then swapped
+for a core ``LoadImage`` of the uploaded name.  Later jobs using the same
+attachment (or the same bytes behind another URL) reuse that name.
+
+The cache is bounded by ``INPUT_CACHE.MAX_MEGABYTES`` and 1024 entries.
+ComfyUI has no API to delete inputs, so evicted ``tenos_*`` uploads are only
+removed from disk when ``INPUT_CACHE.COMFYUI_INPUT_DIR`` points at ComfyUI's
+input folder (i.e. it runs on this machine or a mounted share); without it
+the files stay there and need cleaning up on the ComfyUI side.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+from bot_config_loader import config_service
+from utils.image_probe import ImageDimensionCache
+
+_DEFAULT_MAX_MEGABYTES = 512
+_DEFAULT_MAX_ENTRIES = 1024
+_DOWNLOAD_TIMEOUT_SECONDS = 30
+_URL_LOAD_NODE = 'LoadImageFromUrlOrPath'
+_UPLOAD_PREFIX = 'tenos_'
+
+
+def _read_input_cache_settings() -> dict:
+    section = config_service.section('INPUT_CACHE')
+    try:
+        max_megabytes = max(1.0, float(section.get('MAX_MEGABYTES', _DEFAULT_MAX_MEGABYTES)))
+    except (TypeError, ValueError):
+        print(f"Warning: Invalid INPUT_CACHE.MAX_MEGABYTES '{section.get('MAX_MEGABYTES')}'. Using {_DEFAULT_MAX_MEGABYTES}.")
+        max_megabytes = _DEFAULT_MAX_MEGABYTES
+    return {
+        'enabled': bool(section.get('ENABLED', True)),
+        'max_bytes': int(max_megabytes * 1024 * 1024),
+        'max_entries': _DEFAULT_MAX_ENTRIES,
+        'comfyui_input_dir': str(section.get('COMFYUI_INPUT_DIR') or '').strip(),
+    }
+
+
+def _image_extension(data: bytes) -> str:
+    if data.startswith(b'\x89PNG'):
+        return '.png'
+    if data[:2] == b'\xff\xd8':
+        return '.jpg'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return '.webp'
+    if data[:4] == b'GIF8':
+        return '.gif'
+    return '.png'
+
+
+def _download(url: str) -> bytes:
+    response = requests.get(url, timeout=_DOWNLOAD_TIMEOUT_SECONDS, headers={'User-Agent': 'TenosAIBot/1.0'})
+    response.raise_for_status()
+    return response.content
+
+
+def _upload_to_comfyui(data: bytes, filename: str) -> str:
+    from comfyui_api import upload_image
+    return upload_image(data, filename)
+
+
+def _delete_uploaded_input(input_dir: str, uploaded_name: str) -> bool:
+    """Remove one of our uploads from ComfyUI's input folder; False if it is not there."""
+    root = os.path.realpath(input_dir)
+    path = os.path.realpath(os.path.join(root, uploaded_name))
+    if os.path.commonpath([root, path]) != root or not os.path.basename(path).startswith(_UPLOAD_PREFIX):
+        return False
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+@dataclass
+class CachedInput:
+    digest: str
+    size: int
+    uploaded_name: str
+
+
+class InputImageCache:
+    def __init__(
+        self,
+        *,
+        settings: Optional[dict] = None,
+        downloader: Callable[[str], bytes] = _download,
+        uploader: Callable[[bytes, str], str] = _upload_to_comfyui,
+        remover: Callable[[str, str], bool] = _delete_uploaded_input,
+    ):
+        self.settings = settings if settings is not None else _read_input_cache_settings()
+        self._download = downloader
+        self._upload = uploader
+        self._remove = remover
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CachedInput]" = OrderedDict()
+        self._url_digests: Dict[str, str] = {}
+        self._total_bytes = 0
+        self.hits = 0
+        self.content_hits = 0
+        self.misses = 0
+        self.uploads = 0
+        self.failures = 0
+        self.evictions = 0
+        self.uploads_deleted = 0
+        self.bytes_downloaded = 0
+
+    def _lookup_url(self, url_key: str) -> Optional[CachedInput]:
+        with self._lock:
+            digest = self._url_digests.get(url_key)
+            entry = self._entries.get(digest) if digest else None
+            if entry is None:
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry
+
+    def _store(self, url_key: str, entry: CachedInput) -> None:
+        evicted_entries: List[CachedInput] = []
+        with self._lock:
+            if entry.digest not in self._entries:
+                self._entries[entry.digest] = entry
+                self._total_bytes += entry.size
+            self._entries.move_to_end(entry.digest)
+            self._url_digests[url_key] = entry.digest
+            while self._entries and (
+                self._total_bytes > self.settings['max_bytes'] or len(self._entries) > self.settings['max_entries']
+            ):
+                evicted_digest, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= evicted.size
+                self.evictions += 1
+                evicted_entries.append(evicted)
+                for key in [k for k, d in self._url_digests.items() if d == evicted_digest]:
+                    del self._url_digests[key]
+        self._delete_uploads(evicted_entries)
+
+    def _delete_uploads(self, entries: List[CachedInput]) -> None:
+        input_dir = self.settings.get('comfyui_input_dir')
+        if not entries or not input_dir or not os.path.isdir(input_dir):
+            return
+        for entry in entries:
+            try:
+                deleted = self._remove(input_dir, entry.uploaded_name)
+            except OSError as e:
+                print(f"InputImageCache: Could not delete evicted upload {entry.uploaded_name}: {e}")
+                continue
+            if deleted:
+                with self._lock:
+                    self.uploads_deleted += 1
+
+    def uploaded_name_for(self, url: str) -> Optional[str]:
+        """ComfyUI input name for the image at ``url``, downloading and uploading it if needed."""
+        url_key = ImageDimensionCache.key_for(url)
+        entry = self._lookup_url(url_key)
+        if entry is not None:
+            return entry.uploaded_name
+
+        with self._lock:
+            self.misses += 1
+        data = self._download(url)
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self.bytes_downloaded += len(data)
+            existing = self._entries.get(digest)
+            if existing is not None:
+                self.content_hits += 1
+        if existing is None:
+            uploaded_name = self._upload(data, f"{_UPLOAD_PREFIX}{digest[:24]}{_image_extension(data)}")
+            with self._lock:
+                self.uploads += 1
+            existing = CachedInput(digest=digest, size=len(data), uploaded_name=uploaded_name)
+        self._store(url_key, existing)
+        return existing.uploaded_name
+
+    def _safe_uploaded_name(self, url: str) -> Optional[str]:
+        try:
+            return self.uploaded_name_for(url)
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+            print(f"InputImageCache: Could not cache {url}, ComfyUI will fetch it directly: {e}")
+            return None
+
+    async def prepare_workflow(self, payload: Any) -> Any:
+        """Copy of ``payload`` with remote URL loaders replaced by uploaded ``LoadImage`` nodes."""
+        if not self.settings['enabled'] or not isinstance(payload, dict):
+            return payload
+        remote_nodes = {}
+        for node_id, node in payload.items():
+            if not isinstance(node, dict) or node.get('class_type') != _URL_LOAD_NODE:
+                continue
+            source = (node.get('inputs') or {}).get('url_or_path')
+            if isinstance(source, str) and source.lower().startswith(('http://', 'https://')):
+                remote_nodes[node_id] = source
+        if not remote_nodes:
+            return payload
+
+        unique_urls = list(dict.fromkeys(remote_nodes.values()))
+        names = await asyncio.gather(*(asyncio.to_thread(self._safe_uploaded_name, url) for url in unique_urls))
+        uploaded = dict(zip(unique_urls, names))
+
+        prepared = dict(payload)
+        for node_id, url in remote_nodes.items():
+            if not uploaded.get(url):
+                continue
+            node = {'class_type': 'LoadImage', 'inputs': {'image': uploaded[url]}}
+            if '_meta' in payload[node_id]:
+                node['_meta'] = payload[node_id]['_meta']
+            prepared[node_id] = node
+        return prepared
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.settings['enabled'],
+                'entries': len(self._entries),
+                'cached_megabytes': round(self._total_bytes / (1024 * 1024), 2),
+                'hits': self.hits,
+                'content_hits': self.content_hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'uploads': self.uploads,
+                'failures': self.failures,
+                'evictions': self.evictions,
+                'uploads_deleted': self.uploads_deleted,
+                'megabytes_downloaded': round(self.bytes_downloaded / (1024 * 1024), 2),
+            }
+
+
+input_image_cache = InputImageCache()
@@ -0,0 +1,285 @@
+"""Model-affinity dispatch of prepared workflows to ComfyUI.
+
+ComfyUI runs prompts in the order it receives them, so on a busy server
+interleaved Flux/SDXL/Qwen/WAN requests (or different LoRA stacks) make it
+unload and reload multi-GB models between almost every job.
+:class:`ModelAffinityScheduler` sits between job preparation and
+``queue_prompt``:
+
+* while ComfyUI is idle a job is dispatched immediately,
+* while it is busy, ready jobs are held for at most ``WINDOW_SECONDS``
+  (or until ``MAX_WINDOW_JOBS`` are waiting) and then dispatched grouped by
+  their loader/LoRA set, starting with the set ComfyUI loaded last,
+* every job in a window is dispatched when that window closes, so the
+  window length is the upper bound on the extra wait and nothing starves,
+* all runs of one command are enqueued together with
+  :meth:`ModelAffinityScheduler.submit_many`; a window holding nothing but
+  that one batch is dispatched right away, as there is nothing to group
+  it with.
+
+The number of model switches saved versus arrival order is tracked in
+:meth:`ModelAffinityScheduler.get_stats`.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from bot_config_loader import config_service
+from queue_manager import queue_manager
+
+
+_DEFAULT_WINDOW_SECONDS = 2.0
+_DEFAULT_MAX_WINDOW_JOBS = 8
+_POLL_INTERVAL_SECONDS = 0.1
+
+# Inputs on loader nodes that point at files ComfyUI loads but that are not models.
+_NON_MODEL_INPUTS = {'url_or_path', 'image', 'filename_prefix', 'weight_dtype', 'type', 'device'}
+
+
+def _read_scheduler_settings() -> dict:
+    section = config_service.section('JOB_SCHEDULER')
+    try:
+        window_seconds = max(0.0, float(section.get('WINDOW_SECONDS', _DEFAULT_WINDOW_SECONDS)))
+    except (TypeError, ValueError):
+        print(f"Warning: Invalid JOB_SCHEDULER.WINDOW_SECONDS '{section.get('WINDOW_SECONDS')}'. Using {_DEFAULT_WINDOW_SECONDS}s.")
+        window_seconds = _DEFAULT_WINDOW_SECONDS
+    try:
+        max_window_jobs = max(1, int(section.get('MAX_WINDOW_JOBS', _DEFAULT_MAX_WINDOW_JOBS)))
+    except (TypeError, ValueError):
+        print(f"Warning: Invalid JOB_SCHEDULER.MAX_WINDOW_JOBS '{section.get('MAX_WINDOW_JOBS')}'. Using {_DEFAULT_MAX_WINDOW_JOBS}.")
+        max_window_jobs = _DEFAULT_MAX_WINDOW_JOBS
+    return {
+        'enabled': bool(section.get('ENABLED', True)),
+        'window_seconds': window_seconds,
+        'max_window_jobs': max_window_jobs,
+    }
+
+
+def workflow_affinity_key(payload: dict) -> Tuple[Tuple[str, str], ...]:
+    """Models and enabled LoRAs a workflow makes ComfyUI load, as a hashable key."""
+    loaded = set()
+    if not isinstance(payload, dict):
+        return ()
+    for node in payload.values():
+        if not isinstance(node, dict):
+            continue
+        class_type = str(node.get('class_type', ''))
+        if 'Loader' not in class_type and 'Lora' not in class_type:
+            continue
+        inputs = node.get('inputs')
+        if not isinstance(inputs, dict):
+            continue
+        for input_name, value in inputs.items():
+            if isinstance(value, str):
+                if value and value != 'None' and input_name not in _NON_MODEL_INPUTS:
+                    loaded.add((input_name, value))
+            elif isinstance(value, dict) and value.get('on') and value.get('lora') not in (None, '', 'None'):
+                loaded.add(('lora', str(value['lora'])))
+    return tuple(sorted(loaded))
+
+
+def count_model_swaps(affinities: Iterable, start=None) -> int:
+    swaps = 0
+    previous = start
+    for affinity in affinities:
+        if previous is not None and affinity != previous:
+            swaps += 1
+        previous = affinity
+    return swaps
+
+
+def order_by_affinity(jobs: List["ScheduledJob"], last_affinity=None) -> List["ScheduledJob"]:
+    """Group jobs by affinity, keeping arrival order inside and between groups.
+
+    The group matching ``last_affinity`` (what ComfyUI has loaded) goes first.
+    """
+    groups: "OrderedDict[Any, List[ScheduledJob]]" = OrderedDict()
+    for job in jobs:
+        groups.setdefault(job.affinity, []).append(job)
+    ordered = groups.pop(last_affinity, []) if last_affinity is not None else []
+    for group in groups.values():
+        ordered.extend(group)
+    return ordered
+
+
+@dataclass
+class ScheduledJob:
+    payload: dict
+    affinity: Tuple
+    enqueued_at: float
+    future: asyncio.Future = field(repr=False)
+    batch_id: Optional[int] = None
+
+
+class ModelAffinityScheduler:
+    def __init__(
+        self,
+        dispatch: Callable[[dict], Optional[str]],
+        *,
+        settings: Optional[dict] = None,
+        busy_probe: Optional[Callable[[], bool]] = None,
+        prepare: Optional[Callable[[dict], Awaitable[dict]]] = None,
+    ):
+        self._dispatch = dispatch
+        self._prepare = prepare
+        self.settings = settings if settings is not None else _read_scheduler_settings()
+        self._busy_probe = busy_probe or (lambda: bool(queue_manager.pending_jobs))
+        self._window: List[ScheduledJob] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self._batches = 0
+        self.last_affinity = None
+        self.jobs_dispatched = 0
+        self.windows_flushed = 0
+        self.swaps_in_arrival_order = 0
+        self.swaps_dispatched = 0
+        self.max_wait_seconds = 0.0
+
+    @property
+    def swaps_avoided(self) -> int:
+        return self.swaps_in_arrival_order - self.swaps_dispatched
+
+    def _is_busy(self) -> bool:
+        try:
+            return bool(self._busy_probe())
+        except Exception:
+            return False
+
+    async def submit(self, payload: dict, affinity=None) -> Optional[str]:
+        """Queue ``payload`` with ComfyUI and return its prompt id.
+
+        Exceptions raised by the dispatch function (e.g. connection refused)
+        propagate to the caller.
+        """
+        if self._prepare is not None:
+            payload = await self._prepare(payload)
+        if not self.settings['enabled']:
+            return await asyncio.to_thread(self._dispatch, payload)
+        return await self._enqueue(payload, affinity)
+
+    async def submit_many(self, payloads: List[dict]) -> List[Any]:
+        """Queue all ``payloads`` of one command and return their prompt ids in order.
+
+        Every job enters the window before any of them is awaited, so ``--r 4``
+        waits out one window instead of four.  A failed entry is the raised
+        exception rather than a prompt id.
+        """
+        if self._prepare is not None:
+            prepared = await asyncio.gather(*(self._prepare(payload) for payload in payloads), return_exceptions=True)
+        else:
+            prepared = list(payloads)
+        if not self.settings['enabled']:
+            results = []
+            for payload in prepared:
+                if isinstance(payload, BaseException):
+                    results.append(payload)
+                    continue
+                try:
+                    results.append(await asyncio.to_thread(self._dispatch, payload))
+                except Exception as e:
+                    results.append(e)
+            return results
+
+        self._batches += 1
+        futures = []
+        for payload in prepared:
+            if isinstance(payload, BaseException):
+                failed = asyncio.get_running_loop().create_future()
+                failed.set_exception(payload)
+                futures.append(failed)
+            else:
+                futures.append(self._enqueue(payload, None, batch_id=self._batches))
+        return list(await asyncio.gather(*futures, return_exceptions=True))
+
+    def _enqueue(self, payload: dict, affinity=None, batch_id: Optional[int] = None) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        job = ScheduledJob(
+            payload=payload,
+            affinity=affinity if affinity is not None else workflow_affinity_key(payload),
+            enqueued_at=loop.time(),
+            future=loop.create_future(),
+            batch_id=batch_id,
+        )
+        self._window.append(job)
+        if self._flusher is None or self._flusher.done():
+            self._flusher = loop.create_task(self._run())
+        return job.future
+
+    def _holds_single_batch(self) -> bool:
+        batch_id = self._window[0].batch_id
+        return batch_id is not None and all(job.batch_id == batch_id for job in self._window)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._window:
+            waited = loop.time() - self._window[0].enqueued_at
+            if (
+                waited < self.settings['window_seconds']
+                and len(self._window) < self.settings['max_window_jobs']
+                and not self._holds_single_batch()
+                and self._is_busy()
+            ):
+                await asyncio.sleep(min(self.settings['window_seconds'] - waited, _POLL_INTERVAL_SECONDS))
+                continue
+            batch, self._window = self._window, []
+            await self._dispatch_window(batch, loop.time())
+
+    async def _dispatch_window(self, batch: List[ScheduledJob], now: float) -> None:
+        start_affinity = self.last_affinity
+        ordered = order_by_affinity(batch, start_affinity)
+        arrival_swaps = count_model_swaps((job.affinity for job in batch), start_affinity)
+        ordered_swaps = count_model_swaps((job.affinity for job in ordered), start_affinity)
+
+        for job in ordered:
+            self.max_wait_seconds = max(self.max_wait_seconds, now - job.enqueued_at)
+            if job.future.done():
+                continue
+            try:
+                prompt_id = await asyncio.to_thread(self._dispatch, job.payload)
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+                continue
+            if prompt_id:
+                self.last_affinity = job.affinity
+                self.jobs_dispatched += 1
+            if not job.future.done():
+                job.future.set_result(prompt_id)
+
+        self.windows_flushed += 1
+        self.swaps_in_arrival_order += arrival_swaps
+        self.swaps_dispatched += ordered_swaps
+        if arrival_swaps > ordered_swaps:
+            print(
+                f"JobScheduler: dispatched {len(batch)} jobs grouped by model; "
+                f"~{arrival_swaps - ordered_swaps} model swap(s) avoided "
+                f"({self.swaps_avoided} since startup)."
+            )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.settings['enabled'],
+            'window_seconds': self.settings['window_seconds'],
+            'waiting_jobs': len(self._window),
+            'jobs_dispatched': self.jobs_dispatched,
+            'windows_flushed': self.windows_flushed,
+            'estimated_swaps_in_arrival_order': self.swaps_in_arrival_order,
+            'estimated_swaps_dispatched': self.swaps_dispatched,
+            'estimated_swaps_avoided': self.swaps_avoided,
+            'max_wait_seconds': round(self.max_wait_seconds, 3),
+        }
+
+
+def _queue_with_comfyui(payload: dict) -> Optional[str]:
+    from comfyui_api import queue_prompt
+    return queue_prompt(payload)
+
+
+async def _cache_remote_inputs(payload: dict) -> dict:
+    from input_image_cache import input_image_cache
+    return await input_image_cache.prepare_workflow(payload)
+
+
+job_scheduler = ModelAffinityScheduler(_queue_with_comfyui, prepare=_cache_remote_inputs)
@@ -1,4 +1,3 @@
-import json
 import uuid
 import os
 import re
@@ -6,34 +5,23 @@ import traceback
 from typing import List, Dict, Any, Tuple
 
 from queue_manager import queue_manager
+from bot_config_loader import config_service
 from settings_manager import load_settings
 from kontext_templates import get_kontext_workflow
 from modelnodes import get_model_node
 
-try:
-    if not os.path.exists('config.json'):
-        raise FileNotFoundError("config.json not found in kontext_editing.py.")
-    with open('config.json', 'r') as config_file:
-        config_data_kontext = json.load(config_file)
-    if not isinstance(config_data_kontext, dict):
-        raise ValueError("config.json is not a valid dictionary in kontext_editing.py.")
+KONTEXT_EDITS_DIR = None
+
+
+def _apply_config(service):
+    global KONTEXT_EDITS_DIR
     # Use a specific output directory for Kontext edits, falling back to GENERATIONS
-    KONTEXT_EDITS_DIR = config_data_kontext.get('OUTPUTS', {}).get('KONTEXT_EDITS', 
-                        config_data_kontext.get('OUTPUTS', {}).get('GENERATIONS', 
-                        os.path.join('output', 'TENOSAI-BOT', 'GENERATIONS')))
-    
-    if not isinstance(KONTEXT_EDITS_DIR, str) or not KONTEXT_EDITS_DIR:
-        print("Warning: Invalid 'KONTEXT_EDITS' or 'GENERATIONS' path in config. Using default.")
-        KONTEXT_EDITS_DIR = os.path.join('output', 'TENOSAI-BOT', 'GENERATIONS')
-    if not os.path.isabs(KONTEXT_EDITS_DIR):
-        KONTEXT_EDITS_DIR = os.path.abspath(KONTEXT_EDITS_DIR)
-except (FileNotFoundError, json.JSONDecodeError, ValueError, TypeError) as e:
-    print(f"Error loading config.json in kontext_editing.py: {e}")
-    KONTEXT_EDITS_DIR = os.path.abspath(os.path.join('output', 'TENOSAI-BOT', 'GENERATIONS'))
-except Exception as e:
-    print(f"Unexpected error loading config.json in kontext_editing.py: {e}")
-    traceback.print_exc()
-    KONTEXT_EDITS_DIR = os.path.abspath(os.path.join('output', 'TENOSAI-BOT', 'GENERATIONS'))
+    KONTEXT_EDITS_DIR = service.output_dir(
+        'KONTEXT_EDITS', 'GENERATIONS', default=os.path.join('output', 'TENOSAI-BOT', 'GENERATIONS')
+    )
+
+
+config_service.subscribe(_apply_config)
 
 
 def normalize_path_for_comfyui(path: str) -> str:
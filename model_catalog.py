@@ -0,0 +1,196 @@
+"""In-memory index of the model catalog files used by the settings menus.
+
+``modelslist.json``, ``checkpointslist.json``, ``cliplist.json`` and friends
+are written by :mod:`model_scanner` and read by every settings select menu.
+Opening ``/settings`` builds dozens of those menus, so :data:`model_catalog`
+parses each file once, keeps favourites and items pre-sorted per family, and
+re-reads a file only when its mtime/size changes or the scanner calls
+:meth:`ModelCatalogService.invalidate`.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+UPSCALE_MODEL_EXTENSIONS = {'.pth', '.pt', '.onnx', '.safetensors', '.ckpt', '.bin'}
+_COMFYUI_MODELS_TTL_SECONDS = 60.0
+
+
+def extract_catalog_entries(raw_data: object, *, favorites_key: str = "favorites") -> Tuple[List[str], List[str]]:
+    favorites: List[str] = []
+    items: List[str] = []
+
+    if isinstance(raw_data, dict):
+        raw_favorites = raw_data.get(favorites_key)
+        if isinstance(raw_favorites, dict):
+            for value in raw_favorites.values():
+                if isinstance(value, Iterable) and not isinstance(value, (str, bytes)):
+                    favorites.extend(str(v).strip() for v in value if isinstance(v, str) and v.strip())
+        elif isinstance(raw_favorites, Iterable) and not isinstance(raw_favorites, (str, bytes)):
+            favorites.extend(str(v).strip() for v in raw_favorites if isinstance(v, str) and v.strip())
+
+        for key, value in raw_data.items():
+            if key == favorites_key:
+                continue
+            if isinstance(value, Iterable) and not isinstance(value, (str, bytes)):
+                items.extend(str(v).strip() for v in value if isinstance(v, str) and v.strip())
+    elif isinstance(raw_data, Iterable) and not isinstance(raw_data, (str, bytes)):
+        items.extend(str(v).strip() for v in raw_data if isinstance(v, str) and v.strip())
+
+    # Remove duplicates while preserving order
+    seen: set[str] = set()
+    deduped_items: List[str] = []
+    for entry in items:
+        if entry and entry not in seen:
+            deduped_items.append(entry)
+            seen.add(entry)
+
+    seen_favorites: set[str] = set()
+    deduped_favorites: List[str] = []
+    for fav in favorites:
+        if fav and fav not in seen_favorites:
+            deduped_favorites.append(fav)
+            seen_favorites.add(fav)
+
+    return deduped_favorites, deduped_items
+
+
+def _file_signature(path: str):
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return None
+    return stat_result.st_mtime_ns, stat_result.st_size
+
+
+def _clean_sorted(values, key=None) -> Tuple[str, ...]:
+    if not isinstance(values, Iterable) or isinstance(values, (str, bytes)):
+        return ()
+    return tuple(sorted((v.strip() for v in values if isinstance(v, str)), key=key))
+
+
+@dataclass(frozen=True)
+class CatalogIndex:
+    """Parsed catalog file with the orderings the choice builders need."""
+
+    raw: object = None
+    favorites: Tuple[str, ...] = ()
+    items: Tuple[str, ...] = ()
+    favorites_sorted: Tuple[str, ...] = ()
+    items_sorted: Tuple[str, ...] = ()
+    by_key_sorted: Dict[str, Tuple[str, ...]] = field(default_factory=dict)
+    favorites_by_key_sorted: Dict[str, Tuple[str, ...]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, raw_data: object) -> "CatalogIndex":
+        favorites, items = extract_catalog_entries(raw_data)
+        by_key_sorted: Dict[str, Tuple[str, ...]] = {}
+        favorites_by_key_sorted: Dict[str, Tuple[str, ...]] = {}
+        if isinstance(raw_data, dict):
+            for key, value in raw_data.items():
+                if key == 'favorites':
+                    if isinstance(value, dict):
+                        for fav_key, fav_values in value.items():
+                            favorites_by_key_sorted[fav_key] = _clean_sorted(fav_values)
+                    continue
+                by_key_sorted[key] = _clean_sorted(value)
+        return cls(
+            raw=raw_data,
+            favorites=tuple(favorites),
+            items=tuple(items),
+            favorites_sorted=tuple(sorted(set(favorites), key=str.lower)),
+            items_sorted=tuple(sorted(set(items), key=str.lower)),
+            by_key_sorted=by_key_sorted,
+            favorites_by_key_sorted=favorites_by_key_sorted,
+        )
+
+
+_EMPTY_INDEX = CatalogIndex()
+
+
+class ModelCatalogService:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, Tuple[object, CatalogIndex]] = {}
+        self._directory_listings: Dict[str, Tuple[object, Tuple[str, ...]]] = {}
+        self._comfyui_models: Optional[dict] = None
+        self._comfyui_models_loaded_at = 0.0
+
+    def get(self, file_name: str) -> CatalogIndex:
+        """Indexed contents of ``file_name``; empty when missing or unreadable."""
+        if not file_name:
+            return _EMPTY_INDEX
+        signature = _file_signature(file_name)
+        with self._lock:
+            cached = self._indexes.get(file_name)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+
+        index = _EMPTY_INDEX
+        if signature is not None:
+            try:
+                with open(file_name, 'r') as f:
+                    index = CatalogIndex.build(json.load(f))
+            except Exception as exc:
+                print(f"Warning: Could not load {file_name}: {exc}")
+        with self._lock:
+            self._indexes[file_name] = (signature, index)
+        return index
+
+    def list_directory(self, directory: str, extensions=UPSCALE_MODEL_EXTENSIONS) -> Tuple[str, ...]:
+        """Sorted model files directly inside ``directory``, re-listed only when it changes."""
+        normalized_root = os.path.abspath(directory)
+        signature = _file_signature(normalized_root)
+        with self._lock:
+            cached = self._directory_listings.get(normalized_root)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+
+        entries: Tuple[str, ...] = ()
+        if signature is not None and os.path.isdir(normalized_root):
+            try:
+                found = set()
+                for entry in os.listdir(normalized_root):
+                    base = entry.strip()
+                    if base and os.path.splitext(base)[1].lower() in extensions:
+                        found.add(base)
+                entries = tuple(sorted(found))
+            except OSError as os_error:
+                print(f"ModelCatalog: Unable to scan model directory '{normalized_root}': {os_error}")
+        with self._lock:
+            self._directory_listings[normalized_root] = (signature, entries)
+        return entries
+
+    def get_comfyui_models(self) -> dict:
+        """ComfyUI's model inventory, refreshed at most once a minute."""
+        with self._lock:
+            if self._comfyui_models is not None and time.monotonic() - self._comfyui_models_loaded_at < _COMFYUI_MODELS_TTL_SECONDS:
+                return self._comfyui_models
+        try:
+            from comfyui_api import get_available_comfyui_models
+            models_data = get_available_comfyui_models(suppress_summary_print=True)
+        except Exception:
+            models_data = {}
+        if not isinstance(models_data, dict):
+            models_data = {}
+        with self._lock:
+            self._comfyui_models = models_data
+            self._comfyui_models_loaded_at = time.monotonic()
+        return models_data
+
+    def invalidate(self, file_name: Optional[str] = None) -> None:
+        """Forget cached catalogs, e.g. after :mod:`model_scanner` rewrote them."""
+        with self._lock:
+            if file_name is None:
+                self._indexes.clear()
+                self._directory_listings.clear()
+                self._comfyui_models = None
+            else:
+                self._indexes.pop(file_name, None)
+
+
+model_catalog = ModelCatalogService()
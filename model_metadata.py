@@ -0,0 +1,313 @@
+"""Model classification from safetensors / GGUF file headers.
+
+Folder scans used to decide what a file is from its name alone, so a
+misfiled model or a LoRA trained for another base only failed once ComfyUI
+executed the job.  This module reads just the file header -- the 8-byte
+length plus JSON header of a safetensors file, or the key/values and tensor
+table of a GGUF file -- and infers the model kind, architecture, dominant
+dtype and parameter count from it.  :class:`ModelMetadataIndex` caches the
+result per file under ``(size, mtime_ns)`` so repeated scans only stat files.
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import threading
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+METADATA_CACHE_FILE = 'model_metadata_cache.json'
+
+# Safetensors headers of real models are well below this; anything larger is not a header.
+_MAX_SAFETENSORS_HEADER_BYTES = 100 * 1024 * 1024
+_GGUF_MAGIC = b'GGUF'
+
+_GGML_TYPE_NAMES = {
+    0: 'F32', 1: 'F16', 2: 'Q4_0', 3: 'Q4_1', 6: 'Q5_0', 7: 'Q5_1', 8: 'Q8_0', 9: 'Q8_1',
+    10: 'Q2_K', 11: 'Q3_K', 12: 'Q4_K', 13: 'Q5_K', 14: 'Q6_K', 15: 'Q8_K',
+    24: 'I8', 25: 'I16', 26: 'I32', 27: 'I64', 28: 'F64', 30: 'BF16',
+}
+
+# GGUF value types: fixed-size scalars as struct formats, plus string (8) and array (9).
+_GGUF_SCALAR_FORMATS = {
+    0: '<B', 1: '<b', 2: '<H', 3: '<h', 4: '<I', 5: '<i', 6: '<f', 7: '<?', 10: '<Q', 11: '<q', 12: '<d',
+}
+_GGUF_STRING = 8
+_GGUF_ARRAY = 9
+
+# ``general.architecture`` values written by ComfyUI-GGUF for diffusion models; anything else
+# (llama, qwen2vl, t5encoder, ...) is a text encoder.
+_GGUF_DIFFUSION_ARCHITECTURES = {'flux': 'flux', 'sdxl': 'sdxl', 'wan': 'wan', 'qwen_image': 'qwen'}
+
+# Architectures recognised from header metadata, checked in order.
+_ARCHITECTURE_HINTS = (
+    ('flux', 'flux'),
+    ('qwen', 'qwen'),
+    ('wan', 'wan'),
+    ('xl', 'sdxl'),
+)
+
+
+@dataclass
+class ModelMetadata:
+    format: str
+    kind: str
+    architecture: Optional[str]
+    dtype: Optional[str]
+    parameter_count: int
+    file_size: int
+
+    @property
+    def size_label(self) -> str:
+        if self.parameter_count >= 1_000_000_000:
+            return f"{self.parameter_count / 1_000_000_000:.1f}B"
+        return f"{self.parameter_count / 1_000_000:.0f}M"
+
+
+def read_safetensors_header(path: str) -> Dict[str, Any]:
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if len(mapped) < 8:
+            raise ValueError("file too small for a safetensors header")
+        (header_length,) = struct.unpack_from('<Q', mapped, 0)
+        if header_length > _MAX_SAFETENSORS_HEADER_BYTES or 8 + header_length > len(mapped):
+            raise ValueError(f"implausible safetensors header length {header_length}")
+        header = json.loads(mapped[8:8 + header_length])
+    if not isinstance(header, dict):
+        raise ValueError("safetensors header is not a JSON object")
+    return header
+
+
+class _GGUFReader:
+    def __init__(self, buffer):
+        self._buffer = buffer
+        self.offset = 0
+
+    def unpack(self, fmt: str):
+        (value,) = struct.unpack_from(fmt, self._buffer, self.offset)
+        self.offset += struct.calcsize(fmt)
+        return value
+
+    def string(self) -> str:
+        length = self.unpack('<Q')
+        if self.offset + length > len(self._buffer):
+            raise ValueError("GGUF string runs past end of file")
+        raw = self._buffer[self.offset:self.offset + length]
+        self.offset += length
+        return raw.decode('utf-8', errors='replace')
+
+    def value(self, value_type: int, keep: bool = True):
+        if value_type in _GGUF_SCALAR_FORMATS:
+            return self.unpack(_GGUF_SCALAR_FORMATS[value_type])
+        if value_type == _GGUF_STRING:
+            return self.string()
+        if value_type == _GGUF_ARRAY:
+            item_type = self.unpack('<I')
+            count = self.unpack('<Q')
+            # Tokenizer vocabularies can hold 100k+ entries; walk past them without keeping them.
+            keep_items = keep and count <= 64
+            items = [self.value(item_type, keep_items) for _ in range(count)]
+            return items if keep_items else None
+        raise ValueError(f"unknown GGUF value type {value_type}")
+
+
+def read_gguf_header(path: str) -> Tuple[Dict[str, Any], Dict[str, Tuple[str, Tuple[int, ...]]]]:
+    """Key/values and ``{tensor: (ggml type, shape)}`` from a GGUF file."""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if mapped[:4] != _GGUF_MAGIC:
+            raise ValueError("missing GGUF magic")
+        reader = _GGUFReader(mapped)
+        reader.offset = 4
+        version = reader.unpack('<I')
+        count_format = '<I' if version == 1 else '<Q'
+        tensor_count = reader.unpack(count_format)
+        kv_count = reader.unpack(count_format)
+
+        metadata: Dict[str, Any] = {}
+        for _ in range(kv_count):
+            key = reader.string()
+            metadata[key] = reader.value(reader.unpack('<I'))
+
+        tensors: Dict[str, Tuple[str, Tuple[int, ...]]] = {}
+        for _ in range(tensor_count):
+            name = reader.string()
+            dims = tuple(reader.unpack('<Q') for _ in range(reader.unpack('<I')))
+            ggml_type = reader.unpack('<I')
+            reader.unpack('<Q')  # data offset
+            tensors[name] = (_GGML_TYPE_NAMES.get(ggml_type, f'type_{ggml_type}'), dims)
+    return metadata, tensors
+
+
+def _architecture_from_hint(hint: Any) -> Optional[str]:
+    if not isinstance(hint, str):
+        return None
+    lowered = hint.lower()
+    for needle, architecture in _ARCHITECTURE_HINTS:
+        if needle in lowered:
+            return architecture
+    return None
+
+
+def _classify_tensor_names(names: Iterable[str]) -> Tuple[str, Optional[str]]:
+    """``(kind, architecture)`` from tensor names alone."""
+    # Kohya LoRAs flatten module paths with underscores, so compare on that form.
+    flat = [name.lower().replace('.', '_') for name in names]
+    joined = '\n'.join(flat)
+
+    if 'double_blocks_' in joined or 'single_blocks_' in joined or 'single_transformer_blocks_' in joined:
+        architecture = 'flux'
+    elif 'transformer_blocks_' in joined and 'img_mod' in joined and 'txt_mod' in joined:
+        architecture = 'qwen'
+    elif 'cross_attn' in joined and ('patch_embedding' in joined or '_ffn_' in joined):
+        architecture = 'wan'
+    elif any(marker in joined for marker in ('label_emb', 'add_embedding', 'lora_te2_', 'text_encoder_2', 'conditioner_embedders_1')):
+        architecture = 'sdxl'
+    else:
+        architecture = None
+
+    if any(marker in joined for marker in ('lora_down', 'lora_up', 'lora_a_', 'lora_b_', 'lokr_', 'hada_')):
+        return 'lora', architecture
+    if architecture is not None or 'diffusion_model_' in joined:
+        return 'model', architecture
+    if any(marker in joined for marker in ('encoder_block_', 'text_model_encoder_', 'model_layers_')):
+        return 'text_encoder', None
+    if any(name.startswith('decoder_') for name in flat) and any(name.startswith('encoder_') for name in flat):
+        return 'vae', None
+    return 'unknown', None
+
+
+def _dominant_dtype_and_parameters(tensors: Iterable[Tuple[str, Tuple[int, ...]]]) -> Tuple[Optional[str], int]:
+    elements_by_dtype: Dict[str, int] = {}
+    for dtype, shape in tensors:
+        elements = 1
+        for dim in shape:
+            elements *= int(dim)
+        elements_by_dtype[dtype] = elements_by_dtype.get(dtype, 0) + elements
+    if not elements_by_dtype:
+        return None, 0
+    dominant = max(elements_by_dtype.items(), key=lambda item: item[1])[0]
+    return dominant, sum(elements_by_dtype.values())
+
+
+def parse_model_metadata(path: str) -> Optional[ModelMetadata]:
+    """Parse ``path`` as safetensors or GGUF; ``None`` for other formats."""
+    file_size = os.path.getsize(path)
+    lower_path = path.lower()
+    if lower_path.endswith(('.safetensors', '.sft')):
+        header = read_safetensors_header(path)
+        file_metadata = header.pop('__metadata__', None) or {}
+        tensors = {name: (info.get('dtype', '?'), tuple(info.get('shape', ())))
+                   for name, info in header.items() if isinstance(info, dict)}
+        kind, architecture = _classify_tensor_names(tensors)
+        hinted = (
+            _architecture_from_hint(file_metadata.get('modelspec.architecture'))
+            or _architecture_from_hint(file_metadata.get('ss_base_model_version'))
+        )
+        file_format = 'safetensors'
+    elif lower_path.endswith('.gguf'):
+        file_metadata, tensors = read_gguf_header(path)
+        kind, architecture = _classify_tensor_names(tensors)
+        raw_architecture = file_metadata.get('general.architecture')
+        hinted = _GGUF_DIFFUSION_ARCHITECTURES.get(str(raw_architecture).lower())
+        if raw_architecture and hinted is None and kind in ('model', 'unknown'):
+            kind = 'text_encoder'
+        file_format = 'gguf'
+    else:
+        return None
+
+    if kind == 'unknown' and hinted is not None:
+        kind = 'model'
+    dtype, parameter_count = _dominant_dtype_and_parameters(tensors.values())
+    return ModelMetadata(
+        format=file_format,
+        kind=kind,
+        architecture=architecture or (hinted if kind in ('model', 'lora') else None),
+        dtype=dtype,
+        parameter_count=parameter_count,
+        file_size=file_size,
+    )
+
+
+class ModelMetadataIndex:
+    """Per-file metadata cache keyed by ``(size, mtime_ns)``, persisted to ``cache_file``."""
+
+    def __init__(self, cache_file: str = METADATA_CACHE_FILE):
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, dict]] = None
+        self._dirty = False
+        self.parsed = 0
+        self.cache_hits = 0
+
+    def _ensure_loaded(self) -> None:
+        with self._lock:
+            if self._entries is not None:
+                return
+            self._entries = {}
+            if self.cache_file and os.path.exists(self.cache_file):
+                try:
+                    with open(self.cache_file, 'r') as f:
+                        data = json.load(f)
+                    if isinstance(data, dict):
+                        self._entries = data
+                except (json.JSONDecodeError, OSError) as exc:
+                    print(f"ModelMetadata Warning: Ignoring unreadable cache {self.cache_file}: {exc}")
+
+    def get(self, path: str) -> Optional[ModelMetadata]:
+        """Metadata for ``path``, or ``None`` if it is missing or cannot be parsed."""
+        self._ensure_loaded()
+        path = os.path.abspath(path)
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return None
+        signature = [stat_result.st_size, stat_result.st_mtime_ns]
+
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is not None and cached.get('signature') == signature:
+                self.cache_hits += 1
+                return ModelMetadata(**cached['metadata']) if cached.get('metadata') else None
+
+        try:
+            metadata = parse_model_metadata(path)
+        except (OSError, ValueError, struct.error) as exc:
+            # Cached as unparseable so the same broken file is not re-read on every scan.
+            print(f"ModelMetadata Warning: Could not read header of {path}: {exc}")
+            metadata = None
+
+        with self._lock:
+            self._entries[path] = {
+                'signature': signature,
+                'metadata': asdict(metadata) if metadata is not None else None,
+            }
+            self._dirty = True
+            self.parsed += 1
+        return metadata
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty or not self.cache_file:
+                return
+            snapshot = dict(self._entries)
+            self._dirty = False
+        try:
+            with open(self.cache_file, 'w') as f:
+                json.dump(snapshot, f)
+        except OSError as exc:
+            print(f"ModelMetadata Warning: Could not write cache {self.cache_file}: {exc}")
+
+
+model_metadata_index = ModelMetadataIndex()
+
+
+def lora_compatibility_issue(lora_path: str, model_family: str) -> Optional[str]:
+    """Explain why the LoRA at ``lora_path`` cannot apply to ``model_family``, if it provably can't."""
+    metadata = model_metadata_index.get(lora_path)
+    model_metadata_index.save()  # no-op unless the header was just parsed
+    if metadata is None or metadata.kind != 'lora' or metadata.architecture is None:
+        return None
+    if metadata.architecture == model_family:
+        return None
+    return f"LoRA is for {metadata.architecture}, not {model_family}"
@@ -5,6 +5,8 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Dict, Mapping, Optional, Tuple
 
+from workflow_builder import WorkflowBuilder, copy_workflow_value
+
 from prompt_templates import (
     # Flux templates
     prompt as flux_prompt_template,
@@ -236,37 +238,65 @@ class ModelSpec:
 
 def _deepcopy_template(template: Mapping[str, dict]) -> dict:
     """Create a JSON-safe copy of a template mapping."""
-    import json
-
-    return json.loads(json.dumps(template))
+    return copy_workflow_value(template)
 
 
-def copy_generation_template(spec: GenerationSpec, *, is_img2img: bool) -> dict:
-    source = spec.img2img_template if is_img2img else spec.text2img_template
-    return _deepcopy_template(source)
+def _generation_source(spec: GenerationSpec, is_img2img: bool) -> Mapping[str, dict]:
+    return spec.img2img_template if is_img2img else spec.text2img_template
 
 
-def copy_variation_template(spec: VariationSpec, *, strength: str = "default") -> dict:
+def _variation_source(spec: VariationSpec, strength: str) -> Mapping[str, dict]:
     template_map = spec.templates
     if strength in template_map:
-        template = template_map[strength]
-    elif "default" in template_map:
-        template = template_map["default"]
-    else:
-        template = next(iter(template_map.values()))
-    return _deepcopy_template(template)
+        return template_map[strength]
+    if "default" in template_map:
+        return template_map["default"]
+    return next(iter(template_map.values()))
 
 
-def copy_upscale_template(spec: Optional[UpscaleSpec]) -> dict:
+def _upscale_source(spec: Optional[UpscaleSpec]) -> Mapping[str, dict]:
     if spec is None:
         raise ValueError("Requested model does not define an upscale template")
-    return _deepcopy_template(spec.template)
+    return spec.template
 
 
-def copy_animation_template(spec: ModelSpec) -> dict:
+def _animation_source(spec: ModelSpec) -> Mapping[str, dict]:
     if not spec.animation_template:
         raise ValueError(f"Model '{spec.key}' does not define an animation template")
-    return _deepcopy_template(spec.animation_template)
+    return spec.animation_template
+
+
+def copy_generation_template(spec: GenerationSpec, *, is_img2img: bool) -> dict:
+    return _deepcopy_template(_generation_source(spec, is_img2img))
+
+
+def copy_variation_template(spec: VariationSpec, *, strength: str = "default") -> dict:
+    return _deepcopy_template(_variation_source(spec, strength))
+
+
+def copy_upscale_template(spec: Optional[UpscaleSpec]) -> dict:
+    return _deepcopy_template(_upscale_source(spec))
+
+
+def copy_animation_template(spec: ModelSpec) -> dict:
+    return _deepcopy_template(_animation_source(spec))
+
+
+def generation_workflow_builder(spec: GenerationSpec, *, is_img2img: bool) -> WorkflowBuilder:
+    """Copy-on-write builder over the generation template; call ``materialize()`` when done."""
+    return WorkflowBuilder(_generation_source(spec, is_img2img))
+
+
+def variation_workflow_builder(spec: VariationSpec, *, strength: str = "default") -> WorkflowBuilder:
+    return WorkflowBuilder(_variation_source(spec, strength))
+
+
+def upscale_workflow_builder(spec: Optional[UpscaleSpec]) -> WorkflowBuilder:
+    return WorkflowBuilder(_upscale_source(spec))
+
+
+def animation_workflow_builder(spec: ModelSpec) -> WorkflowBuilder:
+    return WorkflowBuilder(_animation_source(spec))
 
 
 MODEL_REGISTRY: Dict[str, ModelSpec] = {
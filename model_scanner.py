@@ -1,9 +1,175 @@
 import os
 import json
 import requests
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from model_catalog import model_catalog
+from model_metadata import model_metadata_index
 
 SPECIAL_MODEL_EXTENSIONS = (".safetensors", ".ckpt", ".pth", ".gguf")
+SCAN_CACHE_FILE = 'model_scan_cache.json'
+
+
+class ModelDirectoryScanner:
+    """Recursive ``os.scandir`` walker with a per-directory cache.
+
+    Each directory's file list (name, size and mtime) and subdirectory names
+    are cached under its ``st_mtime_ns``.  A directory's mtime changes whenever
+    an entry is added, removed or renamed in it, so on rescans unchanged
+    directories cost a single ``stat`` instead of a listing; on NAS mounts that
+    is most of the startup time.  Overwriting a file in place does not touch
+    the directory, so callers that use sizes re-stat the matching files of a
+    cached listing.  The cache is persisted to ``cache_file``.
+    """
+
+    def __init__(self, cache_file: str = SCAN_CACHE_FILE, max_workers: int = 4):
+        self.cache_file = cache_file
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._dirs = None
+        self._dirty = False
+        self.dirs_listed = 0
+        self.dirs_from_cache = 0
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if self._dirs is not None:
+                return
+            self._dirs = {}
+            if self.cache_file and os.path.exists(self.cache_file):
+                try:
+                    with open(self.cache_file, 'r') as f:
+                        data = json.load(f)
+                    if isinstance(data, dict):
+                        self._dirs = data
+                except (json.JSONDecodeError, OSError) as exc:
+                    print(f"ModelScanner Warning: Ignoring unreadable scan cache {self.cache_file}: {exc}")
+
+    def save(self):
+        with self._lock:
+            if not self._dirty or not self.cache_file:
+                return
+            snapshot = dict(self._dirs)
+            self._dirty = False
+        try:
+            with open(self.cache_file, 'w') as f:
+                json.dump(snapshot, f)
+        except OSError as exc:
+            print(f"ModelScanner Warning: Could not write scan cache {self.cache_file}: {exc}")
+
+    def _list_directory(self, path: str) -> tuple[dict, bool]:
+        """The listing of ``path`` and whether it came from the cache."""
+        mtime_ns = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._dirs.get(path)
+            # Entries written before file mtimes were recorded hold [name, size] only.
+            if cached is not None and cached.get('mtime_ns') == mtime_ns and all(len(f) == 3 for f in cached['files']):
+                self.dirs_from_cache += 1
+                return cached, True
+
+        files = []
+        subdirs = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        if not entry.name.startswith('.'):
+                            subdirs.append(entry.name)
+                    elif entry.is_file():
+                        stat = entry.stat()
+                        files.append([entry.name, stat.st_size, stat.st_mtime_ns])
+                except OSError as exc:
+                    print(f"ModelScanner Error accessing {entry.path}: {exc}")
+        listing = {'mtime_ns': mtime_ns, 'files': files, 'dirs': subdirs}
+        with self._lock:
+            self._dirs[path] = listing
+            self._dirty = True
+            self.dirs_listed += 1
+        return listing, False
+
+    def _refresh_file(self, path: str, file_entry: list) -> None:
+        """Update a cached ``[name, size, mtime_ns]`` entry if the file was overwritten in place."""
+        try:
+            stat = os.stat(os.path.join(path, file_entry[0]))
+        except OSError:
+            return
+        if (stat.st_size, stat.st_mtime_ns) != (file_entry[1], file_entry[2]):
+            with self._lock:
+                file_entry[1], file_entry[2] = stat.st_size, stat.st_mtime_ns
+                self._dirty = True
+
+    def scan_tree(self, root: str, extensions=SPECIAL_MODEL_EXTENSIONS, verify_sizes: bool = True) -> list[tuple[str, int]]:
+        """``(relative_path, size)`` of matching files under ``root``, including subfolders.
+
+        Paths use the OS separator, the same way ComfyUI reports nested models.
+        With ``verify_sizes`` the matching files of cached listings are
+        re-stat'ed so sizes are current; callers that only need paths skip it.
+        """
+        self._ensure_loaded()
+        root_abs = os.path.abspath(root)
+        found = []
+        seen_real_paths = set()
+        pending = [(root_abs, '')]
+        while pending:
+            path, relative_dir = pending.pop()
+            real_path = os.path.realpath(path)
+            if real_path in seen_real_paths:
+                continue
+            seen_real_paths.add(real_path)
+            try:
+                listing, from_cache = self._list_directory(path)
+            except OSError as exc:
+                print(f"ModelScanner Error accessing directory {path}: {exc}")
+                continue
+            for file_entry in listing['files']:
+                name = file_entry[0]
+                if name.lower().endswith(extensions):
+                    if from_cache and verify_sizes:
+                        self._refresh_file(path, file_entry)
+                    found.append((os.path.join(relative_dir, name) if relative_dir else name, file_entry[1]))
+            for subdir in listing['dirs']:
+                pending.append((os.path.join(path, subdir), os.path.join(relative_dir, subdir) if relative_dir else subdir))
+        found.sort(key=lambda item: item[0].lower())
+        return found
+
+    def prefetch(self, roots) -> None:
+        """Walk several model roots concurrently so later per-list scans hit the cache."""
+        unique_roots = [root for root in dict.fromkeys(r for r in roots if r) if os.path.isdir(root)]
+        if not unique_roots:
+            return
+        self._ensure_loaded()
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(unique_roots))) as pool:
+            list(pool.map(lambda root: self.scan_tree(root, extensions=('',), verify_sizes=False), unique_roots))
+
+
+directory_scanner = ModelDirectoryScanner()
+
+
+def _scan_model_files(directory_path: str, extensions=SPECIAL_MODEL_EXTENSIONS) -> list[str]:
+    return [relative_path for relative_path, _ in directory_scanner.scan_tree(directory_path, extensions, verify_sizes=False)]
+
+
+def save_scan_caches() -> None:
+    """Persist the directory listing and header metadata caches."""
+    directory_scanner.save()
+    model_metadata_index.save()
+
+
+def _write_catalog_if_changed(output_file: str, payload: dict) -> bool:
+    """Write ``payload`` unless the file already holds exactly that content."""
+    serialized = json.dumps(payload, indent=2)
+    try:
+        with open(output_file, 'r') as f:
+            if f.read() == serialized:
+                return False
+    except OSError:
+        pass
+    with open(output_file, 'w') as f:
+        f.write(serialized)
+    model_catalog.invalidate(output_file)
+    return True
 
 
 def _load_existing_favorites_list(output_file):
@@ -33,8 +199,52 @@ def _load_existing_favorites_list(output_file):
     return favorites
 
 
-def _scan_keyword_models(directory_path: str, include_keywords: tuple[str, ...], *, exclude_keywords: tuple[str, ...] = ()) -> list[str]:
-    """Scan a directory for model files whose names contain the provided keywords."""
+def prefetch_model_directories(config_path: str) -> None:
+    """Walk every configured model/encoder folder in parallel to warm the scan cache.
+
+    The per-list updaters that run afterwards then mostly read cached listings
+    instead of walking overlapping folders one after another.
+    """
+    try:
+        with open(config_path, 'r') as f:
+            config = json.load(f)
+    except (OSError, json.JSONDecodeError) as exc:
+        print(f"ModelScanner Error reading config file {config_path} for prefetch: {exc}")
+        return
+    roots = []
+    for section_name, keys in (
+        ('MODELS', ('MODEL_FILES', 'CHECKPOINTS_FOLDER', 'QWEN_MODELS', 'QWEN_EDIT_MODELS', 'WAN_MODELS')),
+        ('CLIP', ('CLIP_FILES',)),
+        ('TEXT_ENCODERS', ('QWEN_TEXT_ENCODERS', 'WAN_TEXT_ENCODERS', 'WAN_VISION_ENCODERS')),
+    ):
+        section = config.get(section_name)
+        if isinstance(section, dict):
+            roots.extend(section.get(key) for key in keys if isinstance(section.get(key), str))
+    directory_scanner.prefetch(roots)
+
+
+def _header_matches(path: str, architecture: str) -> bool | None:
+    """Whether the file header says ``path`` is a ``architecture`` model; ``None`` if it can't tell."""
+    metadata = model_metadata_index.get(path)
+    if metadata is None or metadata.kind == 'unknown' or (metadata.kind == 'model' and not metadata.architecture):
+        return None
+    return metadata.kind == 'model' and metadata.architecture == architecture
+
+
+def _scan_keyword_models(
+    directory_path: str,
+    include_keywords: tuple[str, ...],
+    *,
+    exclude_keywords: tuple[str, ...] = (),
+    architecture: str | None = None,
+) -> list[str]:
+    """Scan a directory tree for model files of one family.
+
+    When ``architecture`` is given, files whose header identifies them are
+    classified by that (so a misnamed or misfiled model lands in the right
+    list and LoRAs/encoders are left out); the path keywords only decide for
+    files without a readable header, such as ``.ckpt``.
+    """
 
     if not directory_path or not os.path.exists(directory_path):
         print(f"ModelScanner Warning: Directory does not exist for keyword scan: {directory_path}")
@@ -43,16 +253,18 @@ def _scan_keyword_models(directory_path: str, include_keywords: tuple[str, ...],
     discovered: list[str] = []
 
     try:
-        for filename in os.listdir(directory_path):
-            lower_name = filename.lower()
-            if not lower_name.endswith(SPECIAL_MODEL_EXTENSIONS):
-                continue
+        for relative_path in _scan_model_files(directory_path):
+            if architecture is not None:
+                header_match = _header_matches(os.path.join(directory_path, relative_path), architecture)
+                if header_match is not None:
+                    if header_match:
+                        discovered.append(relative_path)
+                    continue
+            lower_name = relative_path.lower()
             if exclude_keywords and any(term in lower_name for term in exclude_keywords):
                 continue
             if any(keyword in lower_name for keyword in include_keywords):
-                discovered.append(filename)
-    except OSError as exc:
-        print(f"ModelScanner Error accessing directory {directory_path}: {exc}")
+                discovered.append(relative_path)
     except Exception as exc:  # pragma: no cover - defensive logging only
         print(f"ModelScanner Unexpected error during keyword scan ({directory_path}): {exc}")
         traceback.print_exc()
@@ -61,7 +273,7 @@ def _scan_keyword_models(directory_path: str, include_keywords: tuple[str, ...],
     return discovered
 
 def scan_models(model_directory):
-    """Scan for Flux model files in the specified directory."""
+    """Scan for Flux model files, leaving out files whose header says they are not Flux models."""
     models = {
         "safetensors": [],
         "sft": [],
@@ -73,7 +285,9 @@ def scan_models(model_directory):
         return models
 
     try:
-        for filename in os.listdir(model_directory):
+        for filename in _scan_model_files(model_directory, (".safetensors", ".sft", ".gguf")):
+            if _header_matches(os.path.join(model_directory, filename), 'flux') is False:
+                continue
             lower_filename = filename.lower()
             if lower_filename.endswith(".safetensors"):
                 models["safetensors"].append(filename)
@@ -81,8 +295,6 @@ def scan_models(model_directory):
                 models["sft"].append(filename)
             elif lower_filename.endswith(".gguf"):
                 models["gguf"].append(filename)
-    except OSError as e:
-        print(f"ModelScanner Error accessing Flux model directory {model_directory}: {e}")
     except Exception as e:
         print(f"ModelScanner Unexpected error scanning Flux models: {e}")
         traceback.print_exc()
@@ -125,9 +337,10 @@ def update_models_list(config_path, output_file):
         models['favorites'] = current_favorites
 
         try:
-            with open(output_file, 'w') as f:
-                json.dump(models, f, indent=2)
-            print(f"ModelScanner: Successfully updated Flux models list in {output_file}")
+            if _write_catalog_if_changed(output_file, models):
+                print(f"ModelScanner: Successfully updated Flux models list in {output_file}")
+            else:
+                print(f"ModelScanner: Flux models list unchanged, kept {output_file}")
         except OSError as e:
             print(f"ModelScanner Error writing Flux models file {output_file}: {e}")
         except Exception as e_write:
@@ -141,7 +354,7 @@ def update_models_list(config_path, output_file):
 
 
 def scan_checkpoints(checkpoint_directory):
-    """Scan for SDXL checkpoint files in the specified directory."""
+    """Scan for SDXL checkpoint files, leaving out files whose header says they are not SDXL models."""
     checkpoints = {
         "checkpoints": []
     }
@@ -153,12 +366,10 @@ def scan_checkpoints(checkpoint_directory):
         return checkpoints
 
     try:
-        for filename in os.listdir(checkpoint_directory):
-            lower_filename = filename.lower()
-            if any(lower_filename.endswith(ext) for ext in checkpoint_extensions):
-                checkpoints["checkpoints"].append(filename)
-    except OSError as e:
-        print(f"ModelScanner Error accessing SDXL checkpoint directory {checkpoint_directory}: {e}")
+        checkpoints["checkpoints"].extend(
+            filename for filename in _scan_model_files(checkpoint_directory, tuple(checkpoint_extensions))
+            if _header_matches(os.path.join(checkpoint_directory, filename), 'sdxl') is not False
+        )
     except Exception as e:
         print(f"ModelScanner Unexpected error scanning SDXL checkpoints: {e}")
         traceback.print_exc()
@@ -186,6 +397,7 @@ def update_qwen_models_list(config_path, output_file):
             checkpoint_directory,
             include_keywords=("qwen",),
             exclude_keywords=("vae", "clip", "vision"),
+            architecture="qwen",
         )
 
         payload = {
@@ -194,9 +406,10 @@ def update_qwen_models_list(config_path, output_file):
         }
 
         try:
-            with open(output_file, 'w') as f:
-                json.dump(payload, f, indent=2)
-            print(f"ModelScanner: Successfully updated Qwen models list in {output_file}")
+            if _write_catalog_if_changed(output_file, payload):
+                print(f"ModelScanner: Successfully updated Qwen models list in {output_file}")
+            else:
+                print(f"ModelScanner: Qwen models list unchanged, kept {output_file}")
         except OSError as exc:
             print(f"ModelScanner Error writing Qwen models file {output_file}: {exc}")
         except Exception as exc:  # pragma: no cover - defensive logging only
@@ -234,6 +447,7 @@ def update_qwen_edit_models_list(config_path, output_file):
             checkpoint_directory,
             include_keywords=("qwen",),
             exclude_keywords=("vae", "clip", "vision"),
+            architecture="qwen",
         )
 
         edit_models = [
@@ -251,9 +465,10 @@ def update_qwen_edit_models_list(config_path, output_file):
         }
 
         try:
-            with open(output_file, 'w') as f:
-                json.dump(payload, f, indent=2)
-            print(f"ModelScanner: Successfully updated Qwen Edit models list in {output_file}")
+            if _write_catalog_if_changed(output_file, payload):
+                print(f"ModelScanner: Successfully updated Qwen Edit models list in {output_file}")
+            else:
+                print(f"ModelScanner: Qwen Edit models list unchanged, kept {output_file}")
         except OSError as exc:
             print(f"ModelScanner Error writing Qwen Edit models file {output_file}: {exc}")
         except Exception as exc:  # pragma: no cover - defensive logging only
@@ -285,6 +500,7 @@ def update_wan_models_list(config_path, output_file):
             checkpoint_directory,
             include_keywords=("wan",),
             exclude_keywords=("vae", "vision", "clip"),
+            architecture="wan",
         )
 
         video_models = [
@@ -301,9 +517,10 @@ def update_wan_models_list(config_path, output_file):
         }
 
         try:
-            with open(output_file, 'w') as f:
-                json.dump(payload, f, indent=2)
-            print(f"ModelScanner: Successfully updated WAN models list in {output_file}")
+            if _write_catalog_if_changed(output_file, payload):
+                print(f"ModelScanner: Successfully updated WAN models list in {output_file}")
+            else:
+                print(f"ModelScanner: WAN models list unchanged, kept {output_file}")
         except OSError as exc:
             print(f"ModelScanner Error writing WAN models file {output_file}: {exc}")
         except Exception as exc:  # pragma: no cover - defensive logging only
@@ -346,9 +563,10 @@ def update_checkpoints_list(config_path, output_file):
         checkpoints_data_scanned['favorites'] = current_favorites
 
         try:
-            with open(output_file, 'w') as f:
-                json.dump(checkpoints_data_scanned, f, indent=2)
-            print(f"ModelScanner: Successfully updated SDXL checkpoints list in {output_file}")
+            if _write_catalog_if_changed(output_file, checkpoints_data_scanned):
+                print(f"ModelScanner: Successfully updated SDXL checkpoints list in {output_file}")
+            else:
+                print(f"ModelScanner: SDXL checkpoints list unchanged, kept {output_file}")
         except OSError as e:
             print(f"ModelScanner Error writing SDXL checkpoints file {output_file}: {e}")
         except Exception as e_write:
@@ -392,31 +610,18 @@ def scan_clip_files(config_path, output_file):
             if not directory or not os.path.exists(directory):
                 return
             try:
-                for filename in os.listdir(directory):
-                    if filename.lower().endswith(".safetensors"):
-                        target_list.append(filename)
-            except OSError as exc:
-                print(f"ModelScanner Error accessing text encoder directory {directory}: {exc}")
+                target_list.extend(_scan_model_files(directory, (".safetensors",)))
             except Exception as exc:  # pragma: no cover - defensive logging only
                 print(f"ModelScanner Unexpected error scanning text encoder directory {directory}: {exc}")
                 traceback.print_exc()
 
         try:
-            for filename in os.listdir(clip_directory):
-                if filename.lower().endswith(".safetensors"):
-                    file_path = os.path.join(clip_directory, filename)
-                    try:
-                        file_size = os.path.getsize(file_path) / (1024 * 1024 * 1024)
-                        if file_size >= 2.0:
-                            clip_files["t5"].append(filename)
-                        else:
-                            clip_files["clip_L"].append(filename)
-                    except OSError as e:
-                        print(f"ModelScanner Error accessing file {file_path}: {e}")
-                    except Exception as e_size:
-                         print(f"ModelScanner Unexpected error getting size for {file_path}: {e_size}")
-        except OSError as e:
-            print(f"ModelScanner Error listing CLIP directory: {e}")
+            for filename, size_bytes in directory_scanner.scan_tree(clip_directory, (".safetensors",)):
+                file_size = size_bytes / (1024 * 1024 * 1024)
+                if file_size >= 2.0:
+                    clip_files["t5"].append(filename)
+                else:
+                    clip_files["clip_L"].append(filename)
         except Exception as e_list:
              print(f"ModelScanner Unexpected error listing CLIP directory: {e_list}")
              traceback.print_exc()
@@ -456,9 +661,10 @@ def scan_clip_files(config_path, output_file):
         clip_files['favorites'] = current_favorites
 
         try:
-            with open(output_file, 'w') as f:
-                json.dump(clip_files, f, indent=2)
-            print(f"ModelScanner: Successfully updated CLIP list in {output_file}")
+            if _write_catalog_if_changed(output_file, clip_files):
+                print(f"ModelScanner: Successfully updated CLIP list in {output_file}")
+            else:
+                print(f"ModelScanner: CLIP list unchanged, kept {output_file}")
         except OSError as e:
             print(f"ModelScanner Error writing CLIP file {output_file}: {e}")
         except Exception as e_write:
@@ -523,10 +729,12 @@ def verify_models_exist():
 
 if __name__ == "__main__":
     print("Running Model Scanner directly...")
+    prefetch_model_directories('config.json')
     update_models_list('config.json', 'modelslist.json')
     update_checkpoints_list('config.json', 'checkpointslist.json')
     update_qwen_models_list('config.json', 'qwenmodels.json')
     update_qwen_edit_models_list('config.json', 'qweneditmodels.json')
     update_wan_models_list('config.json', 'wanmodels.json')
     scan_clip_files('config.json', 'cliplist.json')
+    save_scan_caches()
     print("Model Scanner finished.")
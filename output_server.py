@@ -0,0 +1,203 @@
+"""Signed, expiring download links for outputs too large to attach on Discord.
+
+A small aiohttp app, separate from the token-protected internal API, serves
+files from the configured ``OUTPUTS`` folders.  Every URL carries an expiry
+timestamp and an HMAC signature over the folder key, relative path and expiry,
+so only links minted by the bot work and they stop working after
+``OUTPUT_SERVER.LINK_TTL_HOURS``.  Responses are ``web.FileResponse`` objects,
+which give us HTTP Range requests (video seeking, resumable downloads) and the
+kernel ``sendfile`` path for free.
+"""
+from __future__ import annotations
+
+import hashlib
+import hmac
+import os
+import secrets
+import time
+import traceback
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+from aiohttp import web
+
+from bot_config_loader import config
+from utils.net_utils import is_loopback_url
+
+
+_DEFAULT_PORT = 8190
+_DEFAULT_TTL_HOURS = 24.0
+
+
+def _read_output_server_settings() -> dict:
+    section = config.get('OUTPUT_SERVER', {})
+    if not isinstance(section, dict):
+        section = {}
+    host = str(section.get('HOST') or '127.0.0.1')
+    try:
+        port = int(section.get('PORT', _DEFAULT_PORT))
+    except (TypeError, ValueError):
+        print(f"Warning: Invalid OUTPUT_SERVER.PORT '{section.get('PORT')}'. Using {_DEFAULT_PORT}.")
+        port = _DEFAULT_PORT
+    try:
+        ttl_hours = max(0.01, float(section.get('LINK_TTL_HOURS', _DEFAULT_TTL_HOURS)))
+    except (TypeError, ValueError):
+        print(f"Warning: Invalid OUTPUT_SERVER.LINK_TTL_HOURS '{section.get('LINK_TTL_HOURS')}'. Using {_DEFAULT_TTL_HOURS}.")
+        ttl_hours = _DEFAULT_TTL_HOURS
+    secret = str(section.get('SECRET') or '')
+    return {
+        'enabled': bool(section.get('ENABLED', False)),
+        'host': host,
+        'port': port,
+        'public_base_url': str(section.get('PUBLIC_BASE_URL') or f"http://{host}:{port}").rstrip('/'),
+        'ttl_seconds': int(ttl_hours * 3600),
+        'secret': secret,
+    }
+
+
+class OutputLinkSigner:
+    def __init__(self, output_roots: dict, secret: str, public_base_url: str, ttl_seconds: int):
+        self.output_roots = {
+            key: os.path.realpath(path)
+            for key, path in (output_roots or {}).items()
+            if isinstance(path, str) and path
+        }
+        self._secret = secret.encode('utf-8')
+        self.public_base_url = public_base_url.rstrip('/')
+        self.ttl_seconds = ttl_seconds
+
+    def _signature(self, root_key: str, relative_path: str, expires: int) -> str:
+        payload = f"{root_key}\n{relative_path}\n{expires}".encode('utf-8')
+        return hmac.new(self._secret, payload, hashlib.sha256).hexdigest()
+
+    def locate(self, file_path: str) -> Optional[Tuple[str, str]]:
+        """Return ``(root_key, relative_path)`` for a file inside an OUTPUTS folder."""
+        real_path = os.path.realpath(file_path)
+        for root_key, root_path in self.output_roots.items():
+            try:
+                if os.path.commonpath([real_path, root_path]) != root_path:
+                    continue
+            except ValueError:
+                continue
+            relative_path = os.path.relpath(real_path, root_path).replace(os.sep, '/')
+            return root_key, relative_path
+        return None
+
+    def sign_url(self, file_path: str, now: Optional[float] = None) -> Optional[str]:
+        located = self.locate(file_path)
+        if located is None:
+            return None
+        root_key, relative_path = located
+        expires = int((now if now is not None else time.time()) + self.ttl_seconds)
+        signature = self._signature(root_key, relative_path, expires)
+        return (
+            f"{self.public_base_url}/files/{quote(root_key)}/{quote(relative_path)}"
+            f"?exp={expires}&sig={signature}"
+        )
+
+    def resolve(self, root_key: str, relative_path: str, expires: str, signature: str, now: Optional[float] = None) -> Optional[str]:
+        """Validate a signed request and return the absolute file path, or ``None``."""
+        try:
+            expires_int = int(expires)
+        except (TypeError, ValueError):
+            return None
+        if expires_int < (now if now is not None else time.time()):
+            return None
+        expected = self._signature(root_key, relative_path, expires_int)
+        if not hmac.compare_digest(expected, signature or ''):
+            return None
+
+        root_path = self.output_roots.get(root_key)
+        if not root_path:
+            return None
+        candidate = os.path.realpath(os.path.join(root_path, *relative_path.split('/')))
+        if os.path.commonpath([candidate, root_path]) != root_path or not os.path.isfile(candidate):
+            return None
+        return candidate
+
+
+async def handle_get_output_file(request):
+    signer: OutputLinkSigner = request.app['signer']
+    file_path = signer.resolve(
+        request.match_info.get('root_key', ''),
+        request.match_info.get('relative_path', ''),
+        request.query.get('exp'),
+        request.query.get('sig'),
+    )
+    if not file_path:
+        raise web.HTTPNotFound()
+    return web.FileResponse(
+        file_path,
+        headers={
+            'Cache-Control': f"private, max-age={signer.ttl_seconds}",
+            'Content-Disposition': f"inline; filename=\"{os.path.basename(file_path)}\"",
+        },
+    )
+
+
+class OutputServer:
+    def __init__(self, settings: Optional[dict] = None):
+        self.settings = settings if settings is not None else _read_output_server_settings()
+        secret = self.settings['secret']
+        if self.settings['enabled'] and not secret:
+            print("Warning: OUTPUT_SERVER.SECRET is empty. Using a random key; download links will stop working after a restart.")
+            secret = secrets.token_hex(32)
+        self.signer = OutputLinkSigner(
+            config.get('OUTPUTS', {}), secret or secrets.token_hex(32),
+            self.settings['public_base_url'], self.settings['ttl_seconds'],
+        )
+        self.runner = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.settings['enabled'])
+
+    @property
+    def is_running(self) -> bool:
+        return self.runner is not None
+
+    def link_for(self, file_path: str) -> Optional[str]:
+        if not self.is_running:
+            return None
+        return self.signer.sign_url(file_path)
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app['signer'] = self.signer
+        app.add_routes([web.get('/files/{root_key}/{relative_path:.+}', handle_get_output_file)])
+        return app
+
+    async def start(self) -> None:
+        if not self.enabled or self.runner is not None:
+            return
+        if is_loopback_url(self.settings['public_base_url']):
+            print(
+                f"Warning: OUTPUT_SERVER.PUBLIC_BASE_URL is '{self.settings['public_base_url']}', which Discord users cannot open. "
+                "Set it to an address they can reach. Output file server not started; oversized outputs get the usual error message."
+            )
+            return
+        runner = web.AppRunner(self.create_app())
+        await runner.setup()
+        site = web.TCPSite(runner, self.settings['host'], self.settings['port'])
+        try:
+            await site.start()
+            self.runner = runner
+            print(f"Output file server started on http://{self.settings['host']}:{self.settings['port']} (links: {self.settings['public_base_url']})")
+        except Exception as e:
+            print(f"ERROR: Failed to start output file server: {e}")
+            traceback.print_exc()
+            await runner.cleanup()
+
+    async def stop(self) -> None:
+        if self.runner is None:
+            return
+        try:
+            await self.runner.cleanup()
+            print("Output file server shut down.")
+        except Exception as e_cleanup:
+            print(f"Warning: Error while cleaning up output file server: {e_cleanup}")
+        finally:
+            self.runner = None
+
+
+output_server = OutputServer()
@@ -0,0 +1,281 @@
+"""Coalescing scheduler for Discord progress-message edits.
+
+ComfyUI emits a progress event for every sampler step.  Editing the status
+message for each of them (plus fetching the channel and message first) burns
+through Discord's per-channel rate-limit bucket and competes with result
+uploads.  :class:`ProgressEditScheduler` funnels those edits so that:
+
+* only the latest pending state per message is kept (latest-value-wins),
+* the message object is fetched once and then reused for every edit,
+* each channel is edited at most once per ``min_interval`` seconds,
+* a 429 pauses the channel for the ``Retry-After`` reported by Discord and
+  the failed edit is merged with anything queued for the message meanwhile,
+* final-result edits call :meth:`ProgressEditScheduler.finalize`, which drops
+  pending progress for that message and waits for any in-flight edit so a
+  stale progress bar never overwrites the finished result.
+"""
+from __future__ import annotations
+
+import asyncio
+import re
+import traceback
+from collections import OrderedDict
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Any, Callable, Dict, Optional
+
+import discord
+
+from bot_config_loader import config
+
+
+STATUS_LINE_PATTERN = re.compile(r'> \*\*Status:\*\*.*', re.MULTILINE)
+
+_DEFAULT_MIN_EDIT_INTERVAL = 1.5
+_MESSAGE_CACHE_LIMIT = 256
+_FINALIZED_HISTORY_LIMIT = 512
+
+
+def _read_min_edit_interval() -> float:
+    section = config.get('PROGRESS_UPDATES', {})
+    raw_value = section.get('MIN_EDIT_INTERVAL', _DEFAULT_MIN_EDIT_INTERVAL) if isinstance(section, dict) else _DEFAULT_MIN_EDIT_INTERVAL
+    try:
+        return max(0.0, float(raw_value))
+    except (TypeError, ValueError):
+        print(f"Warning: Invalid PROGRESS_UPDATES.MIN_EDIT_INTERVAL '{raw_value}'. Using {_DEFAULT_MIN_EDIT_INTERVAL}s.")
+        return _DEFAULT_MIN_EDIT_INTERVAL
+
+
+def _retry_after_from_error(exc: Exception) -> Optional[float]:
+    """Return the cool-down Discord asked for in a rate-limit error, if any."""
+    retry_after = getattr(exc, 'retry_after', None)
+    if retry_after is not None:
+        try:
+            return float(retry_after)
+        except (TypeError, ValueError):
+            pass
+
+    response = getattr(exc, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    for header_name in ('Retry-After', 'X-RateLimit-Reset-After'):
+        header_value = headers.get(header_name)
+        if header_value is None:
+            continue
+        try:
+            return float(header_value)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+@dataclass
+class _CachedMessage:
+    message: Any
+    content: Optional[str]
+
+
+@dataclass
+class _PendingEdit:
+    status_line: Optional[str] = None
+    preview_bytes: Optional[bytes] = None
+    preview_filename: Optional[str] = None
+    on_missing: Optional[Callable[[], None]] = None
+
+    def merge(self, newer: "_PendingEdit") -> None:
+        if newer.status_line is not None:
+            self.status_line = newer.status_line
+        if newer.preview_bytes is not None:
+            self.preview_bytes = newer.preview_bytes
+            self.preview_filename = newer.preview_filename
+        if newer.on_missing is not None:
+            self.on_missing = newer.on_missing
+
+
+class ProgressEditScheduler:
+    def __init__(self, min_interval: Optional[float] = None):
+        self.min_interval = _read_min_edit_interval() if min_interval is None else max(0.0, float(min_interval))
+        self._pending: Dict[int, "OrderedDict[int, _PendingEdit]"] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._channel_ready_at: Dict[int, float] = {}
+        self._messages: "OrderedDict[int, _CachedMessage]" = OrderedDict()
+        self._edit_locks: Dict[int, asyncio.Lock] = {}
+        self._finalized: "OrderedDict[int, None]" = OrderedDict()
+
+    # ------------------------------------------------------------------
+    def submit(
+        self,
+        bot,
+        channel_id,
+        message_id,
+        *,
+        status_line: Optional[str] = None,
+        preview_bytes: Optional[bytes] = None,
+        preview_filename: Optional[str] = None,
+        on_missing: Optional[Callable[[], None]] = None,
+    ) -> bool:
+        """Queue the latest progress state for a message.
+
+        Returns ``False`` when the update was dropped because the message has
+        already received its final result.
+        """
+        channel_id = int(channel_id)
+        message_id = int(message_id)
+        if message_id in self._finalized:
+            return False
+        if status_line is None and preview_bytes is None:
+            return True
+
+        update = _PendingEdit(status_line, preview_bytes, preview_filename, on_missing)
+        channel_queue = self._pending.setdefault(channel_id, OrderedDict())
+        existing = channel_queue.get(message_id)
+        if existing is not None:
+            existing.merge(update)
+        else:
+            channel_queue[message_id] = update
+
+        worker = self._workers.get(channel_id)
+        if worker is None or worker.done():
+            self._workers[channel_id] = asyncio.get_running_loop().create_task(self._run_channel(bot, channel_id))
+        return True
+
+    async def finalize(self, message_id) -> None:
+        """Give the final-result edit priority over any queued progress edit."""
+        if message_id is None:
+            return
+        try:
+            message_id = int(message_id)
+        except (TypeError, ValueError):
+            return
+
+        self._finalized[message_id] = None
+        self._finalized.move_to_end(message_id)
+        while len(self._finalized) > _FINALIZED_HISTORY_LIMIT:
+            self._finalized.popitem(last=False)
+
+        for channel_queue in self._pending.values():
+            channel_queue.pop(message_id, None)
+
+        lock = self._edit_locks.get(message_id)
+        if lock is not None:
+            async with lock:
+                pass
+        self.forget(message_id)
+
+    def forget(self, message_id) -> None:
+        message_id = int(message_id)
+        self._messages.pop(message_id, None)
+        lock = self._edit_locks.get(message_id)
+        if lock is not None and not lock.locked():
+            self._edit_locks.pop(message_id, None)
+
+    def pending_count(self) -> int:
+        return sum(len(channel_queue) for channel_queue in self._pending.values())
+
+    # ------------------------------------------------------------------
+    async def _run_channel(self, bot, channel_id: int) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                channel_queue = self._pending.get(channel_id)
+                if not channel_queue:
+                    break
+                delay = self._channel_ready_at.get(channel_id, 0.0) - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    continue
+                message_id, pending_edit = channel_queue.popitem(last=False)
+                await self._apply_edit(bot, channel_id, message_id, pending_edit)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e_worker:
+            print(f"ProgressScheduler: Worker for channel {channel_id} failed: {e_worker}")
+            traceback.print_exc()
+        finally:
+            if not self._pending.get(channel_id):
+                self._pending.pop(channel_id, None)
+            if self._workers.get(channel_id) is asyncio.current_task():
+                self._workers.pop(channel_id, None)
+
+    async def _apply_edit(self, bot, channel_id: int, message_id: int, pending_edit: _PendingEdit) -> None:
+        loop = asyncio.get_running_loop()
+        lock = self._edit_locks.setdefault(message_id, asyncio.Lock())
+        async with lock:
+            if message_id in self._finalized:
+                return
+            try:
+                cached = await self._resolve_message(bot, channel_id, message_id)
+            except discord.errors.NotFound:
+                self.forget(message_id)
+                if pending_edit.on_missing:
+                    pending_edit.on_missing()
+                return
+            except Exception as e_fetch:
+                print(f"ProgressScheduler: Error fetching message {message_id} in channel {channel_id}: {e_fetch}")
+                return
+
+            edit_kwargs = {}
+            if pending_edit.status_line is not None and cached.content is not None:
+                new_content = STATUS_LINE_PATTERN.sub(lambda _match: pending_edit.status_line, cached.content)
+                if new_content != cached.content:
+                    edit_kwargs['content'] = new_content
+            if pending_edit.preview_bytes is not None:
+                edit_kwargs['attachments'] = [
+                    discord.File(BytesIO(pending_edit.preview_bytes), filename=pending_edit.preview_filename or "preview.jpeg")
+                ]
+            if not edit_kwargs:
+                return
+
+            try:
+                await cached.message.edit(**edit_kwargs)
+                if 'content' in edit_kwargs:
+                    cached.content = edit_kwargs['content']
+                self._channel_ready_at[channel_id] = loop.time() + self.min_interval
+            except discord.errors.NotFound:
+                self.forget(message_id)
+                if pending_edit.on_missing:
+                    pending_edit.on_missing()
+            except discord.errors.RateLimited as e_limited:
+                # discord.py refused to sleep this long itself, so the whole Retry-After is still owed.
+                self._requeue_after_rate_limit(channel_id, message_id, pending_edit, _retry_after_from_error(e_limited))
+            except discord.errors.HTTPException as e_http:
+                if getattr(e_http, 'status', None) == 429:
+                    # discord.py already slept through earlier 429s inside edit(); only the
+                    # Retry-After of this last answer is left, so it is not added on top of anything.
+                    self._requeue_after_rate_limit(channel_id, message_id, pending_edit, _retry_after_from_error(e_http))
+                else:
+                    print(f"ProgressScheduler: HTTPException editing message {message_id}: {e_http}")
+            except Exception as e_edit:
+                print(f"ProgressScheduler: Error editing message {message_id}: {e_edit}")
+
+    def _requeue_after_rate_limit(self, channel_id: int, message_id: int, failed_edit: _PendingEdit, retry_after: Optional[float]) -> None:
+        loop = asyncio.get_running_loop()
+        ready_at = loop.time() + (retry_after if retry_after is not None else self.min_interval)
+        self._channel_ready_at[channel_id] = max(self._channel_ready_at.get(channel_id, 0.0), ready_at)
+        if message_id in self._finalized:
+            return
+        channel_queue = self._pending.setdefault(channel_id, OrderedDict())
+        newer = channel_queue.get(message_id)
+        if newer is not None:
+            # Keep whatever the failed edit carried that the newer one does not; the newer values win.
+            failed_edit.merge(newer)
+        channel_queue[message_id] = failed_edit
+
+    async def _resolve_message(self, bot, channel_id: int, message_id: int) -> _CachedMessage:
+        cached = self._messages.get(message_id)
+        if cached is not None:
+            self._messages.move_to_end(message_id)
+            return cached
+
+        channel = bot.get_channel(channel_id) or await bot.fetch_channel(channel_id)
+        full_message = await channel.fetch_message(message_id)
+        partial_factory = getattr(channel, 'get_partial_message', None)
+        editable = partial_factory(message_id) if callable(partial_factory) else full_message
+        cached = _CachedMessage(message=editable, content=getattr(full_message, 'content', None))
+
+        self._messages[message_id] = cached
+        while len(self._messages) > _MESSAGE_CACHE_LIMIT:
+            self._messages.popitem(last=False)
+        return cached
+
+
+progress_scheduler = ProgressEditScheduler()
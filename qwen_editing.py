@@ -4,7 +4,6 @@ from __future__ import annotations
 import json
 import os
 import uuid
-import traceback
 from typing import Any, Dict, List, Tuple
 
 from prompt_templates import (
@@ -23,12 +22,10 @@ from prompt_templates import (
     QWEN_VAR_VAE_DECODE_NODE,
     qwen_edit_prompt,
 )
+from bot_config_loader import config_service
 from settings_manager import resolve_model_for_type
 
 
-QWEN_IMAGE_EDIT_DIR = None
-
-
 def _copy_qwen_edit_template() -> Dict[str, Any]:
     """Return a deep copy of the base Qwen Image Edit workflow template."""
 
@@ -38,27 +35,10 @@ def _copy_qwen_edit_template() -> Dict[str, Any]:
 def _ensure_edit_directory() -> str:
     """Return the configured output directory for Qwen edits."""
 
-    global QWEN_IMAGE_EDIT_DIR
-    if QWEN_IMAGE_EDIT_DIR:
-        return QWEN_IMAGE_EDIT_DIR
-
-    default_dir = os.path.abspath(os.path.join("output", "TENOSAI-BOT", "GENERATIONS"))
-    try:
-        if os.path.exists("config.json"):
-            import json
-
-            with open("config.json", "r", encoding="utf-8") as config_fp:
-                config_data = json.load(config_fp)
-            outputs_cfg = config_data.get("OUTPUTS", {}) if isinstance(config_data, dict) else {}
-            candidate = outputs_cfg.get("QWEN_EDITS") or outputs_cfg.get("GENERATIONS")
-            if isinstance(candidate, str) and candidate.strip():
-                default_dir = candidate.strip()
-    except Exception as exc:  # pragma: no cover - defensive logging only
-        print(f"Warning: Unable to read Qwen edit output path from config.json: {exc}")
-        traceback.print_exc()
-
-    QWEN_IMAGE_EDIT_DIR = os.path.abspath(default_dir)
-    return QWEN_IMAGE_EDIT_DIR
+    # Looked up per call so edits to OUTPUTS take effect without a restart.
+    return config_service.output_dir(
+        "QWEN_EDITS", "GENERATIONS", default=os.path.join("output", "TENOSAI-BOT", "GENERATIONS")
+    )
 
 
 def _normalise_path(path: str) -> str:
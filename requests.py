@@ -1,25 +1,44 @@
-"""Lightweight ``requests`` compatibility shim built on ``urllib``."""
+"""Lightweight ``requests`` compatibility shim built on ``http.client``.
+
+Requests go through a :class:`Session`, which keeps a small pool of
+HTTP/1.1 keep-alive connections per ``(scheme, host, port)`` so repeated
+calls to ComfyUI, the LLM providers or GitHub skip the TCP/TLS handshake.
+The module-level helpers (``get``, ``post``, ...) share one default session.
+Proxies from ``HTTP_PROXY`` / ``HTTPS_PROXY`` / ``NO_PROXY`` (or the OS
+settings) are honoured: plain HTTP is sent to the proxy with an absolute
+URL and HTTPS is tunnelled through it with ``CONNECT``.
+"""
 
 from __future__ import annotations
 
+import base64
+import http.client
 import json
+import os
 import socket
+import ssl
+import threading
+import time
 import types
 from dataclasses import dataclass
-from typing import Any, Dict, Iterator, Mapping, Optional
-from urllib import error as urllib_error
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
 from urllib import parse as urllib_parse
 from urllib import request as urllib_request
 
 __all__ = [
     "RequestException",
     "Timeout",
+    "ConnectionError",
     "HTTPError",
+    "Retry",
     "Response",
     "get",
     "head",
     "post",
+    "request",
     "Session",
+    "default_session",
+    "download_to_file",
     "exceptions",
 ]
 
@@ -32,6 +51,10 @@ class Timeout(RequestException):
     """Raised when a request times out."""
 
 
+class ConnectionError(RequestException):  # noqa: A001 - mirrors requests.ConnectionError
+    """Raised when a connection cannot be established or is lost."""
+
+
 class HTTPError(RequestException):
     """Raised for non-success HTTP status codes."""
 
@@ -50,6 +73,41 @@ class _PreparedRequest:
     method: str
 
 
+@dataclass(frozen=True)
+class Retry:
+    """Retry policy for :class:`Session` requests.
+
+    ``total`` retries are made for timeouts, connection errors and answers
+    whose status is in ``status_forcelist``, but only for ``allowed_methods``
+    (idempotent ones by default, so a POST that may have reached the server
+    is never sent twice).  The pause before retry *n* is
+    ``backoff_factor * 2 ** (n - 1)`` seconds, capped at ``backoff_max``;
+    a ``Retry-After`` header on a retryable status takes precedence.
+    """
+
+    total: int = 3
+    backoff_factor: float = 0.5
+    backoff_max: float = 30.0
+    status_forcelist: frozenset = frozenset({429, 502, 503, 504})
+    allowed_methods: frozenset = frozenset({"GET", "HEAD", "PUT", "DELETE", "OPTIONS"})
+    respect_retry_after: bool = True
+
+    def allows(self, method: str) -> bool:
+        return method.upper() in self.allowed_methods
+
+    def backoff(self, retry_number: int, retry_after: Optional[str] = None) -> float:
+        if retry_after and self.respect_retry_after:
+            try:
+                return min(self.backoff_max, max(0.0, float(retry_after)))
+            except ValueError:
+                pass
+        return min(self.backoff_max, self.backoff_factor * (2 ** (retry_number - 1)))
+
+
+NO_RETRY = Retry(total=0)
+_sleep = time.sleep
+
+
 class Response:
     """Subset of ``requests.Response`` used by the Tenos project."""
 
@@ -61,7 +119,8 @@ class Response:
         reason: str,
         headers: Mapping[str, str],
         body: Optional[bytes],
-        stream_handle: Optional[urllib_request.addinfourl],
+        stream_handle: Optional[http.client.HTTPResponse],
+        on_close: Optional[Callable[[bool], None]] = None,
     ) -> None:
         self.url = url
         self.status_code = status
@@ -69,6 +128,7 @@ class Response:
         self.headers: Dict[str, str] = {k: v for k, v in headers.items()}
         self._body = body
         self._stream = stream_handle
+        self._on_close = on_close
 
     # ------------------------------------------------------------------
     def raise_for_status(self) -> None:
@@ -109,13 +169,68 @@ class Response:
         finally:
             self.close()
 
+    def readinto(self, buffer) -> int:
+        """Read body bytes straight into ``buffer`` (bytearray/memoryview); 0 at the end."""
+        view = memoryview(buffer).cast("B")
+        if self._stream is None:
+            data = self.content
+            consumed = getattr(self, "_consumed", 0)
+            count = min(len(view), len(data) - consumed)
+            view[:count] = data[consumed : consumed + count]
+            self._consumed = consumed + count
+            return count
+        try:
+            count = self._stream.readinto(view)
+        except socket.timeout as exc:
+            raise Timeout(str(exc)) from exc
+        except (OSError, http.client.HTTPException) as exc:
+            raise ConnectionError(f"Connection lost while reading {self.url}: {exc!r}") from exc
+        if not count:
+            self.close()
+        return count
+
+    def stream_to(self, target, *, chunk_size: int = 1024 * 1024) -> int:
+        """Copy the body into ``target`` without per-chunk ``bytes`` objects.
+
+        ``target`` is either a writable file object, fed from one reused
+        buffer, or a pre-allocated ``bytearray``/``memoryview`` that is
+        filled in place (``ValueError`` if the body does not fit).  Returns
+        the number of bytes copied.
+        """
+        total = 0
+        try:
+            if hasattr(target, "write"):
+                buffer = memoryview(bytearray(max(1, chunk_size)))
+                while True:
+                    count = self.readinto(buffer)
+                    if not count:
+                        return total
+                    target.write(buffer[:count])
+                    total += count
+            view = memoryview(target).cast("B")
+            while True:
+                if total == len(view):
+                    if self.readinto(bytearray(1)):
+                        raise ValueError(f"Response body is larger than the {len(view)}-byte buffer.")
+                    return total
+                count = self.readinto(view[total:])
+                if not count:
+                    return total
+                total += count
+        finally:
+            self.close()
+
     # ------------------------------------------------------------------
     def close(self) -> None:
         if self._stream is not None:
+            stream, self._stream = self._stream, None
+            # http.client closes the response itself once the body is exhausted.
+            fully_read = stream.isclosed()
             try:
-                self._stream.close()
+                stream.close()
             finally:
-                self._stream = None
+                if self._on_close is not None:
+                    self._on_close(fully_read)
 
     # Context manager support -------------------------------------------------
     def __enter__(self) -> "Response":
@@ -177,50 +292,131 @@ def _prepare_request(
     return _PreparedRequest(final_url, body, final_headers, method.upper())
 
 
-def _execute_request(
-    prepared: _PreparedRequest,
-    *,
-    timeout: Optional[float],
-    stream: bool,
-) -> Response:
-    request = urllib_request.Request(
-        prepared.url,
-        data=prepared.data,
-        headers=prepared.headers,
-        method=prepared.method,
-    )
+_REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+_MAX_REDIRECTS = 10
+_DEFAULT_POOL_MAXSIZE = 10
+_DEFAULT_IDLE_TIMEOUT = 30.0
+# Errors that mean a kept-alive connection was closed by the server while idle.
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+# Methods that may be resent when the connection drops after the request went out.
+_IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "PUT", "DELETE", "OPTIONS", "TRACE"})
+
+
+def _proxy_for(scheme: str, host: str) -> Optional[Tuple[str, int, Dict[str, str]]]:
+    """``(proxy_host, proxy_port, proxy_headers)`` for requests to ``host``, or None for a direct connection."""
+    proxy_url = urllib_request.getproxies().get(scheme)
+    if not proxy_url or urllib_request.proxy_bypass(host):
+        return None
+    if "://" not in proxy_url:
+        proxy_url = f"http://{proxy_url}"
+    parts = urllib_parse.urlsplit(proxy_url)
+    if not parts.hostname:
+        return None
+    headers: Dict[str, str] = {}
+    if parts.username is not None:
+        credentials = f"{urllib_parse.unquote(parts.username)}:{urllib_parse.unquote(parts.password or '')}"
+        headers["Proxy-Authorization"] = "Basic " + base64.b64encode(credentials.encode("utf-8")).decode("ascii")
+    return parts.hostname, parts.port or 80, headers
 
-    try:
-        response = urllib_request.urlopen(request, timeout=timeout)
-    except socket.timeout as exc:
-        raise Timeout(str(exc)) from exc
-    except urllib_error.HTTPError as exc:
-        raise HTTPError(exc.code, exc.reason, prepared.url) from exc
-    except urllib_error.URLError as exc:
-        raise RequestException(str(exc.reason)) from exc
-
-    if stream:
-        return Response(
-            url=prepared.url,
-            status=response.status,
-            reason=getattr(response, "reason", ""),
-            headers=response.headers,
-            body=None,
-            stream_handle=response,
-        )
 
-    body = response.read()
-    headers = response.headers
-    reason = getattr(response, "reason", "")
-    response.close()
-    return Response(
-        url=prepared.url,
-        status=response.status,
-        reason=reason,
-        headers=headers,
-        body=body,
-        stream_handle=None,
-    )
+class _HostPool:
+    """Idle keep-alive connections to one ``(scheme, host, port)``, optionally through a proxy."""
+
+    def __init__(
+        self,
+        scheme: str,
+        host: str,
+        port: Optional[int],
+        *,
+        maxsize: int,
+        idle_timeout: float,
+        ssl_context: Optional[ssl.SSLContext],
+        proxy: Optional[Tuple[str, int, Dict[str, str]]] = None,
+    ) -> None:
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.proxy = proxy
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self._ssl_context = ssl_context
+        self._idle: List[Tuple[http.client.HTTPConnection, float]] = []
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+
+    def _evict_expired(self, now: float) -> None:
+        # Oldest connections sit at the front of the idle list.
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            conn, _ = self._idle.pop(0)
+            conn.close()
+            self.evicted += 1
+
+    def acquire(self, timeout: Optional[float]) -> Tuple[http.client.HTTPConnection, bool]:
+        """A connection for one request and whether it is a reused keep-alive one."""
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            while self._idle:
+                conn, _ = self._idle.pop()
+                if conn.sock is None:
+                    self.evicted += 1
+                    continue
+                self.reused += 1
+                conn.timeout = timeout
+                conn.sock.settimeout(timeout)
+                return conn, True
+            self.created += 1
+        if self.proxy is not None:
+            proxy_host, proxy_port, proxy_headers = self.proxy
+            if self.scheme == "https":
+                conn = http.client.HTTPSConnection(proxy_host, proxy_port, timeout=timeout, context=self._ssl_context)
+                conn.set_tunnel(self.host, self.port, headers=proxy_headers)
+            else:
+                conn = http.client.HTTPConnection(proxy_host, proxy_port, timeout=timeout)
+        elif self.scheme == "https":
+            conn = http.client.HTTPSConnection(self.host, self.port, timeout=timeout, context=self._ssl_context)
+        else:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+        return conn, False
+
+    def release(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._evict_expired(now)
+            if conn.sock is not None and len(self._idle) < self.maxsize:
+                self._idle.append((conn, now))
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            conn.close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"idle": len(self._idle), "created": self.created, "reused": self.reused, "evicted": self.evicted}
+
+
+def _finish_connection(pool: _HostPool, conn: http.client.HTTPConnection, response: http.client.HTTPResponse) -> None:
+    """Return ``conn`` to ``pool`` when ``response`` was read to the end and keeps the connection open."""
+    if response.isclosed() and not response.will_close:
+        pool.release(conn)
+    else:
+        conn.close()
+
+
+def _redirected_request(prepared: _PreparedRequest, status: int, location: str) -> _PreparedRequest:
+    url = urllib_parse.urljoin(prepared.url, location)
+    if status == 303 or (status in (301, 302) and prepared.method == "POST"):
+        headers = {
+            k: v for k, v in prepared.headers.items() if k.lower() not in ("content-type", "content-length")
+        }
+        method = "HEAD" if prepared.method == "HEAD" else "GET"
+        return _PreparedRequest(url, None, headers, method)
+    return _PreparedRequest(url, prepared.data, prepared.headers, prepared.method)
 
 
 # ---------------------------------------------------------------------------
@@ -237,19 +433,28 @@ def request(
     headers: Optional[Mapping[str, str]] = None,
     timeout: Optional[float] = None,
     stream: bool = False,
-    allow_redirects: bool = True,  # present for compatibility
+    allow_redirects: bool = True,
     session_headers: Optional[Mapping[str, str]] = None,
+    retries: Optional[Retry] = None,
 ) -> Response:
-    prepared = _prepare_request(
+    """Send a request on the shared default session.
+
+    ``session_headers`` are merged under ``headers`` in place of the
+    default session's own headers.
+    """
+    return _default_session.request(
         method,
         url,
         params=params,
         data=data,
-        json_data=json,
+        json=json,
         headers=headers,
+        timeout=timeout,
+        stream=stream,
+        allow_redirects=allow_redirects,
         session_headers=session_headers,
+        retries=retries,
     )
-    return _execute_request(prepared, timeout=timeout, stream=stream)
 
 
 def get(
@@ -260,6 +465,7 @@ def get(
     timeout: Optional[float] = None,
     stream: bool = False,
     allow_redirects: bool = True,
+    retries: Optional[Retry] = None,
 ) -> Response:
     return request(
         "GET",
@@ -269,6 +475,7 @@ def get(
         timeout=timeout,
         stream=stream,
         allow_redirects=allow_redirects,
+        retries=retries,
     )
 
 
@@ -278,8 +485,9 @@ def head(
     headers: Optional[Mapping[str, str]] = None,
     timeout: Optional[float] = None,
     allow_redirects: bool = True,
+    retries: Optional[Retry] = None,
 ) -> Response:
-    return request("HEAD", url, headers=headers, timeout=timeout, allow_redirects=allow_redirects)
+    return request("HEAD", url, headers=headers, timeout=timeout, allow_redirects=allow_redirects, retries=retries)
 
 
 def post(
@@ -291,6 +499,7 @@ def post(
     timeout: Optional[float] = None,
     stream: bool = False,
     allow_redirects: bool = True,
+    retries: Optional[Retry] = None,
 ) -> Response:
     return request(
         "POST",
@@ -301,14 +510,198 @@ def post(
         timeout=timeout,
         stream=stream,
         allow_redirects=allow_redirects,
+        retries=retries,
     )
 
 
 class Session:
-    """Lightweight session with persistent headers."""
+    """Session with persistent headers and per-host keep-alive connection pools.
+
+    At most ``pool_maxsize`` idle connections are kept per host; more may be
+    open while requests run concurrently, and those are closed when returned
+    to a full pool.  Connections idle for longer than ``idle_timeout``
+    seconds are closed instead of reused.  ``retries`` is the default
+    :class:`Retry` policy; individual calls may pass their own.
+    """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        *,
+        pool_maxsize: int = _DEFAULT_POOL_MAXSIZE,
+        idle_timeout: float = _DEFAULT_IDLE_TIMEOUT,
+        retries: Retry = NO_RETRY,
+    ) -> None:
         self.headers: Dict[str, str] = {}
+        self.retries = retries
+        self.pool_maxsize = pool_maxsize
+        self.idle_timeout = idle_timeout
+        self._pools: Dict[Tuple[str, str, Optional[int]], _HostPool] = {}
+        self._pools_lock = threading.Lock()
+        self._ssl_context: Optional[ssl.SSLContext] = None
+
+    def _pool_for(self, url: str) -> Tuple[_HostPool, str]:
+        parts = urllib_parse.urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https") or not parts.hostname:
+            raise RequestException(f"Unsupported URL: {url}")
+        proxy = _proxy_for(scheme, parts.hostname)
+        key = (scheme, parts.hostname, parts.port, proxy[:2] if proxy else None)
+        with self._pools_lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                if scheme == "https" and self._ssl_context is None:
+                    self._ssl_context = ssl.create_default_context()
+                pool = _HostPool(
+                    scheme,
+                    parts.hostname,
+                    parts.port,
+                    maxsize=self.pool_maxsize,
+                    idle_timeout=self.idle_timeout,
+                    ssl_context=self._ssl_context if scheme == "https" else None,
+                    proxy=proxy,
+                )
+                self._pools[key] = pool
+        if proxy is not None and scheme == "http":
+            # A plain HTTP proxy takes the absolute URL as the request target.
+            return pool, urllib_parse.urlunsplit((scheme, parts.netloc, parts.path or "/", parts.query, ""))
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        return pool, path
+
+    def _send(
+        self, prepared: _PreparedRequest, timeout: Optional[float]
+    ) -> Tuple[_HostPool, http.client.HTTPConnection, http.client.HTTPResponse]:
+        pool, path = self._pool_for(prepared.url)
+        headers = prepared.headers
+        if pool.proxy is not None and pool.scheme == "http" and pool.proxy[2]:
+            headers = {**headers, **pool.proxy[2]}
+        while True:
+            conn, reused = pool.acquire(timeout)
+            sent = False
+            try:
+                conn.request(prepared.method, path, body=prepared.data, headers=headers)
+                sent = True
+                return pool, conn, conn.getresponse()
+            except socket.timeout as exc:
+                conn.close()
+                raise Timeout(str(exc)) from exc
+            except _STALE_CONNECTION_ERRORS as exc:
+                conn.close()
+                # The server dropped an idle connection.  Resend on a fresh one only if it cannot
+                # have acted on the request: it never got all of it, or resending is harmless.
+                if reused and (not sent or prepared.method.upper() in _IDEMPOTENT_METHODS):
+                    continue
+                raise ConnectionError(str(exc)) from exc
+            except OSError as exc:
+                conn.close()
+                raise ConnectionError(str(exc)) from exc
+            except http.client.HTTPException as exc:
+                conn.close()
+                raise RequestException(str(exc)) from exc
+
+    def _read_body(self, pool: _HostPool, conn: http.client.HTTPConnection, response: http.client.HTTPResponse) -> bytes:
+        try:
+            body = response.read()
+        except socket.timeout as exc:
+            conn.close()
+            raise Timeout(str(exc)) from exc
+        except (OSError, http.client.HTTPException) as exc:
+            conn.close()
+            raise RequestException(str(exc)) from exc
+        _finish_connection(pool, conn, response)
+        return body
+
+    def _exchange(
+        self, prepared: _PreparedRequest, timeout: Optional[float], allow_redirects: bool
+    ) -> Tuple[_PreparedRequest, _HostPool, http.client.HTTPConnection, http.client.HTTPResponse]:
+        """Send ``prepared``, following redirects; returns the final request and its raw response."""
+        for _ in range(_MAX_REDIRECTS + 1):
+            pool, conn, response = self._send(prepared, timeout)
+            location = response.getheader("Location")
+            if not (allow_redirects and response.status in _REDIRECT_STATUSES and location):
+                return prepared, pool, conn, response
+            self._read_body(pool, conn, response)
+            prepared = _redirected_request(prepared, response.status, location)
+        raise RequestException(f"Exceeded {_MAX_REDIRECTS} redirects for url {prepared.url}")
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Mapping[str, Any]] = None,
+        data: Any = None,
+        json: Any = None,
+        headers: Optional[Mapping[str, str]] = None,
+        timeout: Optional[float] = None,
+        stream: bool = False,
+        allow_redirects: bool = True,
+        session_headers: Optional[Mapping[str, str]] = None,
+        retries: Optional[Retry] = None,
+    ) -> Response:
+        initial = _prepare_request(
+            method,
+            url,
+            params=params,
+            data=data,
+            json_data=json,
+            headers=headers,
+            session_headers=self.headers if session_headers is None else session_headers,
+        )
+        policy = retries if retries is not None else self.retries
+        retry_number = 0
+        while True:
+            try:
+                prepared, pool, conn, response = self._exchange(initial, timeout, allow_redirects)
+            except (Timeout, ConnectionError):
+                if retry_number >= policy.total or not policy.allows(initial.method):
+                    raise
+                retry_number += 1
+                _sleep(policy.backoff(retry_number))
+                continue
+            if (
+                response.status in policy.status_forcelist
+                and retry_number < policy.total
+                and policy.allows(prepared.method)
+            ):
+                retry_after = response.getheader("Retry-After")
+                self._read_body(pool, conn, response)
+                retry_number += 1
+                _sleep(policy.backoff(retry_number, retry_after))
+                continue
+            break
+
+        if response.status >= 400:
+            self._read_body(pool, conn, response)
+            raise HTTPError(response.status, response.reason or "", prepared.url)
+
+        if stream:
+            def on_close(fully_read: bool) -> None:
+                if fully_read and not response.will_close:
+                    pool.release(conn)
+                else:
+                    conn.close()
+
+            return Response(
+                url=prepared.url,
+                status=response.status,
+                reason=response.reason,
+                headers=response.headers,
+                body=None,
+                stream_handle=response,
+                on_close=on_close,
+            )
+
+        body = self._read_body(pool, conn, response)
+        return Response(
+            url=prepared.url,
+            status=response.status,
+            reason=response.reason,
+            headers=response.headers,
+            body=body,
+            stream_handle=None,
+        )
 
     def get(
         self,
@@ -319,8 +712,9 @@ class Session:
         timeout: Optional[float] = None,
         stream: bool = False,
         allow_redirects: bool = True,
+        retries: Optional[Retry] = None,
     ) -> Response:
-        return request(
+        return self.request(
             "GET",
             url,
             params=params,
@@ -328,9 +722,20 @@ class Session:
             timeout=timeout,
             stream=stream,
             allow_redirects=allow_redirects,
-            session_headers=self.headers,
+            retries=retries,
         )
 
+    def head(
+        self,
+        url: str,
+        *,
+        headers: Optional[Mapping[str, str]] = None,
+        timeout: Optional[float] = None,
+        allow_redirects: bool = True,
+        retries: Optional[Retry] = None,
+    ) -> Response:
+        return self.request("HEAD", url, headers=headers, timeout=timeout, allow_redirects=allow_redirects, retries=retries)
+
     def post(
         self,
         url: str,
@@ -341,8 +746,9 @@ class Session:
         timeout: Optional[float] = None,
         stream: bool = False,
         allow_redirects: bool = True,
+        retries: Optional[Retry] = None,
     ) -> Response:
-        return request(
+        return self.request(
             "POST",
             url,
             data=data,
@@ -351,17 +757,123 @@ class Session:
             timeout=timeout,
             stream=stream,
             allow_redirects=allow_redirects,
-            session_headers=self.headers,
+            retries=retries,
         )
 
+    def pool_stats(self) -> Dict[str, Dict[str, int]]:
+        with self._pools_lock:
+            pools = dict(self._pools)
+        return {f"{scheme}://{host}" + (f":{port}" if port else ""): pool.stats() for (scheme, host, port, _), pool in pools.items()}
+
     def close(self) -> None:
-        """Included for compatibility with ``requests.Session``."""
+        """Close all pooled connections and forget the session headers."""
+        with self._pools_lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.close()
         self.headers.clear()
 
+    def __enter__(self) -> "Session":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+        return False
+
+
+_default_session = Session()
+
+
+def default_session() -> Session:
+    """The session behind the module-level ``get``/``post``/``head``/``request`` helpers."""
+    return _default_session
+
+
+_DOWNLOAD_RETRY = Retry(total=5, backoff_factor=1.0)
+
+
+def _header(headers: Mapping[str, str], name: str) -> Optional[str]:
+    name = name.lower()
+    return next((value for key, value in headers.items() if key.lower() == name), None)
+
+
+def _content_range_start(headers: Mapping[str, str]) -> Optional[int]:
+    value = _header(headers, "Content-Range") or ""
+    if not value.startswith("bytes ") or "-" not in value:
+        return None
+    try:
+        return int(value[len("bytes ") :].split("-", 1)[0])
+    except ValueError:
+        return None
+
+
+def download_to_file(
+    url: str,
+    path: str,
+    *,
+    headers: Optional[Mapping[str, str]] = None,
+    timeout: Optional[float] = 60,
+    retries: Retry = _DOWNLOAD_RETRY,
+    chunk_size: int = 1024 * 1024,
+    session: Optional[Session] = None,
+) -> int:
+    """Download ``url`` to ``path``, resuming interrupted transfers with ``Range``.
+
+    The body is written to ``path + ".part"`` through :meth:`Response.stream_to`.
+    When the connection drops or times out, the next attempt (up to
+    ``retries.total``, with its backoff) asks only for the missing bytes; a
+    server that ignores ``Range`` makes it start over.  A ``.part`` file left
+    by an earlier run is resumed the same way.  The finished file is moved to
+    ``path`` and its size returned.
+    """
+    session = session or _default_session
+    partial_path = f"{path}.part"
+    retry_number = 0
+    while True:
+        offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+        request_headers = dict(headers or {})
+        if offset:
+            request_headers["Range"] = f"bytes={offset}-"
+        try:
+            response = session.get(url, headers=request_headers, timeout=timeout, stream=True, retries=retries)
+        except HTTPError as exc:
+            if exc.status != 416 or not offset:
+                raise
+            # Nothing left past ``offset``: either the part file is complete or it is stale.
+            head_response = session.head(url, headers=headers, timeout=timeout, retries=retries)
+            if _header(head_response.headers, "Content-Length") == str(offset):
+                break
+            os.remove(partial_path)
+            continue
+
+        with response:
+            resumed = offset and response.status_code == 206 and _content_range_start(response.headers) == offset
+            if not resumed:
+                offset = 0
+            length = _header(response.headers, "Content-Length")
+            expected = offset + int(length) if length and length.isdigit() else None
+            try:
+                with open(partial_path, "ab" if resumed else "wb") as f:
+                    response.stream_to(f, chunk_size=chunk_size)
+                interrupted = None
+            except (Timeout, ConnectionError) as exc:
+                interrupted = exc
+        received = os.path.getsize(partial_path)
+        if interrupted is None and (expected is None or received >= expected):
+            break
+        if retry_number >= retries.total:
+            raise interrupted or ConnectionError(f"Download of {url} ended after {received} of {expected} bytes.")
+        retry_number += 1
+        _sleep(retries.backoff(retry_number))
+
+    os.replace(partial_path, path)
+    return os.path.getsize(path)
+
 
 exceptions = types.SimpleNamespace(
     RequestException=RequestException,
     Timeout=Timeout,
+    ConnectionError=ConnectionError,
     HTTPError=HTTPError,
 )
 
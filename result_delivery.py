@@ -0,0 +1,301 @@
+"""Prepare finished job outputs for upload to Discord.
+
+Raw PNGs straight out of ComfyUI are often several megabytes each, so batches
+and upscales upload slowly and anything above Discord's attachment limits used
+to be dropped.  :class:`ResultDeliveryPipeline` re-encodes oversized images to
+high-quality WebP/JPEG in a process pool (Pillow encoding holds the GIL) and
+hands back in-memory attachments.  The originals on disk are never touched, so
+upscales, variations and "show original" style actions keep working on the
+lossless files.
+
+With ``RESULT_DELIVERY.CONTACT_SHEET`` enabled, batch outputs are instead
+composited into a single numbered grid so a batch costs one small upload.
+The per-image buttons resolve back to the originals on disk when clicked.
+"""
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Callable, List, Optional, Tuple
+
+import discord
+
+from bot_config_loader import config
+from result_delivery_worker import CONTACT_SHEET_SUFFIX, build_contact_sheet, grid_shape, transcode_image_file
+
+
+DISCORD_FILE_LIMIT = 25 * 1024 * 1024
+DISCORD_TOTAL_LIMIT = 48 * 1024 * 1024
+MAX_ATTACHMENTS = 10
+
+TRANSCODABLE_EXTENSIONS = {'.png', '.bmp', '.tif', '.tiff', '.jpg', '.jpeg'}
+_STATS_HISTORY_LIMIT = 200
+
+
+def _read_delivery_settings() -> dict:
+    section = config.get('RESULT_DELIVERY', {})
+    if not isinstance(section, dict):
+        section = {}
+
+    def _number(key, default, cast=float, minimum=0):
+        raw_value = section.get(key, default)
+        try:
+            return max(minimum, cast(raw_value))
+        except (TypeError, ValueError):
+            print(f"Warning: Invalid RESULT_DELIVERY.{key} '{raw_value}'. Using {default}.")
+            return default
+
+    output_format = str(section.get('FORMAT', 'webp')).strip().lower()
+    if output_format not in ('webp', 'jpeg'):
+        print(f"Warning: Invalid RESULT_DELIVERY.FORMAT '{output_format}'. Using webp.")
+        output_format = 'webp'
+    return {
+        'enabled': bool(section.get('TRANSCODE', True)),
+        'threshold_bytes': int(_number('TRANSCODE_THRESHOLD_MB', 8.0) * 1024 * 1024),
+        'format': output_format,
+        'quality': _number('QUALITY', 92, cast=int, minimum=1),
+        'max_workers': _number('MAX_WORKERS', 2, cast=int, minimum=1),
+        'contact_sheet': bool(section.get('CONTACT_SHEET', False)),
+        'contact_sheet_min_images': _number('CONTACT_SHEET_MIN_IMAGES', 2, cast=int, minimum=2),
+        'contact_sheet_tile_size': _number('CONTACT_SHEET_TILE_SIZE', 768, cast=int, minimum=64),
+    }
+
+
+def is_contact_sheet_filename(filename: Optional[str]) -> bool:
+    if not filename:
+        return False
+    return os.path.splitext(filename)[0].lower().endswith(CONTACT_SHEET_SUFFIX)
+
+
+@dataclass
+class PreparedAttachment:
+    source_path: str
+    filename: str
+    size: int
+    data: Optional[bytes] = None
+
+    @property
+    def transcoded(self) -> bool:
+        return self.data is not None
+
+    def to_discord_file(self) -> discord.File:
+        if self.data is not None:
+            return discord.File(BytesIO(self.data), filename=self.filename)
+        return discord.File(self.source_path, filename=self.filename)
+
+
+@dataclass
+class DeliveryStats:
+    job_id: str
+    files_considered: int = 0
+    files_attached: int = 0
+    files_transcoded: int = 0
+    files_skipped: int = 0
+    original_bytes: int = 0
+    delivered_bytes: int = 0
+    transcode_seconds: float = 0.0
+    upload_seconds: Optional[float] = None
+
+    @property
+    def bytes_saved(self) -> int:
+        return max(0, self.original_bytes - self.delivered_bytes)
+
+    def summary(self) -> str:
+        upload = f"{self.upload_seconds:.2f}s" if self.upload_seconds is not None else "n/a"
+        return (
+            f"Delivery for job {self.job_id}: {self.files_attached}/{self.files_considered} attached, "
+            f"{self.files_transcoded} transcoded in {self.transcode_seconds:.2f}s, "
+            f"{self.original_bytes / 1048576:.1f}MB -> {self.delivered_bytes / 1048576:.1f}MB "
+            f"(saved {self.bytes_saved / 1048576:.1f}MB), upload {upload}"
+        )
+
+
+@dataclass
+class DeliveryPlan:
+    attachments: List[PreparedAttachment] = field(default_factory=list)
+    stats: Optional[DeliveryStats] = None
+    total_valid_files: int = 0
+    contact_sheet: bool = False
+    skipped_paths: List[str] = field(default_factory=list)
+
+    def discord_files(self) -> List[discord.File]:
+        files = []
+        for attachment in self.attachments:
+            try:
+                files.append(attachment.to_discord_file())
+            except Exception as e_df_create:
+                print(f"Error creating discord.File for {attachment.source_path}: {e_df_create}")
+        return files
+
+
+class ResultDeliveryPipeline:
+    def __init__(
+        self,
+        settings: Optional[dict] = None,
+        executor: Optional[Executor] = None,
+        transcoder: Callable[[str, str, int], Tuple[bytes, str]] = transcode_image_file,
+        sheet_builder: Callable[[List[str], int, str, int], Tuple[bytes, str]] = build_contact_sheet,
+    ):
+        self.settings = settings if settings is not None else _read_delivery_settings()
+        self._executor = executor
+        self._transcoder = transcoder
+        self._sheet_builder = sheet_builder
+        self._stats: "OrderedDict[str, DeliveryStats]" = OrderedDict()
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            # Spawned workers only unpickle functions from result_delivery_worker, which imports
+            # nothing but Pillow, so they behave the same on Windows and Linux.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.settings['max_workers'], mp_context=multiprocessing.get_context('spawn'),
+            )
+        return self._executor
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _should_transcode(self, path: str, size: int) -> bool:
+        if not self.settings['enabled']:
+            return False
+        if os.path.splitext(path)[1].lower() not in TRANSCODABLE_EXTENSIONS:
+            return False
+        return size > self.settings['threshold_bytes'] or size > DISCORD_FILE_LIMIT
+
+    async def _transcode(self, path: str) -> Optional[Tuple[bytes, str]]:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self._get_executor(), self._transcoder, path, self.settings['format'], self.settings['quality']
+            )
+        except Exception as e_transcode:
+            print(f"Delivery: Failed to transcode '{os.path.basename(path)}': {e_transcode}")
+            traceback.print_exc()
+            return None
+
+    def _wants_contact_sheet(self, candidates) -> bool:
+        if not self.settings.get('contact_sheet'):
+            return False
+        if len(candidates) < self.settings.get('contact_sheet_min_images', 2):
+            return False
+        return all(os.path.splitext(path)[1].lower() in TRANSCODABLE_EXTENSIONS for path, _ in candidates)
+
+    async def _build_sheet(self, job_id, candidates, stats: DeliveryStats) -> Optional[DeliveryPlan]:
+        loop = asyncio.get_running_loop()
+        paths = [path for path, _ in candidates]
+        started = time.perf_counter()
+        try:
+            data, filename = await loop.run_in_executor(
+                self._get_executor(), self._sheet_builder, paths,
+                self.settings['contact_sheet_tile_size'], self.settings['format'], self.settings['quality'],
+            )
+        except Exception as e_sheet:
+            print(f"Delivery: Failed to build contact sheet for job {job_id}: {e_sheet}")
+            traceback.print_exc()
+            return None
+        stats.transcode_seconds = time.perf_counter() - started
+        if len(data) > DISCORD_FILE_LIMIT:
+            print(f"Delivery: Contact sheet for job {job_id} is too large ({len(data)} bytes). Falling back to individual files.")
+            return None
+
+        stats.files_attached = 1
+        stats.files_transcoded = len(paths)
+        stats.original_bytes = sum(size for _, size in candidates)
+        stats.delivered_bytes = len(data)
+        attachment = PreparedAttachment(source_path=paths[0], filename=filename, size=len(data), data=data)
+        return DeliveryPlan(attachments=[attachment], stats=stats, total_valid_files=len(paths), contact_sheet=True)
+
+    async def prepare(self, job_id, file_paths: List[str], allow_contact_sheet: bool = True) -> DeliveryPlan:
+        """Select, and where needed re-encode, the files to attach for a job."""
+        stats = DeliveryStats(job_id=str(job_id))
+        candidates = []
+        for fp_check in sorted(file_paths):
+            if not os.path.exists(fp_check):
+                print(f"WARNING: File path not found during completion processing: {fp_check} (job {job_id})")
+                continue
+            try:
+                f_size = os.path.getsize(fp_check)
+            except OSError as e_size_check:
+                print(f"Error getting size/checking file {fp_check}: {e_size_check}")
+                continue
+            if f_size == 0:
+                print(f"Warning: File '{os.path.basename(fp_check)}' is 0 bytes (job {job_id}). Skipping.")
+                continue
+            candidates.append((fp_check, f_size))
+
+        stats.files_considered = len(candidates)
+        if allow_contact_sheet and self._wants_contact_sheet(candidates):
+            sheet_plan = await self._build_sheet(job_id, candidates, stats)
+            if sheet_plan is not None:
+                self._remember(stats)
+                return sheet_plan
+
+        plan = DeliveryPlan(stats=stats, total_valid_files=len(candidates))
+        selected = candidates[:MAX_ATTACHMENTS]
+        overflow = candidates[MAX_ATTACHMENTS:]
+        if overflow:
+            print(f"Warning: Job {job_id} produced {len(candidates)} files; Discord allows {MAX_ATTACHMENTS} attachments. Skipping {len(overflow)}.")
+
+        transcode_indexes = [idx for idx, (path, size) in enumerate(selected) if self._should_transcode(path, size)]
+        transcoded_results = {}
+        if transcode_indexes:
+            started = time.perf_counter()
+            results = await asyncio.gather(*(self._transcode(selected[idx][0]) for idx in transcode_indexes))
+            stats.transcode_seconds = time.perf_counter() - started
+            transcoded_results = dict(zip(transcode_indexes, results))
+
+        total_attachment_size = 0
+        for idx, (path, size) in enumerate(selected):
+            attachment = PreparedAttachment(source_path=path, filename=os.path.basename(path), size=size)
+            encoded = transcoded_results.get(idx)
+            if encoded is not None and len(encoded[0]) < size:
+                attachment = PreparedAttachment(source_path=path, filename=encoded[1], size=len(encoded[0]), data=encoded[0])
+                stats.files_transcoded += 1
+
+            if attachment.size > DISCORD_FILE_LIMIT:
+                print(f"Warning: File '{attachment.filename}' ({attachment.size} bytes) > Discord limit ({DISCORD_FILE_LIMIT} bytes). Skipping.")
+                stats.files_skipped += 1
+                plan.skipped_paths.append(path)
+                continue
+            if total_attachment_size + attachment.size > DISCORD_TOTAL_LIMIT:
+                print(f"Warning: Adding file '{attachment.filename}' would exceed total size limit. Skipping for job {job_id}.")
+                stats.files_skipped += len(selected) - idx
+                plan.skipped_paths.extend(skipped_path for skipped_path, _ in selected[idx:])
+                break
+
+            plan.attachments.append(attachment)
+            total_attachment_size += attachment.size
+            stats.original_bytes += size
+            stats.delivered_bytes += attachment.size
+
+        stats.files_skipped += len(overflow)
+        plan.skipped_paths.extend(path for path, _ in overflow)
+        stats.files_attached = len(plan.attachments)
+        self._remember(stats)
+        return plan
+
+    def record_upload(self, stats: Optional[DeliveryStats], seconds: float) -> None:
+        if stats is None:
+            return
+        stats.upload_seconds = seconds
+        print(stats.summary())
+
+    def _remember(self, stats: DeliveryStats) -> None:
+        self._stats[stats.job_id] = stats
+        self._stats.move_to_end(stats.job_id)
+        while len(self._stats) > _STATS_HISTORY_LIMIT:
+            self._stats.popitem(last=False)
+
+    def get_job_stats(self, job_id) -> Optional[DeliveryStats]:
+        return self._stats.get(str(job_id))
+
+
+delivery_pipeline = ResultDeliveryPipeline()
@@ -0,0 +1,91 @@
+"""Image encoding for result delivery, run in worker processes.
+
+Kept apart from :mod:`result_delivery` so a worker only imports Pillow, not
+discord or the bot configuration.
+"""
+from __future__ import annotations
+
+import math
+import os
+from io import BytesIO
+from typing import List, Tuple
+
+_WEBP_MAX_DIMENSION = 16383
+CONTACT_SHEET_SUFFIX = '_sheet'
+
+
+def grid_shape(count: int) -> Tuple[int, int]:
+    """Columns and rows for ``count`` tiles, as close to square as possible."""
+    columns = max(1, math.ceil(math.sqrt(count)))
+    rows = max(1, math.ceil(count / columns))
+    return columns, rows
+
+
+def transcode_image_file(path: str, output_format: str, quality: int) -> Tuple[bytes, str]:
+    """Encode ``path`` as WebP or JPEG. Runs inside a worker process."""
+    from PIL import Image
+
+    with Image.open(path) as img:
+        img.load()
+        if output_format == 'webp' and max(img.size) > _WEBP_MAX_DIMENSION:
+            output_format = 'jpeg'
+
+        if output_format == 'jpeg':
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            save_kwargs = {'format': 'JPEG', 'quality': quality, 'optimize': True, 'subsampling': 0}
+            extension = '.jpg'
+        else:
+            if img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+            save_kwargs = {'format': 'WEBP', 'quality': quality, 'method': 4}
+            extension = '.webp'
+
+        buffer = BytesIO()
+        img.save(buffer, **save_kwargs)
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return buffer.getvalue(), stem + extension
+
+
+def build_contact_sheet(paths: List[str], tile_size: int, output_format: str, quality: int) -> Tuple[bytes, str]:
+    """Composite ``paths`` into one numbered grid image. Runs inside a worker process."""
+    from PIL import Image, ImageDraw
+
+    tiles = []
+    for path in paths:
+        with Image.open(path) as img:
+            img = img.convert('RGB')
+            img.thumbnail((tile_size, tile_size), Image.LANCZOS)
+            tiles.append(img)
+
+    cell_width = max(tile.width for tile in tiles)
+    cell_height = max(tile.height for tile in tiles)
+    columns, rows = grid_shape(len(tiles))
+    gap = max(2, tile_size // 128)
+
+    sheet = Image.new('RGB', (columns * cell_width + (columns - 1) * gap, rows * cell_height + (rows - 1) * gap), (24, 24, 24))
+    label_positions = []
+    for index, tile in enumerate(tiles):
+        row, column = divmod(index, columns)
+        left = column * (cell_width + gap) + (cell_width - tile.width) // 2
+        top = row * (cell_height + gap) + (cell_height - tile.height) // 2
+        sheet.paste(tile, (left, top))
+        label_positions.append((left, top))
+
+    draw = ImageDraw.Draw(sheet)
+    badge = max(18, tile_size // 24)
+    for index, (left, top) in enumerate(label_positions, start=1):
+        draw.rectangle((left, top, left + badge * 2, top + badge + 6), fill=(0, 0, 0))
+        draw.text((left + badge // 2, top + 3), str(index), fill=(255, 255, 255))
+
+    buffer = BytesIO()
+    if output_format == 'jpeg':
+        sheet.save(buffer, format='JPEG', quality=quality, optimize=True)
+        extension = '.jpg'
+    else:
+        sheet.save(buffer, format='WEBP', quality=quality, method=4)
+        extension = '.webp'
+
+    stem = os.path.splitext(os.path.basename(paths[0]))[0]
+    return buffer.getvalue(), f"{stem}{CONTACT_SHEET_SUFFIX}{extension}"
@@ -5,8 +5,10 @@ import json
 import discord
 import os
 import numpy as np
+import threading
 import traceback
-from typing import Dict, Iterable, List, Optional, Tuple
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
 
 from settings_shared import (
     WAN_CHECKPOINT_KEY,
@@ -18,6 +20,8 @@ from settings_shared import (
 )
 
 from model_registry import get_model_spec, resolve_model_type_from_prefix
+from bot_config_loader import config_service
+from model_catalog import extract_catalog_entries, model_catalog
 
 
 KSAMPLER_SAMPLER_OPTIONS = [
@@ -262,59 +266,9 @@ def load_styles_config():
         return {"off": {"favorite": False}}
 
 
-def _extract_catalog_entries(raw_data: object, *, favorites_key: str = "favorites") -> Tuple[List[str], List[str]]:
-    favorites: List[str] = []
-    items: List[str] = []
-
-    if isinstance(raw_data, dict):
-        raw_favorites = raw_data.get(favorites_key)
-        if isinstance(raw_favorites, dict):
-            for value in raw_favorites.values():
-                if isinstance(value, Iterable) and not isinstance(value, (str, bytes)):
-                    favorites.extend(str(v).strip() for v in value if isinstance(v, str) and v.strip())
-        elif isinstance(raw_favorites, Iterable) and not isinstance(raw_favorites, (str, bytes)):
-            favorites.extend(str(v).strip() for v in raw_favorites if isinstance(v, str) and v.strip())
-
-        for key, value in raw_data.items():
-            if key == favorites_key:
-                continue
-            if isinstance(value, Iterable) and not isinstance(value, (str, bytes)):
-                items.extend(str(v).strip() for v in value if isinstance(v, str) and v.strip())
-    elif isinstance(raw_data, Iterable) and not isinstance(raw_data, (str, bytes)):
-        items.extend(str(v).strip() for v in raw_data if isinstance(v, str) and v.strip())
-
-    # Remove duplicates while preserving order
-    seen: set[str] = set()
-    deduped_items: List[str] = []
-    for entry in items:
-        if entry and entry not in seen:
-            deduped_items.append(entry)
-            seen.add(entry)
-
-    seen_favorites: set[str] = set()
-    deduped_favorites: List[str] = []
-    for fav in favorites:
-        if fav and fav not in seen_favorites:
-            deduped_favorites.append(fav)
-            seen_favorites.add(fav)
-
-    return deduped_favorites, deduped_items
-
-
 def _load_model_catalog(file_name: str) -> Tuple[List[str], List[str]]:
-    if not file_name:
-        return [], []
-
-    try:
-        if not os.path.exists(file_name):
-            return [], []
-        with open(file_name, 'r') as f:
-            raw_data = json.load(f)
-    except Exception as exc:
-        print(f"Warning: Could not load {file_name}: {exc}")
-        return [], []
-
-    return _extract_catalog_entries(raw_data)
+    index = model_catalog.get(file_name)
+    return list(index.favorites), list(index.items)
 
 
 def _get_first_model_from_catalog(model_type: str) -> Optional[str]:
@@ -330,7 +284,67 @@ def _get_first_model_from_catalog(model_type: str) -> Optional[str]:
     return None
 
 
-def load_settings():
+# Files whose contents feed the validation in _load_settings_from_disk. A change
+# to any of them (mtime or size) invalidates the cached snapshot.
+SETTINGS_DEPENDENCY_FILES = (
+    'settings.json',
+    *MODEL_CATALOG_FILES.values(),
+    'cliplist.json',
+    'llm_models.json',
+    'styles_config.json',
+)
+
+_settings_snapshot_lock = threading.Lock()
+_settings_snapshot: Optional[Mapping] = None
+_settings_snapshot_key = None
+
+
+def _settings_files_signature():
+    signature = []
+    for file_name in SETTINGS_DEPENDENCY_FILES:
+        try:
+            stat_result = os.stat(file_name)
+            signature.append((file_name, stat_result.st_mtime_ns, stat_result.st_size))
+        except OSError:
+            signature.append((file_name, None, None))
+    return tuple(signature)
+
+
+def invalidate_settings_cache():
+    global _settings_snapshot, _settings_snapshot_key
+    with _settings_snapshot_lock:
+        _settings_snapshot = None
+        _settings_snapshot_key = None
+
+
+def load_settings() -> Mapping:
+    """Return the validated settings as a read-only mapping.
+
+    The snapshot is rebuilt only when settings.json or one of the catalogs it is
+    validated against changes on disk, or after save_settings. Use
+    load_settings_for_update() to get a mutable copy for editing.
+    """
+    global _settings_snapshot, _settings_snapshot_key
+    signature = _settings_files_signature()
+    with _settings_snapshot_lock:
+        if _settings_snapshot is not None and _settings_snapshot_key == signature:
+            return _settings_snapshot
+
+    settings = _load_settings_from_disk()
+    snapshot = MappingProxyType(dict(settings))
+    with _settings_snapshot_lock:
+        # Loading may have rewritten settings.json with corrections; key on the result.
+        _settings_snapshot = snapshot
+        _settings_snapshot_key = _settings_files_signature()
+    return snapshot
+
+
+def load_settings_for_update() -> dict:
+    """Mutable copy of the current settings, for callers that edit and save them."""
+    return dict(load_settings())
+
+
+def _load_settings_from_disk():
     settings_file = 'settings.json'
     try:
         if not os.path.exists(settings_file):
@@ -864,8 +878,8 @@ def _get_default_settings():
 
     default_t5 = None; default_l = None
     try:
-        if os.path.exists('cliplist.json'):
-            with open('cliplist.json', 'r') as f: clips = json.load(f)
+        clips = model_catalog.get('cliplist.json').raw
+        if isinstance(clips, dict):
             t5_list = clips.get('t5', []); l_list = clips.get('clip_L', [])
             default_t5 = next((c.strip() for c in t5_list if isinstance(c, str) and c.strip()), None) if isinstance(t5_list, list) else None
             default_l = next((c.strip() for c in l_list if isinstance(c, str) and c.strip()), None) if isinstance(l_list, list) else None
@@ -1203,6 +1217,7 @@ def save_settings(settings):
 
         with open(settings_file, 'w') as f:
             json.dump(valid_settings, f, indent=2)
+        invalidate_settings_cache()
     except OSError as e: print(f"Error writing {settings_file}: {e}")
     except TypeError as e: print(f"Type error while saving settings: {e}")
     except Exception as e: print(f"Unexpected error saving settings: {e}"); traceback.print_exc()
@@ -1210,14 +1225,10 @@ def save_settings(settings):
 
 def get_model_choices(settings):
     choices: List[discord.SelectOption] = []
-    catalogs: Dict[str, Dict[str, set[str]]] = {}
-
-    for model_type in MODEL_SELECTION_PREFIX:
-        favorites, items = _load_model_catalog(MODEL_CATALOG_FILES.get(model_type, ""))
-        catalogs[model_type] = {
-            "favorites": {f for f in favorites},
-            "items": {i for i in items},
-        }
+    catalogs = {
+        model_type: model_catalog.get(MODEL_CATALOG_FILES.get(model_type, ""))
+        for model_type in MODEL_SELECTION_PREFIX
+    }
 
     current_model_setting = settings.get('selected_model')
     current_model_value = current_model_setting.strip() if isinstance(current_model_setting, str) else None
@@ -1230,8 +1241,8 @@ def get_model_choices(settings):
             continue
         prefix_label = MODEL_SELECTION_PREFIX[model_type]
         display_tag = prefix_label.upper()
-        favorites_sorted = sorted(catalogs[model_type]["favorites"], key=str.lower)
-        items_sorted = sorted(catalogs[model_type]["items"], key=str.lower)
+        favorites_sorted = catalogs[model_type].favorites_sorted
+        items_sorted = catalogs[model_type].items_sorted
 
         for model in favorites_sorted:
             value = f"{prefix_label}: {model}"
@@ -1255,7 +1266,7 @@ def get_model_choices(settings):
         current_type, actual_name = resolve_model_type_from_prefix(current_model_value)
         display_prefix = MODEL_SELECTION_PREFIX.get(current_type, current_model_value.split(":", 1)[0].strip() if ":" in current_model_value else current_type or "?")
         display_tag = display_prefix.upper()
-        favorites_for_type = catalogs.get(current_type, {}).get("favorites", set())
+        favorites_for_type = catalogs[current_type].favorites if current_type in catalogs else ()
         actual_display_name = actual_name or (current_model_value.split(":", 1)[-1].strip() if ":" in current_model_value else current_model_value)
         is_favorite = bool(actual_display_name and actual_display_name in favorites_for_type)
         label_prefix = "⭐ " if is_favorite else ""
@@ -1284,7 +1295,7 @@ def get_model_choices(settings):
 def _build_model_choice_options(settings, model_type: str, setting_key: str) -> List[discord.SelectOption]:
     """Return select options for a specific model catalog."""
 
-    favorites, items = _load_model_catalog(MODEL_CATALOG_FILES.get(model_type, ""))
+    catalog_index = model_catalog.get(MODEL_CATALOG_FILES.get(model_type, ""))
 
     current_value = settings.get(setting_key)
     if isinstance(current_value, str):
@@ -1296,13 +1307,14 @@ def _build_model_choice_options(settings, model_type: str, setting_key: str) ->
         alias_value = settings.get(WAN_CHECKPOINT_KEY)
         if isinstance(alias_value, str) and alias_value.strip():
             current_value = alias_value.strip()
-            settings[setting_key] = current_value
+            if isinstance(settings, dict):
+                settings[setting_key] = current_value
 
     display_tag = MODEL_SELECTION_PREFIX.get(model_type, model_type.upper())
     canonical_options: List[Dict[str, str]] = []
     seen: set[str] = set()
 
-    for model in sorted(favorites, key=str.lower):
+    for model in catalog_index.favorites_sorted:
         value = model
         if value not in seen:
             canonical_options.append({
@@ -1311,7 +1323,7 @@ def _build_model_choice_options(settings, model_type: str, setting_key: str) ->
             })
             seen.add(value)
 
-    for model in sorted(items, key=str.lower):
+    for model in catalog_index.items_sorted:
         value = model
         if value not in seen:
             canonical_options.append({
@@ -1507,26 +1519,14 @@ def get_qwen_edit_ksampler_scheduler_choices(settings):
 
 def get_clip_choices(settings, clip_type_key, setting_key):
     choices = []
-    clips_data = {}
-    try:
-        if os.path.exists('cliplist.json'):
-            with open('cliplist.json', 'r') as f:
-                clips_data = json.load(f)
-        if not isinstance(clips_data, dict):
-            clips_data = {}
-    except Exception as e:
-        print(f"Error loading cliplist.json: {e}")
-        clips_data = {}
+    clips_index = model_catalog.get('cliplist.json')
 
     current_clip = settings.get(setting_key)
     if isinstance(current_clip, str):
         current_clip = current_clip.strip()
 
-    favorites_raw = clips_data.get('favorites', {}).get(clip_type_key, [])
-    favorites = sorted([f.strip() for f in favorites_raw if isinstance(f, str)])
-
-    all_clips_raw = clips_data.get(clip_type_key, [])
-    all_clips = sorted([c.strip() for c in all_clips_raw if isinstance(c, str)])
+    favorites = clips_index.favorites_by_key_sorted.get(clip_type_key, ())
+    all_clips = clips_index.by_key_sorted.get(clip_type_key, ())
 
     canonical_options = []
     seen_values = set()
@@ -2008,45 +2008,21 @@ def get_mp_size_choices(settings):
     return choices[:20]
 
 def get_upscale_model_choices(settings, setting_key: str):
-    choices = []; models_data = {}; # Changed var name to avoid conflict
-    try:
-        from comfyui_api import get_available_comfyui_models
-        models_data = get_available_comfyui_models(suppress_summary_print=True)
-    except Exception: pass
+    choices = []
+    models_data = model_catalog.get_comfyui_models()
     upscale_models_raw = []
     if isinstance(models_data, dict):
         upscale_models_raw.extend(models_data.get('upscaler', []))
         if not upscale_models_raw: upscale_models_raw.extend(models_data.get('unet', [])) # Fallback
     # Include locally available models from the configured directory as a
     # fallback in case the ComfyUI API does not report any upscalers.
-    try:
-        with open('config.json', 'r') as cfg_file:
-            cfg_data = json.load(cfg_file)
-    except (FileNotFoundError, json.JSONDecodeError, TypeError):
-        cfg_data = {}
-
-    local_upscale_models = set()
-    upscale_root = None
-    if isinstance(cfg_data, dict):
-        upscale_root = cfg_data.get('MODELS', {}).get('UPSCALE_MODELS') if isinstance(cfg_data.get('MODELS', {}), dict) else None
-
-    if isinstance(upscale_root, str) and upscale_root.strip():
-        normalized_root = os.path.abspath(upscale_root.strip())
-        if os.path.isdir(normalized_root):
-            try:
-                allowed_exts = {'.pth', '.pt', '.onnx', '.safetensors', '.ckpt', '.bin'}
-                for entry in os.listdir(normalized_root):
-                    base = entry.strip()
-                    if not base:
-                        continue
-                    _, ext = os.path.splitext(base)
-                    if ext.lower() in allowed_exts:
-                        local_upscale_models.add(base)
-            except OSError as os_error:
-                print(f"SettingsManager: Unable to scan upscale model directory '{normalized_root}': {os_error}")
+    local_upscale_models = ()
+    upscale_root = config_service.models_dir('UPSCALE_MODELS')
+    if upscale_root:
+        local_upscale_models = model_catalog.list_directory(upscale_root)
 
     if local_upscale_models:
-        upscale_models_raw.extend(sorted(local_upscale_models))
+        upscale_models_raw.extend(local_upscale_models)
 
     upscale_models = sorted(list(set(u.strip() for u in upscale_models_raw if isinstance(u, str) and u.strip())))
     current_upscale_model_setting = settings.get(setting_key)
@@ -2074,12 +2050,7 @@ def get_upscale_model_choices(settings, setting_key: str):
 
 def _build_vae_choices(settings, setting_key: str):
     choices = []
-    models_data = {}
-    try:
-        from comfyui_api import get_available_comfyui_models
-        models_data = get_available_comfyui_models(suppress_summary_print=True)
-    except Exception:
-        models_data = {}
+    models_data = model_catalog.get_comfyui_models()
 
     vae_models_raw = models_data.get('vae', []) if isinstance(models_data, dict) else []
     vae_models = sorted(list({v.strip() for v in vae_models_raw if isinstance(v, str)}))
@@ -2162,18 +2133,12 @@ def get_editing_mode_choices(settings):
 
 def get_kontext_model_choices(settings):
     choices = []
-    flux_models_data = {}
-    try:
-        if os.path.exists('modelslist.json'):
-            with open('modelslist.json', 'r') as f: flux_models_data = json.load(f)
-        if not isinstance(flux_models_data, dict): flux_models_data = {}
-    except Exception: flux_models_data = {}
+    flux_index = model_catalog.get(MODEL_CATALOG_FILES['flux'])
 
     current_kontext_model = settings.get('selected_kontext_model')
     if isinstance(current_kontext_model, str): current_kontext_model = current_kontext_model.strip()
 
-    flux_favorites_raw = flux_models_data.get('favorites', [])
-    flux_favorites = [f.strip() for f in flux_favorites_raw if isinstance(f, str)]
+    flux_favorites = flux_index.favorites
     
     canonical_options = []
     seen_values = set()
@@ -2183,11 +2148,11 @@ def get_kontext_model_choices(settings):
             canonical_options.append({'label': f"⭐ {model}", 'value': model})
             seen_values.add(model)
             
-    all_flux_models_raw = []
+    all_flux_models = set()
     for model_type_key in ['safetensors', 'sft', 'gguf']:
-        all_flux_models_raw.extend(flux_models_data.get(model_type_key, []))
+        all_flux_models.update(flux_index.by_key_sorted.get(model_type_key, ()))
     
-    for model in sorted(list(set(m.strip() for m in all_flux_models_raw if isinstance(m, str)))):
+    for model in sorted(all_flux_models):
         if model not in seen_values:
             canonical_options.append({'label': model, 'value': model})
             seen_values.add(model)
@@ -0,0 +1,112 @@
+"""Short-circuit source images that are the bot's own outputs.
+
+Upscale / vary / edit / animate buttons usually point at an image this bot
+generated.  Its attachment filename starts with the job prefix and id
+(``GEN_1a2b3c4d_00001_.png``, possibly re-encoded by result delivery), and
+``queue_manager`` remembers the job's ``image_paths``, so the original file in
+OUTPUTS can be found without touching Discord's CDN.  Dimensions come from the
+file header and ComfyUI is given the local path when it runs on this machine,
+or a signed output-server link otherwise.  Anything that cannot be matched
+falls back to the attachment URL.
+"""
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+from bot_config_loader import config_service
+from file_management import extract_job_id
+from queue_manager import queue_manager
+from utils.image_probe import image_dimension_cache, parse_image_dimensions
+from utils.net_utils import is_loopback_host
+
+_HEADER_READ_BYTES = 64 * 1024
+
+
+@dataclass
+class SourceImage:
+    url_or_path: str
+    original_url: str
+    local_path: Optional[str] = None
+    dimensions: Optional[Tuple[int, int]] = None
+
+    @property
+    def is_local(self) -> bool:
+        return self.local_path is not None
+
+
+def _comfyui_reads_local_files() -> bool:
+    """``SOURCE_IMAGES.LOCAL_PATHS``: true/false, or "auto" (ComfyUI on a loopback address)."""
+    setting = config_service.section('SOURCE_IMAGES').get('LOCAL_PATHS', 'auto')
+    if isinstance(setting, bool):
+        return setting
+    normalized = str(setting).strip().lower()
+    if normalized in ('true', '1', 'yes'):
+        return True
+    if normalized in ('false', '0', 'no'):
+        return False
+    return is_loopback_host(config_service.comfyui.host)
+
+
+def read_local_dimensions(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        with open(path, 'rb') as f:
+            return parse_image_dimensions(f.read(_HEADER_READ_BYTES))
+    except OSError as e:
+        print(f"Warning: Could not read image header of {path}: {e}")
+        return None
+
+
+def find_local_output(filename: str, image_index: Optional[int] = None) -> Optional[str]:
+    """Local output file behind an attachment named ``filename``, if this bot produced it."""
+    job_id = extract_job_id(filename)
+    job_data = queue_manager.get_job_data_by_id(job_id) if job_id else None
+    if not job_data:
+        return None
+    paths = sorted(os.path.normpath(p) for p in (job_data.get('image_paths') or []) if p)
+
+    # Result delivery may re-encode (.png -> .webp), so match on the file stem.
+    stem = os.path.splitext(os.path.basename(filename))[0].lower()
+    for path in paths:
+        if os.path.splitext(os.path.basename(path))[0].lower() == stem and os.path.isfile(path):
+            return os.path.abspath(path)
+    # Contact sheets carry the job id but not the per-image name.
+    if image_index and 1 <= image_index <= len(paths) and os.path.isfile(paths[image_index - 1]):
+        return os.path.abspath(paths[image_index - 1])
+    return None
+
+
+def resolve_source_image(url: str, filename: Optional[str] = None, image_index: Optional[int] = None, *, output_server=None) -> SourceImage:
+    """What to hand ComfyUI for the image at ``url`` (a Discord attachment URL).
+
+    ``filename`` defaults to the last path segment of ``url``.  When the
+    image is a local output, ``url_or_path`` is the local path (ComfyUI on
+    this machine), a signed link from ``output_server`` if it is running, or
+    ``url`` itself; ``dimensions`` is filled from the file header or the job.
+    """
+    if not filename:
+        filename = unquote(os.path.basename(urlsplit(url).path))
+    local_path = find_local_output(filename, image_index) if filename else None
+    if local_path is None:
+        return SourceImage(url_or_path=url, original_url=url)
+
+    dimensions = read_local_dimensions(local_path)
+    if dimensions is None:
+        job_data = queue_manager.get_job_data_by_id(extract_job_id(filename)) or {}
+        try:
+            dimensions = (int(job_data['width']), int(job_data['height']))
+        except (KeyError, TypeError, ValueError):
+            dimensions = None
+
+    if _comfyui_reads_local_files():
+        target = local_path
+    else:
+        target = (output_server.link_for(local_path) if output_server is not None else None) or url
+
+    if dimensions:
+        image_dimension_cache.put(url, dimensions)
+        if target != local_path:
+            image_dimension_cache.put(target, dimensions)
+    return SourceImage(url_or_path=target, original_url=url, local_path=local_path, dimensions=dimensions)
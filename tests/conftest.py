@@ -186,6 +186,11 @@ def _ensure_discord_stub() -> None:
     class InteractionResponded(DiscordException):
         pass
 
+    class RateLimited(DiscordException):
+        def __init__(self, retry_after: float):
+            super().__init__(f"Too many requests. Retry in {retry_after:.2f} seconds.")
+            self.retry_after = retry_after
+
     class NotFound(DiscordException):
         def __init__(self, code: int = 0, text: str = ""):
             super().__init__(text)
@@ -197,6 +202,7 @@ def _ensure_discord_stub() -> None:
     errors_module.HTTPException = HTTPException
     errors_module.InteractionResponded = InteractionResponded
     errors_module.NotFound = NotFound
+    errors_module.RateLimited = RateLimited
 
     abc_module = types.ModuleType("discord.abc")
     abc_module.Messageable = Messageable
@@ -283,6 +289,11 @@ def _ensure_aiohttp_stub() -> None:
 def _ensure_pillow_stub() -> None:
     if "PIL" in sys.modules:
         return
+    try:
+        import PIL.Image  # noqa: F401
+        return
+    except ImportError:
+        pass
 
     pil_module = types.ModuleType("PIL")
     image_module = types.ModuleType("PIL.Image")
@@ -0,0 +1,70 @@
+import json
+import os
+
+from bot_config_loader import ConfigService
+
+
+def _write_config(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+
+def _base_config(tmp_path, **overrides):
+    data = {
+        "COMFYUI_API": {"HOST": "10.0.0.5", "PORT": "9000"},
+        "LLM_ENHANCER": {"GEMINI_API_KEY": "", "GROQ_API_KEY": "groq-key", "OPENAI_API_KEY": ""},
+        "OUTPUTS": {"GENERATIONS": str(tmp_path / "gens")},
+    }
+    data.update(overrides)
+    return data
+
+
+def test_sections_are_typed_and_defaults_are_filled(tmp_path):
+    config_path = tmp_path / "config.json"
+    _write_config(config_path, _base_config(tmp_path))
+
+    service = ConfigService(str(config_path))
+
+    assert service.comfyui.host == "10.0.0.5"
+    assert service.comfyui.port == 9000
+    assert service.llm_api_key("groq") == "groq-key"
+    assert service.llm_api_key("gemini") == ""
+    assert service.output_dir("GENERATIONS") == os.path.abspath(str(tmp_path / "gens"))
+    assert service.output_dir("KONTEXT_EDITS", "GENERATIONS") == os.path.abspath(str(tmp_path / "gens"))
+    assert service.models_dir("UPSCALE_MODELS") is None
+    assert "BOT_INTERNAL_API" in service.data
+
+
+def test_reload_updates_data_in_place_and_notifies_subscribers(tmp_path):
+    config_path = tmp_path / "config.json"
+    _write_config(config_path, _base_config(tmp_path))
+    service = ConfigService(str(config_path))
+    shared_view = service.data
+    seen_keys = []
+    service.subscribe(lambda svc: seen_keys.append(svc.llm_enhancer.gemini_api_key))
+
+    assert service.reload_if_changed() is False
+
+    _write_config(config_path, _base_config(
+        tmp_path, LLM_ENHANCER={"GEMINI_API_KEY": "new-gemini-key"}, MODELS={"UPSCALE_MODELS": str(tmp_path)},
+    ))
+    assert service.reload_if_changed(force=True) is True
+
+    assert shared_view is service.data
+    assert shared_view["LLM_ENHANCER"]["GEMINI_API_KEY"] == "new-gemini-key"
+    assert service.models_dir("UPSCALE_MODELS") == os.path.abspath(str(tmp_path))
+    assert seen_keys == ["", "new-gemini-key"]
+
+
+def test_invalid_file_keeps_last_good_config(tmp_path):
+    config_path = tmp_path / "config.json"
+    _write_config(config_path, _base_config(tmp_path))
+    service = ConfigService(str(config_path))
+
+    with open(config_path, "w") as f:
+        f.write('{"COMFYUI_API": ')
+    service.RELOAD_CHECK_INTERVAL = 0
+
+    assert service.reload_if_changed() is False
+    assert service.comfyui.host == "10.0.0.5"
+    assert service.data["LLM_ENHANCER"]["GROQ_API_KEY"] == "groq-key"
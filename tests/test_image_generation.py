@@ -1,4 +1,5 @@
 import asyncio
+import json
 import pytest
 
 import image_generation
@@ -47,3 +48,49 @@ def test_modify_prompt_hydrates_sdxl_checkpoint(monkeypatch):
     loader_node = prompt_payload[str(SDXL_CHECKPOINT_LOADER_NODE)]
     assert loader_node["inputs"]["ckpt_name"] == "custom_model.safetensors"
     assert job_details["model_used"] == "custom_model.safetensors"
+
+
+def test_modify_prompt_reuses_cached_plan_until_inputs_change(monkeypatch):
+    selected_model = "sdxl::custom_model.safetensors"
+    fake_settings = {
+        "default_guidance_sdxl": 6.5,
+        "sdxl_steps": 24,
+        "default_style_sdxl": "neon",
+        "default_mp_size": "1",
+        "default_batch_size": 1,
+        "selected_model": selected_model,
+    }
+    styles = {"neon": {"model_type": "all", "lora_1": {"on": True, "lora": "neon.safetensors", "strength": 0.8}}}
+    inventory_calls = []
+
+    def fake_inventory(suppress_summary_print=True):
+        inventory_calls.append(1)
+        return {"checkpoint": ["custom_model.safetensors"], "unet": [], "clip": []}
+
+    image_generation.generation_plan_cache.clear()
+    monkeypatch.setattr(image_generation, "load_settings", lambda: fake_settings)
+    monkeypatch.setattr(image_generation, "load_styles_config", lambda: styles)
+    monkeypatch.setattr(image_generation, "check_available_models_api", fake_inventory)
+
+    def run(seed, text):
+        return asyncio.run(
+            image_generation.modify_prompt(
+                original_prompt_text=text,
+                params_dict={},
+                enhancer_info={"used": False},
+                is_img2img=False,
+                explicit_seed=seed,
+                selected_model_name_with_prefix=selected_model,
+            )
+        )[1]
+
+    first = run(1, "first prompt")
+    second = run(2, "second prompt")
+    styles["neon"]["lora_1"]["strength"] = 0.3
+    third = run(3, "third prompt")
+
+    assert len(inventory_calls) == 2
+    assert first[str(SDXL_CHECKPOINT_LOADER_NODE)] == second[str(SDXL_CHECKPOINT_LOADER_NODE)]
+    texts = [json.dumps(payload) for payload in (first, second)]
+    assert "first prompt" in texts[0] and "second prompt" in texts[1] and "first prompt" not in texts[1]
+    assert '"strength": 0.3' in json.dumps(third) and '"strength": 0.3' not in texts[1]
@@ -0,0 +1,83 @@
+import struct
+
+from utils import image_probe
+from utils.image_probe import ImageDimensionCache, parse_image_dimensions
+
+
+def _png(width, height):
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", width, height) + b"\x08\x02\x00\x00\x00"
+
+
+def _jpeg(width, height, exif_bytes=0):
+    app1 = b"\xff\xe1" + struct.pack(">H", exif_bytes + 2) + b"\0" * exif_bytes
+    sof0 = b"\xff\xc0" + struct.pack(">HBHH", 17, 8, height, width) + b"\0" * 10
+    return b"\xff\xd8" + app1 + sof0 + b"\xff\xda"
+
+
+def _webp_vp8x(width, height):
+    payload = b"VP8X" + struct.pack("<I", 10) + b"\0\0\0\0" + (width - 1).to_bytes(3, "little") + (height - 1).to_bytes(3, "little")
+    return b"RIFF" + struct.pack("<I", len(payload) + 4) + b"WEBP" + payload
+
+
+class _FakeResponse:
+    def __init__(self, body, status_code, headers, served):
+        self._body = body
+        self.status_code = status_code
+        self.headers = headers
+        self._served = served
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=8192):
+        for start in range(0, len(self._body), chunk_size):
+            chunk = self._body[start:start + chunk_size]
+            self._served.append(len(chunk))
+            yield chunk
+
+    def close(self):
+        pass
+
+
+def _serve(monkeypatch, body, honour_range=True):
+    requests_seen = []
+    served = []
+
+    def fake_get(url, timeout=None, stream=False, headers=None):
+        requests_seen.append(headers.get("Range"))
+        if not honour_range:
+            return _FakeResponse(body, 200, {}, served)
+        start, end = (int(part) for part in headers["Range"].split("=")[1].split("-"))
+        return _FakeResponse(body[start:end + 1], 206, {"Content-Range": f"bytes {start}-{end}/{len(body)}"}, served)
+
+    monkeypatch.setattr(image_probe.requests, "get", fake_get)
+    monkeypatch.setattr(image_probe, "image_dimension_cache", ImageDimensionCache())
+    return requests_seen, served
+
+
+def test_parser_reads_common_formats_from_header_bytes():
+    assert parse_image_dimensions(_png(1024, 768)) == (1024, 768)
+    assert parse_image_dimensions(_jpeg(1920, 1080)) == (1920, 1080)
+    assert parse_image_dimensions(_webp_vp8x(832, 1216)) == (832, 1216)
+    assert parse_image_dimensions(b"GIF89a" + struct.pack("<HH", 64, 32)) == (64, 32)
+    assert parse_image_dimensions(_png(1024, 768)[:20]) is None
+
+
+def test_probe_stops_after_header_and_caches_by_attachment_path(monkeypatch):
+    body = _png(1344, 768) + b"\0" * 500_000
+    requests_seen, served = _serve(monkeypatch, body, honour_range=False)
+
+    url = "https://cdn.discordapp.com/attachments/1/2/image.png?ex=1&hm=abc"
+    assert image_probe.probe_image_dimensions(url) == (1344, 768)
+    assert sum(served) <= 4096
+
+    assert image_probe.probe_image_dimensions(url.replace("hm=abc", "hm=def")) == (1344, 768)
+    assert len(requests_seen) == 1
+
+
+def test_probe_requests_next_range_for_jpegs_with_large_metadata(monkeypatch):
+    body = _jpeg(3000, 2000, exif_bytes=65_533) + b"\0" * 100_000
+    requests_seen, _ = _serve(monkeypatch, body)
+
+    assert image_probe.probe_image_dimensions("https://example.com/photo.jpg") == (3000, 2000)
+    assert requests_seen == ["bytes=0-65535", f"bytes=65536-{2 * 1024 * 1024 - 1}"]
@@ -0,0 +1,105 @@
+import asyncio
+
+from input_image_cache import InputImageCache
+
+
+def _workflow(*urls):
+    workflow = {"9": {"class_type": "SaveImage", "inputs": {"filename_prefix": "EDIT_x"}}}
+    for index, url in enumerate(urls, start=1):
+        workflow[f"load_image_{index}"] = {
+            "class_type": "LoadImageFromUrlOrPath",
+            "inputs": {"url_or_path": url},
+            "_meta": {"title": f"Load {index}"},
+        }
+    return workflow
+
+
+def _cache(contents, max_bytes=1024 * 1024):
+    downloads, uploads = [], []
+
+    def downloader(url):
+        downloads.append(url)
+        if url not in contents:
+            raise ConnectionError("gone")
+        return contents[url]
+
+    def uploader(data, filename):
+        uploads.append(filename)
+        return filename
+
+    cache = InputImageCache(
+        settings={"enabled": True, "max_bytes": max_bytes, "max_entries": 100},
+        downloader=downloader,
+        uploader=uploader,
+    )
+    return cache, downloads, uploads
+
+
+def test_remote_inputs_are_uploaded_once_and_reused():
+    first = "https://cdn.discordapp.com/attachments/1/2/cat.png?ex=1&hm=a"
+    other_url_same_bytes = "https://cdn.discordapp.com/attachments/3/4/cat-copy.png"
+    cache, downloads, uploads = _cache({
+        first: b"\x89PNG cat",
+        first.replace("hm=a", "hm=b"): b"\x89PNG cat",
+        other_url_same_bytes: b"\x89PNG cat",
+        "https://example.com/dog.jpg": b"\xff\xd8 dog",
+    })
+
+    prepared = asyncio.run(cache.prepare_workflow(_workflow(first, "https://example.com/dog.jpg", "/local/output.png")))
+
+    assert prepared["load_image_1"]["class_type"] == "LoadImage"
+    assert prepared["load_image_1"]["inputs"]["image"].endswith(".png")
+    assert prepared["load_image_1"]["_meta"] == {"title": "Load 1"}
+    assert prepared["load_image_2"]["inputs"]["image"].endswith(".jpg")
+    assert prepared["load_image_3"]["class_type"] == "LoadImageFromUrlOrPath"
+    assert len(uploads) == 2
+
+    asyncio.run(cache.prepare_workflow(_workflow(first.replace("hm=a", "hm=b"))))
+    asyncio.run(cache.prepare_workflow(_workflow(other_url_same_bytes)))
+
+    assert len(downloads) == 3
+    assert len(uploads) == 2
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["content_hits"], stats["misses"]) == (1, 1, 3)
+
+
+def test_failed_download_leaves_url_for_comfyui():
+    cache, _, uploads = _cache({})
+    workflow = _workflow("https://cdn.discordapp.com/attachments/1/2/expired.png")
+
+    prepared = asyncio.run(cache.prepare_workflow(workflow))
+
+    assert prepared["load_image_1"] == workflow["load_image_1"]
+    assert uploads == []
+    assert cache.get_stats()["failures"] == 1
+
+
+def test_cache_evicts_least_recently_used_content_over_budget():
+    urls = [f"https://example.com/{name}.png" for name in ("a", "b", "c")]
+    cache, downloads, _ = _cache({url: url.encode() * 10 for url in urls}, max_bytes=600)
+
+    for url in urls:
+        cache.uploaded_name_for(url)
+    cache.uploaded_name_for(urls[0])
+
+    assert cache.get_stats()["evictions"] == 2
+    assert downloads == urls + [urls[0]]
+
+
+def test_evicted_uploads_are_deleted_from_the_comfyui_input_folder(tmp_path):
+    urls = [f"https://example.com/{name}.png" for name in ("a", "b", "c")]
+    contents = {url: url.encode() * 10 for url in urls}
+
+    def uploader(data, filename):
+        (tmp_path / filename).write_bytes(data)
+        return filename
+
+    cache = InputImageCache(
+        settings={"enabled": True, "max_bytes": 600, "max_entries": 100, "comfyui_input_dir": str(tmp_path)},
+        downloader=contents.__getitem__,
+        uploader=uploader,
+    )
+    names = [cache.uploaded_name_for(url) for url in urls]
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(names[1:])
+    assert cache.get_stats()["uploads_deleted"] == 1
@@ -0,0 +1,103 @@
+import asyncio
+
+from job_scheduler import ModelAffinityScheduler, workflow_affinity_key
+
+
+def _payload(model, lora="None"):
+    return {
+        "1": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": model}},
+        "2": {"class_type": "Power Lora Loader (rgthree)", "inputs": {"lora_1": {"on": lora != "None", "lora": lora, "strength": 1.0}}},
+        "3": {"class_type": "LoadImageFromUrlOrPath", "inputs": {"url_or_path": "https://example.com/a.png"}},
+    }
+
+
+def test_affinity_key_covers_models_and_enabled_loras_only():
+    assert workflow_affinity_key(_payload("a.safetensors")) == (("ckpt_name", "a.safetensors"),)
+    assert workflow_affinity_key(_payload("a.safetensors", "neon.safetensors")) == (
+        ("ckpt_name", "a.safetensors"),
+        ("lora", "neon.safetensors"),
+    )
+
+
+def test_busy_window_groups_jobs_by_model_and_reports_swaps_avoided():
+    dispatched = []
+    busy = {"value": False}
+
+    def dispatch(payload):
+        dispatched.append(payload["1"]["inputs"]["ckpt_name"])
+        return f"prompt-{len(dispatched)}"
+
+    scheduler = ModelAffinityScheduler(
+        dispatch,
+        settings={"enabled": True, "window_seconds": 0.2, "max_window_jobs": 8},
+        busy_probe=lambda: busy["value"],
+    )
+
+    async def scenario():
+        first = await scheduler.submit(_payload("flux.gguf"))
+        busy["value"] = True
+        arrivals = ["sdxl.safetensors", "flux.gguf", "sdxl.safetensors", "flux.gguf"]
+        results = await asyncio.gather(*(scheduler.submit(_payload(model)) for model in arrivals))
+        return first, results
+
+    first, results = asyncio.run(scenario())
+
+    assert first == "prompt-1"
+    assert dispatched == ["flux.gguf", "flux.gguf", "flux.gguf", "sdxl.safetensors", "sdxl.safetensors"]
+    assert sorted(results) == ["prompt-2", "prompt-3", "prompt-4", "prompt-5"]
+    stats = scheduler.get_stats()
+    assert stats["estimated_swaps_in_arrival_order"] == 4
+    assert stats["estimated_swaps_dispatched"] == 1
+    assert stats["estimated_swaps_avoided"] == 3
+    assert stats["max_wait_seconds"] < 1.0
+
+
+def test_dispatch_errors_reach_the_caller():
+    def dispatch(payload):
+        raise ConnectionError("ComfyUI is down")
+
+    scheduler = ModelAffinityScheduler(
+        dispatch,
+        settings={"enabled": True, "window_seconds": 0.0, "max_window_jobs": 8},
+        busy_probe=lambda: False,
+    )
+
+    async def scenario():
+        try:
+            await scheduler.submit(_payload("a.safetensors"))
+        except ConnectionError as exc:
+            return str(exc)
+        return None
+
+    assert asyncio.run(scenario()) == "ComfyUI is down"
+
+
+def test_submit_many_shares_one_window_and_skips_the_wait_for_a_single_batch():
+    dispatched = []
+
+    def dispatch(payload):
+        model = payload["1"]["inputs"]["ckpt_name"]
+        if model == "broken.safetensors":
+            raise ConnectionError("ComfyUI is down")
+        dispatched.append(model)
+        return f"prompt-{len(dispatched)}"
+
+    scheduler = ModelAffinityScheduler(
+        dispatch,
+        settings={"enabled": True, "window_seconds": 5.0, "max_window_jobs": 8},
+        busy_probe=lambda: True,
+    )
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        models = ["sdxl.safetensors", "flux.gguf", "broken.safetensors", "sdxl.safetensors"]
+        results = await scheduler.submit_many([_payload(model) for model in models])
+        return results, loop.time() - started
+
+    results, elapsed = asyncio.run(scenario())
+
+    assert elapsed < 1.0
+    assert dispatched == ["sdxl.safetensors", "sdxl.safetensors", "flux.gguf"]
+    assert results[0] == "prompt-1" and results[1] == "prompt-3" and results[3] == "prompt-2"
+    assert isinstance(results[2], ConnectionError)
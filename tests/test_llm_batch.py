@@ -0,0 +1,85 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import settings_manager
+from utils import llm_enhancer
+from utils.llm_cache import LLMResponseCache
+
+
+def _setup(monkeypatch, tmp_path, batch_answer):
+    calls = []
+
+    async def fake_call(provider, prompt, model_name, system_instruction, reasoning_effort, image_urls):
+        if "BATCH MODE" in system_instruction:
+            calls.append("batch")
+            return batch_answer(json.loads(prompt)), None
+        calls.append(prompt)
+        return f"single {prompt}", None
+
+    cache = LLMResponseCache(settings={"enabled": True, "bypass": False, "ttl_seconds": 3600, "max_entries": 100, "path": str(tmp_path / "llm.sqlite3")})
+    monkeypatch.setattr(llm_enhancer, "_call_provider", fake_call)
+    monkeypatch.setattr(llm_enhancer, "llm_response_cache", cache)
+    monkeypatch.setattr(settings_manager, "load_settings", lambda: {"llm_provider": "groq"})
+    return calls
+
+
+def test_batch_answers_are_split_and_cached_for_single_lookups(monkeypatch, tmp_path):
+    calls = _setup(monkeypatch, tmp_path, lambda items: "```json\n" + json.dumps([f"rich {p}" for p in items]) + "\n```")
+    prompts = ["a cat", "a dog", "a fox"]
+
+    results = asyncio.run(llm_enhancer.enhance_prompts_batch(prompts, target_model_type="flux"))
+
+    assert results == [("rich a cat", None), ("rich a dog", None), ("rich a fox", None)]
+    assert calls == ["batch"]
+    assert asyncio.run(llm_enhancer.enhance_prompt("a dog", target_model_type="flux")) == ("rich a dog", None)
+    assert calls == ["batch"]
+
+
+def test_bad_batch_shapes_fall_back_per_item(monkeypatch, tmp_path):
+    calls = _setup(monkeypatch, tmp_path, lambda items: json.dumps(["rich one", ""] + [f"rich {p}" for p in items[2:]]))
+
+    results = asyncio.run(llm_enhancer.enhance_prompts_batch(["one", "two", "three"], batch_size=3))
+
+    assert results == [("rich one", None), ("single two", None), ("rich three", None)]
+    assert calls == ["batch", "two"]
+
+    unparseable = tmp_path / "unparseable"
+    unparseable.mkdir()
+    calls = _setup(monkeypatch, unparseable, lambda items: "Sure! Here you go.")
+    results = asyncio.run(llm_enhancer.enhance_prompts_batch(["x", "y"]))
+    assert results == [("single x", None), ("single y", None)]
+    assert calls == ["batch", "x", "y"]
+
+
+def test_prewarmed_sheet_rows_are_cache_hits_for_generation(monkeypatch, tmp_path):
+    import bot_core_logic
+
+    calls = _setup(monkeypatch, tmp_path, lambda items: json.dumps([f"rich {p}" for p in items]))
+    settings = {"llm_enhancer_enabled": True, "llm_provider": "groq", "selected_model": "flux:model.gguf"}
+    monkeypatch.setattr(bot_core_logic, "load_settings", lambda: settings)
+    monkeypatch.setattr(bot_core_logic, "load_styles_config", lambda: {})
+    monkeypatch.setattr(bot_core_logic, "llm_response_cache", llm_enhancer.llm_response_cache)
+    monkeypatch.setattr(bot_core_logic.config_service, "llm_api_key", lambda provider: "key")
+
+    async def no_ws():
+        return None
+
+    enhancer_infos = []
+
+    async def fake_modify_prompt(original_prompt_text, enhancer_info, **kwargs):
+        enhancer_infos.append((original_prompt_text, enhancer_info["enhanced_text"]))
+        return None, None, "stop before queueing", None
+
+    monkeypatch.setattr(bot_core_logic, "_ensure_ws_client_id", no_ws)
+    monkeypatch.setattr(bot_core_logic, "ig_modify_prompt", fake_modify_prompt)
+
+    rows = ['a cat --ar 16:9 --no "blurry, text"', "a dog --seed 5", "a fox --img https://x.example/a.png"]
+    assert asyncio.run(bot_core_logic.prewarm_prompt_enhancements(rows, "flux")) == 2
+    assert calls == ["batch"]
+
+    for row in rows:
+        asyncio.run(bot_core_logic.execute_generation_logic(SimpleNamespace(), SimpleNamespace(), row, True))
+
+    assert calls == ["batch"]
+    assert enhancer_infos == [("a cat", "rich a cat"), ("a dog", "rich a dog"), ("a fox", None)]
@@ -0,0 +1,57 @@
+import asyncio
+
+import settings_manager
+from utils import llm_enhancer
+from utils.llm_cache import LLMResponseCache
+
+
+def _cache(tmp_path, **overrides):
+    settings = {"enabled": True, "bypass": False, "ttl_seconds": 3600, "max_entries": 10, "path": str(tmp_path / "llm.sqlite3")}
+    settings.update(overrides)
+    return LLMResponseCache(settings=settings)
+
+
+def test_entries_persist_expire_and_are_pruned(monkeypatch, tmp_path):
+    cache = _cache(tmp_path, max_entries=2)
+    cache.put("a", "enhanced a", 2.5)
+    cache.close()
+
+    reopened = _cache(tmp_path, max_entries=2)
+    assert reopened.get("a") == "enhanced a"
+    assert reopened.get_stats()["saved_seconds"] == 2.5
+
+    reopened.put("b", "enhanced b", 1.0)
+    reopened.put("c", "enhanced c", 1.0)
+    assert reopened.get_stats()["entries"] == 2
+
+    expiring = _cache(tmp_path, ttl_seconds=1)
+    monkeypatch.setattr("utils.llm_cache.time.time", lambda: 10**12)
+    assert expiring.get("c") is None
+
+
+def test_key_ignores_attachment_signatures_but_not_prompt_inputs():
+    key = LLMResponseCache.make_key("gemini", "flash", "system", "a cat", ["https://cdn.discordapp.com/a/1/x.png?hm=1"])
+
+    assert key == LLMResponseCache.make_key("gemini", "flash", "system", "a cat", ["https://cdn.discordapp.com/a/1/x.png?hm=2"])
+    assert key != LLMResponseCache.make_key("gemini", "flash", "other system", "a cat", ["https://cdn.discordapp.com/a/1/x.png"])
+    assert key != LLMResponseCache.make_key("groq", "flash", "system", "a cat", ["https://cdn.discordapp.com/a/1/x.png"])
+
+
+def test_enhance_prompt_reuses_cached_answer_unless_bypassed(monkeypatch, tmp_path):
+    calls = []
+
+    async def fake_call(provider, prompt, model_name, system_instruction, reasoning_effort, image_urls):
+        calls.append(prompt)
+        return f"enhanced {prompt}", None
+
+    monkeypatch.setattr(llm_enhancer, "_call_provider", fake_call)
+    monkeypatch.setattr(llm_enhancer, "llm_response_cache", _cache(tmp_path))
+    monkeypatch.setattr(settings_manager, "load_settings", lambda: {"llm_provider": "gemini", "llm_model_gemini": "flash"})
+
+    first = asyncio.run(llm_enhancer.enhance_prompt("a cat", target_model_type="flux"))
+    second = asyncio.run(llm_enhancer.enhance_prompt("a cat", target_model_type="flux"))
+    monkeypatch.setattr(llm_enhancer, "llm_response_cache", _cache(tmp_path, bypass=True))
+    bypassed = asyncio.run(llm_enhancer.enhance_prompt("a cat", target_model_type="flux"))
+
+    assert first == second == bypassed == ("enhanced a cat", None)
+    assert len(calls) == 2
@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+import settings_manager
+from bot_config_loader import config_service
+from utils import llm_enhancer
+from utils.llm_cache import LLMResponseCache
+
+
+def _setup(monkeypatch, delays, failures=(), **hedging):
+    calls = []
+
+    async def fake_call(provider, prompt, model_name, system_instruction, reasoning_effort, image_urls):
+        calls.append(provider)
+        await asyncio.sleep(delays[provider])
+        if provider in failures:
+            return None, f"{provider} is down"
+        return f"{provider}: {prompt}", None
+
+    monkeypatch.setattr(llm_enhancer, "_call_provider", fake_call)
+    monkeypatch.setattr(llm_enhancer, "llm_response_cache", LLMResponseCache(settings={"enabled": False, "bypass": False}))
+    monkeypatch.setattr(settings_manager, "load_settings", lambda: {"llm_provider": "gemini"})
+    config = {"SECONDARY_PROVIDER": "groq", "DEFAULT_BUDGET_SECONDS": 0.05, "MAX_WAIT_SECONDS": 2}
+    config.update(hedging)
+    monkeypatch.setitem(config_service.data, "LLM_HEDGING", config)
+    return calls
+
+
+def test_slow_primary_is_hedged_and_fastest_good_answer_wins(monkeypatch):
+    calls = _setup(monkeypatch, {"gemini": 1.0, "groq": 0.01})
+
+    started = time.monotonic()
+    enhanced, error = asyncio.run(llm_enhancer.enhance_prompt("a fox"))
+
+    assert (enhanced, error) == ("groq: a fox", None)
+    assert calls == ["gemini", "groq"]
+    assert time.monotonic() - started < 0.5
+
+
+def test_fast_primary_never_fires_secondary_and_failure_hedges_immediately(monkeypatch):
+    calls = _setup(monkeypatch, {"gemini": 0.0, "groq": 0.0})
+    assert asyncio.run(llm_enhancer.enhance_prompt("a fox")) == ("gemini: a fox", None)
+    assert calls == ["gemini"]
+
+    calls = _setup(monkeypatch, {"gemini": 0.0, "groq": 0.0}, failures={"gemini", "groq"}, DEFAULT_BUDGET_SECONDS=5)
+    enhanced, error = asyncio.run(llm_enhancer.enhance_prompt("a fox"))
+    assert enhanced is None
+    assert "gemini is down" in error and "groq is down" in error
+
+
+def test_gives_up_after_max_wait_so_the_raw_prompt_is_used(monkeypatch):
+    _setup(monkeypatch, {"gemini": 5.0, "groq": 5.0}, MAX_WAIT_SECONDS=0.2)
+
+    started = time.monotonic()
+    enhanced, error = asyncio.run(llm_enhancer.enhance_prompt("a fox"))
+
+    assert enhanced is None and "original prompt" in error
+    assert time.monotonic() - started < 1.0
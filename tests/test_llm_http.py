@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from utils.llm_http import LLMHTTPError, LLMHttpClient
+
+
+class _FakeResponse:
+    def __init__(self, session, status, body, delay):
+        self.session, self.status, self._body, self._delay = session, status, body, delay
+
+    async def __aenter__(self):
+        self.session.active += 1
+        self.session.peak = max(self.session.peak, self.session.active)
+        await asyncio.sleep(self._delay)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.session.active -= 1
+
+    async def text(self):
+        return self._body
+
+
+class _FakeSession:
+    def __init__(self, status=200, body='{"ok": true}', delay=0.01):
+        self.status, self.body, self.delay = status, body, delay
+        self.active = self.peak = self.created = 0
+        self.closed = False
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        return _FakeResponse(self, self.status, self.body, self.delay)
+
+    async def close(self):
+        self.closed = True
+
+
+def _client(session, concurrency=2):
+    def factory(settings):
+        session.created += 1
+        return session
+
+    settings = {"max_connections_per_provider": 2, "max_concurrent_per_provider": concurrency,
+                "timeout_seconds": 5.0, "connect_timeout_seconds": 1.0}
+    return LLMHttpClient(settings=settings, session_factory=factory)
+
+
+def test_requests_share_one_session_and_respect_provider_concurrency():
+    session = _FakeSession()
+    client = _client(session, concurrency=2)
+
+    async def burst():
+        return await asyncio.gather(*(client.post_json("gemini", "https://x/api?key=s", payload={}) for _ in range(6)))
+
+    results = asyncio.run(burst())
+
+    assert results == [{"ok": True}] * 6
+    assert session.created == 1
+    assert session.peak == 2
+    stats = client.get_stats()["gemini"]
+    assert stats["requests"] == 6 and stats["in_flight"] == 0
+    assert stats["histogram"]["<=0.5s"] == 6
+
+
+def test_http_errors_are_counted_and_hide_query_string():
+    client = _client(_FakeSession(status=404, body="no such model"))
+
+    with pytest.raises(LLMHTTPError) as excinfo:
+        asyncio.run(client.post_json("openai", "https://x/api?key=secret", payload={}))
+
+    assert excinfo.value.status == 404 and excinfo.value.body == "no such model"
+    assert "secret" not in str(excinfo.value)
+    assert client.get_stats()["openai"]["errors"] == 1
+
+
+def test_session_from_a_previous_loop_is_closed_when_replaced():
+    sessions = []
+
+    def factory(settings):
+        sessions.append(_FakeSession())
+        return sessions[-1]
+
+    settings = {"max_connections_per_provider": 2, "max_concurrent_per_provider": 2,
+                "timeout_seconds": 5.0, "connect_timeout_seconds": 1.0}
+    client = LLMHttpClient(settings=settings, session_factory=factory)
+
+    asyncio.run(client.post_json("groq", "https://x/api", payload={}))
+    asyncio.run(client.post_json("groq", "https://x/api", payload={}))
+
+    assert len(sessions) == 2
+    assert sessions[0].closed and not sessions[1].closed
@@ -0,0 +1,51 @@
+import asyncio
+import base64
+import time
+
+from utils import llm_enhancer
+from utils.llm_images import EnhancerImageEncoder
+
+
+def _encoder(responses, delay=0.1):
+    fetched = []
+
+    async def fetcher(url):
+        fetched.append(url)
+        await asyncio.sleep(delay)
+        return responses[url.split("?", 1)[0]]
+
+    encoder = EnhancerImageEncoder(
+        settings={"max_dimension": 1024, "jpeg_quality": 85, "cache_entries": 8, "workers": 2},
+        fetcher=fetcher,
+    )
+    return encoder, fetched
+
+
+def test_images_are_fetched_concurrently_and_cached_per_attachment():
+    urls = [f"https://cdn.discordapp.com/attachments/1/{n}/img.png?hm=a" for n in range(3)]
+    encoder, fetched = _encoder({url.split("?")[0]: ("image/png", f"png{n}".encode()) for n, url in enumerate(urls)})
+
+    started = time.monotonic()
+    results = asyncio.run(encoder.encode_many(urls + [urls[0]]))
+
+    assert time.monotonic() - started < 0.25
+    assert [mime for mime, _ in results] == ["image/png"] * 4
+    assert base64.b64decode(results[2][1]) == b"png2"
+    assert len(fetched) == 3
+
+    asyncio.run(encoder.encode(urls[1].replace("hm=a", "hm=b")))
+    assert len(fetched) == 3
+    assert encoder.get_stats()["hits"] == 1
+
+
+def test_gemini_parts_keep_url_order_and_report_failures(monkeypatch):
+    good = "https://example.com/a.png"
+    bad = "https://example.com/page.html"
+    encoder, _ = _encoder({good: ("image/png", b"a"), bad: ("text/html; charset=utf-8", b"<html>")}, delay=0)
+    monkeypatch.setattr(llm_enhancer, "enhancer_image_encoder", encoder)
+
+    parts, error = asyncio.run(llm_enhancer._fetch_and_encode_images([good, good]))
+    assert error is None and [p["inline_data"]["mime_type"] for p in parts] == ["image/png", "image/png"]
+
+    parts, error = asyncio.run(llm_enhancer._fetch_and_encode_images([good, bad]))
+    assert parts is None and bad in error
@@ -0,0 +1,57 @@
+import json
+import os
+
+from model_catalog import ModelCatalogService
+
+
+def _write_json(path, payload, bump_ns=0):
+    path.write_text(json.dumps(payload))
+    if bump_ns:
+        stat_result = os.stat(path)
+        os.utime(path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + bump_ns))
+
+
+def test_catalog_is_parsed_once_and_indexed(tmp_path, monkeypatch):
+    catalog_path = tmp_path / "cliplist.json"
+    _write_json(catalog_path, {"t5": ["b.safetensors", " a.safetensors"], "favorites": {"t5": ["b.safetensors"]}})
+    service = ModelCatalogService()
+    opened = []
+    real_open = open
+
+    def counting_open(file, *args, **kwargs):
+        opened.append(file)
+        return real_open(file, *args, **kwargs)
+
+    monkeypatch.setattr("builtins.open", counting_open)
+    first = service.get(str(catalog_path))
+    second = service.get(str(catalog_path))
+
+    assert first is second
+    assert opened == [str(catalog_path)]
+    assert first.by_key_sorted["t5"] == ("a.safetensors", "b.safetensors")
+    assert first.favorites_by_key_sorted["t5"] == ("b.safetensors",)
+
+
+def test_catalog_refreshes_on_change_and_invalidate(tmp_path):
+    catalog_path = tmp_path / "modelslist.json"
+    _write_json(catalog_path, {"safetensors": ["Zeta.safetensors", "alpha.safetensors"], "favorites": []})
+    service = ModelCatalogService()
+
+    assert service.get(str(catalog_path)).items_sorted == ("alpha.safetensors", "Zeta.safetensors")
+
+    _write_json(catalog_path, {"safetensors": ["beta.safetensors"], "favorites": ["beta.safetensors"]}, bump_ns=1_000_000)
+    refreshed = service.get(str(catalog_path))
+    assert refreshed.items == ("beta.safetensors",)
+    assert refreshed.favorites_sorted == ("beta.safetensors",)
+
+    service.invalidate(str(catalog_path))
+    assert service.get(str(catalog_path)) is not refreshed
+    assert service.get(str(tmp_path / "missing.json")).items == ()
+
+
+def test_directory_listing_filters_model_extensions(tmp_path):
+    (tmp_path / "4x.pth").write_bytes(b"")
+    (tmp_path / "notes.txt").write_text("x")
+    service = ModelCatalogService()
+
+    assert service.list_directory(str(tmp_path)) == ("4x.pth",)
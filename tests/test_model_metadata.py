@@ -0,0 +1,135 @@
+import json
+import os
+import struct
+
+import model_metadata
+import model_scanner
+from model_metadata import ModelMetadataIndex, parse_model_metadata
+
+
+def _write_safetensors(path, tensors, metadata=None):
+    header = {name: {"dtype": dtype, "shape": shape, "data_offsets": [0, 0]} for name, (dtype, shape) in tensors.items()}
+    if metadata:
+        header["__metadata__"] = metadata
+    encoded = json.dumps(header).encode("utf-8")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(struct.pack("<Q", len(encoded)) + encoded)
+
+
+def _gguf_string(value):
+    encoded = value.encode("utf-8")
+    return struct.pack("<Q", len(encoded)) + encoded
+
+
+def _write_gguf(path, architecture, tensors):
+    body = b"GGUF" + struct.pack("<IQQ", 3, len(tensors), 2)
+    body += _gguf_string("general.architecture") + struct.pack("<I", 8) + _gguf_string(architecture)
+    body += _gguf_string("tokenizer.tokens") + struct.pack("<IIQ", 9, 8, 3)
+    body += b"".join(_gguf_string(token) for token in ("a", "b", "c"))
+    for name, (ggml_type, dims) in tensors.items():
+        body += _gguf_string(name) + struct.pack("<I", len(dims)) + struct.pack(f"<{len(dims)}Q", *dims)
+        body += struct.pack("<IQ", ggml_type, 0)
+    path.write_bytes(body)
+
+
+def test_safetensors_headers_identify_architecture_dtype_and_size(tmp_path):
+    flux_path = tmp_path / "renamed_model.safetensors"
+    _write_safetensors(flux_path, {
+        "double_blocks.0.img_attn.qkv.weight": ("BF16", [3072, 1000]),
+        "single_blocks.0.linear1.weight": ("BF16", [1000, 1000]),
+        "img_in.bias": ("F32", [10]),
+    })
+    lora_path = tmp_path / "style.safetensors"
+    _write_safetensors(
+        lora_path,
+        {"lora_unet_input_blocks_4_1_proj_in.lora_down.weight": ("F16", [4, 640])},
+        metadata={"ss_base_model_version": "sdxl_base_v1-0"},
+    )
+
+    flux = parse_model_metadata(str(flux_path))
+    lora = parse_model_metadata(str(lora_path))
+
+    assert (flux.kind, flux.architecture, flux.dtype) == ("model", "flux", "BF16")
+    assert flux.parameter_count == 3072 * 1000 + 1000 * 1000 + 10
+    assert (lora.kind, lora.architecture) == ("lora", "sdxl")
+
+
+def test_gguf_header_is_parsed_past_large_arrays(tmp_path):
+    wan_path = tmp_path / "wan.gguf"
+    _write_gguf(wan_path, "wan", {"blocks.0.cross_attn.q.weight": (12, (5120, 5120))})
+    encoder_path = tmp_path / "umt5.gguf"
+    _write_gguf(encoder_path, "t5encoder", {"enc.blk.0.attn_q.weight": (8, (4096, 4096))})
+
+    wan = parse_model_metadata(str(wan_path))
+    encoder = parse_model_metadata(str(encoder_path))
+
+    assert (wan.format, wan.kind, wan.architecture, wan.dtype) == ("gguf", "model", "wan", "Q4_K")
+    assert (encoder.kind, encoder.architecture) == ("text_encoder", None)
+
+
+def test_index_reuses_entries_until_file_changes(monkeypatch, tmp_path):
+    path = tmp_path / "model.safetensors"
+    _write_safetensors(path, {"double_blocks.0.x.weight": ("F16", [2, 2])})
+    index = ModelMetadataIndex(cache_file=str(tmp_path / "meta.json"))
+
+    assert index.get(str(path)).architecture == "flux"
+    assert index.get(str(path)).architecture == "flux"
+    assert (index.parsed, index.cache_hits) == (1, 1)
+
+    _write_safetensors(path, {"transformer_blocks.0.img_mod.1.weight": ("BF16", [2, 2]),
+                              "transformer_blocks.0.txt_mod.1.weight": ("BF16", [2, 2])})
+    os.utime(path, ns=(1, 1))
+    assert index.get(str(path)).architecture == "qwen"
+    index.save()
+
+    reloaded = ModelMetadataIndex(cache_file=index.cache_file)
+    assert reloaded.get(str(path)).architecture == "qwen"
+    assert reloaded.parsed == 0
+
+
+def test_keyword_scan_prefers_header_architecture(monkeypatch, tmp_path):
+    checkpoints = tmp_path / "checkpoints"
+    qwen_keys = {"transformer_blocks.0.img_mod.1.weight": ("BF16", [2, 2]),
+                 "transformer_blocks.0.txt_mod.1.weight": ("BF16", [2, 2])}
+    _write_safetensors(checkpoints / "image_model_v2.safetensors", qwen_keys)
+    _write_safetensors(checkpoints / "qwen_named_but_sdxl.safetensors", {"model.diffusion_model.label_emb.0.weight": ("F16", [2, 2])})
+    _write_safetensors(checkpoints / "qwen_lora.safetensors", {"transformer_blocks.0.img_mod.lora_A.weight": ("F16", [2, 2]),
+                                                              "transformer_blocks.0.txt_mod.lora_B.weight": ("F16", [2, 2])})
+    (checkpoints / "qwen_legacy.ckpt").write_bytes(b"")
+    monkeypatch.setattr(model_scanner, "directory_scanner", model_scanner.ModelDirectoryScanner(cache_file=None))
+    monkeypatch.setattr(model_scanner, "model_metadata_index", ModelMetadataIndex(cache_file=None))
+
+    found = model_scanner._scan_keyword_models(str(checkpoints), ("qwen",), architecture="qwen")
+
+    assert found == ["image_model_v2.safetensors", "qwen_legacy.ckpt"]
+
+
+def test_flux_and_sdxl_lists_drop_files_whose_header_disagrees(monkeypatch, tmp_path):
+    models = tmp_path / "models"
+    _write_safetensors(models / "flux_dev.safetensors", {"double_blocks.0.img_attn.qkv.weight": ("BF16", [2, 2])})
+    _write_safetensors(models / "flux_lora.safetensors", {"lora_unet_double_blocks_0_img_attn_qkv.lora_down.weight": ("F16", [2, 2])})
+    _write_safetensors(models / "sdxl_in_flux_folder.safetensors", {"model.diffusion_model.label_emb.0.weight": ("F16", [2, 2])})
+    _write_safetensors(models / "unrecognised.safetensors", {"weight": ("F16", [2, 2])})
+    checkpoints = tmp_path / "checkpoints"
+    _write_safetensors(checkpoints / "juggernaut.safetensors", {"model.diffusion_model.label_emb.0.weight": ("F16", [2, 2])})
+    _write_safetensors(checkpoints / "flux_in_checkpoints.safetensors", {"double_blocks.0.img_attn.qkv.weight": ("BF16", [2, 2])})
+    (checkpoints / "legacy.ckpt").write_bytes(b"")
+    monkeypatch.setattr(model_scanner, "directory_scanner", model_scanner.ModelDirectoryScanner(cache_file=None))
+    monkeypatch.setattr(model_scanner, "model_metadata_index", ModelMetadataIndex(cache_file=None))
+
+    assert model_scanner.scan_models(str(models))["safetensors"] == ["flux_dev.safetensors", "unrecognised.safetensors"]
+    assert model_scanner.scan_checkpoints(str(checkpoints))["checkpoints"] == ["juggernaut.safetensors", "legacy.ckpt"]
+
+
+def test_lora_compatibility_only_flags_known_mismatches(monkeypatch, tmp_path):
+    index = ModelMetadataIndex(cache_file=str(tmp_path / "metadata.json"))
+    monkeypatch.setattr(model_metadata, "model_metadata_index", index)
+    lora_path = tmp_path / "flux_style.safetensors"
+    _write_safetensors(lora_path, {"lora_unet_double_blocks_0_img_attn_qkv.lora_down.weight": ("F16", [4, 3072])})
+
+    assert model_metadata.lora_compatibility_issue(str(lora_path), "flux") is None
+    assert model_metadata.lora_compatibility_issue(str(lora_path), "sdxl") == "LoRA is for flux, not sdxl"
+    assert model_metadata.lora_compatibility_issue(str(tmp_path / "missing.safetensors"), "sdxl") is None
+    reloaded = ModelMetadataIndex(cache_file=index.cache_file)
+    assert reloaded.get(str(lora_path)).kind == "lora"
+    assert reloaded.parsed == 0
@@ -0,0 +1,77 @@
+import json
+import os
+
+import model_scanner
+from model_metadata import ModelMetadataIndex
+from model_scanner import ModelDirectoryScanner
+
+
+def _touch(path, size=1):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"\0" * size)
+
+
+def _use_scanner(monkeypatch, tmp_path):
+    scanner = ModelDirectoryScanner(cache_file=str(tmp_path / "scan_cache.json"))
+    monkeypatch.setattr(model_scanner, "directory_scanner", scanner)
+    monkeypatch.setattr(model_scanner, "model_metadata_index", ModelMetadataIndex(cache_file=None))
+    return scanner
+
+
+def test_scan_includes_nested_folders_and_reuses_unchanged_listings(monkeypatch, tmp_path):
+    models_dir = tmp_path / "models"
+    _touch(models_dir / "flux-dev.safetensors")
+    _touch(models_dir / "flux" / "schnell.gguf")
+    _touch(models_dir / "flux" / "notes.txt")
+    scanner = _use_scanner(monkeypatch, tmp_path)
+
+    found = model_scanner.scan_models(str(models_dir))
+
+    assert found["safetensors"] == ["flux-dev.safetensors"]
+    assert found["gguf"] == [os.path.join("flux", "schnell.gguf")]
+    assert scanner.dirs_listed == 2
+
+    model_scanner.scan_models(str(models_dir))
+    assert scanner.dirs_listed == 2
+    assert scanner.dirs_from_cache == 2
+
+    _touch(models_dir / "flux" / "krea.safetensors")
+    assert os.path.join("flux", "krea.safetensors") in model_scanner.scan_models(str(models_dir))["safetensors"]
+    assert scanner.dirs_listed == 3
+
+
+def test_scan_cache_is_persisted_between_instances(monkeypatch, tmp_path):
+    models_dir = tmp_path / "models"
+    _touch(models_dir / "a.safetensors")
+    scanner = _use_scanner(monkeypatch, tmp_path)
+    scanner.scan_tree(str(models_dir))
+    scanner.save()
+
+    reloaded = ModelDirectoryScanner(cache_file=scanner.cache_file)
+    assert reloaded.scan_tree(str(models_dir)) == [("a.safetensors", 1)]
+    assert reloaded.dirs_listed == 0
+
+    dir_mtime_ns = os.stat(models_dir).st_mtime_ns
+    _touch(models_dir / "a.safetensors", size=5)
+    os.utime(models_dir, ns=(dir_mtime_ns, dir_mtime_ns))
+    assert reloaded.scan_tree(str(models_dir)) == [("a.safetensors", 5)]
+    assert reloaded.dirs_listed == 0
+
+
+def test_unchanged_catalog_is_not_rewritten(monkeypatch, tmp_path):
+    models_dir = tmp_path / "models"
+    _touch(models_dir / "flux-dev.safetensors")
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({"MODELS": {"MODEL_FILES": str(models_dir)}}))
+    output_file = tmp_path / "modelslist.json"
+    _use_scanner(monkeypatch, tmp_path)
+    invalidated = []
+    monkeypatch.setattr(model_scanner.model_catalog, "invalidate", invalidated.append)
+
+    model_scanner.update_models_list(str(config_path), str(output_file))
+    first_mtime = os.stat(output_file).st_mtime_ns
+    model_scanner.update_models_list(str(config_path), str(output_file))
+
+    assert os.stat(output_file).st_mtime_ns == first_mtime
+    assert invalidated == [str(output_file)]
+    assert json.loads(output_file.read_text())["safetensors"] == ["flux-dev.safetensors"]
@@ -0,0 +1,17 @@
+from utils.net_utils import is_loopback_host, is_loopback_url
+
+
+def test_loopback_hosts_use_ip_semantics():
+    for host in ("localhost", "LOCALHOST", "127.0.0.1", "127.5.6.7", "::1", "[::1]", "0:0:0:0:0:0:0:1", "::ffff:127.0.0.1"):
+        assert is_loopback_host(host), host
+    for host in ("", "0.0.0.0", "::", "192.168.1.10", "127.example.com", "comfy.local"):
+        assert not is_loopback_host(host), host
+
+
+def test_loopback_urls():
+    assert is_loopback_url("http://127.0.0.1:8190")
+    assert is_loopback_url("http://[::1]:8190/files")
+    assert is_loopback_url("http://[0:0:0:0:0:0:0:1]:8190")
+    assert not is_loopback_url("http://0.0.0.0:8190")
+    assert not is_loopback_url("https://files.example")
+    assert not is_loopback_url("http://[::1")
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+pytest.importorskip("aiohttp.web")
+
+from output_server import OutputLinkSigner, is_loopback_url
+
+
+def _signer(tmp_path, ttl=60):
+    return OutputLinkSigner({"GENERATIONS": str(tmp_path)}, "secret", "https://files.example", ttl)
+
+
+def _split(url):
+    path, query = url.split("?", 1)
+    params = dict(part.split("=", 1) for part in query.split("&"))
+    root_key, relative_path = path.split("/files/", 1)[1].split("/", 1)
+    return root_key, relative_path, params["exp"], params["sig"]
+
+
+def test_signed_url_round_trips_and_expires(tmp_path):
+    (tmp_path / "sub").mkdir()
+    target = tmp_path / "sub" / "GEN_abcdef12.mp4"
+    target.write_bytes(b"video")
+    signer = _signer(tmp_path)
+
+    url = signer.sign_url(str(target), now=1000)
+    root_key, relative_path, expires, signature = _split(url)
+
+    assert url.startswith("https://files.example/files/GENERATIONS/sub/GEN_abcdef12.mp4?")
+    assert signer.resolve(root_key, relative_path, expires, signature, now=1010) == os.path.realpath(target)
+    assert signer.resolve(root_key, relative_path, expires, signature, now=2000) is None
+    assert signer.resolve(root_key, relative_path, str(int(expires) + 1), signature, now=1010) is None
+
+
+def test_files_outside_output_roots_are_rejected(tmp_path):
+    inside = tmp_path / "out"
+    inside.mkdir()
+    secret_file = tmp_path / "config.json"
+    secret_file.write_text("{}")
+    signer = OutputLinkSigner({"GENERATIONS": str(inside)}, "secret", "https://files.example", 60)
+
+    assert signer.sign_url(str(secret_file)) is None
+    forged_sig = signer._signature("GENERATIONS", "../config.json", 5000)
+    assert signer.resolve("GENERATIONS", "../config.json", "5000", forged_sig, now=1000) is None
+
+
+def test_loopback_public_base_urls_are_detected():
+    assert is_loopback_url("http://127.0.0.1:8190")
+    assert is_loopback_url("http://localhost:8190/")
+    assert not is_loopback_url("https://files.example")
@@ -0,0 +1,146 @@
+import asyncio
+import types
+
+import discord
+
+from progress_scheduler import ProgressEditScheduler, _retry_after_from_error
+
+
+class _FakeMessage:
+    def __init__(self, content):
+        self.content = content
+        self.edits = []
+
+    async def edit(self, **kwargs):
+        self.edits.append(kwargs)
+        if "content" in kwargs:
+            self.content = kwargs["content"]
+
+
+class _FakeChannel:
+    def __init__(self, message):
+        self.message = message
+        self.fetch_count = 0
+
+    async def fetch_message(self, message_id):
+        self.fetch_count += 1
+        return self.message
+
+    def get_partial_message(self, message_id):
+        return self.message
+
+
+class _FakeBot:
+    def __init__(self, channel):
+        self.channel = channel
+
+    def get_channel(self, channel_id):
+        return self.channel
+
+
+def _status(percent):
+    return f"> **Status:** Generating: {percent}%"
+
+
+def test_latest_progress_wins_and_message_is_fetched_once():
+    message = _FakeMessage("prompt\n> **Status:** Queued...")
+    channel = _FakeChannel(message)
+    bot = _FakeBot(channel)
+
+    async def scenario():
+        scheduler = ProgressEditScheduler(min_interval=0.05)
+        for percent in (10, 20, 30, 40):
+            scheduler.submit(bot, 1, 2, status_line=_status(percent))
+        await asyncio.sleep(0.01)
+        for percent in (50, 60, 70):
+            scheduler.submit(bot, 1, 2, status_line=_status(percent))
+        await asyncio.sleep(0.15)
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+
+    assert channel.fetch_count == 1
+    assert [edit["content"].splitlines()[-1] for edit in message.edits] == [_status(40), _status(70)]
+    assert scheduler.pending_count() == 0
+
+
+def test_finalize_drops_pending_progress():
+    message = _FakeMessage("prompt\n> **Status:** Queued...")
+    bot = _FakeBot(_FakeChannel(message))
+
+    async def scenario():
+        scheduler = ProgressEditScheduler(min_interval=10)
+        scheduler.submit(bot, 1, 2, status_line=_status(10))
+        await asyncio.sleep(0.01)
+        scheduler.submit(bot, 1, 2, status_line=_status(90))
+        await scheduler.finalize(2)
+        accepted = scheduler.submit(bot, 1, 2, status_line=_status(95))
+        return scheduler, accepted
+
+    scheduler, accepted = asyncio.run(scenario())
+
+    assert accepted is False
+    assert len(message.edits) == 1
+    assert scheduler.pending_count() == 0
+
+
+def test_rate_limited_edit_is_retried_after_discord_cooldown():
+    message = _FakeMessage("prompt\n> **Status:** Queued...")
+    bot = _FakeBot(_FakeChannel(message))
+    original_edit = message.edit
+    attempts = []
+
+    async def flaky_edit(**kwargs):
+        attempts.append(kwargs)
+        if len(attempts) == 1:
+            error = discord.errors.HTTPException(429, "rate limited")
+            error.response = types.SimpleNamespace(headers={"Retry-After": "0.05"})
+            raise error
+        await original_edit(**kwargs)
+
+    message.edit = flaky_edit
+
+    async def scenario():
+        scheduler = ProgressEditScheduler(min_interval=0)
+        scheduler.submit(bot, 1, 2, status_line=_status(10))
+        await asyncio.sleep(0.02)
+        assert message.edits == []
+        await asyncio.sleep(0.1)
+
+    asyncio.run(scenario())
+
+    assert len(attempts) == 2
+    assert message.edits[0]["content"].endswith(_status(10))
+
+
+def test_rate_limited_edit_is_merged_with_newer_progress():
+    message = _FakeMessage("prompt\n> **Status:** Queued...")
+    bot = _FakeBot(_FakeChannel(message))
+    original_edit = message.edit
+    attempts = []
+
+    async def limited_edit(**kwargs):
+        attempts.append(kwargs)
+        if len(attempts) == 1:
+            scheduler.submit(bot, 1, 2, status_line=_status(60))
+            raise discord.errors.RateLimited(0.05)
+        await original_edit(**kwargs)
+
+    message.edit = limited_edit
+    scheduler = ProgressEditScheduler(min_interval=0)
+
+    async def scenario():
+        scheduler.submit(bot, 1, 2, status_line=_status(10), preview_bytes=b"jpeg")
+        await asyncio.sleep(0.2)
+
+    asyncio.run(scenario())
+
+    assert len(attempts) == 2
+    assert message.edits[0]["content"].endswith(_status(60))
+    assert "attachments" in message.edits[0]
+
+
+def test_retry_after_prefers_explicit_attribute():
+    error = types.SimpleNamespace(retry_after=3, response=types.SimpleNamespace(headers={"Retry-After": "9"}))
+    assert _retry_after_from_error(error) == 3.0
+    assert _retry_after_from_error(Exception()) is None
@@ -0,0 +1,188 @@
+import http.server
+import threading
+
+import pytest
+
+import requests
+
+
+_PAYLOAD = bytes(range(256)) * 400
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections = 0
+    failures_left = 0
+    drops = 0
+    range_requests = []
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=b"", headers=()):
+        self.send_response(status)
+        for key, value in headers:
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _payload(self):
+        range_header = self.headers.get("Range")
+        if range_header:
+            type(self).range_requests.append(range_header)
+            start = int(range_header.split("=", 1)[1].rstrip("-"))
+            self._reply(206, _PAYLOAD[start:], [("Content-Range", f"bytes {start}-{len(_PAYLOAD) - 1}/{len(_PAYLOAD)}")])
+        elif type(self).failures_left:
+            # Promise the whole body, send a third of it and drop the connection.
+            type(self).failures_left -= 1
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(_PAYLOAD)))
+            self.end_headers()
+            self.wfile.write(_PAYLOAD[: len(_PAYLOAD) // 3])
+            self.close_connection = True
+        else:
+            self._reply(200, _PAYLOAD)
+
+    def do_GET(self):
+        if self.path == "/payload":
+            self._payload()
+        elif self.path == "/flaky":
+            if type(self).failures_left:
+                type(self).failures_left -= 1
+                self._reply(503, b"busy", [("Retry-After", "0")])
+            else:
+                self._reply(200, b"ok")
+        elif self.path == "/missing":
+            self._reply(404, b"nope")
+        elif self.path == "/old":
+            self._reply(302, headers=[("Location", "/data?x=1")])
+        else:
+            self._reply(200, (self.path * 1000).encode(), [("Content-Type", "text/plain")])
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        if self.path == "/flaky":
+            return self.do_GET()
+        if self.path == "/drop":
+            # Take the request, then hang up without answering.
+            type(self).drops += 1
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self.close_connection = True
+            return
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self._reply(200, body, [("Content-Type", "application/json")])
+
+
+@pytest.fixture
+def server():
+    _Handler.connections = 0
+    _Handler.failures_left = 0
+    _Handler.drops = 0
+    _Handler.range_requests = []
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_session_reuses_one_connection_across_requests(server):
+    with requests.Session() as session:
+        for _ in range(5):
+            assert session.get(f"{server}/a").content == b"/a" * 1000
+        assert session.post(f"{server}/echo", json={"k": 1}).json() == {"k": 1}
+        streamed = session.get(f"{server}/s", stream=True)
+        assert b"".join(streamed.iter_content(4096)) == b"/s" * 1000
+        assert session.head(f"{server}/h").status_code == 200
+
+        stats = session.pool_stats()[server]
+    assert _Handler.connections == 1
+    assert (stats["created"], stats["reused"]) == (1, 7)
+
+
+def test_errors_and_redirects_keep_the_pool_usable(server):
+    session = requests.Session()
+    with pytest.raises(requests.HTTPError) as excinfo:
+        session.get(f"{server}/missing")
+    assert excinfo.value.status == 404
+
+    response = session.get(f"{server}/old")
+    assert response.url.endswith("/data?x=1")
+    assert response.content.startswith(b"/data?x=1")
+    assert _Handler.connections == 1
+    session.close()
+
+
+def test_idle_connections_are_evicted_and_module_helpers_pool(server):
+    session = requests.Session(idle_timeout=0)
+    session.get(f"{server}/a")
+    session.get(f"{server}/b")
+    assert _Handler.connections == 2
+    assert session.pool_stats()[server]["evicted"] >= 1
+
+    requests.get(f"{server}/c")
+    requests.get(f"{server}/d")
+    assert requests.default_session().pool_stats()[server]["reused"] >= 1
+
+
+def test_retry_policy_retries_idempotent_requests_only(server, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(requests, "_sleep", sleeps.append)
+    session = requests.Session(retries=requests.Retry(total=3, backoff_factor=0.5))
+
+    _Handler.failures_left = 2
+    assert session.get(f"{server}/flaky").content == b"ok"
+    assert sleeps == [0.0, 0.0]  # Retry-After: 0 wins over the backoff
+
+    _Handler.failures_left = 1
+    with pytest.raises(requests.HTTPError):
+        session.post(f"{server}/flaky", data=b"x")
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        requests.get("http://127.0.0.1:9/", timeout=1, retries=requests.Retry(total=2, backoff_factor=0.25))
+    assert sleeps[-2:] == [0.25, 0.5]
+
+
+def test_post_is_not_resent_after_the_server_drops_a_reused_connection(server):
+    session = requests.Session()
+    session.get(f"{server}/warm")
+    with pytest.raises(requests.exceptions.ConnectionError):
+        session.post(f"{server}/drop", data=b"prompt")
+    assert _Handler.drops == 1
+
+
+def test_plain_http_goes_through_the_configured_proxy(server, monkeypatch):
+    for name in ("http_proxy", "https_proxy", "no_proxy", "HTTP_PROXY", "HTTPS_PROXY", "NO_PROXY"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("http_proxy", server)
+    response = requests.Session().get("http://comfyui.invalid:8188/queue")
+    assert response.text.startswith("http://comfyui.invalid:8188/queue")
+
+    monkeypatch.setenv("no_proxy", "comfyui.invalid")
+    with pytest.raises(requests.exceptions.ConnectionError):
+        requests.Session().get("http://comfyui.invalid:8188/queue", timeout=5)
+
+
+def test_stream_to_fills_buffers_and_download_resumes_with_range(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(requests, "_sleep", lambda seconds: None)
+    buffer = bytearray(len(_PAYLOAD))
+    assert requests.get(f"{server}/payload", stream=True).stream_to(buffer) == len(_PAYLOAD)
+    assert bytes(buffer) == _PAYLOAD
+    with pytest.raises(ValueError):
+        requests.get(f"{server}/payload", stream=True).stream_to(bytearray(10))
+
+    _Handler.failures_left = 1
+    target = tmp_path / "release.zip"
+    assert requests.download_to_file(f"{server}/payload", str(target), chunk_size=4096) == len(_PAYLOAD)
+    assert target.read_bytes() == _PAYLOAD
+    assert _Handler.range_requests == [f"bytes={len(_PAYLOAD) // 3}-"]
+    assert not (tmp_path / "release.zip.part").exists()
@@ -0,0 +1,129 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import pytest
+
+import result_delivery
+from result_delivery import ResultDeliveryPipeline
+
+
+def _settings(**overrides):
+    settings = {'enabled': True, 'threshold_bytes': 100, 'format': 'webp', 'quality': 90, 'max_workers': 1}
+    settings.update(overrides)
+    return settings
+
+
+def _write(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+
+def _fake_transcoder(path, output_format, quality):
+    return b"w" * 10, os.path.splitext(os.path.basename(path))[0] + "." + output_format
+
+
+def test_large_images_are_transcoded_and_originals_kept(tmp_path):
+    small = _write(tmp_path, "a_small.png", 50)
+    large = _write(tmp_path, "b_large.png", 500)
+    video = _write(tmp_path, "c_clip.mp4", 500)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pipeline = ResultDeliveryPipeline(_settings(), executor=executor, transcoder=_fake_transcoder)
+        plan = asyncio.run(pipeline.prepare("job1", [video, large, small]))
+
+    assert [a.filename for a in plan.attachments] == ["a_small.png", "b_large.webp", "c_clip.mp4"]
+    assert [a.transcoded for a in plan.attachments] == [False, True, False]
+    assert (tmp_path / "b_large.png").stat().st_size == 500
+    assert plan.stats.files_transcoded == 1
+    assert plan.stats.bytes_saved == 490
+    assert pipeline.get_job_stats("job1") is plan.stats
+
+
+def test_oversized_file_is_attached_after_transcoding(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_delivery, "DISCORD_FILE_LIMIT", 200)
+    huge = _write(tmp_path, "huge.png", 300)
+    failed = _write(tmp_path, "huge_2.png", 300)
+
+    def transcoder(path, output_format, quality):
+        if path.endswith("huge_2.png"):
+            raise OSError("corrupt")
+        return _fake_transcoder(path, output_format, quality)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pipeline = ResultDeliveryPipeline(_settings(threshold_bytes=10_000), executor=executor, transcoder=transcoder)
+        plan = asyncio.run(pipeline.prepare("job2", [huge, failed]))
+
+    assert [a.filename for a in plan.attachments] == ["huge.webp"]
+    assert plan.stats.files_skipped == 1
+
+
+def test_attachment_count_is_capped(tmp_path):
+    paths = [_write(tmp_path, f"img_{i:02d}.png", 20) for i in range(12)]
+
+    pipeline = ResultDeliveryPipeline(_settings(enabled=False))
+    plan = asyncio.run(pipeline.prepare("job3", paths))
+
+    assert len(plan.attachments) == result_delivery.MAX_ATTACHMENTS
+    assert plan.total_valid_files == 12
+    assert plan.skipped_paths == paths[result_delivery.MAX_ATTACHMENTS:]
+    assert plan.stats.files_skipped == 2
+
+
+def test_batch_is_delivered_as_single_contact_sheet(tmp_path):
+    paths = [_write(tmp_path, f"GEN_abcdef12_{i}.png", 400) for i in range(12)]
+    built = []
+
+    def sheet_builder(sheet_paths, tile_size, output_format, quality):
+        built.append(list(sheet_paths))
+        return b"s" * 50, "GEN_abcdef12_0_sheet.webp"
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pipeline = ResultDeliveryPipeline(
+            _settings(contact_sheet=True, contact_sheet_min_images=2, contact_sheet_tile_size=256),
+            executor=executor,
+            transcoder=_fake_transcoder,
+            sheet_builder=sheet_builder,
+        )
+        plan = asyncio.run(pipeline.prepare("job4", list(reversed(paths))))
+        originals = asyncio.run(pipeline.prepare("job4", paths[:1], allow_contact_sheet=False))
+
+    assert plan.contact_sheet is True
+    assert built == [sorted(paths)]
+    assert [a.filename for a in plan.attachments] == ["GEN_abcdef12_0_sheet.webp"]
+    assert plan.total_valid_files == 12
+    assert plan.stats.delivered_bytes == 50 and plan.stats.original_bytes == 4800
+    assert originals.contact_sheet is False
+    assert result_delivery.is_contact_sheet_filename(plan.attachments[0].filename)
+    assert not result_delivery.is_contact_sheet_filename("GEN_abcdef12_0.png")
+
+
+def test_contact_sheet_tiles_images_in_reading_order(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    if not hasattr(Image, "new"):
+        pytest.skip("Pillow is not installed (conftest stub in use)")
+    colours = [(220, 30, 30), (30, 220, 30), (30, 30, 220)]
+    paths = []
+    for index, colour in enumerate(colours):
+        path = tmp_path / f"GEN_abcdef12_{index}.png"
+        Image.new("RGB", (128, 96), colour).save(path)
+        paths.append(str(path))
+
+    data, filename = result_delivery.build_contact_sheet(paths, 128, "jpeg", 95)
+
+    assert filename == "GEN_abcdef12_0_sheet.jpg"
+    with Image.open(BytesIO(data)) as sheet:
+        sheet = sheet.convert("RGB")
+        assert sheet.size == (2 * 128 + 2, 2 * 96 + 2)
+        cell_centres = [(64, 48), (194, 48), (64, 146), (194, 146)]
+        for (x, y), expected in zip(cell_centres, colours + [(24, 24, 24)]):
+            assert all(abs(a - b) <= 12 for a, b in zip(sheet.getpixel((x, y)), expected))
+
+
+def test_grid_shape_is_near_square():
+    assert result_delivery.grid_shape(1) == (1, 1)
+    assert result_delivery.grid_shape(4) == (2, 2)
+    assert result_delivery.grid_shape(5) == (3, 2)
+    assert result_delivery.grid_shape(10) == (4, 3)
@@ -0,0 +1,52 @@
+import json
+import os
+
+import pytest
+
+import settings_manager
+
+
+@pytest.fixture
+def settings_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    settings_manager.invalidate_settings_cache()
+    yield tmp_path
+    settings_manager.invalidate_settings_cache()
+
+
+def test_snapshot_is_reused_and_read_only(settings_dir):
+    first = settings_manager.load_settings()
+    second = settings_manager.load_settings()
+
+    assert first is second
+    with pytest.raises(TypeError):
+        first['remix_mode'] = True
+
+    editable = settings_manager.load_settings_for_update()
+    editable['remix_mode'] = not first['remix_mode']
+    assert settings_manager.load_settings()['remix_mode'] == first['remix_mode']
+
+
+def test_save_settings_invalidates_snapshot(settings_dir):
+    original = settings_manager.load_settings()
+    editable = settings_manager.load_settings_for_update()
+    editable['default_batch_size'] = 3
+    settings_manager.save_settings(editable)
+
+    reloaded = settings_manager.load_settings()
+
+    assert reloaded is not original
+    assert reloaded['default_batch_size'] == 3
+
+
+def test_external_edit_is_picked_up(settings_dir):
+    settings_manager.load_settings()
+    with open('settings.json') as f:
+        on_disk = json.load(f)
+    on_disk['remix_mode'] = not on_disk['remix_mode']
+    with open('settings.json', 'w') as f:
+        json.dump(on_disk, f, indent=4)
+    stat_result = os.stat('settings.json')
+    os.utime('settings.json', ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 1_000_000))
+
+    assert settings_manager.load_settings()['remix_mode'] == on_disk['remix_mode']
@@ -0,0 +1,55 @@
+import struct
+import types
+
+import source_images
+from bot_config_loader import config_service
+from queue_manager import queue_manager
+from source_images import resolve_source_image
+
+
+def _png(path, width, height):
+    path.write_bytes(b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", width, height) + b"\0" * 64)
+    return path
+
+
+def _completed_job(monkeypatch, job_id, paths):
+    monkeypatch.setitem(queue_manager.completed_jobs, job_id, {"job_id": job_id, "image_paths": [str(p) for p in paths], "width": 1, "height": 1})
+
+
+def test_own_output_resolves_to_local_file_with_header_dimensions(monkeypatch, tmp_path):
+    first = _png(tmp_path / "GEN_1a2b3c4d_00001_.png", 1216, 832)
+    second = _png(tmp_path / "GEN_1a2b3c4d_00002_.png", 832, 1216)
+    _completed_job(monkeypatch, "1a2b3c4d", [first, second])
+    monkeypatch.setitem(config_service.data, "SOURCE_IMAGES", {"LOCAL_PATHS": True})
+
+    # Delivered re-encoded as WebP; the stem still identifies the file.
+    source = resolve_source_image("https://cdn.discordapp.com/attachments/1/2/GEN_1a2b3c4d_00002_.webp?ex=1")
+
+    assert source.url_or_path == str(second)
+    assert source.dimensions == (832, 1216)
+
+    sheet = resolve_source_image("https://cdn.discordapp.com/x", "GEN_1a2b3c4d_contact.jpg", image_index=1)
+    assert sheet.local_path == str(first)
+
+
+def test_remote_comfyui_gets_signed_link_or_original_url(monkeypatch, tmp_path):
+    output = _png(tmp_path / "GEN_0badf00d_00001_.png", 640, 480)
+    _completed_job(monkeypatch, "0badf00d", [output])
+    monkeypatch.setitem(config_service.data, "SOURCE_IMAGES", {"LOCAL_PATHS": False})
+    url = "https://cdn.discordapp.com/attachments/1/2/GEN_0badf00d_00001_.png"
+
+    server = types.SimpleNamespace(link_for=lambda path: f"https://files.example/{path.rsplit('/', 1)[-1]}?sig=1")
+    linked = resolve_source_image(url, output_server=server)
+    assert linked.url_or_path == "https://files.example/GEN_0badf00d_00001_.png?sig=1"
+    assert linked.dimensions == (640, 480)
+
+    assert resolve_source_image(url).url_or_path == url
+
+
+def test_foreign_images_are_left_alone(monkeypatch):
+    url = "https://cdn.discordapp.com/attachments/1/2/holiday.png"
+    source = resolve_source_image(url)
+
+    assert source.url_or_path == url
+    assert not source.is_local
+    assert source_images.find_local_output("GEN_ffffffff_00001_.png") is None
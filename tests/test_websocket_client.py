@@ -0,0 +1,156 @@
+import asyncio
+import weakref
+
+from websocket_client import PromptMailbox, WebsocketClient, compute_backoff_delay
+
+
+class _SlowBot:
+    def __init__(self, delay):
+        self.delay = delay
+        self.calls = []
+
+    def is_closed(self):
+        return False
+
+    async def update_job_progress(self, prompt_id, current_step, max_steps, image_data):
+        self.calls.append((prompt_id, current_step, max_steps, image_data))
+        await asyncio.sleep(self.delay)
+
+
+def _make_client(bot, prompt_ids):
+    client = object.__new__(WebsocketClient)
+    client.bot = weakref.ref(bot)
+    client.active_prompts = {
+        pid: {"message_id": 1, "channel_id": 2, "status": "queued", "last_preview_timestamp": 0}
+        for pid in prompt_ids
+    }
+    client._mailboxes = {}
+    client._handler_tasks = {}
+    client.executing_prompt_id = None
+    return client
+
+
+def _progress(prompt_id, value, maximum=30):
+    return {"type": "progress", "data": {"prompt_id": prompt_id, "value": value, "max": maximum}}
+
+
+def test_mailbox_keeps_only_latest_progress():
+    async def scenario():
+        mailbox = PromptMailbox()
+        for step in range(1, 6):
+            mailbox.put_progress(step, 5)
+        mailbox.put_preview({"filename": "a.png"})
+        first = await mailbox.get()
+        mailbox.close()
+        second = await mailbox.get()
+        return mailbox, first, second
+
+    mailbox, first, second = asyncio.run(scenario())
+
+    assert first == ((5, 5), {"filename": "a.png"})
+    assert second is None
+    assert mailbox.dropped == 4
+
+
+def test_routing_does_not_wait_for_slow_handlers():
+    bot = _SlowBot(delay=0.05)
+    client = _make_client(bot, ["p1", "p2"])
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for step in range(1, 31):
+            client.route_message(_progress("p1", step))
+            client.route_message(_progress("p2", step))
+        routing_time = loop.time() - started
+        await asyncio.sleep(0.12)
+        client.unregister_prompt("p1")
+        client.unregister_prompt("p2")
+        await asyncio.sleep(0.12)
+        return routing_time
+
+    routing_time = asyncio.run(scenario())
+
+    assert routing_time < 0.05
+    for prompt_id in ("p1", "p2"):
+        steps = [call[1] for call in bot.calls if call[0] == prompt_id]
+        assert steps and steps[-1] == 30
+        assert len(steps) < 30
+    assert client._mailboxes == {}
+    assert client._handler_tasks == {}
+
+
+def test_state_messages_are_applied_inline():
+    bot = _SlowBot(delay=0)
+    client = _make_client(bot, ["p1", "p2"])
+
+    client.route_message({"type": "execution_start", "data": {"prompt_id": "p1"}})
+    client.route_message({"type": "execution_start", "data": {"prompt_id": "p2"}})
+
+    assert client.active_prompts["p2"]["status"] == "executing"
+    assert client.active_prompts["p1"]["status"] != "executing"
+
+
+def test_executing_prompt_is_tracked_without_scanning():
+    bot = _SlowBot(delay=0)
+    client = _make_client(bot, [f"p{i}" for i in range(300)])
+
+    async def scenario():
+        client.route_message({"type": "execution_start", "data": {"prompt_id": "p7"}})
+        client.route_message({"type": "progress", "data": {"value": 3, "max": 10}})
+        await asyncio.sleep(0)
+        client.route_message({"type": "executing", "data": {"prompt_id": "p8"}})
+        progress_target_after_switch = client.executing_prompt_id
+        client.route_message({"type": "executed", "data": {"prompt_id": "p8"}})
+        await asyncio.sleep(0)
+        client.unregister_prompt("p7")
+        await asyncio.sleep(0)
+        return progress_target_after_switch
+
+    progress_target_after_switch = asyncio.run(scenario())
+
+    assert bot.calls[0][:3] == ("p7", 3, 10)
+    assert progress_target_after_switch == "p8"
+    assert client.executing_prompt_id is None
+    assert "p8" not in client.active_prompts
+    assert sum(1 for data in client.active_prompts.values() if data["status"] == "executing") == 0
+
+
+def test_backoff_grows_exponentially_and_respects_cap():
+    low = [compute_backoff_delay(attempt, 1.0, 8.0, rng=lambda: 0.0) for attempt in range(6)]
+    high = [compute_backoff_delay(attempt, 1.0, 8.0, rng=lambda: 1.0) for attempt in range(6)]
+
+    assert low == [0.5, 1.0, 2.0, 4.0, 4.0, 4.0]
+    assert high == [1.0, 2.0, 4.0, 8.0, 8.0, 8.0]
+
+
+def test_resync_reconciles_active_prompts_with_comfyui_queue(monkeypatch):
+    import websocket_client
+
+    bot = _SlowBot(delay=0)
+    client = _make_client(bot, ["running", "pending", "finished"])
+    queue_payload = {
+        "queue_running": [[0, "running", {}, {}, []]],
+        "queue_pending": [[1, "pending", {}, {}, []], [2, "late", {}, {}, []]],
+    }
+
+    class _Response:
+        def raise_for_status(self):
+            return None
+
+        def json(self):
+            return queue_payload
+
+    monkeypatch.setattr(websocket_client.requests, "get", lambda url, timeout=None: _Response(), raising=False)
+    monkeypatch.setattr(
+        websocket_client.queue_manager,
+        "get_pending_jobs",
+        lambda: {"job-late": {"comfy_prompt_id": "late", "message_id": "5", "channel_id": "6"}},
+    )
+
+    asyncio.run(client.resync_active_prompts())
+
+    assert client.active_prompts["running"]["status"] == "executing"
+    assert client.active_prompts["pending"]["status"] == "queued"
+    assert "finished" not in client.active_prompts
+    assert client.active_prompts["late"]["message_id"] == 5
@@ -0,0 +1,52 @@
+import json
+
+from model_registry import MODEL_REGISTRY, copy_generation_template, generation_workflow_builder
+from workflow_builder import WorkflowBuilder
+
+
+_TEMPLATE = {
+    "1": {"class_type": "CLIPTextEncode", "inputs": {"text": "", "clip": ["2", 0]}},
+    "2": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "base.safetensors"}},
+    "3": {"class_type": "SaveImage", "inputs": {"filename_prefix": "out", "images": ["4", 0]}},
+}
+
+
+def test_builder_copies_only_touched_nodes_and_records_sparse_patch():
+    snapshot = json.dumps(_TEMPLATE, sort_keys=True)
+    builder = WorkflowBuilder(_TEMPLATE)
+
+    builder["1"]["inputs"]["text"] = "a cat"
+    builder["3"]["inputs"].pop("images")
+    builder["9"] = {"class_type": "LoraLoader", "inputs": {"lora_name": "style.safetensors"}}
+    del builder["2"]
+
+    assert json.dumps(_TEMPLATE, sort_keys=True) == snapshot
+    assert builder.peek("3") is not _TEMPLATE["3"]
+    assert "2" not in builder and list(builder) == ["1", "3", "9"]
+    assert builder.patch() == {
+        "1": {"text": "a cat"},
+        "3": {"images": None},
+        "9": {"class_type": "LoraLoader", "inputs": {"lora_name": "style.safetensors"}},
+        "2": None,
+    }
+
+
+def test_materialized_payload_is_independent_of_template():
+    builder = WorkflowBuilder(_TEMPLATE)
+    builder["1"]["inputs"]["text"] = "a dog"
+
+    payload = builder.materialize()
+    payload["3"]["inputs"]["filename_prefix"] = "changed"
+    payload["1"]["inputs"]["clip"][0] = "99"
+
+    assert type(payload) is dict
+    assert _TEMPLATE["3"]["inputs"]["filename_prefix"] == "out"
+    assert _TEMPLATE["1"]["inputs"]["clip"] == ["2", 0]
+
+
+def test_registry_builder_matches_legacy_copy():
+    for spec in MODEL_REGISTRY.values():
+        for is_img2img in (False, True):
+            builder = generation_workflow_builder(spec.generation, is_img2img=is_img2img)
+            assert builder.materialize() == copy_generation_template(spec.generation, is_img2img=is_img2img)
+            assert builder.patch() == {}
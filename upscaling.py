@@ -1,4 +1,3 @@
-import json
 import math
 import os
 import re
@@ -12,13 +11,15 @@ from io import BytesIO
 from PIL import Image
 
 from queue_manager import queue_manager
+from bot_config_loader import config_service
 
 from model_registry import (
-    copy_upscale_template,
+    upscale_workflow_builder,
     get_model_spec,
     resolve_model_type_from_prefix,
 )
 from utils.seed_utils import parse_seed_from_message, generate_seed
+from utils.image_probe import probe_image_dimensions
 from settings_manager import load_settings, load_styles_config, _get_default_settings
 from modelnodes import get_model_node
 from comfyui_api import get_available_comfyui_models as check_available_models_api
@@ -339,35 +340,17 @@ def _select_preferred_option(
     return fallback_choice
 
 
-try:
-    if not os.path.exists('config.json'):
-        raise FileNotFoundError("config.json not found.")
-    with open('config.json', 'r') as config_file:
-        config_data = json.load(config_file)
-    if not isinstance(config_data, dict):
-         raise ValueError("config.json is not a valid dictionary.")
-    UPSCALES_DIR = config_data.get('OUTPUTS', {}).get('UPSCALES', os.path.join('output','TENOSAI-BOT','UPSCALES'))
-    if not isinstance(UPSCALES_DIR, str) or not UPSCALES_DIR:
-        print("Warning: Invalid 'UPSCALES' path in config. Using default.")
-        UPSCALES_DIR = os.path.join('output','TENOSAI-BOT','UPSCALES')
-    if not os.path.isabs(UPSCALES_DIR):
-        UPSCALES_DIR = os.path.abspath(UPSCALES_DIR)
-    UPSCALE_MODELS_ROOT = config_data.get('MODELS', {}).get('UPSCALE_MODELS')
-    if isinstance(UPSCALE_MODELS_ROOT, str) and UPSCALE_MODELS_ROOT.strip():
-        UPSCALE_MODELS_ROOT = os.path.abspath(UPSCALE_MODELS_ROOT.strip())
-    else:
-        UPSCALE_MODELS_ROOT = None
-except (FileNotFoundError, json.JSONDecodeError, ValueError, TypeError) as e:
-    print(f"Error loading config.json in upscaling.py: {e}")
-    config_data = {"OUTPUTS": {}}
-    UPSCALES_DIR = os.path.abspath(os.path.join('output','TENOSAI-BOT','UPSCALES'))
-    UPSCALE_MODELS_ROOT = None
-except Exception as e:
-    print(f"Unexpected error loading config.json in upscaling.py: {e}")
-    traceback.print_exc()
-    config_data = {"OUTPUTS": {}}
-    UPSCALES_DIR = os.path.abspath(os.path.join('output','TENOSAI-BOT','UPSCALES'))
-    UPSCALE_MODELS_ROOT = None
+UPSCALES_DIR = None
+UPSCALE_MODELS_ROOT = None
+
+
+def _apply_config(service):
+    global UPSCALES_DIR, UPSCALE_MODELS_ROOT
+    UPSCALES_DIR = service.output_dir('UPSCALES')
+    UPSCALE_MODELS_ROOT = service.models_dir('UPSCALE_MODELS')
+
+
+config_service.subscribe(_apply_config)
 
 def normalize_path_for_comfyui(path):
     if not path or not isinstance(path, str): return path
@@ -611,32 +594,22 @@ def _apply_checkpoint_upscale_inputs(
     final_denoise = ultimate_inputs.get("denoise", default_denoise)
     final_guidance = ultimate_inputs.get("cfg", guidance)
     return final_denoise, final_steps, final_guidance
+def _decode_dimensions_with_pil(data: bytes):
+    try:
+        return Image.open(BytesIO(data)).size
+    except Image.UnidentifiedImageError:
+        return None
+
+
 def get_image_dimensions(url):
     try:
-        response = requests.get(url, timeout=10, stream=True, headers={'User-Agent': 'TenosAIBot/1.0'})
-        response.raise_for_status()
-        
-        image_data = BytesIO()
-        bytes_read = 0
-        chunk_size = 8192 
-        max_read_for_dims = 2 * 1024 * 1024 
-
-        for chunk in response.iter_content(chunk_size=chunk_size):
-            image_data.write(chunk)
-            bytes_read += len(chunk)
-            if bytes_read > max_read_for_dims:
-                break
-        
-        image_data.seek(0) 
-        img = Image.open(image_data)
-        return img.size
-    except requests.RequestException as e: 
+        dimensions = probe_image_dimensions(url, fallback_decoder=_decode_dimensions_with_pil)
+        if dimensions is None:
+            print(f"Error: Could not identify image dimensions from URL {url}. It might not be a valid image or the format is unsupported/corrupt.")
+        return dimensions
+    except requests.RequestException as e:
         print(f"Error fetching image URL {url} for dimensions: {e}")
-        if e.response is not None:
-            print(f"Response status: {e.response.status_code}, Response text: {e.response.text[:200]}")
-    except Image.UnidentifiedImageError:
-        print(f"Error: Pillow could not identify image from URL {url}. It might not be a valid image or the format is unsupported/corrupt.")
-    except Exception as e: 
+    except Exception as e:
         print(f"Error getting image dimensions from {url}: {e}")
         traceback.print_exc()
     return None
@@ -830,7 +803,7 @@ def modify_upscale_prompt(
     except (ValueError, TypeError): upscale_factor_setting = 1.85
 
     try:
-        modified_upscale_prompt = copy_upscale_template(upscale_spec)
+        modified_upscale_prompt = upscale_workflow_builder(upscale_spec)
     except Exception as template_error:
         print(f"ERROR copying upscale template for model '{current_base_model_type}': {template_error}")
         return None, "Internal error preparing upscale template.", None
@@ -1113,4 +1086,4 @@ def modify_upscale_prompt(
             "source_job_id": source_job_id_for_tracking
         }
     }
-    return upscale_job_id, modified_upscale_prompt, response_status_msg_ups, job_details_dict_ups
+    return upscale_job_id, modified_upscale_prompt.materialize(), response_status_msg_ups, job_details_dict_ups
@@ -0,0 +1,202 @@
+"""Image dimensions from the first bytes of a remote file.
+
+PNG, GIF, WebP and JPEG store their size in the header, so instead of
+downloading (up to) the whole attachment and decoding it, we request a small
+byte range, parse it as it arrives and stop as soon as the size is known.
+Results are kept in an LRU keyed by the attachment URL without its signed
+query string, so repeated vary/edit clicks on the same image cost nothing.
+"""
+from __future__ import annotations
+
+import os
+import struct
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+Dimensions = Tuple[int, int]
+
+_FIRST_RANGE_BYTES = 64 * 1024
+_MAX_PROBE_BYTES = 2 * 1024 * 1024
+_CHUNK_SIZE = 4096
+_USER_AGENT = 'TenosAIBot/1.0'
+
+# JPEG start-of-frame markers (SOF0-SOF15 except DHT, JPG and DAC) carry the image size.
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _jpeg_dimensions(data: bytes) -> Optional[Dimensions]:
+    offset = 2
+    while offset + 4 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:  # fill byte
+            offset += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:  # markers without a length
+            offset += 2
+            continue
+        (segment_length,) = struct.unpack_from('>H', data, offset + 2)
+        if marker in _JPEG_SOF_MARKERS:
+            if offset + 9 > len(data):
+                return None
+            height, width = struct.unpack_from('>HH', data, offset + 5)
+            return width, height
+        offset += 2 + segment_length
+    return None
+
+
+def _webp_dimensions(data: bytes) -> Optional[Dimensions]:
+    if len(data) < 30:
+        return None
+    chunk = data[12:16]
+    if chunk == b'VP8 ' and data[23:26] == b'\x9d\x01\x2a':
+        width, height = struct.unpack_from('<HH', data, 26)
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L' and data[20] == 0x2F:
+        bits = int.from_bytes(data[21:25], 'little')
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X':
+        width = int.from_bytes(data[24:27], 'little') + 1
+        height = int.from_bytes(data[27:30], 'little') + 1
+        return width, height
+    return None
+
+
+def parse_image_dimensions(data) -> Optional[Dimensions]:
+    """``(width, height)`` from the leading bytes of an image, or ``None`` if more bytes are needed."""
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        if len(data) < 24:
+            return None
+        return struct.unpack_from('>II', data, 16)
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        if len(data) < 10:
+            return None
+        return struct.unpack_from('<HH', data, 6)
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return _webp_dimensions(data)
+    if data[:2] == b'\xff\xd8':
+        return _jpeg_dimensions(data)
+    return None
+
+
+def _header(response, name: str) -> Optional[str]:
+    lowered = name.lower()
+    for key, value in response.headers.items():
+        if key.lower() == lowered:
+            return value
+    return None
+
+
+def _read_until_dimensions(url: str, start: int, end: int, buffer: bytearray, timeout: float) -> Tuple[Optional[Dimensions], bool]:
+    """Fetch ``bytes=start-end`` into ``buffer``; returns ``(dimensions, more_available)``."""
+    response = requests.get(
+        url,
+        timeout=timeout,
+        stream=True,
+        headers={'User-Agent': _USER_AGENT, 'Range': f'bytes={start}-{end}'},
+    )
+    try:
+        response.raise_for_status()
+        partial = response.status_code == 206
+        if start and not partial:
+            # Range ignored on a follow-up request: the body restarts at byte 0.
+            buffer.clear()
+        for chunk in response.iter_content(chunk_size=_CHUNK_SIZE):
+            buffer.extend(chunk)
+            dimensions = parse_image_dimensions(buffer)
+            if dimensions:
+                return dimensions, False
+            if len(buffer) >= _MAX_PROBE_BYTES:
+                return None, False
+        content_range = _header(response, 'Content-Range') or ''
+        total = content_range.rpartition('/')[2]
+        more_available = partial and (not total.isdigit() or int(total) > len(buffer))
+        return None, more_available
+    finally:
+        response.close()
+
+
+class ImageDimensionCache:
+    """Thread-safe LRU of ``attachment key -> (width, height)``."""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dimensions]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(url: str) -> str:
+        # Discord signs CDN links with expiring query parameters; the path identifies the attachment.
+        parts = urlsplit(url)
+        if parts.netloc and parts.path:
+            return f"{parts.netloc}{parts.path}"
+        return url
+
+    def get(self, url: str) -> Optional[Dimensions]:
+        key = self.key_for(url)
+        with self._lock:
+            dimensions = self._entries.get(key)
+            if dimensions is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dimensions
+
+    def put(self, url: str, dimensions: Dimensions) -> None:
+        key = self.key_for(url)
+        with self._lock:
+            self._entries[key] = dimensions
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+image_dimension_cache = ImageDimensionCache()
+
+
+def probe_image_dimensions(
+    url: str,
+    *,
+    timeout: float = 10,
+    fallback_decoder: Optional[Callable[[bytes], Optional[Dimensions]]] = None,
+) -> Optional[Dimensions]:
+    """Dimensions of the image at ``url`` using as few bytes as possible.
+
+    ``url`` may also be a local file path.  ``fallback_decoder`` is given the
+    bytes read so far when the header parser does not recognise the format.
+    Network errors propagate as ``requests.RequestException``.
+    """
+    cached = image_dimension_cache.get(url)
+    if cached is not None:
+        return cached
+
+    if os.path.isfile(url):
+        with open(url, 'rb') as f:
+            buffer = bytearray(f.read(_FIRST_RANGE_BYTES))
+            dimensions = parse_image_dimensions(buffer)
+            if dimensions is None:
+                buffer.extend(f.read(_MAX_PROBE_BYTES - _FIRST_RANGE_BYTES))
+                dimensions = parse_image_dimensions(buffer)
+    else:
+        buffer = bytearray()
+        dimensions, more_available = _read_until_dimensions(url, 0, _FIRST_RANGE_BYTES - 1, buffer, timeout)
+        if dimensions is None and more_available:
+            dimensions, _ = _read_until_dimensions(url, len(buffer), _MAX_PROBE_BYTES - 1, buffer, timeout)
+    if dimensions is None and fallback_decoder is not None and buffer:
+        dimensions = fallback_decoder(bytes(buffer))
+    if dimensions:
+        dimensions = (int(dimensions[0]), int(dimensions[1]))
+        image_dimension_cache.put(url, dimensions)
+    return dimensions
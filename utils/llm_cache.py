@@ -0,0 +1,172 @@
+"""Persistent cache of LLM prompt enhancements.
+
+Every generation with the enhancer on used to make a fresh provider call,
+including exact repeats (re-submitted prompts, reruns, sheets, WAN animation
+directions).  :class:`LLMResponseCache` stores successful enhancements in a
+small SQLite file, keyed by a hash of everything that shapes the answer:
+provider, model, system prompt, the prompt sent and the attachments it
+references.  Entries expire after ``LLM_CACHE.TTL_HOURS`` and the least
+recently used ones are pruned beyond ``LLM_CACHE.MAX_ENTRIES``.  Setting
+``LLM_CACHE.BYPASS`` forces fresh calls.  Lookups and stores block on SQLite,
+so async callers run them through ``asyncio.to_thread``.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bot_config_loader import config_service
+from utils.image_probe import ImageDimensionCache
+
+_DEFAULT_TTL_HOURS = 168.0
+_DEFAULT_MAX_ENTRIES = 5000
+_DEFAULT_CACHE_FILE = 'llm_cache.sqlite3'
+
+
+def _read_llm_cache_settings() -> dict:
+    section = config_service.section('LLM_CACHE')
+    try:
+        ttl_hours = max(0.0, float(section.get('TTL_HOURS', _DEFAULT_TTL_HOURS)))
+    except (TypeError, ValueError):
+        print(f"Warning: Invalid LLM_CACHE.TTL_HOURS '{section.get('TTL_HOURS')}'. Using {_DEFAULT_TTL_HOURS}.")
+        ttl_hours = _DEFAULT_TTL_HOURS
+    try:
+        max_entries = max(1, int(section.get('MAX_ENTRIES', _DEFAULT_MAX_ENTRIES)))
+    except (TypeError, ValueError):
+        print(f"Warning: Invalid LLM_CACHE.MAX_ENTRIES '{section.get('MAX_ENTRIES')}'. Using {_DEFAULT_MAX_ENTRIES}.")
+        max_entries = _DEFAULT_MAX_ENTRIES
+    return {
+        'enabled': bool(section.get('ENABLED', True)),
+        'bypass': bool(section.get('BYPASS', False)),
+        'ttl_seconds': ttl_hours * 3600,
+        'max_entries': max_entries,
+        'path': str(section.get('FILE') or _DEFAULT_CACHE_FILE),
+    }
+
+
+class LLMResponseCache:
+    def __init__(self, settings: Optional[dict] = None):
+        self._fixed_settings = settings
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    @property
+    def settings(self) -> dict:
+        # Read on use so BYPASS/TTL changes in config.json apply after a reload.
+        return self._fixed_settings if self._fixed_settings is not None else _read_llm_cache_settings()
+
+    def is_active(self) -> bool:
+        settings = self.settings
+        return settings['enabled'] and not settings['bypass']
+
+    @staticmethod
+    def make_key(provider: str, model: str, system_prompt: str, prompt: str,
+                 image_urls: Optional[Iterable[str]] = None, extra: Any = None) -> str:
+        material = {
+            'provider': provider,
+            'model': model,
+            'system': hashlib.sha256((system_prompt or '').encode('utf-8')).hexdigest(),
+            'prompt': prompt,
+            # Attachment URLs are re-signed over time; host+path identifies the file.
+            'images': [ImageDimensionCache.key_for(url) for url in (image_urls or [])],
+            'extra': extra,
+        }
+        return hashlib.sha256(json.dumps(material, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.settings['path'], check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS enhancements ("
+                " key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL,"
+                " last_used REAL NOT NULL, latency REAL NOT NULL)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    def get(self, key: str) -> Optional[str]:
+        settings = self.settings
+        now = time.time()
+        try:
+            with self._lock:
+                db = self._db()
+                row = db.execute("SELECT response, created, latency FROM enhancements WHERE key = ?", (key,)).fetchone()
+                if row is not None and settings['ttl_seconds'] and now - row[1] > settings['ttl_seconds']:
+                    db.execute("DELETE FROM enhancements WHERE key = ?", (key,))
+                    db.commit()
+                    row = None
+                if row is None:
+                    self.misses += 1
+                    return None
+                db.execute("UPDATE enhancements SET last_used = ? WHERE key = ?", (now, key))
+                db.commit()
+                self.hits += 1
+                self.saved_seconds += row[2]
+                return row[0]
+        except sqlite3.Error as e:
+            print(f"LLMEnhancer Warning: Cache lookup failed: {e}")
+            return None
+
+    def put(self, key: str, response: str, latency_seconds: float) -> None:
+        self.put_many([(key, response, latency_seconds)])
+
+    def put_many(self, entries: List[Tuple[str, str, float]]) -> None:
+        """Store several ``(key, response, latency_seconds)`` entries with a single commit."""
+        if not entries:
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                db = self._db()
+                db.executemany(
+                    "INSERT OR REPLACE INTO enhancements (key, response, created, last_used, latency) VALUES (?, ?, ?, ?, ?)",
+                    [(key, response, now, now, float(latency_seconds)) for key, response, latency_seconds in entries],
+                )
+                db.execute(
+                    "DELETE FROM enhancements WHERE key IN (SELECT key FROM enhancements ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.settings['max_entries'],),
+                )
+                db.commit()
+        except sqlite3.Error as e:
+            print(f"LLMEnhancer Warning: Could not store enhancement in cache: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM enhancements")
+            db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        settings = self.settings
+        entries = None
+        try:
+            with self._lock:
+                entries = self._db().execute("SELECT COUNT(*) FROM enhancements").fetchone()[0]
+        except sqlite3.Error:
+            pass
+        return {
+            'enabled': settings['enabled'],
+            'bypass': settings['bypass'],
+            'entries': entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            'saved_seconds': round(self.saved_seconds, 2),
+        }
+
+
+llm_response_cache = LLMResponseCache()
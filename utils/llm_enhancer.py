@@ -1,27 +1,29 @@
-import requests
 import json
 import traceback
 import os
 import asyncio
-import base64
+import time
 from urllib.parse import urlencode
 from io import BytesIO
 
-try:
-    from bot_config_loader import config
-except ImportError:
-    print("LLMEnhancer Warning: Could not import from bot_config_loader. Attempting direct load.")
-    try:
-        config_path = os.path.join(os.path.dirname(__file__), '..', 'config.json')
-        with open(config_path, 'r') as f:
-            config = json.load(f)
-    except Exception as e:
-        print(f"LLMEnhancer FATAL: Direct config load failed: {e}")
-        config = {} 
+from bot_config_loader import config_service
+from utils.llm_cache import LLMResponseCache, llm_response_cache
+from utils.llm_http import LLMHTTPError, llm_http_client
+from utils.llm_images import enhancer_image_encoder
+
+GEMINI_API_KEY = ''
+GROQ_API_KEY = ''
+OPENAI_API_KEY = ''
+
 
-GEMINI_API_KEY = config.get('LLM_ENHANCER', {}).get('GEMINI_API_KEY', '')
-GROQ_API_KEY = config.get('LLM_ENHANCER', {}).get('GROQ_API_KEY', '')
-OPENAI_API_KEY = config.get('LLM_ENHANCER', {}).get('OPENAI_API_KEY', '')
+def _apply_config(service):
+    global GEMINI_API_KEY, GROQ_API_KEY, OPENAI_API_KEY
+    GEMINI_API_KEY = service.llm_enhancer.gemini_api_key
+    GROQ_API_KEY = service.llm_enhancer.groq_api_key
+    OPENAI_API_KEY = service.llm_enhancer.openai_api_key
+
+
+config_service.subscribe(_apply_config)
 
 def load_llm_prompts_config():
     """Loads llm_prompts.json safely and ensures all necessary keys exist."""
@@ -93,21 +95,25 @@ MODEL_TYPE_PROMPTS = {
 def get_model_type_enhancer_prompt(model_type: str) -> str:
     return MODEL_TYPE_PROMPTS.get(model_type, FLUX_ENHANCER_SYSTEM_PROMPT)
 
-async def _fetch_and_encode_image(url: str) -> tuple[str | None, str | None]:
-    try:
-        response = await asyncio.to_thread(requests.get, url, timeout=10)
-        response.raise_for_status()
-        content_type = response.headers.get('Content-Type', 'image/jpeg')
-        if not content_type.startswith('image/'):
-            return None, f"URL content type is '{content_type}', not an image."
-        
-        image_bytes = response.content
-        encoded_string = base64.b64encode(image_bytes).decode('utf-8')
-        return content_type, encoded_string
-    except requests.RequestException as e:
-        return None, f"Failed to download image from URL: {e}"
-    except Exception as e:
-        return None, f"An unexpected error occurred during image processing: {e}"
+def _image_error_message(error: BaseException) -> str:
+    if isinstance(error, LLMHTTPError):
+        return f"Failed to download image from URL: HTTP {error.status}"
+    if isinstance(error, ValueError):
+        return str(error)
+    return f"Failed to download image from URL: {error}"
+
+
+async def _fetch_and_encode_images(urls: list) -> tuple[list | None, str | None]:
+    """Inline parts for all ``urls`` in order, or ``(None, error)`` naming the first failure."""
+    outcomes = await enhancer_image_encoder.encode_many(urls)
+    parts = []
+    for url, outcome in zip(urls, outcomes):
+        if isinstance(outcome, BaseException):
+            print(f"LLMEnhancer Warning: {_image_error_message(outcome)}")
+            return None, f"Failed to process image from URL: {url}"
+        content_type, encoded_image = outcome
+        parts.append({"inline_data": {"mime_type": content_type, "data": encoded_image}})
+    return parts, None
 
 async def _enhance_with_gemini(original_prompt: str, model_name: str, system_instruction_text: str, image_urls: list | None = None) -> tuple[str | None, str | None]:
     if not GEMINI_API_KEY:
@@ -129,19 +135,15 @@ async def _enhance_with_gemini(original_prompt: str, model_name: str, system_ins
     
     payload_parts = [{"text": original_prompt}]
     if image_urls:
-        for url in image_urls:
-            content_type, encoded_image = await _fetch_and_encode_image(url)
-            if encoded_image:
-                payload_parts.insert(0, {"inline_data": {"mime_type": content_type, "data": encoded_image}})
-            else:
-                return None, f"Failed to process image from URL: {url}"
+        image_parts, image_error = await _fetch_and_encode_images(image_urls)
+        if image_error:
+            return None, image_error
+        payload_parts = image_parts + payload_parts
 
     payload = { "contents": [{"parts": payload_parts}], "systemInstruction": {"parts": [{"text": system_instruction_text}]}, "generationConfig": {"temperature": 1, "maxOutputTokens": 2048}, "safetySettings": [{"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"}, {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"}, {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"}, {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"}]}
 
     try:
-        response = await asyncio.to_thread(requests.post, request_url, headers=headers, json=payload, timeout=90)
-        response.raise_for_status()
-        response_json = response.json()
+        response_json = await llm_http_client.post_json('gemini', request_url, headers=headers, payload=payload)
         
         if 'candidates' in response_json and response_json['candidates']:
             enhanced_prompt = response_json['candidates'][0].get('content', {}).get('parts', [{}])[0].get('text', '').strip()
@@ -173,9 +175,7 @@ async def _enhance_with_groq(original_prompt: str, model_name: str, system_instr
         payload["reasoning_effort"] = reasoning_effort
 
     try:
-        response = await asyncio.to_thread(requests.post, API_URL, headers=headers, json=payload, timeout=90)
-        response.raise_for_status()
-        response_json = response.json()
+        response_json = await llm_http_client.post_json('groq', API_URL, headers=headers, payload=payload)
         if 'choices' in response_json and response_json['choices']:
             enhanced_prompt = response_json['choices'][0].get('message', {}).get('content', '').strip()
             return enhanced_prompt.strip('`"\' '), None
@@ -234,9 +234,7 @@ async def _enhance_with_openai(original_prompt: str, model_name: str, system_ins
         }
         
     try:
-        response = await asyncio.to_thread(requests.post, API_URL, headers=headers, json=payload, timeout=90)
-        response.raise_for_status()
-        response_json = response.json()
+        response_json = await llm_http_client.post_json('openai', API_URL, headers=headers, payload=payload)
         
         # **FIX START**: Correct parsing logic for both API response types.
         enhanced_prompt = None
@@ -261,18 +259,176 @@ async def _enhance_with_openai(original_prompt: str, model_name: str, system_ins
 
         return None, f"OpenAI response format unexpected: {json.dumps(response_json)}" # Log the full unexpected response
     except Exception as e:
-        if isinstance(e, requests.HTTPError):
-            error_body = e.response.text
-            if e.response.status_code == 404:
+        if isinstance(e, LLMHTTPError):
+            error_body = e.body
+            if e.status == 404:
                 return None, f"Error with OpenAI API (404 Not Found): The model '{model_name}' does not exist or you do not have access to it."
-            elif e.response.status_code == 400:
+            elif e.status == 400:
                 return None, f"Error with OpenAI API (400 Bad Request): The data sent to '{API_URL}' for model '{model_name}' was invalid. Full error: {error_body}"
         return None, f"Error with OpenAI API: {e}"
 
+def _resolve_provider_model(settings, provider: str) -> tuple[str | None, str | None]:
+    """``(model_name, reasoning_effort)`` configured for ``provider``."""
+    if provider == 'gemini':
+        return settings.get('llm_model_gemini', 'gemini-1.5-flash-latest'), None
+    if provider == 'groq':
+        return settings.get('llm_model_groq', 'llama3-8b-8192'), settings.get('llm_groq_reasoning_effort', None)
+    if provider == 'openai':
+        return settings.get('llm_model_openai', 'gpt-4o'), None
+    return None, None
+
+
+async def _call_provider(provider: str, prompt: str, model_name: str, system_instruction: str, reasoning_effort: str | None, image_urls: list | None) -> tuple[str | None, str | None]:
+    if provider == 'gemini':
+        return await _enhance_with_gemini(prompt, model_name, system_instruction, image_urls)
+    if provider == 'groq':
+        return await _enhance_with_groq(prompt, model_name, system_instruction, reasoning_effort, image_urls)
+    if provider == 'openai':
+        return await _enhance_with_openai(prompt, model_name, system_instruction, image_urls)
+    return None, f"Unknown LLM provider '{provider}' selected in settings."
+
+
+_HEDGING_DEFAULTS = {
+    'BUDGET_PERCENTILE': 0.9,
+    'MIN_SAMPLES': 10,
+    'DEFAULT_BUDGET_SECONDS': 8.0,
+    'MAX_WAIT_SECONDS': 90.0,
+}
+_hedging_stats = {'requests': 0, 'hedged': 0, 'secondary_wins': 0, 'all_failed': 0, 'deadline_exceeded': 0}
+
+
+def _read_hedging_settings() -> dict:
+    """Optional ``LLM_HEDGING`` section: ``SECONDARY_PROVIDER`` turns hedging on."""
+    section = config_service.section('LLM_HEDGING')
+    settings = {'secondary_provider': (str(section.get('SECONDARY_PROVIDER') or '').strip().lower() or None)}
+    for key, default in _HEDGING_DEFAULTS.items():
+        try:
+            value = type(default)(section.get(key, default))
+            settings[key.lower()] = value if value > 0 else default
+        except (TypeError, ValueError):
+            print(f"Warning: Invalid LLM_HEDGING.{key} '{section.get(key)}'. Using {default}.")
+            settings[key.lower()] = default
+    return settings
+
+
+def _hedge_budget(provider: str, hedging: dict) -> float:
+    """Seconds to wait for ``provider`` before hedging: its rolling percentile once enough samples exist."""
+    latency = llm_http_client.latency(provider)
+    if len(latency.recent) >= hedging['min_samples']:
+        observed = latency.percentile(min(hedging['budget_percentile'], 1.0))
+        if observed is not None:
+            return max(0.5, observed)
+    return hedging['default_budget_seconds']
+
+
+def get_hedging_stats() -> dict:
+    return dict(_hedging_stats)
+
+
+async def _race_providers(candidates: list, prompt: str, system_instruction: str, image_urls: list | None, hedging: dict) -> tuple[str | None, str | None, str | None]:
+    """Ask ``candidates[0]``; fire the next candidate once the budget passes or it fails.
+
+    Returns ``(enhanced, error_message, provider_that_answered)``.  Gives up
+    after ``MAX_WAIT_SECONDS`` so the caller can fall back to the raw prompt.
+    """
+    primary = candidates[0][0]
+    started = time.monotonic()
+    deadline = started + hedging['max_wait_seconds']
+    waiting = list(candidates[1:])
+    hedge_at = started + _hedge_budget(primary, hedging) if waiting else None
+    errors = []
+
+    def launch(candidate):
+        name, model_name, reasoning_effort = candidate
+        task = asyncio.ensure_future(_call_provider(name, prompt, model_name, system_instruction, reasoning_effort, image_urls))
+        tasks[task] = name
+
+    tasks = {}
+    launch(candidates[0])
+    _hedging_stats['requests'] += 1
+    try:
+        while tasks:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            wake_at = deadline if hedge_at is None else min(deadline, hedge_at)
+            done, _ = await asyncio.wait(tasks, timeout=max(0.0, wake_at - now), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = tasks.pop(task)
+                try:
+                    enhanced, error_message = task.result()
+                except Exception as e:
+                    enhanced, error_message = None, f"Unexpected error: {e}"
+                if enhanced and not error_message:
+                    if name != primary:
+                        _hedging_stats['secondary_wins'] += 1
+                        print(f"LLMEnhancer: '{name}' answered first after {time.monotonic() - started:.1f}s (hedged '{primary}').")
+                    return enhanced, None, name
+                errors.append((name, error_message or "Empty response."))
+            if waiting and (not tasks or time.monotonic() >= hedge_at):
+                _hedging_stats['hedged'] += 1
+                launch(waiting.pop(0))
+                hedge_at = None
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if tasks:
+        _hedging_stats['deadline_exceeded'] += 1
+        return None, f"No answer from {' or '.join(tasks.values())} within {hedging['max_wait_seconds']:g}s; using the original prompt.", None
+    _hedging_stats['all_failed'] += 1
+    if len(errors) == 1:
+        return None, errors[0][1], None
+    return None, " | ".join(f"{name}: {message}" for name, message in errors), None
+
+
+def _system_instruction_for(system_prompt_text_override: str | None, target_model_type: str) -> str:
+    system_instruction_to_use = system_prompt_text_override
+    if not system_instruction_to_use:
+        system_instruction_to_use = MODEL_TYPE_PROMPTS.get(
+            target_model_type.lower(), FLUX_ENHANCER_SYSTEM_PROMPT
+        )
+    
+    if not system_instruction_to_use:
+        system_instruction_to_use = "Enhance the following text for an image generation AI:"
+    return system_instruction_to_use
+
+
+def _provider_candidates(settings) -> tuple[list, dict, str | None]:
+    """``(candidates, hedging_settings, error)``; candidates are ``(provider, model, reasoning_effort)``."""
+    provider = settings.get('llm_provider', 'gemini')
+    model_name, reasoning_effort = _resolve_provider_model(settings, provider)
+    hedging = _read_hedging_settings()
+    if model_name is None:
+        return [], hedging, f"Unknown LLM provider '{provider}' selected in settings."
+    candidates = [(provider, model_name, reasoning_effort)]
+
+    secondary = hedging['secondary_provider']
+    if secondary and secondary != provider:
+        secondary_model, secondary_effort = _resolve_provider_model(settings, secondary)
+        if secondary_model is None:
+            print(f"LLMEnhancer Warning: Unknown LLM_HEDGING.SECONDARY_PROVIDER '{secondary}'. Hedging disabled.")
+        else:
+            candidates.append((secondary, secondary_model, secondary_effort))
+    return candidates, hedging, None
+
+
+def _cached_enhancement(candidates: list, system_instruction: str, prompt: str, image_urls: list | None, cache_keys: dict) -> str | None:
+    """Look ``prompt`` up for every candidate provider, filling ``cache_keys`` for the later store.
+
+    Blocks on SQLite; call it through ``asyncio.to_thread``.
+    """
+    for name, candidate_model, candidate_effort in candidates:
+        cache_keys[name] = LLMResponseCache.make_key(name, candidate_model, system_instruction, prompt, image_urls, extra=candidate_effort)
+        cached_response = llm_response_cache.get(cache_keys[name])
+        if cached_response is not None:
+            return cached_response
+    return None
+
+
 async def enhance_prompt(original_prompt: str, system_prompt_text_override: str | None = None, target_model_type: str = "flux", image_urls: list | None = None) -> tuple[str | None, str | None]:
     from settings_manager import load_settings
     settings = load_settings()
-    provider = settings.get('llm_provider', 'gemini')
 
     if not original_prompt:
         return None, "Invalid original prompt provided."
@@ -282,24 +438,128 @@ async def enhance_prompt(original_prompt: str, system_prompt_text_override: str
         image_references = ", ".join([f"image{i+1}" for i in range(len(image_urls))])
         final_prompt_for_llm = f"Based on the provided images ({image_references}), please follow this instruction: {original_prompt}"
 
-    system_instruction_to_use = system_prompt_text_override
-    if not system_instruction_to_use:
-        system_instruction_to_use = MODEL_TYPE_PROMPTS.get(
-            target_model_type.lower(), FLUX_ENHANCER_SYSTEM_PROMPT
-        )
-    
-    if not system_instruction_to_use:
-        system_instruction_to_use = "Enhance the following text for an image generation AI:"
+    system_instruction_to_use = _system_instruction_for(system_prompt_text_override, target_model_type)
+    candidates, hedging, error_message = _provider_candidates(settings)
+    if error_message:
+        return None, error_message
 
-    if provider == 'gemini':
-        model_name = settings.get('llm_model_gemini', 'gemini-1.5-flash-latest')
-        return await _enhance_with_gemini(final_prompt_for_llm, model_name, system_instruction_to_use, image_urls)
-    elif provider == 'groq':
-        model_name = settings.get('llm_model_groq', 'llama3-8b-8192')
-        reasoning_effort = settings.get('llm_groq_reasoning_effort', None)
-        return await _enhance_with_groq(final_prompt_for_llm, model_name, system_instruction_to_use, reasoning_effort, image_urls)
-    elif provider == 'openai':
-        model_name = settings.get('llm_model_openai', 'gpt-4o')
-        return await _enhance_with_openai(final_prompt_for_llm, model_name, system_instruction_to_use, image_urls)
-    else:
-        return None, f"Unknown LLM provider '{provider}' selected in settings."
+    cache_keys = {}
+    if llm_response_cache.is_active():
+        cached_response = await asyncio.to_thread(_cached_enhancement, candidates, system_instruction_to_use, final_prompt_for_llm, image_urls, cache_keys)
+        if cached_response is not None:
+            return cached_response, None
+
+    started = time.monotonic()
+    enhanced, error_message, answered_by = await _race_providers(candidates, final_prompt_for_llm, system_instruction_to_use, image_urls, hedging)
+    if enhanced and answered_by in cache_keys:
+        await asyncio.to_thread(llm_response_cache.put, cache_keys[answered_by], enhanced, time.monotonic() - started)
+    return enhanced, error_message
+
+
+_DEFAULT_BATCH_SIZE = 8
+_BATCH_INSTRUCTION = (
+    "\n\nBATCH MODE: The user message is a JSON array of {count} separate prompts. Apply the instructions above to each "
+    "prompt independently. Reply with only a JSON array of exactly {count} strings, the enhanced prompts in the same order, "
+    "and nothing else."
+)
+
+
+def _read_batch_size() -> int:
+    """``LLM_BATCH.MAX_PROMPTS``: prompts per batched request (1 disables batching)."""
+    value = config_service.section('LLM_BATCH').get('MAX_PROMPTS', _DEFAULT_BATCH_SIZE)
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        print(f"Warning: Invalid LLM_BATCH.MAX_PROMPTS '{value}'. Using {_DEFAULT_BATCH_SIZE}.")
+        return _DEFAULT_BATCH_SIZE
+
+
+def _parse_batch_response(text: str, count: int) -> list | None:
+    """The ``count`` items of a JSON array answer; ``None`` if the answer is not such an array."""
+    cleaned = text.strip()
+    if cleaned.startswith('```'):
+        cleaned = cleaned.split('\n', 1)[1] if '\n' in cleaned else ''
+        cleaned = cleaned.rsplit('```', 1)[0]
+    start, end = cleaned.find('['), cleaned.rfind(']')
+    if start == -1 or end <= start:
+        return None
+    try:
+        items = json.loads(cleaned[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(items, list) or len(items) != count:
+        return None
+    return [item.strip().strip('`"\' ') if isinstance(item, str) and item.strip() else None for item in items]
+
+
+async def enhance_prompts_batch(prompts: list, system_prompt_text_override: str | None = None, target_model_type: str = "flux", *, batch_size: int | None = None) -> list:
+    """Enhance many text prompts with as few provider round-trips as possible.
+
+    Up to ``batch_size`` (``LLM_BATCH.MAX_PROMPTS``) uncached prompts go out
+    as one JSON array request.  Answers are cached under the same keys
+    :func:`enhance_prompt` uses, so a later single call for any of the
+    prompts is a cache hit.  Items the batch answer does not cover (wrong
+    shape, empty entries, failed request) are enhanced one by one.  Returns
+    one ``(enhanced, error)`` tuple per prompt, in order.
+    """
+    from settings_manager import load_settings
+    settings = load_settings()
+    results: list = [None] * len(prompts)
+    system_instruction = _system_instruction_for(system_prompt_text_override, target_model_type)
+    candidates, hedging, error_message = _provider_candidates(settings)
+    if error_message:
+        return [(None, error_message)] * len(prompts)
+
+    use_cache = llm_response_cache.is_active()
+    cache_keys = [{} for _ in prompts]
+    pending = []
+
+    def lookup_all():
+        for index, prompt in enumerate(prompts):
+            if not prompt:
+                results[index] = (None, "Invalid original prompt provided.")
+                continue
+            cached_response = _cached_enhancement(candidates, system_instruction, prompt, None, cache_keys[index]) if use_cache else None
+            if cached_response is not None:
+                results[index] = (cached_response, None)
+            else:
+                pending.append(index)
+
+    await asyncio.to_thread(lookup_all)
+
+    size = batch_size or _read_batch_size()
+    fallback = []
+    for chunk_start in range(0, len(pending), size):
+        chunk = pending[chunk_start:chunk_start + size]
+        if len(chunk) == 1:
+            fallback.extend(chunk)
+            continue
+        started = time.monotonic()
+        batch_text, batch_error, answered_by = await _race_providers(
+            candidates, json.dumps([prompts[i] for i in chunk], ensure_ascii=False),
+            system_instruction + _BATCH_INSTRUCTION.format(count=len(chunk)), None, hedging,
+        )
+        items = _parse_batch_response(batch_text, len(chunk)) if batch_text else None
+        if items is None:
+            print(f"LLMEnhancer: Batch of {len(chunk)} prompts unusable ({batch_error or 'unexpected response shape'}); enhancing individually.")
+            fallback.extend(chunk)
+            continue
+        per_item_seconds = (time.monotonic() - started) / len(chunk)
+        to_store = []
+        for index, item in zip(chunk, items):
+            if item is None:
+                fallback.append(index)
+                continue
+            results[index] = (item, None)
+            if use_cache and answered_by in cache_keys[index]:
+                to_store.append((cache_keys[index][answered_by], item, per_item_seconds))
+        if to_store:
+            await asyncio.to_thread(llm_response_cache.put_many, to_store)
+
+    if fallback:
+        singles = await asyncio.gather(*(
+            enhance_prompt(prompts[index], system_prompt_text_override, target_model_type) for index in fallback
+        ))
+        for index, outcome in zip(fallback, singles):
+            results[index] = outcome
+    return results
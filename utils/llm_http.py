@@ -0,0 +1,230 @@
+"""Shared async HTTP client for the LLM prompt enhancer.
+
+The provider calls used to run a blocking ``requests.post`` through
+``asyncio.to_thread``: a new connection and TLS handshake per enhancement,
+and a default-executor thread held for up to 90 s while the provider thinks.
+:class:`LLMHttpClient` keeps one keep-alive ``aiohttp`` session on the bot's
+loop instead, caps connections and in-flight requests per provider, applies
+connect/total timeouts and records a latency histogram per provider.
+
+Optional ``LLM_HTTP`` settings in config.json::
+
+    "LLM_HTTP": {"MAX_CONNECTIONS_PER_PROVIDER": 4, "MAX_CONCURRENT_PER_PROVIDER": 4,
+                 "TIMEOUT_SECONDS": 90, "CONNECT_TIMEOUT_SECONDS": 10}
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+import aiohttp
+
+from bot_config_loader import config_service
+
+_DEFAULTS = {
+    'MAX_CONNECTIONS_PER_PROVIDER': 4,
+    'MAX_CONCURRENT_PER_PROVIDER': 4,
+    'TIMEOUT_SECONDS': 90.0,
+    'CONNECT_TIMEOUT_SECONDS': 10.0,
+}
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is open-ended.
+LATENCY_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 45.0, 90.0)
+_RECENT_SAMPLES = 200
+
+
+def _read_llm_http_settings() -> dict:
+    section = config_service.section('LLM_HTTP')
+    settings = {}
+    for key, default in _DEFAULTS.items():
+        try:
+            value = type(default)(section.get(key, default))
+            settings[key.lower()] = value if value > 0 else default
+        except (TypeError, ValueError):
+            print(f"Warning: Invalid LLM_HTTP.{key} '{section.get(key)}'. Using {default}.")
+            settings[key.lower()] = default
+    return settings
+
+
+class LLMHTTPError(Exception):
+    """Non-2xx answer from a provider; ``body`` is the raw response text."""
+
+    def __init__(self, provider: str, status: int, body: str, url: str):
+        super().__init__(f"{provider} returned HTTP {status} for {url}: {body[:500]}")
+        self.provider = provider
+        self.status = status
+        self.body = body
+        self.url = url
+
+
+class ProviderLatency:
+    """Request outcome counters and latency histogram of one provider."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.total_seconds = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.recent: "deque[float]" = deque(maxlen=_RECENT_SAMPLES)
+
+    def record(self, seconds: float) -> None:
+        self.requests += 1
+        self.total_seconds += seconds
+        self.recent.append(seconds)
+        for index, upper in enumerate(LATENCY_BUCKETS):
+            if seconds <= upper:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def as_dict(self) -> Dict[str, Any]:
+        labels = [f"<={upper:g}s" for upper in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]:g}s"]
+        p50, p90 = self.percentile(0.5), self.percentile(0.9)
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'in_flight': self.in_flight,
+            'mean_seconds': round(self.total_seconds / self.requests, 3) if self.requests else None,
+            'p50_seconds': round(p50, 3) if p50 is not None else None,
+            'p90_seconds': round(p90, 3) if p90 is not None else None,
+            'histogram': dict(zip(labels, self.buckets)),
+        }
+
+
+def _default_session_factory(settings: dict):
+    connector = aiohttp.TCPConnector(limit_per_host=settings['max_connections_per_provider'], keepalive_timeout=60)
+    return aiohttp.ClientSession(connector=connector)
+
+
+async def _close_session(session) -> None:
+    try:
+        await session.close()
+    except Exception as e:
+        # Its loop may already be closed (asyncio.run() ended); nothing left to release then.
+        print(f"LLM HTTP: Could not close the previous session cleanly: {e}")
+
+
+class LLMHttpClient:
+    def __init__(self, *, settings: Optional[dict] = None, session_factory: Callable[[dict], Any] = _default_session_factory):
+        self._fixed_settings = settings
+        self._session_factory = session_factory
+        self._session = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._closing: Set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+        self._latency: Dict[str, ProviderLatency] = {}
+
+    @property
+    def settings(self) -> dict:
+        return self._fixed_settings if self._fixed_settings is not None else _read_llm_http_settings()
+
+    def _session_for_running_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._loop is not loop or getattr(self._session, 'closed', False):
+            # A session (and its semaphores) belongs to the loop it was created on.
+            self._retire_session(self._session, self._loop, loop)
+            self._session = self._session_factory(self.settings)
+            self._loop = loop
+            self._semaphores = {}
+        return self._session
+
+    def _retire_session(self, session, old_loop, loop) -> None:
+        """Close a session being replaced instead of leaking its connector."""
+        if session is None or getattr(session, 'closed', False):
+            return
+        if old_loop is not None and old_loop is not loop and old_loop.is_running():
+            asyncio.run_coroutine_threadsafe(_close_session(session), old_loop)
+        else:
+            task = loop.create_task(_close_session(session))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    def _semaphore(self, provider: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(provider)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.settings['max_concurrent_per_provider'])
+            self._semaphores[provider] = semaphore
+        return semaphore
+
+    def latency(self, provider: str) -> ProviderLatency:
+        with self._lock:
+            return self._latency.setdefault(provider, ProviderLatency())
+
+    def _request_timeout(self, timeout: Optional[float]):
+        settings = self.settings
+        total = timeout if timeout is not None else settings['timeout_seconds']
+        client_timeout = getattr(aiohttp, 'ClientTimeout', None)
+        if client_timeout is None:
+            return total
+        return client_timeout(total=total, connect=settings['connect_timeout_seconds'])
+
+    async def _request(self, label: str, method: str, url: str, read_body, *, timeout: Optional[float] = None, **kwargs) -> Any:
+        session = self._session_for_running_loop()
+        stats = self.latency(label)
+        async with self._semaphore(label):
+            stats.in_flight += 1
+            started = time.monotonic()
+            try:
+                async with getattr(session, method)(url, timeout=self._request_timeout(timeout), **kwargs) as response:
+                    if response.status >= 400:
+                        raise LLMHTTPError(label, response.status, await response.text(), url.split('?', 1)[0])
+                    result = await read_body(response)
+            except asyncio.TimeoutError:
+                stats.timeouts += 1
+                stats.errors += 1
+                limit = timeout if timeout is not None else self.settings['timeout_seconds']
+                raise asyncio.TimeoutError(f"{label} did not answer within {limit:g}s") from None
+            except Exception:
+                stats.errors += 1
+                raise
+            else:
+                stats.record(time.monotonic() - started)
+                return result
+            finally:
+                stats.in_flight -= 1
+
+    async def post_json(self, provider: str, url: str, *, headers: Optional[dict] = None,
+                        payload: Any = None, timeout: Optional[float] = None) -> Any:
+        """POST ``payload`` as JSON and return the decoded JSON answer.
+
+        Raises :class:`LLMHTTPError` for non-2xx answers, ``asyncio.TimeoutError``
+        when the request exceeds its timeout, and aiohttp errors otherwise.
+        """
+        async def read_json(response):
+            return json.loads(await response.text())
+
+        return await self._request(provider, 'post', url, read_json, timeout=timeout, headers=headers, json=payload)
+
+    async def get_bytes(self, label: str, url: str, *, headers: Optional[dict] = None,
+                        timeout: Optional[float] = None) -> Tuple[str, bytes]:
+        """GET ``url`` on the shared session; returns ``(content_type, body)``."""
+        async def read_bytes(response):
+            return response.headers.get('Content-Type', ''), await response.read()
+
+        return await self._request(label, 'get', url, read_bytes, timeout=timeout, headers=headers)
+
+    async def close(self) -> None:
+        session, self._session = self._session, None
+        if session is not None and not getattr(session, 'closed', True):
+            await session.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            providers = dict(self._latency)
+        return {name: stats.as_dict() for name, stats in sorted(providers.items())}
+
+
+llm_http_client = LLMHttpClient()
@@ -0,0 +1,165 @@
+"""Reference images for vision-capable LLM enhancers, fetched and encoded once.
+
+Kontext / Qwen edit enhancement sends its source images inline to Gemini.
+They used to be downloaded one after another and base64-encoded at full
+size, often several megabytes per image, although the model only looks at
+roughly a thousand pixels per side.  :class:`EnhancerImageEncoder`
+downloads all images of a request concurrently on the shared LLM HTTP
+session, downscales them in a small thread pool and keeps the encoded
+payload per attachment, so the next enhancement of the same image costs
+nothing.
+
+Optional ``LLM_IMAGES`` settings: ``MAX_DIMENSION`` (1024), ``JPEG_QUALITY``
+(85), ``CACHE_ENTRIES`` (64) and ``WORKERS`` (2).
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from bot_config_loader import config_service
+from utils.image_probe import ImageDimensionCache
+from utils.llm_http import llm_http_client
+
+_DEFAULTS = {
+    'MAX_DIMENSION': 1024,
+    'JPEG_QUALITY': 85,
+    'CACHE_ENTRIES': 64,
+    'WORKERS': 2,
+}
+_FETCH_TIMEOUT_SECONDS = 10
+_PASSTHROUGH_TYPES = ('image/jpeg', 'image/png', 'image/webp')
+
+
+def _read_llm_image_settings() -> dict:
+    section = config_service.section('LLM_IMAGES')
+    settings = {}
+    for key, default in _DEFAULTS.items():
+        try:
+            settings[key.lower()] = max(1, int(section.get(key, default)))
+        except (TypeError, ValueError):
+            print(f"Warning: Invalid LLM_IMAGES.{key} '{section.get(key)}'. Using {default}.")
+            settings[key.lower()] = default
+    return settings
+
+
+def downscale_for_llm(data: bytes, content_type: str, max_dimension: int, quality: int) -> Tuple[str, bytes]:
+    """``(content_type, bytes)`` no larger than ``max_dimension`` per side.
+
+    Small JPEG/PNG/WebP images pass through untouched; anything else is
+    re-encoded as JPEG.  Undecodable data is returned as-is.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return content_type, data
+    try:
+        with Image.open(BytesIO(data)) as img:
+            if max(img.size) <= max_dimension and content_type in _PASSTHROUGH_TYPES:
+                return content_type, data
+            img.draft('RGB', (max_dimension, max_dimension))  # JPEG: decode at a reduced scale
+            converted = img.convert('RGB')
+        converted.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        buffer = BytesIO()
+        converted.save(buffer, format='JPEG', quality=quality, optimize=True)
+        return 'image/jpeg', buffer.getvalue()
+    except Exception as e:
+        print(f"LLMEnhancer Warning: Could not downscale reference image, sending original: {e}")
+        return content_type, data
+
+
+async def _fetch_with_shared_session(url: str) -> Tuple[str, bytes]:
+    return await llm_http_client.get_bytes('images', url, timeout=_FETCH_TIMEOUT_SECONDS)
+
+
+class EnhancerImageEncoder:
+    def __init__(
+        self,
+        *,
+        settings: Optional[dict] = None,
+        fetcher: Callable[[str], Awaitable[Tuple[str, bytes]]] = _fetch_with_shared_session,
+    ):
+        self.settings = settings if settings is not None else _read_llm_image_settings()
+        self._fetch = fetcher
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+        self._pending: Dict[str, "asyncio.Future"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.bytes_fetched = 0
+        self.bytes_encoded = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.settings['workers'], thread_name_prefix='llm-image')
+        return self._executor
+
+    def _cache_key(self, url: str) -> str:
+        return f"{ImageDimensionCache.key_for(url)}@{self.settings['max_dimension']}"
+
+    async def _load(self, url: str, key: str) -> Tuple[str, str]:
+        content_type, data = await self._fetch(url)
+        content_type = (content_type or 'image/jpeg').split(';', 1)[0].strip().lower()
+        if not content_type.startswith('image/'):
+            raise ValueError(f"URL content type is '{content_type}', not an image.")
+        loop = asyncio.get_running_loop()
+        mime_type, encoded = await loop.run_in_executor(
+            self._get_executor(), downscale_for_llm, data, content_type,
+            self.settings['max_dimension'], self.settings['jpeg_quality'],
+        )
+        payload = (mime_type, base64.b64encode(encoded).decode('ascii'))
+        with self._lock:
+            self.bytes_fetched += len(data)
+            self.bytes_encoded += len(encoded)
+            self._entries[key] = payload
+            while len(self._entries) > self.settings['cache_entries']:
+                self._entries.popitem(last=False)
+        return payload
+
+    async def encode(self, url: str) -> Tuple[str, str]:
+        """``(mime_type, base64_data)`` for the image at ``url``; raises if it cannot be fetched."""
+        key = self._cache_key(url)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+        pending = self._pending.get(key)
+        if pending is None:
+            # Concurrent requests for the same attachment share one download.
+            pending = asyncio.ensure_future(self._load(url, key))
+            self._pending[key] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(pending)
+
+    async def encode_many(self, urls: List[str]) -> List[Any]:
+        """Encode all ``urls`` concurrently; failed entries are the raised exception."""
+        return await asyncio.gather(*(self.encode(url) for url in urls), return_exceptions=True)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'megabytes_fetched': round(self.bytes_fetched / (1024 * 1024), 2),
+                'megabytes_encoded': round(self.bytes_encoded / (1024 * 1024), 2),
+            }
+
+
+enhancer_image_encoder = EnhancerImageEncoder()
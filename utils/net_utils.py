@@ -0,0 +1,29 @@
+"""Loopback checks shared by the internal API, output server and source images."""
+from __future__ import annotations
+
+from ipaddress import ip_address
+from urllib.parse import urlsplit
+
+
+def is_loopback_host(host: str) -> bool:
+    """True for ``localhost`` and any loopback IP (127.0.0.0/8, ::1, ::ffff:127.x, bracketed or not)."""
+    if not host:
+        return False
+    lowered = host.strip().strip('[]').lower()
+    if lowered == 'localhost':
+        return True
+    try:
+        address = ip_address(lowered)
+    except ValueError:
+        return False
+    mapped = getattr(address, 'ipv4_mapped', None)
+    return address.is_loopback or (mapped is not None and mapped.is_loopback)
+
+
+def is_loopback_url(url: str) -> bool:
+    """True if ``url`` points at this machine's loopback interface."""
+    try:
+        host = urlsplit(url).hostname
+    except ValueError:
+        return False
+    return is_loopback_host(host or '')
@@ -1,5 +1,4 @@
 # --- START OF FILE variation.py ---
-import json
 import random
 import uuid
 import re
@@ -9,9 +8,10 @@ import traceback
 import math
 
 from queue_manager import queue_manager
+from bot_config_loader import config_service
 
 from model_registry import (
-    copy_variation_template,
+    variation_workflow_builder,
     get_model_spec,
     resolve_model_type_from_prefix,
 )
@@ -21,28 +21,15 @@ from modelnodes import get_model_node
 from upscaling import get_image_dimensions 
 from comfyui_api import get_available_comfyui_models as check_available_models_api
 
-try:
-    if not os.path.exists('config.json'):
-        raise FileNotFoundError("config.json not found in variation.py.")
-    with open('config.json', 'r') as config_file:
-        config_data_var = json.load(config_file)
-    if not isinstance(config_data_var, dict):
-         raise ValueError("config.json is not a valid dictionary in variation.py.")
-    VARIATIONS_DIR = config_data_var.get('OUTPUTS', {}).get('VARIATIONS', os.path.join('output','TENOSAI-BOT','VARIATIONS'))
-    if not isinstance(VARIATIONS_DIR, str) or not VARIATIONS_DIR:
-        print("Warning: Invalid 'VARIATIONS' path in config (variation.py). Using default.")
-        VARIATIONS_DIR = os.path.join('output','TENOSAI-BOT','VARIATIONS')
-    if not os.path.isabs(VARIATIONS_DIR):
-        VARIATIONS_DIR = os.path.abspath(VARIATIONS_DIR)
-except (FileNotFoundError, json.JSONDecodeError, ValueError, TypeError) as e:
-    print(f"Error loading config.json in variation.py: {e}")
-    config_data_var = {"OUTPUTS": {}}
-    VARIATIONS_DIR = os.path.abspath(os.path.join('output','TENOSAI-BOT','VARIATIONS'))
-except Exception as e:
-    print(f"Unexpected error loading config.json in variation.py: {e}")
-    traceback.print_exc()
-    config_data_var = {"OUTPUTS": {}}
-    VARIATIONS_DIR = os.path.abspath(os.path.join('output','TENOSAI-BOT','VARIATIONS'))
+VARIATIONS_DIR = None
+
+
+def _apply_config(service):
+    global VARIATIONS_DIR
+    VARIATIONS_DIR = service.output_dir('VARIATIONS')
+
+
+config_service.subscribe(_apply_config)
 
 def normalize_path_for_comfyui(path):
     if not path or not isinstance(path, str): return path
@@ -346,7 +333,7 @@ def modify_variation_prompt(
     variation_job_id = str(uuid.uuid4())[:8]
     try:
         template_strength = variation_type if variation_type in var_spec.templates else "default"
-        modified_variation_prompt = copy_variation_template(var_spec, strength=template_strength)
+        modified_variation_prompt = variation_workflow_builder(var_spec, strength=template_strength)
     except Exception as template_error:
         print(f"ERROR copying variation template for model '{base_model_type_for_variation_workflow}': {template_error}")
         return None, "Internal error preparing variation template.", None
@@ -535,7 +522,7 @@ def modify_variation_prompt(
             "is_remix": edited_prompt is not None
         }
     }
-    return [(variation_job_id, modified_variation_prompt, response_status_msg_var, job_details_dict_var)]
+    return [(variation_job_id, modified_variation_prompt.materialize(), response_status_msg_var, job_details_dict_var)]
 
 
 def modify_weak_variation_prompt(message_content_or_obj, referenced_message, target_image_url: str, image_index: int = 1, edited_prompt: str | None = None, edited_negative_prompt: str | None = None):
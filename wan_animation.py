@@ -9,7 +9,7 @@ import traceback
 from typing import Any, Dict, Tuple
 
 from bot_config_loader import config
-from model_registry import get_model_spec, copy_animation_template
+from model_registry import get_model_spec, animation_workflow_builder
 from settings_manager import load_settings, _get_default_settings
 from utils.llm_enhancer import (
     enhance_prompt as util_enhance_prompt,
@@ -85,7 +85,7 @@ async def prepare_wan_animation_prompt(
 
     settings = load_settings()
     wan_spec = get_model_spec("wan")
-    template = copy_animation_template(wan_spec)
+    template = animation_workflow_builder(wan_spec)
 
     motion_profile = str(
         source_job_data.get(
@@ -389,7 +389,7 @@ async def prepare_wan_animation_prompt(
         "animation_prompt_text": animation_prompt_text,
     }
 
-    return job_id, template, job_details
+    return job_id, template.materialize(), job_details
 
 
 __all__ = ["prepare_wan_animation_prompt"]
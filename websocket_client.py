@@ -1,13 +1,89 @@
 import asyncio
 import aiohttp
 import json
+import random
+import time
 import weakref
 import traceback
 import uuid
 
-from bot_config_loader import COMFYUI_HOST, COMFYUI_PORT
+import requests
+
+from bot_config_loader import config, config_service
 from queue_manager import queue_manager
 
+
+def _read_ws_setting(key, default):
+    section = config.get('COMFYUI_API', {})
+    raw_value = section.get(key, default) if isinstance(section, dict) else default
+    try:
+        return max(0.0, float(raw_value))
+    except (TypeError, ValueError):
+        print(f"Warning: Invalid COMFYUI_API.{key} '{raw_value}'. Using {default}.")
+        return default
+
+
+WS_HEARTBEAT_SECONDS = _read_ws_setting('WS_HEARTBEAT', 20.0)
+WS_RECONNECT_BASE_DELAY = _read_ws_setting('WS_RECONNECT_BASE_DELAY', 1.0)
+WS_RECONNECT_MAX_DELAY = _read_ws_setting('WS_RECONNECT_MAX_DELAY', 60.0)
+
+
+def compute_backoff_delay(attempt, base_delay=WS_RECONNECT_BASE_DELAY, max_delay=WS_RECONNECT_MAX_DELAY, rng=random.random):
+    """Exponential backoff with jitter: a random delay in the upper half of ``base * 2**attempt``."""
+    ceiling = min(max_delay, base_delay * (2 ** max(0, attempt)))
+    return ceiling / 2 + rng() * ceiling / 2
+
+
+PROMPT_QUEUED = 'queued'
+PROMPT_EXECUTING = 'executing'
+PROMPT_DONE = 'done'
+
+
+class PromptMailbox:
+    """Bounded per-prompt inbox for progress traffic.
+
+    Only the newest progress step and the newest preview are kept; anything
+    the handler has not consumed yet is overwritten (and counted in
+    ``dropped``) so a slow Discord edit can never build up a backlog.
+    """
+
+    def __init__(self):
+        self.progress = None
+        self.preview = None
+        self.closed = False
+        self.dropped = 0
+        self._event = asyncio.Event()
+
+    def put_progress(self, current_step, max_steps):
+        if self.closed: return
+        if self.progress is not None: self.dropped += 1
+        self.progress = (current_step, max_steps)
+        self._event.set()
+
+    def put_preview(self, preview_data):
+        if self.closed: return
+        if self.preview is not None: self.dropped += 1
+        self.preview = preview_data
+        self._event.set()
+
+    def close(self):
+        self.closed = True
+        self._event.set()
+
+    async def get(self):
+        """Return ``(progress, preview)`` or ``None`` once closed and drained."""
+        while True:
+            if self.progress is not None or self.preview is not None:
+                item = (self.progress, self.preview)
+                self.progress = None
+                self.preview = None
+                return item
+            if self.closed:
+                return None
+            self._event.clear()
+            await self._event.wait()
+
+
 class WebsocketClient:
     _instance = None
 
@@ -36,7 +112,6 @@ class WebsocketClient:
 
         self.client_id_confirmed = False
 
-        self.ws_base_url = f"ws://{COMFYUI_HOST}:{COMFYUI_PORT}/ws"
         if not hasattr(self, "client_id") or self.client_id is None:
             self.client_id = uuid.uuid4().hex
         self.ws_url = f"{self.ws_base_url}?clientId={self.client_id}"
@@ -45,9 +120,24 @@ class WebsocketClient:
         self.is_connected = False
         self.is_connecting = False
         self.active_prompts = {}
+        self._mailboxes = {}
+        self._handler_tasks = {}
         self._initialized = True
         self.connection_task = None
         self.listener_task = None
+        self.supervisor_task = None
+        self.executing_prompt_id = None
+        self.reconnect_count = 0
+        self.failed_connect_attempts = 0
+        self.total_downtime = 0.0
+        self.last_downtime = 0.0
+        self._disconnected_at = None
+        self._has_connected_once = False
+
+    @property
+    def ws_base_url(self):
+        comfyui = config_service.comfyui
+        return f"ws://{comfyui.host}:{comfyui.port}/ws"
 
     async def connect(self):
         if self.is_connected or self.is_connecting:
@@ -71,7 +161,12 @@ class WebsocketClient:
 
             # Ensure the websocket URL always includes the latest client ID.
             self.ws_url = f"{self.ws_base_url}?clientId={self.client_id}"
-            self.ws = await self.session.ws_connect(self.ws_url, timeout=10)
+            self.ws = await self.session.ws_connect(
+                self.ws_url,
+                timeout=10,
+                heartbeat=WS_HEARTBEAT_SECONDS or None,
+                autoping=True,
+            )
             self.is_connected = True
             self.is_connecting = False
             print(f"WebSocket: Successfully connected to {self.ws_url}")
@@ -80,6 +175,19 @@ class WebsocketClient:
                 self.listener_task.cancel() 
             self.listener_task = bot.loop.create_task(self.listen())
 
+            if self._has_connected_once:
+                self.reconnect_count += 1
+                if self._disconnected_at is not None:
+                    self.last_downtime = time.monotonic() - self._disconnected_at
+                    self.total_downtime += self.last_downtime
+                print(
+                    f"WebSocket: Reconnected (#{self.reconnect_count}) after {self.last_downtime:.1f}s downtime. "
+                    "Resyncing active prompts with ComfyUI queue."
+                )
+                bot.loop.create_task(self.resync_active_prompts())
+            self._has_connected_once = True
+            self._disconnected_at = None
+
         except aiohttp.ClientConnectorError as e:
             print(f"WebSocket Connection Error: Failed to connect to {self.ws_url}. Is ComfyUI running? Details: {e}")
             self.is_connected = False
@@ -110,7 +218,7 @@ class WebsocketClient:
                 if msg.type == aiohttp.WSMsgType.TEXT:
                     try:
                         data = json.loads(msg.data)
-                        await self.handle_message(data)
+                        self.route_message(data)
                     except json.JSONDecodeError:
                         print(f"WebSocket Warning: Received non-JSON message: {msg.data}")
                     except Exception as e_handle:
@@ -130,17 +238,86 @@ class WebsocketClient:
         finally:
             print("WebSocket: Listener loop terminated.")
             self.is_connected = False
+            self._mark_disconnected()
+
+    def _mark_disconnected(self):
+        if self._disconnected_at is None:
+            self._disconnected_at = time.monotonic()
 
     async def handle_message(self, data):
+        self.route_message(data)
+
+    def route_message(self, data):
+        """Apply state changes inline and hand progress traffic to per-prompt mailboxes.
+
+        Runs on the reader task, so it must never await Discord or ComfyUI.
+        """
         bot = self.bot()
         if not bot or bot.is_closed():
             return
 
         msg_type = data.get('type')
         msg_data_content = data.get('data', {})
-        
-        
 
+        if msg_type == 'progress':
+            prompt_id_for_progress = msg_data_content.get('prompt_id') or self.executing_prompt_id
+
+            if prompt_id_for_progress and prompt_id_for_progress in self.active_prompts:
+                current_step = msg_data_content.get('value', 0)
+                max_steps = msg_data_content.get('max', 1)
+                if max_steps > 0 and hasattr(bot, 'update_job_progress'):
+                    self._get_mailbox(prompt_id_for_progress).put_progress(current_step, max_steps)
+
+        elif msg_type == 'preview':
+            prompt_id_for_preview = msg_data_content.get('prompt_id') or self.executing_prompt_id
+
+            if prompt_id_for_preview and prompt_id_for_preview in self.active_prompts:
+                if hasattr(bot, 'update_job_progress'):
+                    self._get_mailbox(prompt_id_for_preview).put_preview(msg_data_content)
+
+        else:
+            self._handle_state_message(msg_type, msg_data_content, data)
+
+    def _get_mailbox(self, prompt_id):
+        mailbox = self._mailboxes.get(prompt_id)
+        if mailbox is None:
+            mailbox = PromptMailbox()
+            self._mailboxes[prompt_id] = mailbox
+        handler_task = self._handler_tasks.get(prompt_id)
+        if handler_task is None or handler_task.done():
+            self._handler_tasks[prompt_id] = asyncio.get_running_loop().create_task(self._run_prompt_handler(prompt_id, mailbox))
+        return mailbox
+
+    async def _run_prompt_handler(self, prompt_id, mailbox):
+        try:
+            while True:
+                item = await mailbox.get()
+                if item is None:
+                    break
+                bot = self.bot()
+                if not bot or bot.is_closed():
+                    break
+                progress_item, preview_item = item
+                if progress_item is not None:
+                    current_step, max_steps = progress_item
+                    try:
+                        await bot.update_job_progress(prompt_id, current_step, max_steps, None)
+                    except Exception as e_upd:
+                        print(f"Error calling bot.update_job_progress for {prompt_id} from WS progress: {e_upd}")
+                if preview_item is not None:
+                    try:
+                        await bot.update_job_progress(prompt_id, None, None, preview_item)
+                    except Exception as e_upd_preview:
+                        print(f"Error calling bot.update_job_progress for {prompt_id} from WS preview: {e_upd_preview}")
+        except asyncio.CancelledError:
+            pass
+        finally:
+            if self._mailboxes.get(prompt_id) is mailbox and mailbox.closed:
+                del self._mailboxes[prompt_id]
+            if self._handler_tasks.get(prompt_id) is asyncio.current_task():
+                del self._handler_tasks[prompt_id]
+
+    def _handle_state_message(self, msg_type, msg_data_content, data):
         if msg_type == 'status':
             sid_from_msg = msg_data_content.get('sid') if 'sid' in msg_data_content else data.get('sid')
             if sid_from_msg:
@@ -160,73 +337,50 @@ class WebsocketClient:
             prompt_id = msg_data_content.get('prompt_id')
             if prompt_id and prompt_id in self.active_prompts:
                 print(f"WebSocket: Job {prompt_id} started execution.")
-                for p_id_loop in list(self.active_prompts.keys()): 
-                    if p_id_loop == prompt_id:
-                        if p_id_loop in self.active_prompts: self.active_prompts[p_id_loop]['status'] = 'executing'
-                    elif p_id_loop in self.active_prompts and self.active_prompts[p_id_loop]['status'] == 'executing': 
-                        self.active_prompts[p_id_loop]['status'] = 'queued_behind_new_start'
+                self._mark_executing(prompt_id)
 
         elif msg_type == 'execution_cached':
             prompt_id = msg_data_content.get('prompt_id')
             if prompt_id and prompt_id in self.active_prompts:
                 print(f"WebSocket: Job {prompt_id} is using cached data.")
-                if self.active_prompts[prompt_id]['status'] != 'executing':
-                    for p_id_loop in list(self.active_prompts.keys()):
-                        if p_id_loop == prompt_id:
-                            if p_id_loop in self.active_prompts: self.active_prompts[p_id_loop]['status'] = 'executing'
-                        elif p_id_loop in self.active_prompts and self.active_prompts[p_id_loop]['status'] == 'executing':
-                            self.active_prompts[p_id_loop]['status'] = 'queued_usurped_by_cache_message'
+                self._mark_executing(prompt_id)
             
         elif msg_type == 'executing': 
             prompt_id = msg_data_content.get('prompt_id')
             if prompt_id and prompt_id in self.active_prompts:
-                if self.active_prompts[prompt_id]['status'] != 'executing':
-                    for p_id_loop in list(self.active_prompts.keys()):
-                         if p_id_loop == prompt_id:
-                              if p_id_loop in self.active_prompts: self.active_prompts[p_id_loop]['status'] = 'executing'
-                         elif p_id_loop in self.active_prompts and self.active_prompts[p_id_loop]['status'] == 'executing':
-                              self.active_prompts[p_id_loop]['status'] = 'queued_usurped' 
+                self._mark_executing(prompt_id)
             
         elif msg_type == 'executed': 
             prompt_id = msg_data_content.get('prompt_id')
             if prompt_id:
                 print(f"WebSocket: Job {prompt_id} finished execution.")
+                self._mark_done(prompt_id)
                 self.unregister_prompt(prompt_id)
 
-        elif msg_type == 'progress':
-            progress_update_data = msg_data_content 
-            prompt_id_for_progress = msg_data_content.get('prompt_id') 
-            if not prompt_id_for_progress:
-                prompt_id_for_progress = next((pid for pid, pdata in self.active_prompts.items() if pdata.get('status') == 'executing'), None)
-            
-            if prompt_id_for_progress and prompt_id_for_progress in self.active_prompts:
-                current_step = progress_update_data.get('value', 0)
-                max_steps = progress_update_data.get('max', 1) 
-                if max_steps > 0 and hasattr(bot, 'update_job_progress'):
-                    try:
-                        await bot.update_job_progress(prompt_id_for_progress, current_step, max_steps, None)
-                    except Exception as e_upd:
-                        print(f"Error calling bot.update_job_progress for {prompt_id_for_progress} from WS progress: {e_upd}")
-
-        elif msg_type == 'preview':
-            preview_img_data = msg_data_content 
-            prompt_id_for_preview = msg_data_content.get('prompt_id')
-            if not prompt_id_for_preview:
-                prompt_id_for_preview = next((pid for pid, pdata in self.active_prompts.items() if pdata.get('status') == 'executing'), None)
-
-            if prompt_id_for_preview and prompt_id_for_preview in self.active_prompts:
-                if hasattr(bot, 'update_job_progress'):
-                    try:
-                        await bot.update_job_progress(prompt_id_for_preview, None, None, preview_img_data)
-                    except Exception as e_upd_preview:
-                        print(f"Error calling bot.update_job_progress for {prompt_id_for_preview} from WS preview: {e_upd_preview}")
-
         elif msg_type in ['execution_interrupted', 'execution_error']:
              prompt_id = msg_data_content.get('prompt_id')
              if prompt_id:
                 error_details = msg_data_content.get('exception_message', 'No details provided.')
                 print(f"WebSocket: Job {prompt_id} failed with status '{msg_type}'. Details: {error_details}")
+                self._mark_done(prompt_id)
                 self.unregister_prompt(prompt_id)
+
+    def _mark_executing(self, prompt_id):
+        """queued -> executing. ComfyUI runs one prompt at a time, so the previous one is demoted."""
+        previous_id = self.executing_prompt_id
+        if previous_id == prompt_id:
+            return
+        if previous_id is not None and previous_id in self.active_prompts:
+            if self.active_prompts[previous_id]['status'] == PROMPT_EXECUTING:
+                self.active_prompts[previous_id]['status'] = PROMPT_QUEUED
+        self.active_prompts[prompt_id]['status'] = PROMPT_EXECUTING
+        self.executing_prompt_id = prompt_id
+
+    def _mark_done(self, prompt_id):
+        if prompt_id in self.active_prompts:
+            self.active_prompts[prompt_id]['status'] = PROMPT_DONE
+        if self.executing_prompt_id == prompt_id:
+            self.executing_prompt_id = None
     
     async def register_prompt(self, prompt_id, message_id, channel_id):
         if not self.is_connected and not self.is_connecting:
@@ -239,11 +393,16 @@ class WebsocketClient:
         self.active_prompts[prompt_id] = {
             "message_id": message_id,
             "channel_id": channel_id,
-            "status": "queued", 
+            "status": PROMPT_QUEUED, 
             "last_preview_timestamp": 0
         }
 
     def unregister_prompt(self, prompt_id):
+        if self.executing_prompt_id == prompt_id:
+            self.executing_prompt_id = None
+        mailbox = self._mailboxes.pop(prompt_id, None)
+        if mailbox is not None:
+            mailbox.close()
         if prompt_id in self.active_prompts:
             del self.active_prompts[prompt_id]
             print(f"WebSocket: Unregistered prompt {prompt_id}")
@@ -281,6 +440,7 @@ class WebsocketClient:
         self.ws = None
         self.is_connected = False
         self.is_connecting = False
+        self._mark_disconnected()
         print("WebSocket: Disconnected state set.")
         self.client_id_confirmed = False
         if hasattr(self, "_client_id_ready_event"):
@@ -318,12 +478,110 @@ class WebsocketClient:
         finally:
             self.connection_task = None
 
-    async def reconnect(self):
-        print("WebSocket: Reconnect sequence initiated.")
-        await self.disconnect(cancel_tasks=True)
-        print("WebSocket: Delaying 5s before attempting reconnect...")
-        await asyncio.sleep(5)
-        await self.ensure_connected()
+    def start_supervisor(self):
+        """Start the background task that keeps the socket connected."""
+        bot = self.bot()
+        if not bot or bot.is_closed():
+            return
+        if self.supervisor_task and not self.supervisor_task.done():
+            return
+        self.supervisor_task = bot.loop.create_task(self._supervise())
+
+    async def _supervise(self):
+        print("WebSocket: Connection supervisor started.")
+        try:
+            while True:
+                bot = self.bot()
+                if not bot or bot.is_closed():
+                    break
+
+                if not self.is_connected:
+                    await self.ensure_connected()
+                    if not self.is_connected:
+                        delay = compute_backoff_delay(self.failed_connect_attempts)
+                        self.failed_connect_attempts += 1
+                        print(f"WebSocket: Connection attempt {self.failed_connect_attempts} failed. Retrying in {delay:.1f}s.")
+                        await asyncio.sleep(delay)
+                        continue
+
+                self.failed_connect_attempts = 0
+                listener = self.listener_task
+                if listener is not None and not listener.done():
+                    await asyncio.wait({listener})
+                else:
+                    await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            print("WebSocket: Connection supervisor stopped.")
+
+    async def resync_active_prompts(self):
+        """Reconcile ``active_prompts`` with ComfyUI's queue after a reconnect.
+
+        Prompts that are no longer queued or running finished while we were
+        offline; they are dropped from progress tracking and picked up by the
+        output folder scan.  Pending bot jobs that were queued while the socket
+        was down are registered so they receive progress again.
+        """
+        comfyui = config_service.comfyui
+        queue_url = f"http://{comfyui.host}:{comfyui.port}/queue"
+        try:
+            response = await asyncio.to_thread(requests.get, queue_url, timeout=10)
+            response.raise_for_status()
+            queue_data = response.json()
+        except Exception as e_resync:
+            print(f"WebSocket: Could not fetch ComfyUI queue for resync: {e_resync}")
+            return
+
+        def _prompt_ids(entries):
+            ids = []
+            for entry in entries or []:
+                if isinstance(entry, (list, tuple)) and len(entry) > 1 and isinstance(entry[1], str):
+                    ids.append(entry[1])
+            return ids
+
+        running_ids = set(_prompt_ids(queue_data.get('queue_running')))
+        pending_ids = set(_prompt_ids(queue_data.get('queue_pending')))
+
+        for job_data in queue_manager.get_pending_jobs().values():
+            comfy_id = job_data.get('comfy_prompt_id')
+            if comfy_id and comfy_id not in self.active_prompts and (comfy_id in running_ids or comfy_id in pending_ids):
+                message_id = job_data.get('message_id'); channel_id = job_data.get('channel_id')
+                if message_id and channel_id:
+                    self.active_prompts[comfy_id] = {
+                        "message_id": int(message_id),
+                        "channel_id": int(channel_id),
+                        "status": PROMPT_QUEUED,
+                        "last_preview_timestamp": 0
+                    }
+
+        dropped = 0
+        for prompt_id in list(self.active_prompts.keys()):
+            if prompt_id in running_ids:
+                self._mark_executing(prompt_id)
+            elif prompt_id in pending_ids:
+                if self.executing_prompt_id == prompt_id:
+                    self.executing_prompt_id = None
+                self.active_prompts[prompt_id]['status'] = PROMPT_QUEUED
+            else:
+                self.unregister_prompt(prompt_id)
+                dropped += 1
+        print(
+            f"WebSocket: Resync complete. {len(running_ids)} running, {len(pending_ids)} pending, "
+            f"{dropped} prompt(s) finished while disconnected."
+        )
+
+    def get_connection_metrics(self):
+        current_downtime = time.monotonic() - self._disconnected_at if self._disconnected_at is not None else 0.0
+        return {
+            "connected": self.is_connected,
+            "reconnect_count": self.reconnect_count,
+            "failed_connect_attempts": self.failed_connect_attempts,
+            "last_downtime_seconds": round(self.last_downtime, 3),
+            "total_downtime_seconds": round(self.total_downtime + (current_downtime if self._has_connected_once else 0.0), 3),
+            "current_downtime_seconds": round(current_downtime, 3),
+            "active_prompts": len(self.active_prompts),
+        }
 
     async def wait_for_client_id(self, timeout: float = 5.0) -> bool:
         if self.client_id and getattr(self, "client_id_confirmed", False):
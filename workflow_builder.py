@@ -0,0 +1,168 @@
+"""Copy-on-write view over a ComfyUI workflow template.
+
+Preparing a job used to start with ``json.loads(json.dumps(template))`` of
+the whole graph even though the ``_apply_*`` helpers only touch a handful of
+nodes.  :class:`WorkflowBuilder` keeps the template as a read-only base and
+behaves like the ``dict`` those helpers expect: a node is copied the first
+time it is looked up, untouched nodes are never copied until
+:meth:`WorkflowBuilder.materialize` produces the plain payload handed to
+ComfyUI.  :meth:`WorkflowBuilder.patch` exposes the per-job changes as a
+sparse ``node id -> input changes`` mapping.  :class:`WorkflowPlanCache`
+keeps resolved skeletons around so repeated jobs can start from them.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, Mapping, Tuple
+
+_MISSING = object()
+
+
+def copy_workflow_value(value: Any) -> Any:
+    """Structural copy of JSON-shaped data (dicts, lists, scalars)."""
+    if isinstance(value, dict):
+        return {key: copy_workflow_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [copy_workflow_value(item) for item in value]
+    return value
+
+
+class WorkflowBuilder(MutableMapping):
+    """Mutable mapping of node id -> node that shares untouched nodes with ``base``."""
+
+    __slots__ = ("_base", "_overrides", "_removed")
+
+    def __init__(self, base: Mapping[str, dict]):
+        self._base = base
+        self._overrides: Dict[str, Any] = {}
+        self._removed: set = set()
+
+    @property
+    def base(self) -> Mapping[str, dict]:
+        return self._base
+
+    def __getitem__(self, node_id):
+        node = self._overrides.get(node_id, _MISSING)
+        if node is not _MISSING:
+            return node
+        if node_id in self._removed or node_id not in self._base:
+            raise KeyError(node_id)
+        # The caller may mutate what it gets back, so copy the node before handing it out.
+        node = copy_workflow_value(self._base[node_id])
+        self._overrides[node_id] = node
+        return node
+
+    def __setitem__(self, node_id, node) -> None:
+        self._removed.discard(node_id)
+        self._overrides[node_id] = node
+
+    def __delitem__(self, node_id) -> None:
+        if node_id not in self:
+            raise KeyError(node_id)
+        self._overrides.pop(node_id, None)
+        if node_id in self._base:
+            self._removed.add(node_id)
+
+    def __contains__(self, node_id) -> bool:
+        if node_id in self._overrides:
+            return True
+        return node_id in self._base and node_id not in self._removed
+
+    def __iter__(self) -> Iterator[str]:
+        for node_id in self._base:
+            if node_id not in self._removed:
+                yield node_id
+        for node_id in self._overrides:
+            if node_id not in self._base:
+                yield node_id
+
+    def __len__(self) -> int:
+        added = sum(1 for node_id in self._overrides if node_id not in self._base)
+        return len(self._base) - len(self._removed) + added
+
+    def peek(self, node_id, default=None):
+        """Read a node without copying it. The result must not be mutated."""
+        node = self._overrides.get(node_id, _MISSING)
+        if node is not _MISSING:
+            return node
+        if node_id in self._removed:
+            return default
+        return self._base.get(node_id, default)
+
+    def patch(self) -> Dict[str, Dict[str, Any]]:
+        """Sparse per-job changes: ``{node_id: {input_name: new_value}}``.
+
+        Inputs that were removed map to ``None``. Nodes that are new or had
+        their ``class_type`` swapped are returned whole, and nodes deleted
+        from the template map to ``None``.
+        """
+        changes: Dict[str, Dict[str, Any]] = {}
+        for node_id, node in self._overrides.items():
+            base_node = self._base.get(node_id) if node_id not in self._removed else None
+            if not isinstance(base_node, dict) or not isinstance(node, dict) \
+                    or node.get("class_type") != base_node.get("class_type"):
+                changes[node_id] = node
+                continue
+            base_inputs = base_node.get("inputs") or {}
+            inputs = node.get("inputs") or {}
+            diff = {key: value for key, value in inputs.items() if base_inputs.get(key, _MISSING) != value}
+            diff.update({key: None for key in base_inputs if key not in inputs})
+            if diff:
+                changes[node_id] = diff
+        for node_id in self._removed:
+            changes[node_id] = None
+        return changes
+
+    def materialize(self) -> Dict[str, Any]:
+        """Plain ``dict`` payload, safe to mutate or serialize without touching ``base``."""
+        return {
+            node_id: self._overrides[node_id] if node_id in self._overrides
+            else copy_workflow_value(self._base[node_id])
+            for node_id in self
+        }
+
+
+class WorkflowPlanCache:
+    """Small LRU of resolved workflow skeletons keyed by a hash of their inputs.
+
+    Entries also expire after ``ttl_seconds`` because a plan bakes in which
+    models ComfyUI reported as available when it was built.
+    """
+
+    def __init__(self, max_entries: int = 32, ttl_seconds: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, plan) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), plan)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}